@@ -8,9 +8,175 @@ Maneja conexiones, consultas y operaciones sobre la base de datos.
 import sqlite3
 import os
 import sys
+import threading
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
 from pathlib import Path
 
+from app.database.instrumentacion import conectar
+from app.utils.conversion import convertir_monto, tasa_a_cup
+from app.utils.perfilado import medir
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Columnas de saldo_caja por moneda y sus columnas de origen en facturas y salidas_caja
+MONEDAS_CAJA = (
+    ("usd", "pago_usd", "monto_usd"),
+    ("eur", "pago_eur", "monto_eur"),
+    ("cup", "pago_cup", "monto_cup"),
+    ("transferencia", "pago_transferencia", "monto_transferencia"),
+)
+
+def _sql_triggers_saldo(tabla, tipo, indice_columna, contador):
+    """
+    Genera los triggers que mantienen saldo_caja al día para una tabla
+    
+    Args:
+        tabla: 'facturas' o 'salidas_caja'
+        tipo: 'entradas' o 'salidas' (prefijo de las columnas de saldo_caja)
+        indice_columna: Posición de la columna de origen en MONEDAS_CAJA
+        contador: Columna de saldo_caja con el número de filas abiertas
+    
+    Returns:
+        Lista de sentencias CREATE TRIGGER
+    """
+    abierta_new = "COALESCE(NEW.cerrada, 0) = 0"
+    abierta_old = "COALESCE(OLD.cerrada, 0) = 0"
+    columnas = [(f"{tipo}_{moneda[0]}", moneda[indice_columna]) for moneda in MONEDAS_CAJA]
+    
+    sumar = ", ".join(f"{destino} = {destino} + COALESCE(NEW.{origen}, 0)" for destino, origen in columnas)
+    restar = ", ".join(f"{destino} = {destino} - COALESCE(OLD.{origen}, 0)" for destino, origen in columnas)
+    cambiar = ", ".join(
+        f"{destino} = {destino}"
+        f" - CASE WHEN {abierta_old} THEN COALESCE(OLD.{origen}, 0) ELSE 0 END"
+        f" + CASE WHEN {abierta_new} THEN COALESCE(NEW.{origen}, 0) ELSE 0 END"
+        for destino, origen in columnas
+    )
+    origenes = ", ".join(origen for _, origen in columnas)
+    
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_saldo_{tabla}_insert AFTER INSERT ON {tabla} "
+        f"WHEN {abierta_new} BEGIN "
+        f"UPDATE saldo_caja SET {sumar}, {contador} = {contador} + 1 WHERE id = 1; END",
+        
+        f"CREATE TRIGGER IF NOT EXISTS trg_saldo_{tabla}_update AFTER UPDATE OF {origenes}, cerrada ON {tabla} "
+        f"BEGIN "
+        f"UPDATE saldo_caja SET {cambiar}, "
+        f"{contador} = {contador} - ({abierta_old}) + ({abierta_new}) WHERE id = 1; END",
+        
+        f"CREATE TRIGGER IF NOT EXISTS trg_saldo_{tabla}_delete AFTER DELETE ON {tabla} "
+        f"WHEN {abierta_old} BEGIN "
+        f"UPDATE saldo_caja SET {restar}, {contador} = {contador} - 1 WHERE id = 1; END",
+    ]
+
+def _diferencia(tipo, columna):
+    """Expresión SQL con la variación de una columna en un trigger"""
+    if tipo == "alta":
+        return f"COALESCE(NEW.{columna}, 0)"
+    if tipo == "baja":
+        return f"-COALESCE(OLD.{columna}, 0)"
+    return f"COALESCE(NEW.{columna}, 0) - COALESCE(OLD.{columna}, 0)"
+
+def _sql_triggers_libro(tabla, indice_columna, cuenta_debe, cuenta_haber, origen):
+    """
+    Genera los triggers que asientan en movimientos_caja los cambios de una tabla
+    
+    Args:
+        tabla: 'facturas' o 'salidas_caja'
+        indice_columna: Posición de la columna de origen en MONEDAS_CAJA
+        cuenta_debe: Cuenta que recibe el dinero cuando el monto aumenta
+        cuenta_haber: Cuenta de la que sale el dinero cuando el monto aumenta
+        origen: Tipo de documento que se registra en el movimiento
+    
+    Returns:
+        Lista de sentencias CREATE TRIGGER
+    """
+    def asientos(diferencia, tipo):
+        # Un movimiento por moneda con monto distinto de cero; si el monto
+        # disminuye, el asiento invierte las cuentas
+        return " ".join(
+            f"INSERT INTO movimientos_caja (moneda, cuenta_debe, cuenta_haber, monto, origen, origen_id) "
+            f"SELECT '{moneda[0]}', "
+            f"CASE WHEN d > 0 THEN '{cuenta_debe}' ELSE '{cuenta_haber}' END, "
+            f"CASE WHEN d > 0 THEN '{cuenta_haber}' ELSE '{cuenta_debe}' END, "
+            f"ABS(d), '{tipo}', {'OLD' if diferencia == 'baja' else 'NEW'}.id "
+            f"FROM (SELECT {_diferencia(diferencia, moneda[indice_columna])} AS d) WHERE d <> 0;"
+            for moneda in MONEDAS_CAJA
+        )
+    
+    origenes = ", ".join(moneda[indice_columna] for moneda in MONEDAS_CAJA)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_libro_{tabla}_insert AFTER INSERT ON {tabla} "
+        f"BEGIN {asientos('alta', origen)} END",
+        
+        f"CREATE TRIGGER IF NOT EXISTS trg_libro_{tabla}_update AFTER UPDATE OF {origenes} ON {tabla} "
+        f"BEGIN {asientos('cambio', 'ajuste_' + origen)} END",
+        
+        f"CREATE TRIGGER IF NOT EXISTS trg_libro_{tabla}_delete AFTER DELETE ON {tabla} "
+        f"BEGIN {asientos('baja', 'anulacion_' + origen)} END",
+    ]
+
+def registrar_funciones_conversion(conexion, tasas_en):
+    """
+    Registra en una conexión las funciones SQL de conversión de moneda
+    
+    - to_usd(monto, moneda[, instante]): monto en USD con la tasa vigente en el instante
+    - convertir(monto, origen, destino, instante): monto convertido entre monedas
+    - tasa_cup(moneda, instante): CUP por unidad de la moneda
+    
+    Los instantes son TIMESTAMP en UTC (como facturas.fecha); NULL es el momento
+    actual. No se declaran deterministas: con NULL dependen de la hora, y las
+    tasas vigentes en un instante cambian si se registran o corrigen tasas, así
+    que SQLite no debe reutilizar sus resultados ni usarlas en índices.
+    
+    Args:
+        conexion: Conexión sqlite3
+        tasas_en: Función que recibe el instante y devuelve {'usd': ..., 'eur': ...}
+            (normalmente DatabaseManager.tasas_en)
+    """
+    def to_usd(monto, moneda, instante=None):
+        if monto is None or moneda is None:
+            return None
+        return convertir_monto(monto, moneda, "USD", tasas_en(instante))
+    
+    def convertir(monto, origen, destino, instante):
+        if monto is None or origen is None or destino is None:
+            return None
+        return convertir_monto(monto, origen, destino, tasas_en(instante))
+    
+    def tasa_cup(moneda, instante):
+        if moneda is None:
+            return None
+        return tasa_a_cup(moneda, tasas_en(instante))
+    
+    conexion.create_function("to_usd", 3, to_usd)
+    conexion.create_function("to_usd", 2, to_usd)
+    conexion.create_function("convertir", 4, convertir)
+    conexion.create_function("tasa_cup", 2, tasa_cup)
+
+# Consulta de tasas de las funciones SQL de conversión (la capa de servicios
+# registra su historial en memoria al importarse, ver establecer_consulta_tasas)
+_consulta_tasas = None
+
+def establecer_consulta_tasas(consulta):
+    """
+    Registra la función que resuelve las tasas vigentes de cualquier base de datos
+    
+    Args:
+        consulta: Función que recibe el DatabaseManager y el instante
+            (TIMESTAMP UTC o None) y devuelve {'usd': ..., 'eur': ...}
+    """
+    global _consulta_tasas
+    _consulta_tasas = consulta
+
+# Bases de datos cuyas tablas ya se crearon y migraron en este proceso
+_bases_inicializadas = set()
+_inicializacion_lock = threading.Lock()
+
+# Bases de datos con el índice único sobre facturas.orden_id
+_bases_orden_unica = set()
+
 class DatabaseManager:
     """Gestor de conexiones y operaciones de base de datos"""
     
@@ -39,19 +205,66 @@ class DatabaseManager:
         # Crear directorio si no existe
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        # Inicializar la base de datos si no existe
-        self.connect()
-        self.inicializar_tablas()
-        self.disconnect()
+        # Inicializar la base de datos si no existe (una sola vez por proceso:
+        # cada servicio crea su propio DatabaseManager)
+        with _inicializacion_lock:
+            if self.db_path not in _bases_inicializadas or not os.path.exists(self.db_path):
+                with medir("inicializar base de datos"):
+                    self.connect()
+                    self.inicializar_tablas()
+                    self.disconnect()
+                _bases_inicializadas.add(self.db_path)
+    
+    def orden_id_unico(self) -> bool:
+        """Indica si la tabla facturas tiene el índice único sobre orden_id"""
+        return self.db_path in _bases_orden_unica
+    
+    def tasas_en(self, instante=None):
+        """
+        Obtiene las tasas vigentes en un instante para las funciones SQL de conversión
+        
+        Usa la consulta registrada (ver establecer_consulta_tasas), que queda
+        registrada en cuanto se importa la capa de servicios, así que no depende
+        de que el historial ya se haya cargado. Solo si nunca se importó (un
+        script que use DatabaseManager por sí solo) se lee tasas_historial en
+        cada llamada, con una conexión propia porque la llamada puede ocurrir
+        dentro de una consulta todavía en curso.
+        
+        Args:
+            instante: TIMESTAMP en UTC (None para el momento actual)
+        
+        Returns:
+            Diccionario {'usd': ..., 'eur': ...}
+        """
+        if _consulta_tasas is not None:
+            return _consulta_tasas(self, instante)
+        
+        conexion = sqlite3.connect(self.db_path)
+        try:
+            # La vigente es la última que entró en vigor hasta ese momento; antes de la primera, la primera
+            fila = conexion.execute(
+                "SELECT usd_valor, eur_valor FROM tasas_historial "
+                "WHERE vigente_desde <= COALESCE(?, CURRENT_TIMESTAMP) ORDER BY vigente_desde DESC LIMIT 1",
+                (instante,)
+            ).fetchone() or conexion.execute(
+                "SELECT usd_valor, eur_valor FROM tasas_historial ORDER BY vigente_desde LIMIT 1"
+            ).fetchone()
+        finally:
+            conexion.close()
+        
+        if fila is None:
+            return {'usd': 350.0, 'eur': 350.0}
+        return {'usd': fila[0], 'eur': fila[1]}
     
     def connect(self):
         """Establece una conexión a la base de datos"""
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            self.connection = conectar(self.db_path)
+            registrar_funciones_conversion(self.connection, self.tasas_en)
             self.cursor = self.connection.cursor()
             return True
         except sqlite3.Error as e:
-            print(f"Error al conectar a la base de datos: {e}")
+            registro.error("Error al conectar a la base de datos: %s", e)
             return False
     
     def disconnect(self):
@@ -66,6 +279,31 @@ class DatabaseManager:
         if self.connection:
             self.connection.commit()
     
+    @contextmanager
+    def transaccion(self):
+        """
+        Abre una transacción de escritura con BEGIN IMMEDIATE
+        
+        El bloqueo de escritura se toma al empezar, así que las lecturas hechas
+        dentro de la transacción no pueden quedar obsoletas por otra terminal
+        antes del commit. Se usa una conexión propia y los errores se propagan.
+        
+        Yields:
+            Cursor de la transacción
+        """
+        conexion = conectar(self.db_path, timeout=10, isolation_level=None)
+        registrar_funciones_conversion(conexion, self.tasas_en)
+        try:
+            conexion.execute("BEGIN IMMEDIATE")
+            try:
+                yield conexion.cursor()
+            except BaseException:
+                conexion.execute("ROLLBACK")
+                raise
+            conexion.execute("COMMIT")
+        finally:
+            conexion.close()
+    
     def execute(self, query, params=None):
         """
         Ejecuta una consulta SQL
@@ -87,9 +325,9 @@ class DatabaseManager:
             self.cursor.execute(query, params)
             return self.cursor
         except sqlite3.Error as e:
-            print(f"Error al ejecutar consulta: {e}")
-            print(f"Consulta: {query}")
-            print(f"Parámetros: {params}")
+            registro.error("Error al ejecutar consulta: %s", e)
+            registro.debug("Consulta: %s", query)
+            registro.debug("Parámetros: %s", params)
             return None
     
     def fetch_all(self, query, params=None):
@@ -135,6 +373,35 @@ class DatabaseManager:
         )
         ''')
         
+        # Historial de tasas por momento de entrada en vigor (UTC, como CURRENT_TIMESTAMP):
+        # permite varias tasas en un mismo día. tasa_cambio se mantiene por trigger
+        # con la última tasa de cada día (hora local) para las consultas por fecha.
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS tasas_historial (
+            vigente_desde TIMESTAMP PRIMARY KEY,
+            usd_valor REAL NOT NULL,
+            eur_valor REAL NOT NULL
+        )
+        ''')
+        self.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_tasas_historial_dia AFTER INSERT ON tasas_historial
+        BEGIN
+            INSERT OR REPLACE INTO tasa_cambio (fecha, usd_valor, eur_valor)
+            SELECT date(vigente_desde, 'localtime'), usd_valor, eur_valor
+            FROM tasas_historial
+            WHERE vigente_desde >= datetime(date(NEW.vigente_desde, 'localtime'), 'utc')
+              AND vigente_desde < datetime(date(NEW.vigente_desde, 'localtime'), '+1 day', 'utc')
+            ORDER BY vigente_desde DESC LIMIT 1;
+        END
+        ''')
+        
+        # Las tasas diarias anteriores pasan al historial vigentes desde la medianoche local
+        if self.fetch_one("SELECT COUNT(*) FROM tasas_historial")[0] == 0:
+            self.execute(
+                "INSERT INTO tasas_historial (vigente_desde, usd_valor, eur_valor) "
+                "SELECT datetime(fecha, 'utc'), usd_valor, eur_valor FROM tasa_cambio"
+            )
+        
         # Tabla de facturas (con mensajero incluido)
         self.execute('''
         CREATE TABLE IF NOT EXISTS facturas (
@@ -175,7 +442,7 @@ class DatabaseManager:
             fecha_cierre TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         ''')
-
+        
         # Tabla de salidas de caja
         self.execute('''
         CREATE TABLE IF NOT EXISTS salidas_caja (
@@ -192,5 +459,169 @@ class DatabaseManager:
             cerrada INTEGER DEFAULT 0
         )
         ''')
-
+        
+        # Bases antiguas: la columna mensajero se añadió después
+        columnas = [fila[1] for fila in self.fetch_all("PRAGMA table_info(facturas)")]
+        if "mensajero" not in columnas:
+            self.execute("ALTER TABLE facturas ADD COLUMN mensajero TEXT NOT NULL DEFAULT 'No especificado'")
+        
+        # Índices de cobertura para los saldos de caja abierta: la suma de pagos
+        # y salidas sin cerrar se resuelve sin leer las tablas
+        self.execute(
+            "CREATE INDEX IF NOT EXISTS idx_facturas_abiertas "
+            "ON facturas(cerrada, pago_usd, pago_eur, pago_cup, pago_transferencia)"
+        )
+        self.execute(
+            "CREATE INDEX IF NOT EXISTS idx_salidas_abiertas "
+            "ON salidas_caja(cerrada, monto_usd, monto_eur, monto_cup, monto_transferencia)"
+        )
+        
+        # Arqueos: conteos de caja intermedios (por ejemplo, en cada cambio de turno).
+        # Guardan el saldo esperado en ese momento y las marcas de facturas,
+        # salidas y libro de caja, para que el cierre parta del último arqueo.
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS arqueos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            responsable TEXT NOT NULL,
+            factura_id INTEGER NOT NULL,   -- Última factura incluida
+            salida_id INTEGER NOT NULL,    -- Última salida incluida
+            movimiento_id INTEGER NOT NULL, -- Último movimiento del libro de caja incluido
+            esperado TEXT NOT NULL,        -- JSON con entradas/salidas/balance por moneda
+            billetes TEXT NOT NULL,        -- JSON {moneda: {denominación: cantidad}}
+            contado_usd REAL DEFAULT 0,
+            contado_eur REAL DEFAULT 0,
+            contado_cup REAL DEFAULT 0,
+            diferencia_usd REAL DEFAULT 0, -- Diferencia atribuible solo a este turno
+            diferencia_eur REAL DEFAULT 0,
+            diferencia_cup REAL DEFAULT 0,
+            cierre_id INTEGER              -- Cierre que lo incluyó (NULL mientras la caja sigue abierta)
+        )
+        ''')
+        self.execute("CREATE INDEX IF NOT EXISTS idx_arqueos_abiertos ON arqueos(cierre_id, id)")
+        
+        # Tipo de cierre: 'normal' (con conteo de efectivo) o 'recuperacion'
+        # (cierre retroactivo de un día que quedó sin cerrar)
+        columnas = [fila[1] for fila in self.fetch_all("PRAGMA table_info(cierres_dia)")]
+        if "tipo" not in columnas:
+            self.execute("ALTER TABLE cierres_dia ADD COLUMN tipo TEXT NOT NULL DEFAULT 'normal'")
+        
+        # Normalizar el estado de filas antiguas para que "cerrada = 0" use los índices
+        self.execute("UPDATE facturas SET cerrada = 0 WHERE cerrada IS NULL")
+        self.execute("UPDATE salidas_caja SET cerrada = 0 WHERE cerrada IS NULL")
+        
+        # Saldo de la caja abierta (facturas y salidas sin cerrar), mantenido por
+        # triggers para que la caja se consulte sin recorrer las tablas
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS saldo_caja (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            entradas_usd REAL NOT NULL DEFAULT 0,
+            entradas_eur REAL NOT NULL DEFAULT 0,
+            entradas_cup REAL NOT NULL DEFAULT 0,
+            entradas_transferencia REAL NOT NULL DEFAULT 0,
+            salidas_usd REAL NOT NULL DEFAULT 0,
+            salidas_eur REAL NOT NULL DEFAULT 0,
+            salidas_cup REAL NOT NULL DEFAULT 0,
+            salidas_transferencia REAL NOT NULL DEFAULT 0,
+            num_facturas INTEGER NOT NULL DEFAULT 0,
+            num_salidas INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # Primera vez: calcular el saldo a partir de los datos existentes
+        entradas = ", ".join(f"COALESCE(SUM({pago}), 0)" for _, pago, _ in MONEDAS_CAJA)
+        salidas = ", ".join(f"COALESCE(SUM({monto}), 0)" for _, _, monto in MONEDAS_CAJA)
+        self.execute(
+            f"INSERT OR IGNORE INTO saldo_caja "
+            f"SELECT 1, e.*, s.*, "
+            f"(SELECT COUNT(*) FROM facturas WHERE COALESCE(cerrada, 0) = 0), "
+            f"(SELECT COUNT(*) FROM salidas_caja WHERE COALESCE(cerrada, 0) = 0) "
+            f"FROM (SELECT {entradas} FROM facturas WHERE COALESCE(cerrada, 0) = 0) AS e, "
+            f"(SELECT {salidas} FROM salidas_caja WHERE COALESCE(cerrada, 0) = 0) AS s"
+        )
+        
+        for sentencia in (_sql_triggers_saldo("facturas", "entradas", 1, "num_facturas") +
+                          _sql_triggers_saldo("salidas_caja", "salidas", 2, "num_salidas")):
+            self.execute(sentencia)
+        
+        # Libro de caja de partida doble: cada movimiento de dinero, por moneda,
+        # con la cuenta que recibe (debe) y la que entrega (haber). Solo se añaden filas.
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS movimientos_caja (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            moneda TEXT NOT NULL,          -- 'usd', 'eur', 'cup', 'transferencia'
+            cuenta_debe TEXT NOT NULL,     -- 'caja', 'ventas', 'salidas', 'cierres'
+            cuenta_haber TEXT NOT NULL,
+            monto REAL NOT NULL,
+            origen TEXT NOT NULL,          -- 'factura', 'ajuste_factura', 'salida', 'cierre', ...
+            origen_id INTEGER
+        )
+        ''')
+        self.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos_caja(fecha)")
+        
+        # Saldos de todas las cuentas en un punto del libro (hasta movimiento_id inclusive)
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS checkpoints_caja (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movimiento_id INTEGER NOT NULL,
+            fecha TIMESTAMP NOT NULL
+        )
+        ''')
+        self.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_fecha ON checkpoints_caja(fecha)")
+        self.execute('''
+        CREATE TABLE IF NOT EXISTS saldos_checkpoint (
+            checkpoint_id INTEGER NOT NULL,
+            cuenta TEXT NOT NULL,
+            moneda TEXT NOT NULL,
+            saldo REAL NOT NULL,
+            PRIMARY KEY (checkpoint_id, cuenta, moneda)
+        )
+        ''')
+        
+        # Bases existentes: asentar en el libro la historia anterior, en orden cronológico
+        if self.fetch_one("SELECT COUNT(*) FROM movimientos_caja")[0] == 0:
+            partes = []
+            for moneda, pago, monto in MONEDAS_CAJA:
+                partes.append(
+                    f"SELECT fecha, '{moneda}' AS moneda, 'caja' AS debe, 'ventas' AS haber, {pago} AS monto, "
+                    f"'factura' AS origen, id FROM facturas WHERE COALESCE({pago}, 0) <> 0"
+                )
+                partes.append(
+                    f"SELECT fecha, '{moneda}', 'salidas', 'caja', {monto}, 'salida', id "
+                    f"FROM salidas_caja WHERE COALESCE({monto}, 0) <> 0"
+                )
+                if moneda != "transferencia":
+                    partes.append(
+                        f"SELECT fecha_cierre, '{moneda}', 'cierres', 'caja', total_{moneda}, 'cierre', id "
+                        f"FROM cierres_dia WHERE COALESCE(total_{moneda}, 0) <> 0"
+                    )
+            partes.append(
+                "SELECT fecha_cierre, 'transferencia', 'cierres', 'caja', total_transferencia, 'cierre', id "
+                "FROM cierres_dia WHERE COALESCE(total_transferencia, 0) <> 0"
+            )
+            # Los montos negativos (por ejemplo, cierres con saldo negativo) invierten las cuentas
+            self.execute(
+                "INSERT INTO movimientos_caja (fecha, moneda, cuenta_debe, cuenta_haber, monto, origen, origen_id) "
+                "SELECT fecha, moneda, "
+                "CASE WHEN monto > 0 THEN debe ELSE haber END, "
+                "CASE WHEN monto > 0 THEN haber ELSE debe END, "
+                "ABS(monto), origen, id "
+                f"FROM ({' UNION ALL '.join(partes)}) ORDER BY fecha"
+            )
+        
+        for sentencia in (_sql_triggers_libro("facturas", 1, "caja", "ventas", "factura") +
+                          _sql_triggers_libro("salidas_caja", 2, "salidas", "caja", "salida")):
+            self.execute(sentencia)
+        
+        # Un orden_id solo puede facturarse una vez: el índice único lo garantiza
+        # en la propia inserción. Si una base antigua ya tiene duplicados, se crea
+        # un índice normal para no perder la búsqueda rápida.
+        try:
+            self.cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_facturas_orden_id ON facturas(orden_id)")
+            _bases_orden_unica.add(self.db_path)
+        except sqlite3.IntegrityError:
+            registro.warning("Aviso: hay orden_id duplicados en facturas; no se pudo crear el índice único")
+            self.execute("CREATE INDEX IF NOT EXISTS idx_facturas_orden_id_no_unico ON facturas(orden_id)")
+        
         self.commit()
\ No newline at end of file
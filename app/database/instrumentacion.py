@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+"""
+Medición de la latencia de las consultas SQL.
+Con la instrumentación activa (configuración database.instrumentacion o
+activar_instrumentacion), las conexiones abiertas con conectar() usan cursores
+que miden cada sentencia: texto normalizado, número de parámetros, filas
+devueltas o modificadas y tiempo (ejecución más lectura de las filas). Las
+mediciones se acumulan en histogramas por sentencia (obtener_estadisticas) y
+las que superan el umbral se anotan, con su EXPLAIN QUERY PLAN, en el
+registro de consultas lentas. Sin activar, conectar() equivale a sqlite3.connect.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List
+
+from app.utils.config import config
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Límites superiores (ms) de las cubetas del histograma; la última es el resto
+CUBETAS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+REGISTRO_PREDETERMINADO = Path(os.path.expanduser("~")) / ".facturacion-app" / "consultas_lentas.log"
+
+# Sentencias cuyo plan de ejecución tiene sentido registrar
+_CON_PLAN = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_activa = False
+_umbral_lento_s = 0.05
+_ruta_registro = None
+_estadisticas = {}
+_lock = threading.RLock()
+
+@lru_cache(maxsize=2048)
+def normalizar_sql(sql: str) -> str:
+    """
+    Normaliza el texto de una sentencia para agrupar sus ejecuciones
+    
+    Se eliminan los comentarios, se unifican los espacios y los literales
+    (textos y números) se sustituyen por ?; las listas IN (?, ?, ...) quedan
+    como IN (...).
+    
+    Args:
+        sql: Sentencia SQL
+    
+    Returns:
+        Sentencia normalizada
+    """
+    texto = re.sub(r"--[^\n]*", " ", sql)
+    texto = re.sub(r"'(?:[^']|'')*'", "?", texto)
+    texto = re.sub(r"(?<![\w.])\d+(?:\.\d+)?\b", "?", texto)
+    texto = re.sub(r"\s+", " ", texto).strip()
+    return re.sub(r"\bIN \(\?(?:, ?\?)*\)", "IN (...)", texto, flags=re.IGNORECASE)
+
+def activar_instrumentacion(umbral_lento_ms: float = 50, ruta_registro: str = None):
+    """
+    Activa la medición de las consultas en las conexiones que se abran a partir de ahora
+    
+    Args:
+        umbral_lento_ms: Sentencias con más latencia se anotan en el registro de consultas lentas
+        ruta_registro: Archivo del registro (por defecto ~/.facturacion-app/consultas_lentas.log)
+    """
+    global _activa, _umbral_lento_s, _ruta_registro
+    _umbral_lento_s = umbral_lento_ms / 1000.0
+    _ruta_registro = Path(ruta_registro) if ruta_registro else REGISTRO_PREDETERMINADO
+    _activa = True
+
+def desactivar_instrumentacion():
+    """Desactiva la medición (las conexiones ya abiertas siguen midiendo hasta cerrarse)"""
+    global _activa
+    _activa = False
+
+def instrumentacion_activa() -> bool:
+    """Indica si las conexiones nuevas miden sus consultas"""
+    return _activa
+
+def conectar(ruta: str, **opciones) -> sqlite3.Connection:
+    """
+    Abre una conexión SQLite, instrumentada si la medición está activa
+    
+    Args:
+        ruta: Archivo de la base de datos
+        **opciones: Argumentos de sqlite3.connect
+    
+    Returns:
+        Conexión a la base de datos
+    """
+    if _activa:
+        opciones.setdefault("factory", ConexionInstrumentada)
+    return sqlite3.connect(ruta, **opciones)
+
+def _plan(conexion, sql: str, parametros) -> List[str]:
+    """Obtiene el EXPLAIN QUERY PLAN de una sentencia (sin medirlo)"""
+    if not sql.lstrip().upper().startswith(_CON_PLAN):
+        return []
+    try:
+        cursor = sqlite3.Cursor(conexion)
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)
+        return [fila[-1] for fila in cursor.fetchall()]
+    except Exception as e:
+        return [f"(sin plan: {e})"]
+
+def _anotar_lenta(conexion, sql: str, parametros, num_parametros: int, filas: int, segundos: float):
+    """Añade una sentencia lenta, con su plan, al registro de consultas lentas"""
+    lineas = [
+        f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | {segundos * 1000:.1f} ms | "
+        f"{num_parametros} parámetros | {filas} filas | {threading.current_thread().name}",
+        f"  {normalizar_sql(sql)}"
+    ]
+    lineas.extend(f"  plan: {paso}" for paso in _plan(conexion, sql, parametros))
+    
+    try:
+        os.makedirs(os.path.dirname(_ruta_registro), exist_ok=True)
+        with _lock, open(_ruta_registro, "a", encoding="utf-8") as archivo:
+            archivo.write("\n".join(lineas) + "\n\n")
+    except OSError as e:
+        registro.error("Error al escribir el registro de consultas lentas: %s", e)
+
+def registrar_medicion(conexion, sql: str, parametros, num_parametros: int, filas: int, segundos: float):
+    """
+    Acumula la medición de una sentencia y la anota si es lenta
+    
+    Args:
+        conexion: Conexión en la que se ejecutó (para obtener el plan)
+        sql: Sentencia tal como se ejecutó
+        parametros: Parámetros de la sentencia (para obtener el plan)
+        num_parametros: Número de parámetros (o de filas en executemany)
+        filas: Filas devueltas o modificadas
+        segundos: Latencia medida
+    """
+    clave = normalizar_sql(sql)
+    cubeta = bisect_left(CUBETAS_MS, segundos * 1000)
+    with _lock:
+        datos = _estadisticas.get(clave)
+        if datos is None:
+            datos = _estadisticas[clave] = {
+                'ejecuciones': 0, 'total_s': 0.0, 'maximo_s': 0.0, 'filas': 0,
+                'parametros': num_parametros, 'lentas': 0, 'cubetas': [0] * (len(CUBETAS_MS) + 1)
+            }
+        datos['ejecuciones'] += 1
+        datos['total_s'] += segundos
+        datos['maximo_s'] = max(datos['maximo_s'], segundos)
+        datos['filas'] += filas
+        datos['parametros'] = num_parametros
+        datos['cubetas'][cubeta] += 1
+        lenta = segundos >= _umbral_lento_s
+        if lenta:
+            datos['lentas'] += 1
+    
+    if lenta:
+        _anotar_lenta(conexion, sql, parametros, num_parametros, filas, segundos)
+
+def _percentil_ms(cubetas: List[int], ejecuciones: int, fraccion: float) -> float:
+    """Cota superior (ms) del percentil según el histograma (inf si cae en la última cubeta)"""
+    objetivo = fraccion * ejecuciones
+    acumulado = 0
+    for indice, cantidad in enumerate(cubetas):
+        acumulado += cantidad
+        if acumulado >= objetivo:
+            return CUBETAS_MS[indice] if indice < len(CUBETAS_MS) else float("inf")
+    return float("inf")
+
+def obtener_estadisticas(orden: str = "total_ms") -> List[Dict]:
+    """
+    Devuelve las estadísticas acumuladas por sentencia normalizada
+    
+    Args:
+        orden: Campo por el que se ordena de mayor a menor
+            ('total_ms', 'maximo_ms', 'ejecuciones', 'p95_ms'...)
+    
+    Returns:
+        Lista de diccionarios con sql, ejecuciones, total_ms, media_ms,
+        maximo_ms, p50_ms, p95_ms, filas, parametros, lentas e histograma
+        ({límite en ms: cantidad}, con None para la cubeta sin límite)
+    """
+    with _lock:
+        copia = [(sql, dict(datos, cubetas=list(datos['cubetas']))) for sql, datos in _estadisticas.items()]
+    
+    resultado = []
+    for sql, datos in copia:
+        ejecuciones = datos['ejecuciones']
+        resultado.append({
+            'sql': sql,
+            'ejecuciones': ejecuciones,
+            'total_ms': datos['total_s'] * 1000,
+            'media_ms': datos['total_s'] * 1000 / ejecuciones,
+            'maximo_ms': datos['maximo_s'] * 1000,
+            'p50_ms': _percentil_ms(datos['cubetas'], ejecuciones, 0.50),
+            'p95_ms': _percentil_ms(datos['cubetas'], ejecuciones, 0.95),
+            'filas': datos['filas'],
+            'parametros': datos['parametros'],
+            'lentas': datos['lentas'],
+            'histograma': dict(zip(CUBETAS_MS + (None,), datos['cubetas']))
+        })
+    
+    resultado.sort(key=lambda fila: fila[orden], reverse=True)
+    return resultado
+
+def reiniciar_estadisticas():
+    """Descarta las estadísticas acumuladas"""
+    with _lock:
+        _estadisticas.clear()
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """Cursor que mide cada sentencia desde su ejecución hasta la lectura de sus filas"""
+    
+    _pendiente = None
+    
+    def execute(self, sql, parametros=()):
+        """Ejecuta la sentencia; si devuelve filas, la medición sigue abierta hasta leerlas"""
+        self._cerrar_medicion()
+        inicio = time.perf_counter()
+        super().execute(sql, parametros)
+        self._pendiente = [sql, parametros, time.perf_counter() - inicio, 0]
+        if self.description is None:
+            self._pendiente[3] = max(self.rowcount, 0)
+            self._cerrar_medicion()
+        return self
+    
+    def executemany(self, sql, secuencia):
+        """Ejecuta la sentencia para cada juego de parámetros y la mide como una sola"""
+        self._cerrar_medicion()
+        secuencia = list(secuencia)
+        inicio = time.perf_counter()
+        super().executemany(sql, secuencia)
+        registrar_medicion(self.connection, sql, secuencia[0] if secuencia else (), len(secuencia),
+                           max(self.rowcount, 0), time.perf_counter() - inicio)
+        return self
+    
+    def _leer(self, lectura, *args):
+        """Lee filas sumando su tiempo a la medición abierta"""
+        inicio = time.perf_counter()
+        filas = lectura(*args)
+        if self._pendiente is not None:
+            self._pendiente[2] += time.perf_counter() - inicio
+        return filas
+    
+    def fetchone(self):
+        """Lee una fila; al agotarse los resultados se cierra la medición"""
+        fila = self._leer(super().fetchone)
+        if self._pendiente is not None:
+            if fila is None:
+                self._cerrar_medicion()
+            else:
+                self._pendiente[3] += 1
+        return fila
+    
+    def fetchmany(self, size=None):
+        """Lee varias filas"""
+        filas = self._leer(super().fetchmany, size if size is not None else self.arraysize)
+        if self._pendiente is not None:
+            self._pendiente[3] += len(filas)
+            if not filas:
+                self._cerrar_medicion()
+        return filas
+    
+    def fetchall(self):
+        """Lee todas las filas restantes y cierra la medición"""
+        filas = self._leer(super().fetchall)
+        if self._pendiente is not None:
+            self._pendiente[3] += len(filas)
+            self._cerrar_medicion()
+        return filas
+    
+    def __next__(self):
+        """Iteración fila a fila (for fila in cursor)"""
+        fila = self.fetchone()
+        if fila is None:
+            raise StopIteration
+        return fila
+    
+    def close(self):
+        """Cierra la medición pendiente y el cursor"""
+        self._cerrar_medicion()
+        super().close()
+    
+    def __del__(self):
+        """Registra la medición de una sentencia cuyos resultados no se leyeron del todo"""
+        try:
+            self._cerrar_medicion()
+        except Exception:
+            pass
+    
+    def _cerrar_medicion(self):
+        """Registra la sentencia en curso, si la hay"""
+        pendiente, self._pendiente = self._pendiente, None
+        if pendiente is not None:
+            sql, parametros, segundos, filas = pendiente
+            num_parametros = len(parametros) if parametros is not None else 0
+            registrar_medicion(self.connection, sql, parametros, num_parametros, filas, segundos)
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión cuyos cursores (incluidos los de execute) miden las sentencias"""
+    
+    def __init__(self, *args, **kwargs):
+        """Abre la conexión"""
+        super().__init__(*args, **kwargs)
+        self._cursores = weakref.WeakSet()
+    
+    def cursor(self, factory=CursorInstrumentado):
+        """Crea un cursor instrumentado"""
+        cursor = super().cursor(factory)
+        self._cursores.add(cursor)
+        return cursor
+    
+    def close(self):
+        """Registra las mediciones pendientes (con la conexión aún abierta para el plan) y cierra"""
+        for cursor in list(self._cursores):
+            if isinstance(cursor, CursorInstrumentado):
+                cursor._cerrar_medicion()
+        super().close()
+    
+    def execute(self, sql, parametros=()):
+        """Ejecuta una sentencia en un cursor instrumentado nuevo"""
+        return self.cursor().execute(sql, parametros)
+    
+    def executemany(self, sql, secuencia):
+        """Ejecuta una sentencia varias veces en un cursor instrumentado nuevo"""
+        return self.cursor().executemany(sql, secuencia)
+
+# Activación desde la configuración
+if config.get("database", "instrumentacion", False):
+    activar_instrumentacion(config.get("database", "umbral_lento_ms", 50),
+                            config.get("database", "registro_consultas_lentas", "") or None)
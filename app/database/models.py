@@ -9,6 +9,10 @@ from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from typing import Optional
 
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
 @dataclass
 class TasaCambio:
     """Representa una tasa de cambio USD a CUP para una fecha específica"""
@@ -71,7 +75,7 @@ class Factura:
             else:
                 fecha = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
         except Exception as e:
-            print(f"Error al procesar fecha '{fecha_str}': {e}")
+            registro.error("Error al procesar fecha '%s': %s", fecha_str, e)
             fecha = datetime.now()
         
         # Crear instancia con valores básicos y mensajero por defecto
@@ -8,33 +8,85 @@ Este módulo inicia la aplicación y la interfaz gráfica.
 
 import sys
 import os
+import multiprocessing
 from pathlib import Path
 
 # Asegurar que los módulos de la aplicación se puedan importar
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from PyQt6.QtWidgets import QApplication
-from app.ui.main_window import MainWindow
-from app.ui.dialogs.login_dialog import LoginDialog
+# Primero el perfilado, para medir las demás importaciones
+from app.utils.perfilado import activar_perfilado, leer_opcion_perfil, marcar, medir
+from app.utils.registro import obtener_registro, configurar_registro
+
+registro = obtener_registro(__name__)
+
+with medir("importar PyQt6"):
+    from PyQt6.QtWidgets import QApplication, QSplashScreen
+    from PyQt6.QtGui import QPixmap, QColor
+    from PyQt6.QtCore import Qt
+
+with medir("importar ventana principal"):
+    from app.ui.main_window import MainWindow
+    from app.ui.dialogs.login_dialog import LoginDialog
+    from app.utils.config import config
+
+def crear_splash():
+    """
+    Crea la pantalla de presentación que se muestra tras el inicio de sesión
+    
+    Returns:
+        QSplashScreen con el nombre de la aplicación
+    """
+    imagen = QPixmap(420, 180)
+    imagen.fill(QColor("#2E7D32"))
+    
+    splash = QSplashScreen(imagen)
+    splash.showMessage(
+        "Sistema de Facturación\n\nIniciando...",
+        Qt.AlignmentFlag.AlignCenter,
+        QColor("white")
+    )
+    return splash
 
 def main():
     """Función principal que inicia la aplicación"""
-    app = QApplication(sys.argv)
+    # Nivel del registro de diagnóstico (DEBUG para ver los mensajes detallados)
+    configurar_registro(config.get("app", "nivel_registro", "INFO"),
+                        config.get("app", "registro_capacidad", 2000))
+    
+    perfil, directorio_perfil, argumentos = leer_opcion_perfil(sys.argv)
+    if perfil:
+        registro.info("Perfilado activo: %s", activar_perfilado(directorio_perfil))
+    
+    app = QApplication(argumentos)
     app.setApplicationName("Sistema de Facturación")
     
     # Mostrar diálogo de inicio de sesión
     login_dialog = LoginDialog()
+    marcar("diálogo de inicio de sesión")
     if login_dialog.exec() != LoginDialog.DialogCode.Accepted:
         # Si el usuario cancela o ingresa clave incorrecta, salir
-        print("Acceso denegado: clave incorrecta o cancelación.")
+        registro.info("Acceso denegado: clave incorrecta o cancelación.")
         return
     
-    # Crear y mostrar la ventana principal solo si la clave es correcta
-    window = MainWindow()
+    # Pantalla de presentación mientras se crea la ventana principal
+    marcar("sesión iniciada")
+    splash = crear_splash()
+    splash.show()
+    app.processEvents()
+    
+    # Crear y mostrar la ventana principal solo si la clave es correcta: la base
+    # de datos y las cachés se preparan después, en segundo plano
+    with medir("crear ventana principal"):
+        window = MainWindow()
     window.show()
+    splash.finish(window)
+    marcar("ventana principal visible")
     
     # Ejecutar el bucle de eventos
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Necesario para el pool de procesos en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
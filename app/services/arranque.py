@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+Inicialización de la aplicación en segundo plano.
+Tras el inicio de sesión la ventana principal se muestra de inmediato y este
+módulo prepara en un hilo propio, por etapas, lo que antes se hacía antes de
+mostrarla: crear y migrar la base de datos, cargar el historial de tasas y el
+índice de órdenes, y consultar el estado de los cierres. La ventana habilita
+cada pestaña cuando termina la etapa de la que depende.
+"""
+
+import threading
+import time
+from typing import Callable, Dict
+
+from app.database.db_manager import DatabaseManager
+from app.services.cierre_dia import CierreDiaService
+from app.services.historial_tasas import obtener_historial_tasas
+from app.services.indice_ordenes import obtener_indice_ordenes
+from app.utils.perfilado import medir
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Etapas en orden de ejecución, con el texto que se muestra mientras se ejecutan
+ETAPAS = (
+    ("base_datos", "Preparando la base de datos..."),
+    ("tasas", "Cargando tasas de cambio..."),
+    ("ordenes", "Cargando índice de órdenes..."),
+    ("cierres", "Verificando cierres pendientes..."),
+)
+
+class InicializadorArranque:
+    """Hilo que ejecuta las etapas de inicialización y avisa al terminar cada una"""
+    
+    def __init__(self, al_iniciar_etapa: Callable[[str, str], None] = None,
+                 al_completar_etapa: Callable[[str, object], None] = None,
+                 al_fallar: Callable[[str, str], None] = None):
+        """
+        Inicializa el hilo (sin iniciarlo)
+        
+        Las funciones se llaman desde el hilo: la interfaz debe pasarlas a su
+        propio hilo (por ejemplo, emitiendo una señal).
+        
+        Args:
+            al_iniciar_etapa: Recibe el nombre y el texto de la etapa que empieza
+            al_completar_etapa: Recibe el nombre de la etapa y su resultado
+            al_fallar: Recibe el nombre de la etapa que falló y el mensaje de error
+        """
+        self.al_iniciar_etapa = al_iniciar_etapa
+        self.al_completar_etapa = al_completar_etapa
+        self.al_fallar = al_fallar
+        
+        self.db = None
+        self.duraciones = {}
+        self.hilo = threading.Thread(target=self._ejecutar, name="arranque", daemon=True)
+    
+    def iniciar(self):
+        """Inicia la inicialización en segundo plano"""
+        self.hilo.start()
+    
+    def _ejecutar(self):
+        """Ejecuta las etapas en orden; si una falla, las siguientes no se ejecutan"""
+        for nombre, texto in ETAPAS:
+            if self.al_iniciar_etapa is not None:
+                self.al_iniciar_etapa(nombre, texto)
+            
+            inicio = time.perf_counter()
+            try:
+                with medir(f"etapa de arranque: {nombre}"):
+                    resultado = getattr(self, f"_etapa_{nombre}")()
+            except Exception as e:
+                registro.error("Error en la etapa de arranque '%s': %s", nombre, e)
+                if self.al_fallar is not None:
+                    self.al_fallar(nombre, str(e))
+                return
+            self.duraciones[nombre] = time.perf_counter() - inicio
+            
+            if self.al_completar_etapa is not None:
+                self.al_completar_etapa(nombre, resultado)
+    
+    def _etapa_base_datos(self):
+        """Crea las tablas y aplica las migraciones pendientes"""
+        self.db = DatabaseManager()
+    
+    def _etapa_tasas(self):
+        """Carga el historial de tasas de cambio en memoria"""
+        obtener_historial_tasas(self.db)
+    
+    def _etapa_ordenes(self):
+        """Carga el índice de orden_id facturados"""
+        obtener_indice_ordenes(self.db)
+    
+    def _etapa_cierres(self) -> Dict:
+        """
+        Consulta el último cierre y los días anteriores sin cerrar
+        
+        Returns:
+            Diccionario con 'hay_cierre', 'ultimo_cierre' y 'dias_pendientes'
+        """
+        servicio = CierreDiaService()
+        hay_cierre, ultimo_cierre = servicio.verificar_dia_actual()
+        return {
+            'hay_cierre': hay_cierre,
+            'ultimo_cierre': ultimo_cierre,
+            'dias_pendientes': servicio.obtener_dias_pendientes() if ultimo_cierre else []
+        }
@@ -4,11 +4,18 @@
 Servicio para gestionar los cierres de día.
 """
 
+import json
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional, Tuple
 
 from app.database.db_manager import DatabaseManager
 from app.services.facturacion import FacturacionService
+from app.services.salidas_service import SalidasService
+from app.services.libro_caja import LibroCajaService, CUENTA_CAJA, CUENTA_VENTAS, CUENTA_SALIDAS
+from app.services.cola_facturas import vaciar_cola_facturas
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class CierreDiaService:
     """Servicio para gestionar los cierres de día"""
@@ -17,6 +24,398 @@ class CierreDiaService:
         """Inicializa el servicio de cierres de día"""
         self.db = DatabaseManager()
         self.facturacion_service = FacturacionService()
+        self.salidas_service = SalidasService()
+        self.libro_service = LibroCajaService()
+    
+    def obtener_resumen_cierre(self) -> Dict:
+        """
+        Obtiene el saldo de la caja abierta junto con la marca que lo delimita
+        
+        La marca (último id de factura y de salida) se toma en la misma lectura
+        que el saldo. Si luego se pasa a realizar_cierre_dia, el cierre incluye
+        exactamente las filas que se vieron en la vista previa; lo registrado
+        después queda para el siguiente cierre.
+        
+        Returns:
+            Diccionario con el formato de SalidasService.obtener_saldo_caja
+            más la clave 'marca'
+        """
+        # Las facturas en escritura diferida deben contarse en el saldo
+        vaciar_cola_facturas()
+        
+        with self.db.transaccion() as cursor:
+            marca = self.capturar_marca(cursor)
+            saldo = self._saldo_hasta_marca(cursor, marca)
+        
+        saldo['marca'] = marca
+        return saldo
+    
+    def registrar_arqueo(self, billetes: Dict[str, Dict[int, int]], responsable: str) -> Dict:
+        """
+        Registra un arqueo (conteo intermedio de la caja, por ejemplo al cambiar de turno)
+        
+        Guarda el conteo por denominación, el saldo esperado en ese momento y
+        las marcas de facturas, salidas y libro de caja. La diferencia que se
+        registra es solo la del turno: la acumulada menos la del arqueo anterior.
+        
+        Args:
+            billetes: {'usd': {denominación: cantidad}, 'eur': {...}, 'cup': {...}}
+            responsable: Persona que entrega o recibe la caja
+            
+        Returns:
+            Diccionario con 'success', 'message' y, si tuvo éxito, el esperado,
+            el contado y las diferencias del turno por moneda
+        """
+        if not responsable:
+            return {'success': False, 'message': "Debe indicar el responsable del arqueo"}
+        
+        vaciar_cola_facturas()
+        
+        contado = {
+            moneda: round(sum(float(denominacion) * cantidad
+                              for denominacion, cantidad in billetes.get(moneda, {}).items()), 2)
+            for moneda in ('usd', 'eur', 'cup')
+        }
+        
+        try:
+            with self.db.transaccion() as cursor:
+                marca = self.capturar_marca(cursor)
+                saldo = self._saldo_hasta_marca(cursor, marca)
+                anterior = self._ultimo_arqueo(cursor)
+                
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos_caja")
+                movimiento_id = cursor.fetchone()[0]
+                
+                diferencias = {}
+                for moneda in ('usd', 'eur', 'cup'):
+                    acumulada = contado[moneda] - saldo[moneda]['balance']
+                    if anterior is not None:
+                        acumulada -= anterior['diferencia_acumulada'][moneda]
+                    diferencias[moneda] = round(acumulada, 2)
+                
+                cursor.execute(
+                    "INSERT INTO arqueos (responsable, factura_id, salida_id, movimiento_id, esperado, billetes, "
+                    "contado_usd, contado_eur, contado_cup, diferencia_usd, diferencia_eur, diferencia_cup) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (responsable, marca['factura_id'], marca['salida_id'], movimiento_id,
+                     json.dumps(saldo),
+                     json.dumps({moneda: {str(d): c for d, c in conteo.items() if c}
+                                 for moneda, conteo in billetes.items()}),
+                     contado['usd'], contado['eur'], contado['cup'],
+                     diferencias['usd'], diferencias['eur'], diferencias['cup'])
+                )
+                arqueo_id = cursor.lastrowid
+                
+                # Checkpoint del libro: los saldos del día se consultan desde el último arqueo
+                self.libro_service.crear_checkpoint(cursor)
+            
+            return {
+                'success': True,
+                'message': "Arqueo registrado correctamente",
+                'id': arqueo_id,
+                'esperado': {moneda: saldo[moneda]['balance'] for moneda in ('usd', 'eur', 'cup')},
+                'contado': contado,
+                'diferencias': diferencias
+            }
+            
+        except Exception as e:
+            registro.error("Error al registrar arqueo: %s", e)
+            return {'success': False, 'message': f"Error: {str(e)}"}
+    
+    def obtener_arqueos_abiertos(self) -> List[Dict]:
+        """
+        Obtiene los arqueos de la caja abierta (aún no incluidos en un cierre)
+        
+        Returns:
+            Lista de arqueos ordenada del más antiguo al más reciente
+        """
+        try:
+            self.db.connect()
+            filas = self.db.fetch_all(
+                "SELECT id, fecha, responsable, contado_usd, contado_eur, contado_cup, "
+                "diferencia_usd, diferencia_eur, diferencia_cup "
+                "FROM arqueos WHERE cierre_id IS NULL ORDER BY id"
+            )
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al obtener arqueos: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return []
+        
+        return [{
+            'id': fila[0],
+            'fecha': fila[1],
+            'responsable': fila[2],
+            'contado': {'usd': fila[3], 'eur': fila[4], 'cup': fila[5]},
+            'diferencias': {'usd': fila[6], 'eur': fila[7], 'cup': fila[8]}
+        } for fila in filas]
+    
+    def _ultimo_arqueo(self, cursor, marca: Optional[Dict[str, int]] = None) -> Optional[Dict]:
+        """
+        Obtiene el último arqueo de la caja abierta
+        
+        La diferencia acumulada es la suma de las diferencias de turno de los
+        arqueos abiertos hasta él, de modo que no arrastra las de arqueos que ya
+        quedaron en un cierre.
+        
+        Args:
+            cursor: Cursor de la conexión en curso
+            marca: Si se indica, solo se consideran los arqueos que no cubren
+                filas posteriores a ella
+            
+        Returns:
+            Diccionario con las marcas, el saldo esperado y la diferencia
+            acumulada por moneda, o None si no hay arqueos abiertos
+        """
+        sql = "SELECT id, factura_id, salida_id, movimiento_id, esperado FROM arqueos WHERE cierre_id IS NULL"
+        params = ()
+        if marca is not None:
+            sql += " AND factura_id <= ? AND salida_id <= ?"
+            params = (marca['factura_id'], marca['salida_id'])
+        cursor.execute(sql + " ORDER BY id DESC LIMIT 1", params)
+        fila = cursor.fetchone()
+        if fila is None:
+            return None
+        
+        cursor.execute(
+            "SELECT COALESCE(SUM(diferencia_usd), 0), COALESCE(SUM(diferencia_eur), 0), "
+            "COALESCE(SUM(diferencia_cup), 0) FROM arqueos WHERE cierre_id IS NULL AND id <= ?",
+            (fila[0],)
+        )
+        acumulada = cursor.fetchone()
+        return {
+            'id': fila[0],
+            'factura_id': fila[1],
+            'salida_id': fila[2],
+            'movimiento_id': fila[3],
+            'esperado': json.loads(fila[4]),
+            'diferencia_acumulada': {
+                'usd': acumulada[0], 'eur': acumulada[1], 'cup': acumulada[2]
+            }
+        }
+    
+    def _asociar_arqueos(self, cursor, cierre_id: int, marca: Dict[str, int]) -> int:
+        """
+        Asocia a un cierre los arqueos abiertos que no cubren filas posteriores a la marca
+        
+        Args:
+            cursor: Cursor de la transacción del cierre
+            cierre_id: ID del cierre
+            marca: Marca del cierre
+            
+        Returns:
+            Número de arqueos asociados
+        """
+        cursor.execute(
+            "UPDATE arqueos SET cierre_id = ? WHERE cierre_id IS NULL AND factura_id <= ? AND salida_id <= ?",
+            (cierre_id, marca['factura_id'], marca['salida_id'])
+        )
+        return cursor.rowcount
+    
+    def _rebasar_arqueos_abiertos(self, cursor, primer_cierre_id: int):
+        """
+        Descuenta del saldo esperado de los arqueos que siguen abiertos las filas recién cerradas
+        
+        Un arqueo posterior a la marca de un cierre incluía en su esperado filas
+        que ese cierre acaba de retirar de la caja; sin ajustarlo, el siguiente
+        cierre partiría de un saldo que las vuelve a contar.
+        
+        Args:
+            cursor: Cursor de la transacción del cierre
+            primer_cierre_id: ID del primer cierre creado en la transacción
+                (las filas con dia_id igual o mayor son las recién cerradas)
+        """
+        cursor.execute("SELECT id, factura_id, salida_id, esperado FROM arqueos WHERE cierre_id IS NULL")
+        for arqueo_id, factura_id, salida_id, esperado in cursor.fetchall():
+            esperado = json.loads(esperado)
+            
+            cursor.execute(
+                "SELECT COUNT(*), SUM(pago_usd), SUM(pago_eur), SUM(pago_cup), SUM(pago_transferencia) "
+                "FROM facturas WHERE dia_id >= ? AND id <= ?",
+                (primer_cierre_id, factura_id)
+            )
+            facturas = cursor.fetchone()
+            cursor.execute(
+                "SELECT COUNT(*), SUM(monto_usd), SUM(monto_eur), SUM(monto_cup), SUM(monto_transferencia) "
+                "FROM salidas_caja WHERE dia_id >= ? AND id <= ?",
+                (primer_cierre_id, salida_id)
+            )
+            salidas = cursor.fetchone()
+            if not facturas[0] and not salidas[0]:
+                continue
+            
+            esperado['num_facturas'] -= facturas[0]
+            esperado['num_salidas'] -= salidas[0]
+            for i, moneda in enumerate(('usd', 'eur', 'cup', 'transferencia')):
+                esperado[moneda]['entradas'] = round(esperado[moneda]['entradas'] - (facturas[i + 1] or 0), 2)
+                esperado[moneda]['salidas'] = round(esperado[moneda]['salidas'] - (salidas[i + 1] or 0), 2)
+                esperado[moneda]['balance'] = round(esperado[moneda]['entradas'] - esperado[moneda]['salidas'], 2)
+            
+            cursor.execute("UPDATE arqueos SET esperado = ? WHERE id = ?", (json.dumps(esperado), arqueo_id))
+    
+    def contar_posteriores_a_marca(self, marca: Dict[str, int]) -> Dict[str, int]:
+        """
+        Cuenta las filas abiertas registradas después de una marca
+        
+        Son las que un cierre con esa marca deja para el siguiente cierre.
+        
+        Args:
+            marca: Marca obtenida con obtener_resumen_cierre
+            
+        Returns:
+            Diccionario {'facturas': int, 'salidas': int}
+        """
+        vaciar_cola_facturas()
+        
+        try:
+            self.db.connect()
+            fila = self.db.fetch_one(
+                "SELECT (SELECT COUNT(*) FROM facturas WHERE cerrada = 0 AND id > ?), "
+                "(SELECT COUNT(*) FROM salidas_caja WHERE cerrada = 0 AND id > ?)",
+                (marca['factura_id'], marca['salida_id'])
+            )
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al contar movimientos posteriores a la marca: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return {'facturas': 0, 'salidas': 0}
+        
+        return {'facturas': fila[0], 'salidas': fila[1]}
+    
+    def capturar_marca(self, cursor) -> Dict[str, int]:
+        """
+        Obtiene el último id de facturas y salidas de caja
+        
+        Args:
+            cursor: Cursor de la transacción en curso
+            
+        Returns:
+            Diccionario {'factura_id': int, 'salida_id': int}
+        """
+        cursor.execute(
+            "SELECT (SELECT COALESCE(MAX(id), 0) FROM facturas), "
+            "(SELECT COALESCE(MAX(id), 0) FROM salidas_caja)"
+        )
+        factura_id, salida_id = cursor.fetchone()
+        return {'factura_id': factura_id, 'salida_id': salida_id}
+    
+    def _saldo_hasta_marca(self, cursor, marca: Dict[str, int]) -> Dict:
+        """
+        Calcula el saldo de la caja abierta limitado a las filas hasta la marca
+        
+        Si hay un arqueo abierto anterior a la marca, parte del saldo esperado
+        en ese arqueo y solo suma lo ocurrido después; si no, usa saldo_caja.
+        
+        Args:
+            cursor: Cursor de la transacción en curso
+            marca: Marca obtenida con capturar_marca
+            
+        Returns:
+            Diccionario con el formato de SalidasService.obtener_saldo_caja
+        """
+        arqueo = self._ultimo_arqueo(cursor, marca)
+        if arqueo is not None:
+            return self._saldo_desde_arqueo(cursor, arqueo, marca)
+        return self._saldo_desde_saldo_caja(cursor, marca)
+    
+    def _saldo_desde_arqueo(self, cursor, arqueo: Dict, marca: Dict[str, int]) -> Dict:
+        """
+        Calcula el saldo hasta la marca a partir del último arqueo
+        
+        Lee solo los movimientos del libro de caja posteriores al arqueo
+        (rango de id), incluidos los ajustes de pagos de facturas anteriores,
+        y descarta los de filas posteriores a la marca.
+        
+        Args:
+            cursor: Cursor de la transacción en curso
+            arqueo: Último arqueo abierto (ver _ultimo_arqueo)
+            marca: Marca del cierre
+            
+        Returns:
+            Diccionario con el formato de SalidasService.obtener_saldo_caja
+        """
+        saldo = json.loads(json.dumps(arqueo['esperado']))
+        
+        cursor.execute(
+            "SELECT moneda, cuenta_debe, cuenta_haber, SUM(monto) FROM movimientos_caja "
+            "WHERE id > ? AND (cuenta_debe = ? OR cuenta_haber = ?) "
+            "AND NOT (origen LIKE '%factura' AND origen_id > ?) "
+            "AND NOT (origen LIKE '%salida' AND origen_id > ?) "
+            "GROUP BY moneda, cuenta_debe, cuenta_haber",
+            (arqueo['movimiento_id'], CUENTA_CAJA, CUENTA_CAJA, marca['factura_id'], marca['salida_id'])
+        )
+        for moneda, debe, haber, total in cursor.fetchall():
+            if (debe, haber) == (CUENTA_CAJA, CUENTA_VENTAS):
+                saldo[moneda]['entradas'] += total
+            elif (debe, haber) == (CUENTA_VENTAS, CUENTA_CAJA):
+                saldo[moneda]['entradas'] -= total
+            elif (debe, haber) == (CUENTA_SALIDAS, CUENTA_CAJA):
+                saldo[moneda]['salidas'] += total
+            elif (debe, haber) == (CUENTA_CAJA, CUENTA_SALIDAS):
+                saldo[moneda]['salidas'] -= total
+        
+        for moneda in ('usd', 'eur', 'cup', 'transferencia'):
+            saldo[moneda]['entradas'] = round(saldo[moneda]['entradas'], 2)
+            saldo[moneda]['salidas'] = round(saldo[moneda]['salidas'], 2)
+            saldo[moneda]['balance'] = round(saldo[moneda]['entradas'] - saldo[moneda]['salidas'], 2)
+        
+        # Filas nuevas desde el arqueo (rango de id acotado por ambas marcas)
+        cursor.execute(
+            "SELECT COUNT(*) FROM facturas WHERE id > ? AND id <= ? AND cerrada = 0",
+            (arqueo['factura_id'], marca['factura_id'])
+        )
+        saldo['num_facturas'] += cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT COUNT(*) FROM salidas_caja WHERE id > ? AND id <= ? AND cerrada = 0",
+            (arqueo['salida_id'], marca['salida_id'])
+        )
+        saldo['num_salidas'] += cursor.fetchone()[0]
+        
+        return saldo
+    
+    def _saldo_desde_saldo_caja(self, cursor, marca: Dict[str, int]) -> Dict:
+        """
+        Calcula el saldo hasta la marca a partir de saldo_caja
+        
+        Parte de saldo_caja y descuenta solo las filas abiertas posteriores a
+        la marca (lectura por rango de id), que normalmente son pocas o ninguna.
+        
+        Args:
+            cursor: Cursor de la transacción en curso
+            marca: Marca obtenida con capturar_marca
+            
+        Returns:
+            Diccionario con el formato de SalidasService.obtener_saldo_caja
+        """
+        saldo = self.salidas_service.obtener_saldo_caja(cursor)
+        monedas = ('usd', 'eur', 'cup', 'transferencia')
+        
+        cursor.execute(
+            "SELECT COUNT(*), SUM(pago_usd), SUM(pago_eur), SUM(pago_cup), SUM(pago_transferencia) "
+            "FROM facturas WHERE id > ? AND cerrada = 0",
+            (marca['factura_id'],)
+        )
+        posteriores = cursor.fetchone()
+        saldo['num_facturas'] -= posteriores[0]
+        for i, moneda in enumerate(monedas):
+            saldo[moneda]['entradas'] = round(saldo[moneda]['entradas'] - (posteriores[i + 1] or 0), 2)
+        
+        cursor.execute(
+            "SELECT COUNT(*), SUM(monto_usd), SUM(monto_eur), SUM(monto_cup), SUM(monto_transferencia) "
+            "FROM salidas_caja WHERE id > ? AND cerrada = 0",
+            (marca['salida_id'],)
+        )
+        posteriores = cursor.fetchone()
+        saldo['num_salidas'] -= posteriores[0]
+        for i, moneda in enumerate(monedas):
+            saldo[moneda]['salidas'] = round(saldo[moneda]['salidas'] - (posteriores[i + 1] or 0), 2)
+        
+        for moneda in monedas:
+            saldo[moneda]['balance'] = round(saldo[moneda]['entradas'] - saldo[moneda]['salidas'], 2)
+        
+        return saldo
     
     def obtener_facturas_sin_cerrar(self) -> List[Dict]:
         """
@@ -25,6 +424,9 @@ class CierreDiaService:
         Returns:
             Lista de facturas sin cerrar
         """
+        # Las facturas en escritura diferida deben estar en disco antes de cualquier cierre
+        vaciar_cola_facturas()
+        
         self.db.connect()
         resultado = self.db.fetch_all(
             "SELECT id, orden_id, monto, moneda, monto_equivalente, pago_usd, pago_eur, pago_cup, pago_transferencia, fecha "
@@ -78,8 +480,9 @@ class CierreDiaService:
             })
         
         return salidas
-
-    def realizar_cierre_dia(self, efectivo_contado_usd=0, efectivo_contado_eur=0, efectivo_contado_cup=0) -> Dict:
+    
+    def realizar_cierre_dia(self, efectivo_contado_usd=0, efectivo_contado_eur=0, efectivo_contado_cup=0,
+                            marca: Optional[Dict[str, int]] = None) -> Dict:
         """
         Realiza el cierre del día actual
         
@@ -87,6 +490,8 @@ class CierreDiaService:
             efectivo_contado_usd: Efectivo físico contado en USD
             efectivo_contado_eur: Efectivo físico contado en EUR
             efectivo_contado_cup: Efectivo físico contado en CUP
+            marca: Marca de la vista previa (obtener_resumen_cierre). Solo se
+                cierran las filas hasta ella; si es None, se toma en el momento.
         
         Returns:
             Diccionario con resultados del cierre incluyendo diferencias
@@ -103,81 +508,80 @@ class CierreDiaService:
                     'message': f"Ya existe un cierre para el día {fecha_hoy}"
                 }
             
-            # Obtener facturas sin cerrar
-            facturas = self.obtener_facturas_sin_cerrar()
-            
-            # Obtener salidas sin cerrar
-            salidas = self.obtener_salidas_sin_cerrar()
+            # Las facturas en escritura diferida deben estar en disco antes del cierre
+            vaciar_cola_facturas()
             
-            if not facturas and not salidas:
-                return {
-                    'success': False,
-                    'message': "No hay facturas ni salidas para cerrar"
+            with self.db.transaccion() as cursor:
+                # El saldo de la caja abierta lo mantienen los triggers de saldo_caja;
+                # solo se descuenta lo registrado después de la marca
+                if marca is None:
+                    marca = self.capturar_marca(cursor)
+                saldo = self._saldo_hasta_marca(cursor, marca)
+                num_facturas = saldo['num_facturas']
+                num_salidas = saldo['num_salidas']
+                
+                if not num_facturas and not num_salidas:
+                    return {
+                        'success': False,
+                        'message': "No hay facturas ni salidas para cerrar"
+                    }
+                
+                total_usd_caja = saldo['usd']['balance']
+                total_eur_caja = saldo['eur']['balance']
+                total_cup_caja = saldo['cup']['balance']
+                total_transferencia = saldo['transferencia']['balance']
+                
+                # Calcular diferencias con el efectivo contado
+                diferencia_usd = efectivo_contado_usd - total_usd_caja
+                diferencia_eur = efectivo_contado_eur - total_eur_caja
+                diferencia_cup = efectivo_contado_cup - total_cup_caja
+                
+                # La diferencia del último turno descuenta la ya registrada en el
+                # último arqueo incluido en el cierre (los posteriores a la marca no)
+                arqueo = self._ultimo_arqueo(cursor, marca)
+                acumulada = arqueo['diferencia_acumulada'] if arqueo else {'usd': 0, 'eur': 0, 'cup': 0}
+                diferencias_turno = {
+                    'usd': round(diferencia_usd - acumulada['usd'], 2),
+                    'eur': round(diferencia_eur - acumulada['eur'], 2),
+                    'cup': round(diferencia_cup - acumulada['cup'], 2)
                 }
-            
-            # Calcular totales según los pagos realizados en cada moneda
-            total_usd_caja = 0.0
-            total_eur_caja = 0.0
-            total_cup_caja = 0.0
-            total_transferencia = 0.0
-            ids_facturas = []
-            
-            for factura in facturas:
-                ids_facturas.append(factura['id'])
                 
-                # Sumar pagos directamente por cada moneda
-                total_usd_caja += factura.get('pago_usd', 0) or 0
-                total_eur_caja += factura.get('pago_eur', 0) or 0
-                total_cup_caja += factura.get('pago_cup', 0) or 0
-                total_transferencia += factura.get('pago_transferencia', 0) or 0
-            
-            # Restar las salidas de caja
-            ids_salidas = []
-            for salida in salidas:
-                ids_salidas.append(salida['id'])
+                # Insertar cierre
+                cursor.execute(
+                    "INSERT INTO cierres_dia (fecha, total_usd, total_eur, total_cup, total_transferencia, num_facturas, "
+                    "efectivo_contado_usd, efectivo_contado_eur, efectivo_contado_cup, diferencia_usd, diferencia_eur, diferencia_cup) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (fecha_hoy, total_usd_caja, total_eur_caja, total_cup_caja, total_transferencia, num_facturas, 
+                    efectivo_contado_usd, efectivo_contado_eur, efectivo_contado_cup, diferencia_usd, diferencia_eur, diferencia_cup)
+                )
                 
-                # Restar montos de salidas
-                total_usd_caja -= salida.get('monto_usd', 0) or 0
-                total_eur_caja -= salida.get('monto_eur', 0) or 0
-                total_cup_caja -= salida.get('monto_cup', 0) or 0
-                total_transferencia -= salida.get('monto_transferencia', 0) or 0
-            
-            # Calcular diferencias con el efectivo contado
-            diferencia_usd = efectivo_contado_usd - total_usd_caja
-            diferencia_eur = efectivo_contado_eur - total_eur_caja
-            diferencia_cup = efectivo_contado_cup - total_cup_caja
-            
-            # Crear registro de cierre
-            self.db.connect()
-            
-            # Insertar cierre
-            self.db.execute(
-                "INSERT INTO cierres_dia (fecha, total_usd, total_eur, total_cup, total_transferencia, num_facturas, "
-                "efectivo_contado_usd, efectivo_contado_eur, efectivo_contado_cup, diferencia_usd, diferencia_eur, diferencia_cup) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (fecha_hoy, total_usd_caja, total_eur_caja, total_cup_caja, total_transferencia, len(facturas), 
-                efectivo_contado_usd, efectivo_contado_eur, efectivo_contado_cup, diferencia_usd, diferencia_eur, diferencia_cup)
-            )
-            
-            # Obtener ID del cierre
-            cierre_id = self.db.cursor.lastrowid
-            
-            # Marcar facturas como cerradas
-            for factura_id in ids_facturas:
-                self.db.execute(
-                    "UPDATE facturas SET cerrada = 1, dia_id = ? WHERE id = ?",
-                    (cierre_id, factura_id)
+                # Obtener ID del cierre
+                cierre_id = cursor.lastrowid
+                
+                # Marcar como cerradas las filas abiertas hasta la marca (los triggers
+                # descuentan su saldo); las posteriores pasan al siguiente cierre
+                cursor.execute(
+                    "UPDATE facturas SET cerrada = 1, dia_id = ? WHERE cerrada = 0 AND id <= ?",
+                    (cierre_id, marca['factura_id'])
                 )
-            
-            # Marcar salidas como cerradas
-            for salida_id in ids_salidas:
-                self.db.execute(
-                    "UPDATE salidas_caja SET cerrada = 1, dia_id = ? WHERE id = ?",
-                    (cierre_id, salida_id)
+                cursor.execute(
+                    "UPDATE salidas_caja SET cerrada = 1, dia_id = ? WHERE cerrada = 0 AND id <= ?",
+                    (cierre_id, marca['salida_id'])
                 )
-            
-            self.db.commit()
-            self.db.disconnect()
+                
+                # Los arqueos hasta la marca quedan asociados a este cierre; los
+                # posteriores siguen abiertos sin las filas que se acaban de cerrar
+                num_arqueos = self._asociar_arqueos(cursor, cierre_id, marca)
+                self._rebasar_arqueos_abiertos(cursor, cierre_id)
+                
+                # Asentar el retiro de la caja en el libro y fijar un checkpoint de saldos
+                self.libro_service.registrar_cierre(cursor, cierre_id, {
+                    'usd': total_usd_caja,
+                    'eur': total_eur_caja,
+                    'cup': total_cup_caja,
+                    'transferencia': total_transferencia
+                })
+                self.libro_service.crear_checkpoint(cursor)
             
             # Preparar resultados
             return {
@@ -187,24 +591,26 @@ class CierreDiaService:
                 'total_eur': total_eur_caja,
                 'total_cup': total_cup_caja,
                 'total_transferencia': total_transferencia,
-                'num_facturas': len(facturas),
-                'num_salidas': len(salidas),
+                'num_facturas': num_facturas,
+                'num_salidas': num_salidas,
                 'efectivo_contado_usd': efectivo_contado_usd,
                 'efectivo_contado_eur': efectivo_contado_eur,
                 'efectivo_contado_cup': efectivo_contado_cup,
                 'diferencia_usd': diferencia_usd,
                 'diferencia_eur': diferencia_eur,
                 'diferencia_cup': diferencia_cup,
+                'diferencias_turno': diferencias_turno,
+                'num_arqueos': num_arqueos,
                 'cierre_id': cierre_id
             }
                 
         except Exception as e:
-            print(f"Error al realizar cierre de día: {e}")
+            registro.error("Error al realizar cierre de día: %s", e)
             return {
                 'success': False,
                 'message': f"Error: {str(e)}"
             }
-
+    
     def obtener_historial_cierres(self, limite: int = 30) -> List[Dict]:
         """
         Obtiene el historial de cierres de día
@@ -245,7 +651,7 @@ class CierreDiaService:
             })
         
         return cierres
-
+    
     def obtener_detalles_cierre(self, cierre_id: int) -> Dict:
         """
         Obtiene los detalles de un cierre específico, incluyendo las facturas y salidas asociadas
@@ -342,12 +748,12 @@ class CierreDiaService:
             }
                 
         except Exception as e:
-            print(f"Error al obtener detalles del cierre: {e}")
+            registro.error("Error al obtener detalles del cierre: %s", e)
             return {
                 'success': False,
                 'message': f"Error: {str(e)}"
             }
-
+    
     def calcular_resumen_periodo(self, dias: int = 30) -> Dict:
             """
             Calcula un resumen de los cierres en un período específico
@@ -393,12 +799,141 @@ class CierreDiaService:
                     }
                     
             except Exception as e:
-                print(f"Error al calcular resumen de período: {e}")
+                registro.error("Error al calcular resumen de período: %s", e)
                 return {
                     'success': False,
                     'message': f"Error: {str(e)}"
                 }
-
+    
+    def obtener_dias_pendientes(self) -> List[Dict]:
+        """
+        Obtiene los días anteriores a hoy con facturas o salidas sin cerrar
+        
+        Los días que ya tienen un cierre no se incluyen: sus filas rezagadas
+        pasan al siguiente cierre.
+        
+        Returns:
+            Lista de diccionarios {'fecha', 'num_facturas', 'num_salidas'} ordenada por fecha
+        """
+        vaciar_cola_facturas()
+        
+        try:
+            self.db.connect()
+            filas = self.db.fetch_all(
+                "SELECT dia, SUM(es_factura), SUM(1 - es_factura) FROM ("
+                "  SELECT date(fecha, 'localtime') AS dia, 1 AS es_factura FROM facturas WHERE cerrada = 0"
+                "  UNION ALL"
+                "  SELECT date(fecha, 'localtime'), 0 FROM salidas_caja WHERE cerrada = 0"
+                ") WHERE dia < ? AND dia NOT IN (SELECT fecha FROM cierres_dia) "
+                "GROUP BY dia ORDER BY dia",
+                (date.today().isoformat(),)
+            )
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al obtener días pendientes de cierre: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return []
+        
+        return [{'fecha': fila[0], 'num_facturas': fila[1], 'num_salidas': fila[2]} for fila in filas]
+    
+    def realizar_cierres_pendientes(self) -> Dict:
+        """
+        Crea un cierre de recuperación por cada día anterior a hoy que quedó sin cerrar
+        
+        Las facturas y salidas abiertas se reparten por día calendario (hora
+        local) y todo se hace en una transacción con sentencias por conjuntos:
+        un INSERT ... SELECT ... GROUP BY para los cierres y un UPDATE por tabla
+        para asignar cada fila a su cierre. Estos cierres no tienen conteo de
+        efectivo (tipo 'recuperacion').
+        
+        Returns:
+            Diccionario con 'success', 'message' y 'cierres' (lista de fechas cerradas)
+        """
+        vaciar_cola_facturas()
+        
+        try:
+            with self.db.transaccion() as cursor:
+                marca = self.capturar_marca(cursor)
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cierres_dia")
+                ultimo_cierre = cursor.fetchone()[0]
+                
+                cursor.execute(
+                    "INSERT INTO cierres_dia (fecha, total_usd, total_eur, total_cup, total_transferencia, "
+                    "num_facturas, tipo) "
+                    "SELECT dia, SUM(usd), SUM(eur), SUM(cup), SUM(transferencia), SUM(es_factura), 'recuperacion' "
+                    "FROM ("
+                    "  SELECT date(fecha, 'localtime') AS dia, pago_usd AS usd, pago_eur AS eur, pago_cup AS cup, "
+                    "         pago_transferencia AS transferencia, 1 AS es_factura "
+                    "  FROM facturas WHERE cerrada = 0 AND id <= ?"
+                    "  UNION ALL"
+                    "  SELECT date(fecha, 'localtime'), -monto_usd, -monto_eur, -monto_cup, -monto_transferencia, 0 "
+                    "  FROM salidas_caja WHERE cerrada = 0 AND id <= ?"
+                    ") WHERE dia < ? AND dia NOT IN (SELECT fecha FROM cierres_dia) "
+                    "GROUP BY dia ORDER BY dia",
+                    (marca['factura_id'], marca['salida_id'], date.today().isoformat())
+                )
+                
+                cursor.execute(
+                    "SELECT id, fecha, total_usd, total_eur, total_cup, total_transferencia "
+                    "FROM cierres_dia WHERE id > ? ORDER BY fecha",
+                    (ultimo_cierre,)
+                )
+                nuevos = cursor.fetchall()
+                if not nuevos:
+                    return {'success': False, 'message': "No hay días pendientes de cierre", 'cierres': []}
+                
+                # Asignar cada fila abierta al cierre de su día
+                for tabla, limite in (("facturas", marca['factura_id']), ("salidas_caja", marca['salida_id'])):
+                    cursor.execute(
+                        f"UPDATE {tabla} SET cerrada = 1, dia_id = ("
+                        f"  SELECT c.id FROM cierres_dia c "
+                        f"  WHERE c.id > ? AND c.fecha = date({tabla}.fecha, 'localtime')"
+                        f") WHERE cerrada = 0 AND id <= ? "
+                        f"AND date(fecha, 'localtime') IN (SELECT fecha FROM cierres_dia WHERE id > ?)",
+                        (ultimo_cierre, limite, ultimo_cierre)
+                    )
+                
+                # Cada arqueo de un día anterior pasa al cierre de su día (o al último
+                # cierre nuevo anterior a él); los de hoy siguen abiertos, sin las
+                # filas que se acaban de cerrar en su saldo esperado
+                cursor.execute(
+                    "UPDATE arqueos SET cierre_id = COALESCE("
+                    "  (SELECT c.id FROM cierres_dia c WHERE c.id > ? "
+                    "   AND c.fecha <= date(arqueos.fecha, 'localtime') ORDER BY c.fecha DESC LIMIT 1),"
+                    "  (SELECT MIN(c.id) FROM cierres_dia c WHERE c.id > ?)"
+                    ") WHERE cierre_id IS NULL AND date(fecha, 'localtime') < ? "
+                    "AND factura_id <= ? AND salida_id <= ?",
+                    (ultimo_cierre, ultimo_cierre, date.today().isoformat(),
+                     marca['factura_id'], marca['salida_id'])
+                )
+                self._rebasar_arqueos_abiertos(cursor, min(fila[0] for fila in nuevos))
+                
+                # Asentar en el libro el retiro de cada día
+                for cierre_id, _, total_usd, total_eur, total_cup, total_transferencia in nuevos:
+                    self.libro_service.registrar_cierre(cursor, cierre_id, {
+                        'usd': total_usd,
+                        'eur': total_eur,
+                        'cup': total_cup,
+                        'transferencia': total_transferencia
+                    })
+                self.libro_service.crear_checkpoint(cursor)
+            
+            fechas = [fila[1] for fila in nuevos]
+            return {
+                'success': True,
+                'message': f"Se cerraron {len(fechas)} día(s) pendientes",
+                'cierres': fechas
+            }
+            
+        except Exception as e:
+            registro.error("Error al realizar cierres pendientes: %s", e)
+            return {
+                'success': False,
+                'message': f"Error: {str(e)}",
+                'cierres': []
+            }
+    
     def verificar_dia_actual(self) -> Tuple[bool, Optional[str]]:
             """
             Verifica si hay un cierre para el día actual
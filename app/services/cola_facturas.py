@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cola de escritura diferida de facturas ("write-behind").
+Las facturas ya validadas se entregan a un hilo escritor que las agrupa y las
+confirma juntas cada pocos milisegundos, de modo que el cajero no espera el
+commit de cada una. Cada factura notifica su resultado al confirmarse.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.database.db_manager import registrar_funciones_conversion
+from app.database.instrumentacion import conectar
+from app.services.facturacion import (FacturacionService, FacturaDuplicadaError,
+                                      SQL_INSERTAR_FACTURA, SOPORTA_RETURNING,
+                                      es_orden_duplicada)
+from app.services.indice_ordenes import obtener_indice_ordenes
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Firma de las notificaciones: (ticket, orden_id, factura_id o None, mensaje de error o "")
+Notificacion = Callable[[int, str, Optional[int], str], None]
+
+class ColaFacturas:
+    """Hilo escritor que registra facturas en lotes (group commit)"""
+    
+    def __init__(self, db_path=None, intervalo_ms: int = 5, max_lote: int = 200):
+        """
+        Inicializa la cola e inicia el hilo escritor
+        
+        Args:
+            db_path: Ruta de la base de datos (opcional, por defecto la de la aplicación)
+            intervalo_ms: Tiempo máximo que se espera para agrupar facturas en un lote
+            max_lote: Número máximo de facturas por commit
+        """
+        self.servicio = FacturacionService(db_path)
+        self.db_path = self.servicio.db.db_path
+        
+        # El hilo escritor no usa self.servicio.db (su conexión es la del hilo de
+        # la interfaz): solo su propia conexión y estas referencias, que no recargan
+        self.indice = obtener_indice_ordenes(self.servicio.db)
+        self.tasas_en = self.servicio.db.tasas_en
+        self.intervalo = intervalo_ms / 1000.0
+        self.max_lote = max_lote
+        
+        self.cola = queue.Queue()
+        self.lock = threading.Lock()
+        self.ultimo_ticket = 0
+        self.pendientes = 0
+        
+        self.hilo = threading.Thread(target=self._escribir, name="cola-facturas", daemon=True)
+        self.hilo.start()
+    
+    def encolar(self, orden_id: str, monto: float, moneda: str,
+                pago_usd: float = 0, pago_eur: float = 0, pago_cup: float = 0,
+                pago_transferencia: float = 0, transferencia_id: str = None,
+                mensajero: str = None, tasas: Dict = None,
+                al_confirmar: Notificacion = None) -> Optional[int]:
+        """
+        Valida una factura y la deja pendiente de escritura
+        
+        Args:
+            orden_id: Identificador de la orden
+            monto: Monto total de la factura
+            moneda: Moneda principal de la factura ('USD', 'EUR' o 'CUP')
+            pago_usd: Monto pagado en USD
+            pago_eur: Monto pagado en EUR
+            pago_cup: Monto pagado en CUP
+            pago_transferencia: Monto pagado por transferencia
+            transferencia_id: ID de la transferencia
+            mensajero: Nombre del mensajero que entregó la factura (obligatorio)
+            tasas: Tasas ya consultadas por el llamador (opcional)
+            al_confirmar: Función llamada desde el hilo escritor cuando la
+                factura queda guardada (o falla)
+        
+        Returns:
+            Número de ticket de la factura encolada, o None si los datos no son válidos
+        
+        Raises:
+            FacturaDuplicadaError: Si el orden_id ya está facturado o pendiente en la cola
+        """
+        params = self.servicio.preparar_factura(orden_id, monto, moneda, pago_usd, pago_eur, pago_cup,
+                                                pago_transferencia, transferencia_id, mensajero, tasas)
+        if params is None:
+            return None
+        
+        orden_id = params[0]
+        
+        with self.lock:
+            # Las órdenes encoladas ya están en el índice: un segundo escaneo
+            # de la misma orden se rechaza aunque todavía no se haya escrito.
+            # Una orden de otra terminal la rechaza el índice único al escribir;
+            # sin ese índice se confirma aquí en la base de datos.
+            exacto = not self.servicio.db.orden_id_unico()
+            if self.servicio.verificar_orden_id_existente(orden_id, exacto=exacto):
+                raise FacturaDuplicadaError(orden_id)
+            self.indice.agregar(orden_id, pendiente=True)
+            
+            self.ultimo_ticket += 1
+            ticket = self.ultimo_ticket
+            self.pendientes += 1
+        
+        self.cola.put((ticket, params, al_confirmar))
+        return ticket
+    
+    def cantidad_pendiente(self) -> int:
+        """Devuelve el número de facturas aún no confirmadas en disco"""
+        with self.lock:
+            return self.pendientes
+    
+    def vaciar(self):
+        """Bloquea hasta que todas las facturas encoladas estén confirmadas"""
+        if self.hilo.is_alive():
+            self.cola.join()
+    
+    def detener(self):
+        """Vacía la cola y termina el hilo escritor"""
+        if self.hilo.is_alive():
+            self.cola.put(None)
+            self.hilo.join()
+    
+    def _escribir(self):
+        """Bucle del hilo escritor"""
+        conexion = conectar(self.db_path)
+        registrar_funciones_conversion(conexion, self.tasas_en)
+        try:
+            terminar = False
+            while not terminar:
+                elemento = self.cola.get()
+                if elemento is None:
+                    self.cola.task_done()
+                    break
+                
+                # Agrupar lo que llegue durante el intervalo en un mismo commit
+                lote = [elemento]
+                limite = time.monotonic() + self.intervalo
+                while len(lote) < self.max_lote:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        elemento = self.cola.get(timeout=restante)
+                    except queue.Empty:
+                        break
+                    if elemento is None:
+                        self.cola.task_done()
+                        terminar = True
+                        break
+                    lote.append(elemento)
+                
+                resultados = self._guardar_lote(conexion, lote)
+                
+                for _, params, _ in lote:
+                    self.indice.confirmar(params[0])
+                
+                with self.lock:
+                    self.pendientes -= len(lote)
+                
+                for (ticket, params, al_confirmar), (factura_id, error) in zip(lote, resultados):
+                    if al_confirmar:
+                        try:
+                            al_confirmar(ticket, params[0], factura_id, error)
+                        except Exception as e:
+                            registro.error("Error al notificar la factura %s: %s", params[0], e)
+                    self.cola.task_done()
+        finally:
+            conexion.close()
+    
+    def _guardar_lote(self, conexion, lote):
+        """
+        Inserta un lote de facturas en una sola transacción
+        
+        Returns:
+            Lista de tuplas (factura_id o None, mensaje de error) en el orden del lote
+        """
+        sql = SQL_INSERTAR_FACTURA + " RETURNING id" if SOPORTA_RETURNING else SQL_INSERTAR_FACTURA
+        resultados = []
+        
+        try:
+            cursor = conexion.cursor()
+            for _, params, _ in lote:
+                try:
+                    cursor.execute(sql, params)
+                    factura_id = cursor.fetchone()[0] if SOPORTA_RETURNING else cursor.lastrowid
+                    resultados.append((factura_id, ""))
+                except sqlite3.IntegrityError as e:
+                    # Solo falla la sentencia; el resto del lote sigue en la transacción
+                    if es_orden_duplicada(e):
+                        resultados.append((None, str(FacturaDuplicadaError(params[0]))))
+                    else:
+                        registro.error("Error al guardar la factura %s: %s", params[0], e)
+                        resultados.append((None, f"Error al guardar la factura: {e}"))
+                        self.indice.descartar(params[0])
+            conexion.commit()
+        except sqlite3.Error as e:
+            conexion.rollback()
+            registro.error("Error al guardar lote de facturas: %s", e)
+            resultados = [(None, f"Error al guardar la factura: {e}") for _ in lote]
+            
+            # Las órdenes no guardadas dejan de figurar como existentes
+            for _, params, _ in lote:
+                self.indice.descartar(params[0])
+        
+        return resultados
+
+# Cola compartida por el proceso (solo existe si el modo diferido está activo)
+_cola = None
+_cola_lock = threading.Lock()
+
+def iniciar_cola_facturas(db_path=None, intervalo_ms: int = 5) -> ColaFacturas:
+    """Crea (una sola vez) la cola del proceso y la devuelve"""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaFacturas(db_path, intervalo_ms)
+        return _cola
+
+def obtener_cola_facturas() -> Optional[ColaFacturas]:
+    """Devuelve la cola del proceso, o None si el modo diferido no está activo"""
+    return _cola
+
+def vaciar_cola_facturas():
+    """Asegura que no quedan facturas pendientes de escritura (antes de cierres o consultas de caja)"""
+    if _cola is not None:
+        _cola.vaciar()
+
+def detener_cola_facturas():
+    """Vacía y detiene la cola del proceso (al cerrar la aplicación)"""
+    global _cola
+    with _cola_lock:
+        if _cola is not None:
+            _cola.detener()
+            _cola = None
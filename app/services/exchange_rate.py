@@ -3,17 +3,29 @@
 """
 Servicio para la gestión de tasas de cambio.
 """
+import csv
 import datetime
 
 from datetime import date, timedelta
+from typing import List, Tuple
 from app.database.db_manager import DatabaseManager
+from app.services.historial_tasas import INTERVALO_VERIFICACION, obtener_historial_tasas, formatear_instante
+from app.services.proveedores_tasas import obtener_actualizador_tasas
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class ExchangeRateService:
     """Servicio para gestionar las tasas de cambio entre monedas"""
     
-    def __init__(self):
-        """Inicializa el servicio de tasas de cambio"""
-        self.db = DatabaseManager()
+    def __init__(self, db_path=None):
+        """
+        Inicializa el servicio de tasas de cambio
+        
+        Args:
+            db_path: Ruta de la base de datos (opcional, por defecto la de la aplicación)
+        """
+        self.db = DatabaseManager(db_path)
         self.tasa_predeterminada_usd = 350.0  # Valor predeterminado
         self.tasa_predeterminada_eur = 350.0  # Valor predeterminado
     
@@ -21,43 +33,46 @@ class ExchangeRateService:
         """
         Obtiene las tasas de cambio actuales (USD y EUR a CUP)
         
+        Si hay un proveedor configurado y las tasas están vencidas, se devuelven
+        igualmente las últimas conocidas y se pide una consulta en segundo plano.
+        Siempre se comprueba si otra terminal registró tasas, porque con estas se
+        cobran las facturas nuevas.
+        
         Returns:
             Diccionario con las tasas actuales
         """
-        try:
-            
-# Obtener la fecha actual
-            fecha_hoy = date.today().isoformat()            # Conectar a la base de datos
-            self.db.connect()
-            
-            # Intentar obtener las tasas para la fecha actual
-            resultado = self.db.fetch_one(
-                "SELECT usd_valor, eur_valor FROM tasa_cambio WHERE fecha = ?",
-                (fecha_hoy,)
-            )
-            
-            # Si no hay tasas para hoy, obtener las más recientes
-            if not resultado:
-                resultado = self.db.fetch_one(
-                    "SELECT usd_valor, eur_valor FROM tasa_cambio ORDER BY fecha DESC LIMIT 1"
-                )
-            
-            self.db.disconnect()
+        actualizador = obtener_actualizador_tasas()
+        if actualizador is not None and actualizador.vencidas():
+            actualizador.refrescar()
+        return self.obtener_tasas_en(None, intervalo=0)
+    
+    def obtener_tasas_en(self, instante=None, intervalo=INTERVALO_VERIFICACION):
+        """
+        Obtiene las tasas de cambio vigentes en un momento dado
+        
+        Se resuelven sobre el historial en memoria, recargado si otra terminal
+        cambió las tasas (ver HistorialTasas.verificar).
+        
+        Args:
+            instante: datetime, date, 'YYYY-MM-DD' o 'YYYY-MM-DD HH:MM:SS' UTC (None para ahora)
+            intervalo: Segundos sin volver a comprobar la tabla (0 para comprobar siempre)
             
-            # Devolver los valores o los predeterminados
-            if resultado:
+        Returns:
+            Diccionario con las tasas vigentes
+        """
+        try:
+            historial = obtener_historial_tasas(self.db, intervalo)
+            if not historial.instantes:
                 return {
-                    'usd': resultado[0],
-                    'eur': resultado[1]
+                    'usd': self.tasa_predeterminada_usd,
+                    'eur': self.tasa_predeterminada_eur
                 }
-            
-            return {
-                'usd': self.tasa_predeterminada_usd,
-                'eur': self.tasa_predeterminada_eur
-            }
+            return historial.tasas_en(instante)
             
         except Exception as e:
-            print(f"Error al obtener tasas de cambio: {e}")
+            registro.error("Error al obtener tasas de cambio: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
             return {
                 'usd': self.tasa_predeterminada_usd,
                 'eur': self.tasa_predeterminada_eur
@@ -76,13 +91,16 @@ class ExchangeRateService:
         tasas = self.obtener_tasas_actuales()
         return tasas.get(moneda.lower(), self.tasa_predeterminada_usd)
     
-    def actualizar_tasas(self, tasa_usd, tasa_eur):
+    def actualizar_tasas(self, tasa_usd, tasa_eur, vigente_desde=None):
         """
-        Actualiza las tasas de cambio para la fecha actual
+        Registra nuevas tasas de cambio, vigentes desde ahora (o desde el momento indicado)
+        
+        Las tasas anteriores del mismo día se conservan en el historial.
         
         Args:
             tasa_usd: Nuevo valor de la tasa USD a CUP
             tasa_eur: Nuevo valor de la tasa EUR a CUP
+            vigente_desde: Momento de entrada en vigor (datetime local o None para ahora)
             
         Returns:
             True si la actualización fue exitosa, False en caso contrario
@@ -92,22 +110,24 @@ class ExchangeRateService:
             if tasa_usd <= 0 or tasa_eur <= 0:
                 return False
                 
-            # Obtener la fecha actual
-            fecha_hoy = date.today().isoformat()
+            instante = formatear_instante(vigente_desde)
             
-            # Insertar o actualizar en la base de datos
+            # Insertar en el historial (el trigger actualiza la tasa del día en tasa_cambio)
             self.db.connect()
             self.db.execute(
-                "INSERT OR REPLACE INTO tasa_cambio (fecha, usd_valor, eur_valor) VALUES (?, ?, ?)",
-                (fecha_hoy, tasa_usd, tasa_eur)
+                "INSERT OR REPLACE INTO tasas_historial (vigente_desde, usd_valor, eur_valor) VALUES (?, ?, ?)",
+                (instante, tasa_usd, tasa_eur)
             )
             self.db.commit()
             self.db.disconnect()
             
+            # Mantener al día el historial en memoria
+            obtener_historial_tasas(self.db).registrar(instante, tasa_usd, tasa_eur)
+            
             return True
             
         except Exception as e:
-            print(f"Error al actualizar tasas de cambio: {e}")
+            registro.error("Error al actualizar tasas de cambio: %s", e)
             return False
     
     def actualizar_tasa(self, nueva_tasa, moneda="usd"):
@@ -128,4 +148,61 @@ class ExchangeRateService:
         elif moneda.lower() == "eur":
             return self.actualizar_tasas(tasas['usd'], nueva_tasa)
         else:
-            return False
\ No newline at end of file
+            return False
+    
+    def importar_tasas_csv(self, ruta: str) -> Tuple[int, List[str]]:
+        """
+        Importa una serie de tasas desde un archivo CSV
+        
+        El archivo debe tener encabezados 'vigente_desde' (o 'fecha'), 'usd' y 'eur'.
+        Las fechas se toman en hora local: 'YYYY-MM-DD' (desde la medianoche) o
+        'YYYY-MM-DD HH:MM[:SS]'; con 'Z' o un desplazamiento, en esa zona.
+        Una fecha ya registrada se reemplaza.
+        
+        Args:
+            ruta: Ruta del archivo CSV
+            
+        Returns:
+            Tupla (número de tasas importadas, lista de errores por línea)
+        """
+        filas = []
+        errores = []
+        
+        try:
+            with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+                lector = csv.DictReader(archivo)
+                for numero, linea in enumerate(lector, start=2):
+                    try:
+                        texto_fecha = (linea.get('vigente_desde') or linea.get('fecha') or '').strip()
+                        instante = formatear_instante(datetime.datetime.fromisoformat(texto_fecha.replace("Z", "+00:00")))
+                        tasa_usd = float(linea.get('usd') or linea.get('usd_valor'))
+                        tasa_eur = float(linea.get('eur') or linea.get('eur_valor'))
+                        if tasa_usd <= 0 or tasa_eur <= 0:
+                            raise ValueError("las tasas deben ser mayores que cero")
+                        filas.append((instante, tasa_usd, tasa_eur))
+                    except (TypeError, ValueError) as e:
+                        errores.append(f"Línea {numero}: {e}")
+        except OSError as e:
+            return 0, [f"No se pudo leer el archivo: {e}"]
+        
+        if not filas:
+            return 0, errores
+        
+        try:
+            self.db.connect()
+            self.db.connection.executemany(
+                "INSERT OR REPLACE INTO tasas_historial (vigente_desde, usd_valor, eur_valor) VALUES (?, ?, ?)",
+                filas
+            )
+            self.db.commit()
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al importar tasas de cambio: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return 0, errores + [f"Error al guardar las tasas: {e}"]
+        
+        # Recargar el historial en memoria con la serie completa
+        obtener_historial_tasas(self.db).cargar(self.db)
+        
+        return len(filas), errores
\ No newline at end of file
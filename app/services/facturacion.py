@@ -5,20 +5,62 @@ Servicio para la gestión de facturas.
 Implementa la lógica de negocio relacionada con la facturación.
 """
 
+import sqlite3
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
 
 from app.database.db_manager import DatabaseManager
 from app.database.models import Factura
 from app.services.exchange_rate import ExchangeRateService
+from app.services.historial_tasas import obtener_historial_tasas, formatear_instante
+from app.services.indice_ordenes import obtener_indice_ordenes
+from app.utils.conversion import convertir_monto, total_pagado
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# INSERT ... RETURNING requiere SQLite 3.35 o superior
+SOPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+SQL_INSERTAR_FACTURA = (
+    "INSERT INTO facturas (orden_id, monto, moneda, monto_equivalente, pago_usd, pago_eur, pago_cup, "
+    "pago_transferencia, transferencia_id, tasa_usada, fecha, mensajero) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)"
+)
+
+def es_orden_duplicada(error: sqlite3.IntegrityError) -> bool:
+    """
+    Indica si un IntegrityError se debe al índice único de facturas.orden_id
+    
+    Args:
+        error: Error de la inserción
+    
+    Returns:
+        True si la orden ya estaba facturada, False si falló otra restricción
+        (NOT NULL, CHECK, ...)
+    """
+    mensaje = str(error)
+    return mensaje.startswith("UNIQUE constraint failed") and "facturas.orden_id" in mensaje
+
+class FacturaDuplicadaError(Exception):
+    """Se intentó registrar una factura con un orden_id ya facturado"""
+    
+    def __init__(self, orden_id: str):
+        self.orden_id = orden_id
+        super().__init__(f"Ya existe una factura con el orden_id: {orden_id}")
 
 class FacturacionService:
     """Servicio para la gestión de facturas"""
     
-    def __init__(self):
-        """Inicializa el servicio de facturación"""
-        self.db = DatabaseManager()
-        self.exchange_service = ExchangeRateService()
+    def __init__(self, db_path=None):
+        """
+        Inicializa el servicio de facturación
+        
+        Args:
+            db_path: Ruta de la base de datos (opcional, por defecto la de la aplicación)
+        """
+        self.db = DatabaseManager(db_path)
+        self.exchange_service = ExchangeRateService(db_path)
     
     def registrar_factura(self, orden_id: str, monto: float, moneda: str, 
                      pago_usd: float = 0, pago_eur: float = 0, pago_cup: float = 0, 
@@ -42,172 +84,151 @@ class FacturacionService:
             True si la factura se registró correctamente, False en caso contrario
         """
         try:
-            # Validar datos
-            if not orden_id or monto <= 0 or moneda not in ['USD', 'EUR', 'CUP']:
-                return False
-                
-            # Validar mensajero (obligatorio)
-            if not mensajero:
-                print("Error: El nombre del mensajero es obligatorio")
-                return False
-            
-            # Verificar si ya existe una factura con el mismo orden_id
-            self.db.connect()
-            factura_existente = self.db.fetch_one(
-                "SELECT COUNT(*) FROM facturas WHERE orden_id = ?",
-                (orden_id,)
+            factura_id = self.registrar_factura_rapida(
+                orden_id, monto, moneda, pago_usd, pago_eur, pago_cup,
+                pago_transferencia, transferencia_id, mensajero
             )
+            return factura_id is not None
+        except FacturaDuplicadaError as e:
+            registro.warning("%s", e)
+            return False
+    
+    def registrar_factura_rapida(self, orden_id: str, monto: float, moneda: str,
+                                 pago_usd: float = 0, pago_eur: float = 0, pago_cup: float = 0,
+                                 pago_transferencia: float = 0, transferencia_id: str = None,
+                                 mensajero: str = None, tasas: Dict = None) -> Optional[int]:
+        """
+        Registra una factura con una sola sentencia INSERT
+        
+        La unicidad de orden_id la garantiza el índice único de la tabla, por lo
+        que no se consulta antes ni se relee la fila después de insertarla. Solo
+        en bases antiguas sin ese índice se verifica la orden antes del INSERT.
+        
+        Args:
+            orden_id: Identificador de la orden
+            monto: Monto total de la factura
+            moneda: Moneda principal de la factura ('USD', 'EUR' o 'CUP')
+            pago_usd: Monto pagado en USD
+            pago_eur: Monto pagado en EUR
+            pago_cup: Monto pagado en CUP
+            pago_transferencia: Monto pagado por transferencia
+            transferencia_id: ID de la transferencia
+            mensajero: Nombre del mensajero que entregó la factura (obligatorio)
+            tasas: Tasas ya consultadas por el llamador ({'usd': ..., 'eur': ...});
+                si es None se obtienen las actuales
             
-            if factura_existente and factura_existente[0] > 0:
-                print(f"Ya existe una factura con el orden_id: {orden_id}")
-                self.db.disconnect()
-                return False
-                
-            # Convertir explícitamente todos los valores a float para garantizar el tipo correcto
-            try:
-                monto = float(monto)
-                pago_usd = float(pago_usd) if pago_usd is not None else 0.0
-                pago_eur = float(pago_eur) if pago_eur is not None else 0.0
-                pago_cup = float(pago_cup) if pago_cup is not None else 0.0
-                pago_transferencia = float(pago_transferencia) if pago_transferencia is not None else 0.0
-            except (ValueError, TypeError) as e:
-                print(f"Error al convertir valores a float: {e}")
-                self.db.disconnect()
-                return False
-            
-            # Obtener tasas de cambio
-            tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
-            
-            # Calcular monto equivalente en USD (para estandarizar)
-            if moneda == "USD":
-                monto_equivalente = monto
-                tasa_usada = tasa_usd
-            elif moneda == "EUR":
-                monto_equivalente = monto * (tasa_eur / tasa_usd)  # Convertir EUR a USD
-                tasa_usada = tasa_eur
-            else:  # CUP
-                monto_equivalente = monto / tasa_usd
-                tasa_usada = tasa_usd
-            
-            # Verificar que los pagos son válidos
-            if pago_usd < 0 or pago_eur < 0 or pago_cup < 0 or pago_transferencia < 0:
-                self.db.disconnect()
-                return False
-            
-            # Si hay pago por transferencia, debe tener ID
-            if pago_transferencia > 0 and not transferencia_id:
-                self.db.disconnect()
-                return False
-            
-            # Verificar que los pagos cubren el monto total
-            total_en_moneda_principal = 0
-            
-            if moneda == "USD":
-                total_en_moneda_principal = pago_usd + (pago_eur * tasa_eur / tasa_usd) + (pago_cup / tasa_usd) + (pago_transferencia / tasa_usd)
-            elif moneda == "EUR":
-                total_en_moneda_principal = pago_eur + (pago_usd * tasa_usd / tasa_eur) + (pago_cup / tasa_eur) + (pago_transferencia / tasa_eur)
-            else:  # CUP
-                total_en_moneda_principal = pago_cup + (pago_usd * tasa_usd) + (pago_eur * tasa_eur) + pago_transferencia
-            
-            # Permitir un pequeño margen de error por redondeo
-            if total_en_moneda_principal < monto - 0.01:
-                print(f"Pago insuficiente: {total_en_moneda_principal} vs {monto}")
-                self.db.disconnect()
-                return False
-            
-            # Imprimir valores para depuración
-            print("Valores a insertar:")
-            print(f"orden_id: {orden_id}")
-            print(f"monto: {monto}")
-            print(f"moneda: {moneda}")
-            print(f"monto_equivalente: {monto_equivalente}")
-            print(f"pago_usd: {pago_usd}")
-            print(f"pago_eur: {pago_eur}")
-            print(f"pago_cup: {pago_cup}")
-            print(f"pago_transferencia: {pago_transferencia}")
-            print(f"transferencia_id: {transferencia_id}")
-            print(f"tasa_usada: {tasa_usada}")
-            print(f"mensajero: {mensajero}")
-            
-            # Preparar parámetros explícitamente
-            params = (
-                str(orden_id),
-                float(monto),
-                str(moneda),
-                float(monto_equivalente),
-                float(pago_usd),
-                float(pago_eur),
-                float(pago_cup),
-                float(pago_transferencia),
-                transferencia_id,
-                float(tasa_usada),
-                str(mensajero)
-            )
+        Returns:
+            ID de la factura creada, o None si los datos no son válidos
             
-            # Verificar si la tabla tiene la columna mensajero
-            tiene_columna_mensajero = False
+        Raises:
+            FacturaDuplicadaError: Si ya existe una factura con el mismo orden_id
+        """
+        params = self.preparar_factura(orden_id, monto, moneda, pago_usd, pago_eur, pago_cup,
+                                        pago_transferencia, transferencia_id, mensajero, tasas)
+        if params is None:
+            return None
+        
+        orden_id = params[0]
+        
+        # Sin índice único (base antigua con duplicados) la inserción no detecta
+        # la orden repetida: se confirma antes en la base de datos
+        if not self.db.orden_id_unico() and self.verificar_orden_id_existente(orden_id, exacto=True):
+            raise FacturaDuplicadaError(orden_id)
+        
+        try:
+            self.db.connect()
+            cursor = self.db.cursor
             try:
-                self.db.execute("SELECT mensajero FROM facturas LIMIT 1")
-                tiene_columna_mensajero = True
-            except:
-                # Añadir la columna si no existe
-                try:
-                    self.db.execute("ALTER TABLE facturas ADD COLUMN mensajero TEXT NOT NULL DEFAULT 'No especificado'")
-                    self.db.commit()
-                    tiene_columna_mensajero = True
-                    print("Columna 'mensajero' añadida a la tabla 'facturas'")
-                except Exception as e:
-                    print(f"Error al añadir columna 'mensajero': {e}")
-                    self.db.disconnect()
-                    return False
-            
-            # Insertar en la base de datos
-            if tiene_columna_mensajero:
-                cursor = self.db.execute(
-                    "INSERT INTO facturas (orden_id, monto, moneda, monto_equivalente, pago_usd, pago_eur, pago_cup, pago_transferencia, transferencia_id, tasa_usada, fecha, mensajero) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)",
-                    params
-                )
-            else:
-                # Fallback sin mensajero (no debería ocurrir después de añadir la columna)
-                cursor = self.db.execute(
-                    "INSERT INTO facturas (orden_id, monto, moneda, monto_equivalente, pago_usd, pago_eur, pago_cup, pago_transferencia, transferencia_id, tasa_usada, fecha) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                    params[:-1]  # Excluir mensajero
-                )
-            
-            # Verificar la inserción
-            if cursor:
-                factura_id = cursor.lastrowid
-                verificacion = self.db.fetch_one(
-                    "SELECT pago_eur, pago_transferencia, mensajero FROM facturas WHERE id = ?",
-                    (factura_id,)
-                )
-                
-                if verificacion:
-                    print(f"Verificación - pago_eur: {verificacion[0]}, pago_transferencia: {verificacion[1]}, mensajero: {verificacion[2] if len(verificacion) > 2 else 'N/A'}")
+                if SOPORTA_RETURNING:
+                    cursor.execute(SQL_INSERTAR_FACTURA + " RETURNING id", params)
+                    factura_id = cursor.fetchone()[0]
+                else:
+                    cursor.execute(SQL_INSERTAR_FACTURA, params)
+                    factura_id = cursor.lastrowid
+            except sqlite3.IntegrityError as e:
+                if es_orden_duplicada(e):
+                    raise FacturaDuplicadaError(orden_id)
+                raise
             
             self.db.commit()
+        except sqlite3.Error as e:
+            registro.error("Error al registrar factura: %s", e)
+            return None
+        finally:
             self.db.disconnect()
-            
-            return True
-            
-        except Exception as e:
-            print(f"Error al registrar factura: {e}")
-            # Imprimir traceback para más detalles
-            import traceback
-            traceback.print_exc()
-            
-            # Asegurar que la conexión se cierra en caso de error
-            try:
-                if self.db.connection:
-                    self.db.disconnect()
-            except:
-                pass
-                
-            return False
+        
+        obtener_indice_ordenes(self.db).agregar(orden_id)
+        
+        return factura_id
+    
+    def preparar_factura(self, orden_id, monto, moneda, pago_usd, pago_eur, pago_cup,
+                          pago_transferencia, transferencia_id, mensajero, tasas=None) -> Optional[tuple]:
+        """
+        Valida los datos de una factura y calcula los parámetros del INSERT
+        
+        Returns:
+            Tupla de parámetros para SQL_INSERTAR_FACTURA, o None si los datos no son válidos
+        """
+        # Validar datos
+        if not orden_id or moneda not in ['USD', 'EUR', 'CUP']:
+            return None
+        
+        # Validar mensajero (obligatorio)
+        if not mensajero:
+            registro.warning("Error: El nombre del mensajero es obligatorio")
+            return None
+        
+        # Convertir explícitamente todos los valores a float para garantizar el tipo correcto
+        try:
+            monto = float(monto)
+            pago_usd = float(pago_usd) if pago_usd is not None else 0.0
+            pago_eur = float(pago_eur) if pago_eur is not None else 0.0
+            pago_cup = float(pago_cup) if pago_cup is not None else 0.0
+            pago_transferencia = float(pago_transferencia) if pago_transferencia is not None else 0.0
+        except (ValueError, TypeError) as e:
+            registro.error("Error al convertir valores a float: %s", e)
+            return None
+        
+        if monto <= 0:
+            return None
+        
+        # Verificar que los pagos son válidos
+        if pago_usd < 0 or pago_eur < 0 or pago_cup < 0 or pago_transferencia < 0:
+            return None
+        
+        # Si hay pago por transferencia, debe tener ID
+        if pago_transferencia > 0 and not transferencia_id:
+            return None
+        
+        # Obtener tasas de cambio
+        if tasas is None:
+            tasas = self.exchange_service.obtener_tasas_actuales()
+        
+        # Calcular monto equivalente en USD (para estandarizar)
+        monto_equivalente = convertir_monto(monto, moneda, "USD", tasas)
+        tasa_usada = tasas['eur'] if moneda == "EUR" else tasas['usd']
+        
+        # Verificar que los pagos cubren el monto total
+        total_en_moneda_principal = total_pagado(pago_usd, pago_eur, pago_cup, pago_transferencia, moneda, tasas)
+        
+        # Permitir un pequeño margen de error por redondeo
+        if total_en_moneda_principal < monto - 0.01:
+            registro.warning("Pago insuficiente: %s vs %s", total_en_moneda_principal, monto)
+            return None
+        
+        return (
+            str(orden_id),
+            monto,
+            str(moneda),
+            float(monto_equivalente),
+            pago_usd,
+            pago_eur,
+            pago_cup,
+            pago_transferencia,
+            transferencia_id,
+            float(tasa_usada),
+            str(mensajero)
+        )
     
     def obtener_facturas_recientes(self, limite: int = 10) -> List[Factura]:
         """
@@ -299,7 +320,7 @@ class FacturacionService:
             return facturas
                 
         except Exception as e:
-            print(f"Error al obtener facturas recientes: {e}")
+            registro.error("Error al obtener facturas recientes: %s", e)
             return []
         
     def obtener_facturas_por_orden_id(self, orden_id):
@@ -361,7 +382,7 @@ class FacturacionService:
                         else:
                             fecha = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
                     except Exception as e:
-                        print(f"Error al procesar fecha '{fecha_str}': {e}")
+                        registro.error("Error al procesar fecha '%s': %s", fecha_str, e)
                         fecha = datetime.now()
                     
                     # Crear objeto Factura según las columnas disponibles
@@ -404,16 +425,12 @@ class FacturacionService:
                     
                     facturas.append(factura)
                 except Exception as e:
-                    print(f"Error al procesar factura: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    print(f"Datos de la fila: {row}")
+                    registro.exception("Error al procesar factura: %s", e)
+                    registro.debug("Datos de la fila: %s", row)
             
             return facturas
         except Exception as e:
-            print(f"Error al obtener facturas por orden ID: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("Error al obtener facturas por orden ID: %s", e)
             try:
                 if self.db.connection:
                     self.db.disconnect()
@@ -479,7 +496,7 @@ class FacturacionService:
                     else:
                         fecha = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
             except Exception as e:
-                print(f"Error al procesar fecha '{fecha_str}': {e}")
+                registro.error("Error al procesar fecha '%s': %s", fecha_str, e)
                 fecha = datetime.now()  # Usar fecha actual como fallback
             
             # Crear objeto Factura con todos los campos, manejando la posición de mensajero
@@ -522,9 +539,7 @@ class FacturacionService:
             
             return factura
         except Exception as e:
-            print(f"Error al obtener factura por ID: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("Error al obtener factura por ID: %s", e)
             try:
                 self.db.disconnect()
             except:
@@ -541,7 +556,7 @@ class FacturacionService:
         return self.exchange_service.obtener_tasa_actual()
     
     
-
+    
     def actualizar_pagos_factura(self, factura_id, pago_usd, pago_eur, pago_cup, pago_transferencia, transferencia_id=None):
         """
         Actualiza los medios de pago de una factura
@@ -578,12 +593,140 @@ class FacturacionService:
             
             return True
         except Exception as e:
-            print(f"Error al actualizar pagos de factura: {e}")
+            registro.error("Error al actualizar pagos de factura: %s", e)
             try:
                 self.db.disconnect()
             except:
                 pass
             return False
+    
+    def corregir_tasa_facturas(self, desde, hasta, tasa_usd: float, tasa_eur: float,
+                               aplicar: bool = False, corregir_historial: bool = False) -> Dict:
+        """
+        Recalcula con tasas corregidas las facturas abiertas de un intervalo
+        
+        Sin aplicar, solo devuelve la vista previa de los totales afectados. Al
+        aplicar, una sola sentencia UPDATE corrige monto_equivalente y tasa_usada
+        de todas las facturas abiertas del intervalo. Los pagos registrados y las
+        facturas cerradas no cambian.
+        
+        El historial de tasas solo se modifica si se pide corregir_historial: las
+        tasas que entraron en vigor dentro del intervalo (que la vista previa
+        enumera) se reemplazan por las corregidas. Como las estadísticas
+        convierten con la tasa del momento de cada factura, eso también cambia
+        los totales de las facturas cerradas del intervalo.
+        
+        Args:
+            desde: Inicio del intervalo (datetime local o TIMESTAMP UTC)
+            hasta: Fin del intervalo (datetime local o TIMESTAMP UTC)
+            tasa_usd: Tasa USD a CUP correcta
+            tasa_eur: Tasa EUR a CUP correcta
+            aplicar: Si es False (por defecto) no se modifica nada
+            corregir_historial: Si es True, al aplicar también se reemplazan las
+                tasas del historial del intervalo
+            
+        Returns:
+            Diccionario con 'success', 'message', 'aplicada', 'cantidad',
+            'por_moneda' ({moneda: cantidad y equivalentes actual/nuevo}),
+            'diferencia_usd', 'insuficientes' (facturas cuyos pagos dejarían
+            de cubrir el monto con las tasas corregidas) y 'tasas_historial'
+            (tasas registradas en el intervalo: vigente_desde, usd y eur)
+        """
+        if tasa_usd <= 0 or tasa_eur <= 0:
+            return {'success': False, 'message': "Las tasas deben ser mayores que cero"}
+        
+        inicio = formatear_instante(desde)
+        fin = formatear_instante(hasta)
+        if inicio > fin:
+            return {'success': False, 'message': "El inicio del intervalo es posterior al fin"}
+        
+        # Expresiones compartidas por la vista previa y el UPDATE
+        factor = "(CASE moneda WHEN 'USD' THEN :usd WHEN 'EUR' THEN :eur ELSE 1.0 END)"
+        equivalente_nuevo = f"(monto * {factor} / :usd)"
+        tasa_nueva = "(CASE moneda WHEN 'EUR' THEN :eur ELSE :usd END)"
+        pagado_nuevo = f"((pago_usd * :usd + pago_eur * :eur + pago_cup + pago_transferencia) / {factor})"
+        filtro = "cerrada = 0 AND fecha BETWEEN :inicio AND :fin"
+        parametros = {'usd': tasa_usd, 'eur': tasa_eur, 'inicio': inicio, 'fin': fin}
+        
+        # Importación local: cola_facturas depende de este módulo
+        from app.services.cola_facturas import vaciar_cola_facturas
+        vaciar_cola_facturas()
+        
+        try:
+            with self.db.transaccion() as cursor:
+                cursor.execute(
+                    f"SELECT moneda, COUNT(*), SUM(monto_equivalente), SUM({equivalente_nuevo}), "
+                    f"SUM(CASE WHEN {pagado_nuevo} < monto - 0.01 THEN 1 ELSE 0 END) "
+                    f"FROM facturas WHERE {filtro} GROUP BY moneda",
+                    parametros
+                )
+                filas = cursor.fetchall()
+                
+                por_moneda = {
+                    fila[0]: {
+                        'cantidad': fila[1],
+                        'equivalente_actual': round(fila[2] or 0.0, 2),
+                        'equivalente_nuevo': round(fila[3] or 0.0, 2)
+                    }
+                    for fila in filas
+                }
+                cantidad = sum(fila[1] for fila in filas)
+                insuficientes = sum(fila[4] or 0 for fila in filas)
+                diferencia_usd = round(sum((fila[3] or 0.0) - (fila[2] or 0.0) for fila in filas), 2)
+                
+                cursor.execute(
+                    "SELECT vigente_desde, usd_valor, eur_valor FROM tasas_historial "
+                    "WHERE vigente_desde BETWEEN ? AND ? ORDER BY vigente_desde",
+                    (inicio, fin)
+                )
+                tasas_historial = [
+                    {'vigente_desde': fila[0], 'usd': fila[1], 'eur': fila[2]}
+                    for fila in cursor.fetchall()
+                ]
+                historial_corregido = aplicar and corregir_historial and bool(tasas_historial)
+                
+                if aplicar and cantidad > 0:
+                    cursor.execute(
+                        f"UPDATE facturas SET monto_equivalente = {equivalente_nuevo}, "
+                        f"tasa_usada = {tasa_nueva} WHERE {filtro}",
+                        parametros
+                    )
+                
+                if historial_corregido:
+                    # INSERT OR REPLACE para que el trigger actualice tasa_cambio
+                    cursor.executemany(
+                        "INSERT OR REPLACE INTO tasas_historial (vigente_desde, usd_valor, eur_valor) VALUES (?, ?, ?)",
+                        [(tasa['vigente_desde'], tasa_usd, tasa_eur) for tasa in tasas_historial]
+                    )
+            
+            if historial_corregido:
+                obtener_historial_tasas(self.db).cargar(self.db)
+            
+        except Exception as e:
+            registro.error("Error al corregir tasas de facturas: %s", e)
+            return {'success': False, 'message': f"Error: {str(e)}"}
+        
+        if cantidad == 0:
+            mensaje = "No hay facturas abiertas en el intervalo indicado"
+        elif aplicar:
+            mensaje = f"Se corrigieron {cantidad} factura(s)"
+        else:
+            mensaje = f"Se corregirían {cantidad} factura(s)"
+        if corregir_historial and tasas_historial:
+            verbo = "Se reemplazaron" if aplicar else "Se reemplazarían"
+            mensaje += f". {verbo} {len(tasas_historial)} tasa(s) del historial"
+        
+        return {
+            'success': True,
+            'message': mensaje,
+            'aplicada': (aplicar and cantidad > 0) or historial_corregido,
+            'cantidad': cantidad,
+            'por_moneda': por_moneda,
+            'diferencia_usd': diferencia_usd,
+            'insuficientes': insuficientes,
+            'tasas_historial': tasas_historial
+        }
+    
     # En facturacion.py
     def cerrar_facturas_por_fecha(self, fecha):
         """
@@ -606,11 +749,11 @@ class FacturacionService:
             self.db.session.commit()
             return True
         except Exception as e:
-            print(f"Error al cerrar facturas: {e}")
+            registro.error("Error al cerrar facturas: %s", e)
             self.db.session.rollback()
             return False
-
-
+    
+    
     def obtener_facturas_sin_cerrar(self):
         """
         Obtiene todas las facturas que no han sido cerradas
@@ -652,39 +795,92 @@ class FacturacionService:
             
             return facturas
         except Exception as e:
-            print(f"Error al obtener facturas sin cerrar: {e}")
+            registro.error("Error al obtener facturas sin cerrar: %s", e)
             try:
                 self.db.disconnect()
             except:
                 pass
             return []
         
-    def verificar_orden_id_existente(self, orden_id: str) -> bool:
+    def verificar_orden_id_existente(self, orden_id: str, exacto: bool = False) -> bool:
         """
         Verifica si ya existe una factura con el orden_id proporcionado
         
         Args:
             orden_id: Identificador de la orden a verificar
+            exacto: Si es True, una orden que el índice da por nueva se confirma
+                en la base de datos (necesario antes de insertar, porque otra
+                terminal pudo facturarla)
             
         Returns:
             True si ya existe una factura con ese orden_id, False en caso contrario
         """
+        try:
+            # El filtro de Bloom descarta las órdenes nuevas sin ir a la base de datos;
+            # solo las posibles repetidas que no están entre las recientes se consultan
+            return obtener_indice_ordenes(self.db).existe(orden_id, self._consultar_orden_id, exacto)
+            
+        except Exception as e:
+            registro.error("Error al verificar orden_id existente: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return False
+    
+    def _consultar_orden_id(self, orden_id: str) -> bool:
+        """Consulta en la base de datos si existe una factura con el orden_id"""
+        self.db.connect()
+        resultado = self.db.fetch_one(
+            "SELECT 1 FROM facturas WHERE orden_id = ? LIMIT 1",
+            (orden_id,)
+        )
+        self.db.disconnect()
+        
+        return resultado is not None
+    
+    def cargar_indice_ordenes(self):
+        """Carga el índice en memoria de órdenes facturadas (si aún no está cargado)"""
+        try:
+            obtener_indice_ordenes(self.db)
+        except Exception as e:
+            registro.error("Error al cargar el índice de órdenes: %s", e)
+    
+    def obtener_orden_ids_existentes(self, orden_ids: List[str]) -> set:
+        """
+        Indica cuáles de los orden_id proporcionados ya tienen factura
+        
+        Args:
+            orden_ids: Lista de identificadores de orden
+            
+        Returns:
+            Conjunto con los orden_id que ya existen en la tabla facturas
+        """
+        existentes = set()
+        orden_ids = list(dict.fromkeys(orden_ids))
+        if not orden_ids:
+            return existentes
+        
         try:
             self.db.connect()
-            resultado = self.db.fetch_one(
-                "SELECT COUNT(*) FROM facturas WHERE orden_id = ?",
-                (orden_id,)
-            )
-            self.db.disconnect()
             
-            # Si el resultado es mayor que 0, ya existe una factura con ese orden_id
-            return resultado and resultado[0] > 0
+            # SQLite limita la cantidad de parámetros por consulta
+            for inicio in range(0, len(orden_ids), 500):
+                lote = orden_ids[inicio:inicio + 500]
+                marcadores = ", ".join("?" for _ in lote)
+                filas = self.db.fetch_all(
+                    f"SELECT DISTINCT orden_id FROM facturas WHERE orden_id IN ({marcadores})",
+                    tuple(lote)
+                )
+                existentes.update(fila[0] for fila in filas)
+            
+            self.db.disconnect()
+            return existentes
             
         except Exception as e:
-            print(f"Error al verificar orden_id existente: {e}")
+            registro.error("Error al verificar orden_id existentes: %s", e)
             if self.db.connection:
                 self.db.disconnect()
-            return False
+            return existentes
+    
     def obtener_facturas_por_fecha(self, fecha_inicio: str, fecha_fin: str) -> List[Factura]:
         """
         Obtiene las facturas en un rango de fechas
@@ -732,8 +928,8 @@ class FacturacionService:
             resultado = self.db.fetch_all(query, (fecha_inicio, fecha_fin_ajustada))
             self.db.disconnect()
             
-            print(f"Consultando facturas entre {fecha_inicio} y {fecha_fin_ajustada}")
-            print(f"Resultados encontrados: {len(resultado) if resultado else 0}")
+            registro.debug("Consultando facturas entre %s y %s", fecha_inicio, fecha_fin_ajustada)
+            registro.debug("Resultados encontrados: %s", len(resultado) if resultado else 0)
             
             facturas = []
             for row in resultado:
@@ -748,7 +944,7 @@ class FacturacionService:
                         else:
                             fecha = datetime.strptime(fecha_str, "%Y-%m-%d %H:%M:%S")
                     except Exception as e:
-                        print(f"Error al procesar fecha '{fecha_str}': {e}")
+                        registro.error("Error al procesar fecha '%s': %s", fecha_str, e)
                         fecha = datetime.now()
                     
                     # Crear objeto Factura según las columnas disponibles
@@ -791,17 +987,13 @@ class FacturacionService:
                     
                     facturas.append(factura)
                 except Exception as e:
-                    print(f"Error al procesar factura: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    print(f"Datos de la fila: {row}")
+                    registro.exception("Error al procesar factura: %s", e)
+                    registro.debug("Datos de la fila: %s", row)
             
             return facturas
             
         except Exception as e:
-            print(f"Error al obtener facturas por fecha: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("Error al obtener facturas por fecha: %s", e)
             if self.db.connection:
                 self.db.disconnect()
             return []
@@ -823,13 +1015,14 @@ class FacturacionService:
             
             self.db.connect()
             
-            # Consulta para obtener estadísticas por moneda
+            # Conversión a USD dentro de SQLite, con la tasa vigente al emitir cada factura
             query = """
             SELECT 
                 COUNT(*) as cantidad,
                 SUM(monto) as total,
                 AVG(monto) as promedio,
-                moneda
+                moneda,
+                SUM(to_usd(monto, moneda, fecha)) as total_equivalente
             FROM facturas 
             WHERE fecha BETWEEN ? AND ?
             GROUP BY moneda
@@ -838,8 +1031,8 @@ class FacturacionService:
             resultado = self.db.fetch_all(query, (fecha_inicio, fecha_fin_ajustada))
             self.db.disconnect()
             
-            print(f"Consultando estadísticas de facturas entre {fecha_inicio} y {fecha_fin_ajustada}")
-            print(f"Resultados encontrados: {len(resultado) if resultado else 0}")
+            registro.debug("Consultando estadísticas de facturas entre %s y %s", fecha_inicio, fecha_fin_ajustada)
+            registro.debug("Resultados encontrados: %s", len(resultado) if resultado else 0)
             
             # Inicializar estadísticas
             estadisticas = {
@@ -854,6 +1047,7 @@ class FacturacionService:
                 "cantidad_eur": 0,
                 "cantidad_cup": 0
             }
+            total_equivalente_usd = 0.0
             
             if resultado:
                 for row in resultado:
@@ -863,6 +1057,7 @@ class FacturacionService:
                     moneda = row[3]
                     
                     estadisticas["cantidad_total"] += cantidad
+                    total_equivalente_usd += row[4] or 0.0
                     
                     if moneda == "USD":
                         estadisticas["total_usd"] = total
@@ -877,17 +1072,6 @@ class FacturacionService:
                         estadisticas["promedio_cup"] = promedio
                         estadisticas["cantidad_cup"] = cantidad
             
-            # Calcular total equivalente en USD
-            tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
-            
-            total_equivalente_usd = (
-                estadisticas["total_usd"] + 
-                (estadisticas["total_eur"] * tasa_eur / tasa_usd) + 
-                (estadisticas["total_cup"] / tasa_usd)
-            )
-            
             estadisticas["total_equivalente_usd"] = total_equivalente_usd
             
             # Calcular promedio general
@@ -899,9 +1083,7 @@ class FacturacionService:
             return estadisticas
             
         except Exception as e:
-            print(f"Error al obtener estadísticas de facturas por fecha: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("Error al obtener estadísticas de facturas por fecha: %s", e)
             if self.db.connection:
                 self.db.disconnect()
             return {
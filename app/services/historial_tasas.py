@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+"""
+Historial en memoria de las tasas de cambio.
+Carga todas las filas de tasas_historial en listas ordenadas por momento de
+entrada en vigor para obtener con bisect la tasa vigente en cualquier
+instante. Las funciones SQL de conversión (ver registrar_funciones_conversion)
+lo usan para convertir los totales históricos con la tasa de su momento.
+Antes de usarlo se comprueba si otra conexión (otra terminal o proceso) cambió
+tasas_historial, como mucho una vez cada INTERVALO_VERIFICACION segundos.
+"""
+
+import sqlite3
+import threading
+from bisect import bisect_right
+from datetime import date, datetime, time, timezone
+from time import monotonic
+from typing import Dict, Union
+
+from app.database.db_manager import establecer_consulta_tasas
+
+# Segundos durante los que se confía en el historial sin comprobar la tabla
+INTERVALO_VERIFICACION = 1.0
+
+def formatear_instante(instante: Union[datetime, date, str, None]) -> str:
+    """
+    Convierte un momento al formato de las columnas TIMESTAMP (UTC, como CURRENT_TIMESTAMP)
+    
+    Args:
+        instante: datetime (sin zona horaria se toma como hora local), date o
+            'YYYY-MM-DD' (se toma el final de ese día local), texto ISO con hora
+            (sin zona horaria se toma como UTC, como CURRENT_TIMESTAMP), o None
+            para el momento actual
+    
+    Returns:
+        Texto 'YYYY-MM-DD HH:MM:SS' en UTC
+    """
+    if instante is None:
+        instante = datetime.now(timezone.utc)
+    elif isinstance(instante, str):
+        try:
+            instante = date.fromisoformat(instante)
+        except ValueError:
+            # fromisoformat no acepta el sufijo "Z" antes de Python 3.11
+            instante = datetime.fromisoformat(instante.replace("Z", "+00:00"))
+            if instante.tzinfo is None:
+                instante = instante.replace(tzinfo=timezone.utc)
+    
+    if not isinstance(instante, datetime):
+        instante = datetime.combine(instante, time(23, 59, 59))
+    return instante.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class HistorialTasas:
+    """Tasas USD y EUR a CUP ordenadas por momento de entrada en vigor"""
+    
+    def __init__(self, tasa_predeterminada_usd: float = 350.0, tasa_predeterminada_eur: float = 350.0):
+        """
+        Inicializa un historial vacío (sin cargar)
+        
+        Args:
+            tasa_predeterminada_usd: Tasa USD usada si no hay ninguna registrada
+            tasa_predeterminada_eur: Tasa EUR usada si no hay ninguna registrada
+        """
+        self.tasa_predeterminada_usd = tasa_predeterminada_usd
+        self.tasa_predeterminada_eur = tasa_predeterminada_eur
+        self.instantes = []
+        self.usd = []
+        self.eur = []
+        self.cargado = False
+        self.version = None
+        self.verificado = 0.0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def _leer_version(conexion) -> tuple:
+        """
+        Resume el contenido de tasas_historial para detectar cambios
+        
+        INSERT OR REPLACE asigna un rowid nuevo, así que un reemplazo también
+        cambia el resumen.
+        """
+        return tuple(conexion.execute("SELECT COUNT(*), MAX(rowid) FROM tasas_historial").fetchone())
+    
+    def cargar(self, db):
+        """
+        Carga todas las tasas de la tabla tasas_historial
+        
+        Se usa una conexión propia porque la carga puede ocurrir dentro de una
+        función SQL de conversión, con una consulta de db todavía en curso.
+        
+        Args:
+            db: DatabaseManager desde el que se leen las tasas
+        """
+        conexion = sqlite3.connect(db.db_path)
+        try:
+            # La versión se lee antes que las filas: un cambio entre ambas lecturas
+            # solo provoca una recarga de más en la siguiente verificación
+            version = self._leer_version(conexion)
+            filas = conexion.execute(
+                "SELECT vigente_desde, usd_valor, eur_valor FROM tasas_historial ORDER BY vigente_desde"
+            ).fetchall()
+        finally:
+            conexion.close()
+        
+        with self.lock:
+            self.instantes = [fila[0] for fila in filas]
+            self.usd = [fila[1] for fila in filas]
+            self.eur = [fila[2] for fila in filas]
+            self.version = version
+            self.verificado = monotonic()
+            self.cargado = True
+    
+    def verificar(self, db, intervalo: float = INTERVALO_VERIFICACION):
+        """
+        Recarga el historial si tasas_historial cambió desde la última carga
+        
+        Args:
+            db: DatabaseManager desde el que se leen las tasas
+            intervalo: Segundos desde la última verificación durante los que no
+                se vuelve a consultar la tabla (0 para comprobar siempre)
+        """
+        if self.cargado and monotonic() - self.verificado < intervalo:
+            return
+        
+        conexion = sqlite3.connect(db.db_path)
+        try:
+            version = self._leer_version(conexion)
+        finally:
+            conexion.close()
+        
+        if not self.cargado or version != self.version:
+            self.cargar(db)
+        else:
+            self.verificado = monotonic()
+    
+    def registrar(self, instante: str, tasa_usd: float, tasa_eur: float):
+        """
+        Registra (o reemplaza) unas tasas ya guardadas en la base de datos
+        
+        Args:
+            instante: Momento de entrada en vigor 'YYYY-MM-DD HH:MM:SS' (UTC)
+            tasa_usd: Tasa USD a CUP
+            tasa_eur: Tasa EUR a CUP
+        """
+        with self.lock:
+            if not self.cargado:
+                return
+            posicion = bisect_right(self.instantes, instante)
+            if posicion > 0 and self.instantes[posicion - 1] == instante:
+                self.usd[posicion - 1] = tasa_usd
+                self.eur[posicion - 1] = tasa_eur
+            else:
+                self.instantes.insert(posicion, instante)
+                self.usd.insert(posicion, tasa_usd)
+                self.eur.insert(posicion, tasa_eur)
+    
+    def _posicion(self, instante: str) -> int:
+        """Índice de la tasa vigente en el instante UTC (-1 si no hay tasas)"""
+        if not self.instantes:
+            return -1
+        # La vigente es la última que entró en vigor hasta ese momento; antes de la primera, la primera
+        return max(0, bisect_right(self.instantes, instante) - 1)
+    
+    def tasas_en(self, instante: Union[datetime, date, str, None] = None) -> Dict[str, float]:
+        """
+        Obtiene las tasas vigentes en un momento
+        
+        Args:
+            instante: Momento de la consulta (ver formatear_instante; None para ahora)
+        
+        Returns:
+            Diccionario {'usd': ..., 'eur': ...}
+        """
+        instante = formatear_instante(instante)
+        with self.lock:
+            posicion = self._posicion(instante)
+            if posicion < 0:
+                return {'usd': self.tasa_predeterminada_usd, 'eur': self.tasa_predeterminada_eur}
+            return {'usd': self.usd[posicion], 'eur': self.eur[posicion]}
+
+# Historiales por ruta de base de datos
+_historiales = {}
+_historiales_lock = threading.Lock()
+
+def obtener_historial_tasas(db, intervalo: float = INTERVALO_VERIFICACION) -> HistorialTasas:
+    """
+    Devuelve el historial del proceso para la base de datos, al día con la tabla
+    
+    Args:
+        db: DatabaseManager de la base de datos
+        intervalo: Ver HistorialTasas.verificar
+    
+    Returns:
+        Instancia compartida de HistorialTasas
+    """
+    with _historiales_lock:
+        historial = _historiales.get(db.db_path)
+        if historial is None:
+            historial = HistorialTasas()
+            _historiales[db.db_path] = historial
+    
+    historial.verificar(db, intervalo)
+    return historial
+
+# Las funciones SQL de conversión de cualquier base de datos usan el historial
+# (cargado la primera vez que se necesita), sin una consulta por fila
+establecer_consulta_tasas(lambda db, instante: obtener_historial_tasas(db).tasas_en(instante))
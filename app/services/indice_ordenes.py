@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+"""
+Índice en memoria de los orden_id facturados.
+Permite detectar órdenes duplicadas sin consultar la base de datos en la
+mayoría de los casos: un filtro de Bloom descarta al instante las órdenes
+nuevas y un conjunto de órdenes recientes confirma las repetidas.
+"""
+
+import hashlib
+import math
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+class FiltroBloom:
+    """Filtro de Bloom simple sobre un bytearray"""
+    
+    def __init__(self, capacidad: int = 100000, tasa_falsos_positivos: float = 0.001):
+        """
+        Inicializa el filtro
+        
+        Args:
+            capacidad: Número de elementos esperados
+            tasa_falsos_positivos: Probabilidad de falso positivo deseada
+        """
+        capacidad = max(1, capacidad)
+        self.capacidad = capacidad
+        self.num_bits = max(8, int(-capacidad * math.log(tasa_falsos_positivos) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.cantidad = 0
+    
+    def _posiciones(self, valor: str):
+        """Calcula las posiciones de bits para un valor (doble hashing)"""
+        digest = hashlib.blake2b(valor.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def agregar(self, valor: str):
+        """Añade un valor al filtro"""
+        for posicion in self._posiciones(valor):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+        self.cantidad += 1
+    
+    def __contains__(self, valor: str) -> bool:
+        """False significa que el valor seguro no está; True que puede estar"""
+        for posicion in self._posiciones(valor):
+            if not self.bits[posicion >> 3] & (1 << (posicion & 7)):
+                return False
+        return True
+
+class IndiceOrdenes:
+    """Índice de orden_id existentes compartido por todo el proceso"""
+    
+    def __init__(self, capacidad_recientes: int = 5000):
+        """
+        Inicializa un índice vacío (sin cargar)
+        
+        Args:
+            capacidad_recientes: Máximo de orden_id recientes en el conjunto exacto
+        """
+        self.capacidad_recientes = capacidad_recientes
+        self.filtro = None
+        self.recientes = OrderedDict()
+        self.cargado = False
+        self.lock = threading.Lock()
+        
+        # Serializa las cargas completas (arranque, interfaz y cola pueden pedirla a la vez)
+        self.carga_lock = threading.Lock()
+        
+        # Órdenes aceptadas pero aún no escritas (cola de escritura diferida):
+        # una recarga desde la base de datos no las vería
+        self.pendientes = set()
+    
+    def cargar(self, db):
+        """
+        Carga todos los orden_id de la tabla facturas
+        
+        Se usa una conexión propia: la carga puede pedirse desde cualquier hilo
+        y la conexión de db pertenece a quien la creó.
+        
+        Args:
+            db: DatabaseManager de la base de datos de la que se leen las órdenes
+        """
+        conexion = sqlite3.connect(db.db_path)
+        try:
+            filas = conexion.execute("SELECT orden_id FROM facturas ORDER BY id").fetchall()
+        finally:
+            conexion.close()
+        
+        # Dejar margen para el crecimiento antes de tener que reconstruir
+        filtro = FiltroBloom(capacidad=max(10000, len(filas) * 2))
+        recientes = OrderedDict()
+        for (orden_id,) in filas:
+            filtro.agregar(orden_id)
+            recientes[orden_id] = None
+            if len(recientes) > self.capacidad_recientes:
+                recientes.popitem(last=False)
+        
+        with self.lock:
+            for orden_id in self.pendientes:
+                filtro.agregar(orden_id)
+                recientes[orden_id] = None
+            
+            self.filtro = filtro
+            self.recientes = recientes
+            self.cargado = True
+    
+    def asegurar_cargado(self, db):
+        """
+        Carga el índice si no está cargado, una sola vez aunque se pida desde varios hilos
+        
+        Args:
+            db: DatabaseManager de la base de datos de la que se leen las órdenes
+        """
+        if self.cargado:
+            return
+        with self.carga_lock:
+            # Otro hilo pudo terminar la carga mientras se esperaba el lock
+            if not self.cargado:
+                self.cargar(db)
+    
+    def agregar(self, orden_id: str, pendiente: bool = False):
+        """
+        Registra un orden_id recién facturado
+        
+        Args:
+            orden_id: Orden facturada
+            pendiente: Si es True, la factura aún no está en la base de datos y
+                la orden se conserva en las recargas hasta llamar a confirmar
+        """
+        with self.lock:
+            if pendiente:
+                self.pendientes.add(orden_id)
+            if not self.cargado:
+                return
+            self.filtro.agregar(orden_id)
+            self._recordar(orden_id)
+            
+            # Pasada la capacidad, los falsos positivos crecen: se fuerza una recarga
+            if self.filtro.cantidad > self.filtro.capacidad:
+                self.cargado = False
+    
+    def descartar(self, orden_id: str):
+        """
+        Quita un orden_id del conjunto de recientes (por ejemplo, si su escritura falló)
+        
+        El filtro de Bloom no admite borrados; si vuelve a consultarse, la base
+        de datos decide.
+        """
+        with self.lock:
+            self.recientes.pop(orden_id, None)
+            self.pendientes.discard(orden_id)
+    
+    def confirmar(self, orden_id: str):
+        """Indica que la escritura de una orden pendiente terminó (guardada o rechazada)"""
+        with self.lock:
+            self.pendientes.discard(orden_id)
+    
+    def _recordar(self, orden_id: str):
+        """Mueve o añade el orden_id al frente del conjunto de recientes"""
+        self.recientes[orden_id] = None
+        self.recientes.move_to_end(orden_id)
+        if len(self.recientes) > self.capacidad_recientes:
+            self.recientes.popitem(last=False)
+    
+    def existe(self, orden_id: str, consultar_db: Callable[[str], bool], exacto: bool = False) -> bool:
+        """
+        Indica si ya existe una factura con el orden_id
+        
+        El índice es del proceso: no ve las órdenes facturadas desde otra
+        terminal. Antes de insertar debe usarse exacto=True para que una orden
+        "seguro nueva" según el filtro se confirme igualmente en la base de datos.
+        
+        Args:
+            orden_id: Orden a verificar
+            consultar_db: Función que consulta la base de datos (solo se usa
+                cuando el índice no puede responder por sí solo)
+            exacto: Si es True, el filtro solo sirve para confirmar órdenes
+                repetidas recientes; las demás se consultan en la base de datos
+        
+        Returns:
+            True si la orden ya fue facturada
+        """
+        with self.lock:
+            if self.cargado:
+                if orden_id not in self.filtro:
+                    if not exacto:
+                        return False
+                elif orden_id in self.recientes:
+                    self.recientes.move_to_end(orden_id)
+                    return True
+        
+        # Índice sin cargar, posible falso positivo o consulta exacta: confirmar
+        # en la base de datos (las órdenes de otras terminales se incorporan)
+        existe = consultar_db(orden_id)
+        if existe:
+            with self.lock:
+                if self.cargado:
+                    if orden_id not in self.filtro:
+                        self.filtro.agregar(orden_id)
+                    self._recordar(orden_id)
+        return existe
+
+# Índices por ruta de base de datos
+_indices = {}
+_indices_lock = threading.Lock()
+
+def obtener_indice_ordenes(db) -> IndiceOrdenes:
+    """
+    Devuelve el índice del proceso para la base de datos, cargándolo si hace falta
+    
+    Args:
+        db: DatabaseManager de la base de datos
+    
+    Returns:
+        Instancia compartida de IndiceOrdenes
+    """
+    with _indices_lock:
+        indice = _indices.get(db.db_path)
+        if indice is None:
+            indice = IndiceOrdenes()
+            _indices[db.db_path] = indice
+    
+    indice.asegurar_cargado(db)
+    return indice
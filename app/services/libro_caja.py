@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""
+Servicio del libro de caja.
+Consulta el libro de partida doble (movimientos_caja) para obtener saldos en
+cualquier momento e historiales por cuenta, partiendo del checkpoint de saldos
+más cercano en lugar de recorrer toda la historia. Se crean checkpoints en
+cada cierre de día y en cada arqueo.
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.database.db_manager import DatabaseManager
+from app.services.historial_tasas import formatear_instante
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Cuentas del libro
+CUENTA_CAJA = "caja"          # Dinero en la caja
+CUENTA_VENTAS = "ventas"      # Cobros de facturas
+CUENTA_SALIDAS = "salidas"    # Salidas de caja autorizadas
+CUENTA_CIERRES = "cierres"    # Dinero retirado de la caja en los cierres de día
+
+MONEDAS = ("usd", "eur", "cup", "transferencia")
+
+def _limite_libro(fecha_hora: Union[datetime, date, str, None]) -> Optional[str]:
+    """
+    Convierte un límite de consulta del libro al formato de movimientos_caja.fecha
+    
+    Igual que formatear_instante (una fecha 'YYYY-MM-DD' es el final de ese día
+    local), salvo que None significa sin límite en lugar de ahora.
+    """
+    return None if fecha_hora is None else formatear_instante(fecha_hora)
+
+class LibroCajaService:
+    """Servicio de consulta y mantenimiento del libro de caja"""
+    
+    def __init__(self):
+        """Inicializa el servicio del libro de caja"""
+        self.db = DatabaseManager()
+    
+    def saldo_en(self, fecha_hora: Union[datetime, date, str, None] = None,
+                 cuenta: str = CUENTA_CAJA) -> Dict[str, float]:
+        """
+        Obtiene el saldo de una cuenta en un momento dado
+        
+        Args:
+            fecha_hora: Momento de la consulta (ver formatear_instante; una fecha
+                es el final de ese día local; None para el saldo actual)
+            cuenta: Cuenta del libro (por defecto, la caja)
+            
+        Returns:
+            Diccionario {moneda: saldo}
+        """
+        try:
+            self.db.connect()
+            saldos = self._saldos(self.db.cursor, _limite_libro(fecha_hora))
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al obtener saldo del libro de caja: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            saldos = {}
+        
+        return {moneda: round(saldos.get((cuenta, moneda), 0.0), 2) for moneda in MONEDAS}
+    
+    def historial(self, cuenta: str, moneda: str, desde: Union[datetime, date, str],
+                  hasta: Union[datetime, date, str, None] = None) -> Dict:
+        """
+        Obtiene los movimientos de una cuenta en un período con su saldo acumulado
+        
+        Args:
+            cuenta: Cuenta del libro
+            moneda: 'usd', 'eur', 'cup' o 'transferencia'
+            desde: Inicio del período (exclusivo; una fecha es el final de ese día local)
+            hasta: Fin del período (inclusivo, None para hasta ahora)
+            
+        Returns:
+            Diccionario con 'saldo_inicial', 'saldo_final' y 'movimientos'
+            (lista de diccionarios con id, fecha, importe con signo, contrapartida,
+            origen, origen_id y saldo)
+        """
+        desde = formatear_instante(desde)
+        hasta = _limite_libro(hasta)
+        
+        try:
+            self.db.connect()
+            saldo = self._saldos(self.db.cursor, desde).get((cuenta, moneda), 0.0)
+            saldo_inicial = saldo
+            
+            consulta = (
+                "SELECT id, fecha, cuenta_debe, cuenta_haber, monto, origen, origen_id "
+                "FROM movimientos_caja WHERE fecha > ? AND moneda = ? "
+                "AND (cuenta_debe = ? OR cuenta_haber = ?)"
+            )
+            params = [desde, moneda, cuenta, cuenta]
+            if hasta is not None:
+                consulta += " AND fecha <= ?"
+                params.append(hasta)
+            filas = self.db.fetch_all(consulta + " ORDER BY id", tuple(params))
+            self.db.disconnect()
+        except Exception as e:
+            registro.error("Error al obtener historial del libro de caja: %s", e)
+            if self.db.connection:
+                self.db.disconnect()
+            return {'saldo_inicial': 0.0, 'saldo_final': 0.0, 'movimientos': []}
+        
+        movimientos = []
+        for mov_id, fecha, debe, haber, monto, origen, origen_id in filas:
+            importe = monto if debe == cuenta else -monto
+            saldo += importe
+            movimientos.append({
+                'id': mov_id,
+                'fecha': fecha,
+                'importe': importe,
+                'contrapartida': haber if debe == cuenta else debe,
+                'origen': origen,
+                'origen_id': origen_id,
+                'saldo': round(saldo, 2)
+            })
+        
+        return {
+            'saldo_inicial': round(saldo_inicial, 2),
+            'saldo_final': round(saldo, 2),
+            'movimientos': movimientos
+        }
+    
+    def registrar_cierre(self, cursor, cierre_id: int, saldos: Dict[str, float]):
+        """
+        Asienta el retiro del saldo de la caja en un cierre de día
+        
+        Args:
+            cursor: Cursor de la transacción del cierre
+            cierre_id: ID del registro en cierres_dia
+            saldos: Saldo de la caja cerrado, por moneda
+        """
+        for moneda in MONEDAS:
+            monto = saldos.get(moneda, 0) or 0
+            if abs(monto) < 0.005:
+                continue
+            debe, haber = (CUENTA_CIERRES, CUENTA_CAJA) if monto > 0 else (CUENTA_CAJA, CUENTA_CIERRES)
+            cursor.execute(
+                "INSERT INTO movimientos_caja (moneda, cuenta_debe, cuenta_haber, monto, origen, origen_id) "
+                "VALUES (?, ?, ?, ?, 'cierre', ?)",
+                (moneda, debe, haber, abs(monto), cierre_id)
+            )
+    
+    def crear_checkpoint(self, cursor=None) -> Optional[int]:
+        """
+        Guarda los saldos de todas las cuentas hasta el último movimiento
+        
+        Args:
+            cursor: Cursor de una transacción en curso (opcional)
+            
+        Returns:
+            ID del checkpoint creado, o None si no hay movimientos nuevos
+        """
+        propio = cursor is None
+        if propio:
+            self.db.connect()
+            cursor = self.db.cursor
+        
+        try:
+            cursor.execute("SELECT id, fecha FROM movimientos_caja ORDER BY id DESC LIMIT 1")
+            ultimo = cursor.fetchone()
+            cursor.execute("SELECT movimiento_id FROM checkpoints_caja ORDER BY id DESC LIMIT 1")
+            anterior = cursor.fetchone()
+            if ultimo is None or (anterior and anterior[0] >= ultimo[0]):
+                return None
+            
+            saldos = self._saldos(cursor, None)
+            cursor.execute(
+                "INSERT INTO checkpoints_caja (movimiento_id, fecha) VALUES (?, ?)",
+                (ultimo[0], ultimo[1])
+            )
+            checkpoint_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO saldos_checkpoint (checkpoint_id, cuenta, moneda, saldo) VALUES (?, ?, ?, ?)",
+                [(checkpoint_id, cuenta, moneda, saldo) for (cuenta, moneda), saldo in saldos.items()]
+            )
+            
+            if propio:
+                self.db.commit()
+            return checkpoint_id
+        finally:
+            if propio:
+                self.db.disconnect()
+    
+    def _saldos(self, cursor, fecha: Optional[str]) -> Dict[Tuple[str, str], float]:
+        """
+        Calcula los saldos de todas las cuentas hasta una fecha
+        
+        Parte del último checkpoint anterior a la fecha y suma solo los
+        movimientos posteriores (lectura por rango del índice de fecha).
+        
+        Args:
+            cursor: Cursor de la conexión en curso
+            fecha: Límite inclusivo en formato de la base de datos (None: sin límite)
+            
+        Returns:
+            Diccionario {(cuenta, moneda): saldo}
+        """
+        if fecha is None:
+            cursor.execute("SELECT id, movimiento_id, fecha FROM checkpoints_caja ORDER BY id DESC LIMIT 1")
+        else:
+            cursor.execute(
+                "SELECT id, movimiento_id, fecha FROM checkpoints_caja WHERE fecha <= ? "
+                "ORDER BY fecha DESC, id DESC LIMIT 1",
+                (fecha,)
+            )
+        checkpoint = cursor.fetchone()
+        
+        saldos = {}
+        if checkpoint:
+            checkpoint_id, movimiento_id, fecha_checkpoint = checkpoint
+            cursor.execute(
+                "SELECT cuenta, moneda, saldo FROM saldos_checkpoint WHERE checkpoint_id = ?",
+                (checkpoint_id,)
+            )
+            for cuenta, moneda, saldo in cursor.fetchall():
+                saldos[(cuenta, moneda)] = saldo
+            
+            condicion = "fecha >= ? AND id > ?"
+            params = [fecha_checkpoint, movimiento_id]
+        else:
+            condicion = "1 = 1"
+            params = []
+        
+        if fecha is not None:
+            condicion += " AND fecha <= ?"
+            params.append(fecha)
+        
+        cursor.execute(
+            f"SELECT cuenta_debe, cuenta_haber, moneda, SUM(monto) FROM movimientos_caja "
+            f"WHERE {condicion} GROUP BY cuenta_debe, cuenta_haber, moneda",
+            tuple(params)
+        )
+        for debe, haber, moneda, total in cursor.fetchall():
+            saldos[(debe, moneda)] = saldos.get((debe, moneda), 0.0) + total
+            saldos[(haber, moneda)] = saldos.get((haber, moneda), 0.0) - total
+        
+        return saldos
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""
+Proveedores de tasas de cambio y actualización en segundo plano.
+Un proveedor sabe leer las tasas de un origen (archivo dejado en una carpeta
+o endpoint HTTP local). El actualizador lo consulta periódicamente en un hilo
+propio, con tiempo de espera acotado, y registra las tasas nuevas; mientras
+tanto la aplicación sigue usando las últimas tasas conocidas (aunque estén
+vencidas) sin esperar nunca a la red.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+from app.services.historial_tasas import obtener_historial_tasas
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Segundos mínimos entre dos consultas forzadas por refrescar()
+REFRESCO_MINIMO_S = 5
+
+# Espera máxima antes de reintentar tras un error
+REINTENTO_ERROR_S = 60
+
+class ProveedorTasas(ABC):
+    """Interfaz de los orígenes de tasas de cambio"""
+    
+    nombre = "manual"
+    
+    @abstractmethod
+    def obtener(self, timeout: float) -> Dict[str, float]:
+        """
+        Obtiene las tasas vigentes del origen
+        
+        Args:
+            timeout: Segundos máximos de espera
+        
+        Returns:
+            Diccionario {'usd': ..., 'eur': ...}
+        
+        Raises:
+            Exception: Si el origen no responde o la respuesta no es válida
+        """
+
+def _validar_tasas(datos: Dict) -> Dict[str, float]:
+    """Extrae y valida las tasas de un diccionario recibido de un proveedor"""
+    tasas = {
+        'usd': float(datos.get('usd', datos.get('usd_valor'))),
+        'eur': float(datos.get('eur', datos.get('eur_valor')))
+    }
+    if tasas['usd'] <= 0 or tasas['eur'] <= 0:
+        raise ValueError(f"Tasas no válidas: {tasas}")
+    return tasas
+
+class ProveedorArchivo(ProveedorTasas):
+    """Lee las tasas de un archivo JSON ({"usd": ..., "eur": ...}) o CSV (última fila)"""
+    
+    nombre = "archivo"
+    
+    def __init__(self, ruta: str):
+        """
+        Inicializa el proveedor
+        
+        Args:
+            ruta: Archivo que otro proceso reemplaza con las tasas nuevas
+        """
+        self.ruta = ruta
+        self._firma = None
+        self._tasas = None
+    
+    def obtener(self, timeout: float) -> Dict[str, float]:
+        """Lee el archivo (solo si cambió desde la última lectura)"""
+        estado = os.stat(self.ruta)
+        firma = (estado.st_mtime_ns, estado.st_size)
+        
+        # Si el archivo no cambió, no se vuelve a leer
+        if firma == self._firma and self._tasas is not None:
+            return self._tasas
+        
+        with open(self.ruta, newline='', encoding='utf-8-sig') as archivo:
+            if self.ruta.lower().endswith('.csv'):
+                filas = list(csv.DictReader(archivo))
+                if not filas:
+                    raise ValueError("El archivo de tasas está vacío")
+                datos = filas[-1]
+            else:
+                datos = json.load(archivo)
+        
+        self._tasas = _validar_tasas(datos)
+        self._firma = firma
+        return self._tasas
+
+class ProveedorHTTP(ProveedorTasas):
+    """Consulta un endpoint HTTP que responde JSON ({"usd": ..., "eur": ...})"""
+    
+    nombre = "http"
+    
+    def __init__(self, url: str):
+        """
+        Inicializa el proveedor
+        
+        Args:
+            url: Dirección del endpoint (por ejemplo http://127.0.0.1:8765/tasas)
+        """
+        self.url = url
+    
+    def obtener(self, timeout: float) -> Dict[str, float]:
+        """Consulta el endpoint con el tiempo de espera indicado"""
+        with urllib.request.urlopen(self.url, timeout=timeout) as respuesta:
+            return _validar_tasas(json.loads(respuesta.read().decode('utf-8')))
+
+def crear_proveedor(tipo: str, origen: str) -> Optional[ProveedorTasas]:
+    """
+    Crea el proveedor configurado
+    
+    Args:
+        tipo: 'manual', 'archivo' o 'http'
+        origen: Ruta del archivo o URL del endpoint
+    
+    Returns:
+        Proveedor, o None para la carga manual de tasas
+    """
+    tipo = (tipo or "manual").lower()
+    if tipo == "archivo" and origen:
+        return ProveedorArchivo(origen)
+    if tipo == "http" and origen:
+        return ProveedorHTTP(origen)
+    return None
+
+class ActualizadorTasas:
+    """Hilo que consulta un proveedor y registra las tasas que cambian"""
+    
+    def __init__(self, servicio, proveedor: ProveedorTasas, intervalo_s: float = 300,
+                 timeout_s: float = 3, al_actualizar: Callable[[], None] = None):
+        """
+        Inicializa el actualizador e inicia el hilo
+        
+        Args:
+            servicio: ExchangeRateService con el que se registran las tasas
+            proveedor: Origen de las tasas
+            intervalo_s: Segundos entre consultas (y antigüedad a partir de la cual las tasas están vencidas)
+            timeout_s: Segundos máximos de espera por consulta
+            al_actualizar: Función llamada (desde el hilo) cuando se registran tasas nuevas
+        """
+        self.servicio = servicio
+        self.proveedor = proveedor
+        self.intervalo = intervalo_s
+        self.timeout = timeout_s
+        self.al_actualizar = al_actualizar
+        
+        self.ultimo_intento = None
+        self.ultimo_exito = None
+        self.ultimo_error = None
+        
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self.hilo = threading.Thread(target=self._ejecutar, name="actualizador-tasas", daemon=True)
+        self.hilo.start()
+    
+    def vencidas(self) -> bool:
+        """Indica si las últimas tasas obtenidas tienen más antigüedad que el intervalo"""
+        return self.ultimo_exito is None or time.monotonic() - self.ultimo_exito > self.intervalo
+    
+    def refrescar(self):
+        """Pide una consulta inmediata sin esperar su resultado"""
+        if self.ultimo_intento is not None and time.monotonic() - self.ultimo_intento < REFRESCO_MINIMO_S:
+            return
+        self._despertar.set()
+    
+    def detener(self):
+        """Detiene el hilo (la consulta en curso termina por su tiempo de espera)"""
+        self._detener.set()
+        self._despertar.set()
+        self.hilo.join(self.timeout + 1)
+    
+    def _ejecutar(self):
+        """Bucle del hilo: consultar y esperar hasta el próximo intervalo o un refresco"""
+        while not self._detener.is_set():
+            self._consultar()
+            espera = self.intervalo if self.ultimo_error is None else min(self.intervalo, REINTENTO_ERROR_S)
+            self._despertar.wait(espera)
+            self._despertar.clear()
+    
+    def _consultar(self):
+        """Consulta el proveedor y registra las tasas si cambiaron"""
+        self.ultimo_intento = time.monotonic()
+        try:
+            tasas = self.proveedor.obtener(self.timeout)
+            
+            actuales = obtener_historial_tasas(self.servicio.db).tasas_en()
+            cambiaron = (tasas['usd'], tasas['eur']) != (actuales['usd'], actuales['eur'])
+            if cambiaron and not self.servicio.actualizar_tasas(tasas['usd'], tasas['eur']):
+                raise RuntimeError("No se pudieron registrar las tasas")
+            
+            self.ultimo_exito = time.monotonic()
+            self.ultimo_error = None
+            
+            if cambiaron and self.al_actualizar is not None:
+                self.al_actualizar()
+        
+        except Exception as e:
+            # Se siguen usando las últimas tasas conocidas
+            self.ultimo_error = str(e)
+            registro.error("Error al consultar tasas (%s): %s", self.proveedor.nombre, e)
+
+# Actualizador compartido por el proceso (solo existe si hay un proveedor configurado)
+_actualizador = None
+_actualizador_lock = threading.Lock()
+
+def iniciar_actualizador_tasas(servicio, proveedor: ProveedorTasas, intervalo_s: float = 300,
+                               timeout_s: float = 3, al_actualizar: Callable[[], None] = None) -> ActualizadorTasas:
+    """Crea (una sola vez) el actualizador del proceso y lo devuelve"""
+    global _actualizador
+    with _actualizador_lock:
+        if _actualizador is None:
+            _actualizador = ActualizadorTasas(servicio, proveedor, intervalo_s, timeout_s, al_actualizar)
+        return _actualizador
+
+def obtener_actualizador_tasas() -> Optional[ActualizadorTasas]:
+    """Devuelve el actualizador del proceso, o None si las tasas se cargan a mano"""
+    return _actualizador
+
+def detener_actualizador_tasas():
+    """Detiene el actualizador del proceso (al cerrar la aplicación)"""
+    global _actualizador
+    with _actualizador_lock:
+        if _actualizador is not None:
+            _actualizador.detener()
+            _actualizador = None
@@ -10,6 +10,9 @@ from typing import List, Optional, Dict
 
 from app.database.db_manager import DatabaseManager
 from app.database.models import SalidaCaja
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class SalidasService:
     """Servicio para la gestión de salidas de caja"""
@@ -27,45 +30,70 @@ class SalidasService:
         """
         try:
             self.db.connect()
-            
-            # Obtener pagos de facturas sin cerrar
-            pagos = self.db.fetch_one(
-                "SELECT SUM(pago_usd), SUM(pago_eur), SUM(pago_cup), SUM(pago_transferencia) "
-                "FROM facturas WHERE cerrada = 0"
-            )
-            
-            total_usd = pagos[0] or 0 if pagos else 0
-            total_eur = pagos[1] or 0 if pagos else 0
-            total_cup = pagos[2] or 0 if pagos else 0
-            total_transferencia = pagos[3] or 0 if pagos else 0
-            
-            # Restar salidas sin cerrar
-            salidas = self.db.fetch_one(
-                "SELECT SUM(monto_usd), SUM(monto_eur), SUM(monto_cup), SUM(monto_transferencia) "
-                "FROM salidas_caja WHERE cerrada = 0"
-            )
-            
-            if salidas and salidas[0] is not None:
-                total_usd -= salidas[0] or 0
-                total_eur -= salidas[1] or 0
-                total_cup -= salidas[2] or 0
-                total_transferencia -= salidas[3] or 0
-            
+            saldo = self._consultar_saldo(self.db.cursor)
             self.db.disconnect()
-            
-            return {
-                'usd': total_usd,
-                'eur': total_eur,
-                'cup': total_cup,
-                'transferencia': total_transferencia
-            }
+            return saldo
             
         except Exception as e:
-            print(f"Error al calcular saldo disponible: {e}")
+            registro.error("Error al calcular saldo disponible: %s", e)
             if self.db.connection:
                 self.db.disconnect()
             return {'usd': 0, 'eur': 0, 'cup': 0, 'transferencia': 0}
     
+    def _consultar_saldo(self, cursor) -> Dict[str, float]:
+        """
+        Consulta el saldo disponible con el cursor indicado
+        
+        Args:
+            cursor: Cursor de la conexión (o transacción) en curso
+            
+        Returns:
+            Diccionario con los saldos por moneda
+        """
+        saldo = self.obtener_saldo_caja(cursor)
+        return {moneda: saldo[moneda]['balance'] for moneda in ('usd', 'eur', 'cup', 'transferencia')}
+    
+    def obtener_saldo_caja(self, cursor=None) -> Dict:
+        """
+        Obtiene entradas, salidas y balance de la caja abierta
+        
+        Lee la fila de saldo_caja que mantienen los triggers de la base de
+        datos, por lo que no depende de la cantidad de facturas abiertas.
+        
+        Args:
+            cursor: Cursor de una transacción en curso (opcional)
+            
+        Returns:
+            Diccionario {'usd': {'entradas', 'salidas', 'balance'}, 'eur': ..., 'cup': ...,
+            'transferencia': ..., 'num_facturas': int, 'num_salidas': int}
+        """
+        consulta = (
+            "SELECT entradas_usd, entradas_eur, entradas_cup, entradas_transferencia, "
+            "salidas_usd, salidas_eur, salidas_cup, salidas_transferencia, num_facturas, num_salidas "
+            "FROM saldo_caja WHERE id = 1"
+        )
+        
+        if cursor is None:
+            self.db.connect()
+            fila = self.db.fetch_one(consulta)
+            self.db.disconnect()
+        else:
+            cursor.execute(consulta)
+            fila = cursor.fetchone()
+        
+        fila = fila or (0,) * 10
+        saldo = {'num_facturas': fila[8], 'num_salidas': fila[9]}
+        for i, moneda in enumerate(('usd', 'eur', 'cup', 'transferencia')):
+            # Redondear para no arrastrar el error acumulado de las sumas y restas
+            entradas = round(fila[i], 2)
+            salidas = round(fila[i + 4], 2)
+            saldo[moneda] = {
+                'entradas': entradas,
+                'salidas': salidas,
+                'balance': round(entradas - salidas, 2)
+            }
+        return saldo
+    
     def registrar_salida(self, monto_usd: float = 0, monto_eur: float = 0, 
                         monto_cup: float = 0, monto_transferencia: float = 0,
                         destinatario: str = "", autorizado_por: str = "",
@@ -73,6 +101,10 @@ class SalidasService:
         """
         Registra una nueva salida de caja
         
+        La verificación de saldo y la inserción ocurren en la misma transacción
+        BEGIN IMMEDIATE, de modo que dos terminales no pueden retirar a la vez
+        el mismo dinero.
+        
         Args:
             monto_usd: Monto en USD a retirar
             monto_eur: Monto en EUR a retirar
@@ -101,40 +133,37 @@ class SalidasService:
                     'message': "Debe especificar al menos un monto mayor que cero"
                 }
             
-            # Validar que hay suficiente saldo
-            if validar_saldo:
-                saldo = self.calcular_saldo_disponible()
-                
-                errores = []
-                if monto_usd > 0 and monto_usd > saldo['usd']:
-                    errores.append(f"No hay suficiente USD en caja. Disponible: {saldo['usd']:.2f}")
-                
-                if monto_eur > 0 and monto_eur > saldo['eur']:
-                    errores.append(f"No hay suficiente EUR en caja. Disponible: {saldo['eur']:.2f}")
-                
-                if monto_cup > 0 and monto_cup > saldo['cup']:
-                    errores.append(f"No hay suficiente CUP en caja. Disponible: {saldo['cup']:.2f}")
-                
-                if monto_transferencia > 0 and monto_transferencia > saldo['transferencia']:
-                    errores.append(f"No hay suficiente saldo de transferencia. Disponible: {saldo['transferencia']:.2f}")
+            with self.db.transaccion() as cursor:
+                # Validar que hay suficiente saldo (con el bloqueo de escritura ya tomado)
+                if validar_saldo:
+                    saldo = self._consultar_saldo(cursor)
+                    
+                    errores = []
+                    if monto_usd > 0 and monto_usd > saldo['usd']:
+                        errores.append(f"No hay suficiente USD en caja. Disponible: {saldo['usd']:.2f}")
+                    
+                    if monto_eur > 0 and monto_eur > saldo['eur']:
+                        errores.append(f"No hay suficiente EUR en caja. Disponible: {saldo['eur']:.2f}")
+                    
+                    if monto_cup > 0 and monto_cup > saldo['cup']:
+                        errores.append(f"No hay suficiente CUP en caja. Disponible: {saldo['cup']:.2f}")
+                    
+                    if monto_transferencia > 0 and monto_transferencia > saldo['transferencia']:
+                        errores.append(f"No hay suficiente saldo de transferencia. Disponible: {saldo['transferencia']:.2f}")
+                    
+                    if errores:
+                        return {
+                            'success': False,
+                            'message': "\n".join(errores)
+                        }
                 
-                if errores:
-                    return {
-                        'success': False,
-                        'message': "\n".join(errores)
-                    }
-            
-            # Insertar en la base de datos
-            self.db.connect()
-            self.db.execute(
-                "INSERT INTO salidas_caja (monto_usd, monto_eur, monto_cup, monto_transferencia, destinatario, autorizado_por, motivo, fecha) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
-                (monto_usd, monto_eur, monto_cup, monto_transferencia, destinatario, autorizado_por, motivo)
-            )
-            
-            salida_id = self.db.cursor.lastrowid
-            self.db.commit()
-            self.db.disconnect()
+                # Insertar en la base de datos
+                cursor.execute(
+                    "INSERT INTO salidas_caja (monto_usd, monto_eur, monto_cup, monto_transferencia, destinatario, autorizado_por, motivo, fecha) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
+                    (monto_usd, monto_eur, monto_cup, monto_transferencia, destinatario, autorizado_por, motivo)
+                )
+                salida_id = cursor.lastrowid
             
             return {
                 'success': True,
@@ -143,9 +172,7 @@ class SalidasService:
             }
                 
         except Exception as e:
-            print(f"Error al registrar salida de caja: {e}")
-            if self.db.connection:
-                self.db.disconnect()
+            registro.error("Error al registrar salida de caja: %s", e)
             return {
                 'success': False,
                 'message': f"Error: {str(e)}"
@@ -188,7 +215,7 @@ class SalidasService:
             return salidas
                 
         except Exception as e:
-            print(f"Error al obtener salidas recientes: {e}")
+            registro.error("Error al obtener salidas recientes: %s", e)
             if self.db.connection:
                 self.db.disconnect()
             return []
@@ -232,8 +259,8 @@ class SalidasService:
             # Finalizar query con orden
             query += " ORDER BY fecha DESC"
             
-            print(f"Query salidas: {query}")
-            print(f"Params: {params}")
+            registro.debug("Query salidas: %s", query)
+            registro.debug("Params: %s", params)
             
             self.db.connect()
             cursor = self.db.connection.cursor()
@@ -241,7 +268,7 @@ class SalidasService:
             resultado = cursor.fetchall()
             self.db.disconnect()
             
-            print(f"Resultados encontrados: {len(resultado)}")
+            registro.debug("Resultados encontrados: %s", len(resultado))
             
             salidas = []
             for row in resultado:
@@ -261,9 +288,7 @@ class SalidasService:
             return salidas
                 
         except Exception as e:
-            print(f"Error al obtener salidas por fecha: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("Error al obtener salidas por fecha: %s", e)
             if hasattr(self, 'db') and hasattr(self.db, 'connection') and self.db.connection:
                 self.db.disconnect()
             return []
@@ -316,5 +341,5 @@ class SalidasService:
             return True
                 
         except Exception as e:
-            print(f"Error al exportar salidas a CSV: {e}")
+            registro.error("Error al exportar salidas a CSV: %s", e)
             return False
\ No newline at end of file
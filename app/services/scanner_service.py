@@ -2,17 +2,98 @@
 
 """
 Servicio para el escaneo de códigos de barras.
+El componente de cámara (y con él OpenCV y NumPy) se importa la primera vez
+que se escanea, para no cargarlo al iniciar la aplicación.
 """
 
-from app.ui.components.scanner import ScannerWidget
-from PyQt6.QtWidgets import QApplication
+from collections import deque
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.ui.components.scanner import ScannerWidget
+
+def cargar_scanner_widget():
+    """
+    Importa el diálogo de escaneo la primera vez que se necesita
+    
+    Returns:
+        Clase ScannerWidget
+    """
+    from app.ui.components.scanner import ScannerWidget
+    return ScannerWidget
+
+class SesionEscaneo:
+    """Cola de códigos leídos en una sesión de escaneo continuo"""
+    
+    def __init__(self):
+        """Inicializa una sesión vacía"""
+        self.pendientes = deque()
+        self.vistos = set()
+    
+    def agregar(self, codigo: str) -> bool:
+        """
+        Encola un código si no se ha visto antes en la sesión
+        
+        Args:
+            codigo: Código decodificado
+        
+        Returns:
+            True si el código se encoló, False si estaba repetido o vacío
+        """
+        codigo = (codigo or "").strip()
+        if not codigo or codigo in self.vistos:
+            return False
+        
+        self.vistos.add(codigo)
+        self.pendientes.append(codigo)
+        return True
+    
+    def siguiente(self) -> Optional[str]:
+        """
+        Extrae el siguiente código pendiente
+        
+        Returns:
+            El código más antiguo de la cola o None si está vacía
+        """
+        if self.pendientes:
+            return self.pendientes.popleft()
+        return None
+    
+    def cantidad_pendiente(self) -> int:
+        """Devuelve cuántos códigos quedan en la cola"""
+        return len(self.pendientes)
+    
+    def descartar(self, codigo: str):
+        """
+        Olvida un código para que pueda volver a escanearse
+        
+        Args:
+            codigo: Código que se quitó del formulario o cuya factura no se guardó
+        """
+        codigo = (codigo or "").strip()
+        self.vistos.discard(codigo)
+        if codigo in self.pendientes:
+            self.pendientes.remove(codigo)
+    
+    def limpiar(self, conservar_pendientes: bool = False):
+        """
+        Descarta el historial de la sesión
+        
+        Args:
+            conservar_pendientes: Si es True, los códigos que aún esperan en la
+                cola se mantienen (y siguen contando como vistos)
+        """
+        if not conservar_pendientes:
+            self.pendientes.clear()
+        self.vistos = set(self.pendientes)
 
 class ScannerService:
     """Servicio para gestionar el escaneo de códigos de barras"""
     
     def __init__(self):
         """Inicializa el servicio de escaneo"""
-        pass
+        self.sesion = SesionEscaneo()
+        self.dialogo_sesion = None
     
     def escanear(self) -> str:
         """
@@ -22,7 +103,7 @@ class ScannerService:
             Código escaneado o cadena vacía si se cancela
         """
         # Crear un nuevo diálogo de escaneo
-        scanner_dialog = ScannerWidget()
+        scanner_dialog = cargar_scanner_widget()()
         
         # Código escaneado
         codigo_escaneado = ""
@@ -37,14 +118,113 @@ class ScannerService:
         
         return codigo_escaneado
     
+    def iniciar_sesion(self, parent=None, al_encolar=None) -> "ScannerWidget":
+        """
+        Abre (o reutiliza) un diálogo de escaneo continuo no modal
+        
+        La cámara se abre una sola vez y permanece abierta mientras dure la
+        sesión; cada código nuevo se encola sin repetidos.
+        
+        Args:
+            parent: Widget padre del diálogo
+            al_encolar: Función opcional que recibe cada código encolado
+        
+        Returns:
+            El diálogo de la sesión
+        """
+        if self.dialogo_sesion is not None and self.dialogo_sesion.isVisible():
+            self.dialogo_sesion.raise_()
+            self.dialogo_sesion.activateWindow()
+            return self.dialogo_sesion
+        
+        dialogo = cargar_scanner_widget()(parent, continuo=True)
+        
+        # Los códigos ya leídos en esta sesión no se vuelven a emitir
+        dialogo.codigos_sesion.update(self.sesion.vistos)
+        
+        def encolar(codigo):
+            if self.sesion.agregar(codigo) and al_encolar is not None:
+                al_encolar(codigo)
+        
+        dialogo.codigo_escaneado.connect(encolar)
+        dialogo.finished.connect(self._sesion_terminada)
+        
+        self.dialogo_sesion = dialogo
+        dialogo.show()
+        return dialogo
+    
+    def detener_sesion(self):
+        """Cierra el diálogo de la sesión continua (los pendientes se conservan)"""
+        if self.dialogo_sesion is not None:
+            self.dialogo_sesion.close()
+            self.dialogo_sesion = None
+    
+    def _sesion_terminada(self, _resultado):
+        """Libera el diálogo y olvida los códigos que ya salieron de la cola"""
+        self.dialogo_sesion = None
+        self.sesion.limpiar(conservar_pendientes=True)
+    
+    def descartar_codigo(self, codigo: str):
+        """
+        Permite volver a escanear un código que se quitó del formulario
+        
+        Args:
+            codigo: Código descartado
+        """
+        self.sesion.descartar(codigo)
+        if self.dialogo_sesion is not None:
+            self.dialogo_sesion.codigos_sesion.discard((codigo or "").strip())
+    
+    def decodificar_fotos(self, directorio: str, procesos: int = None, recursivo: bool = True,
+                          al_avanzar=None, cancelado=None):
+        """
+        Decodifica en paralelo las fotos de comprobantes de un directorio
+        
+        Args:
+            directorio: Directorio con las fotos
+            procesos: Número de procesos a usar (por defecto, uno por núcleo)
+            recursivo: Si es True, incluye subdirectorios
+            al_avanzar: Función opcional que recibe (fotos procesadas, total)
+            cancelado: Función opcional que devuelve True para detener la
+                decodificación (se devuelven las órdenes ya leídas)
+        
+        Returns:
+            Tupla (ordenes, errores): ordenes es una lista de diccionarios con
+            orden_id, archivo y ya_facturada; errores es una lista de (archivo, mensaje)
+        """
+        from app.utils.decodificador import decodificar_directorio
+        from app.services.facturacion import FacturacionService
+        
+        ordenes = []
+        vistas = set()
+        errores = []
+        for ruta, codigos, error in decodificar_directorio(directorio, procesos, recursivo,
+                                                              al_avanzar, cancelado):
+            if error:
+                errores.append((ruta, error))
+            elif not codigos:
+                errores.append((ruta, "No se encontró ningún código"))
+            
+            for codigo in codigos:
+                if codigo not in vistas:
+                    vistas.add(codigo)
+                    ordenes.append({'orden_id': codigo, 'archivo': ruta})
+        
+        # Marcar las órdenes que ya tienen factura con una sola consulta por lote
+        existentes = FacturacionService().obtener_orden_ids_existentes([o['orden_id'] for o in ordenes])
+        for orden in ordenes:
+            orden['ya_facturada'] = orden['orden_id'] in existentes
+        
+        return ordenes, errores
+    
     def simular_escaneo(self, codigo: str) -> str:
         """
         Simula un escaneo de código de barras (para pruebas)
         
         Args:
             codigo: Código a simular
-            
+        
         Returns:
             El mismo código ingresado
         """
-        return codigo
\ No newline at end of file
+        return codigo
@@ -9,7 +9,8 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
                             QLabel, QLineEdit, QPushButton, QComboBox, 
                             QTableWidget, QTableWidgetItem, QGroupBox,
                             QMessageBox, QHeaderView, QTextEdit, QDateEdit,
-                            QScrollArea, QSizePolicy, QGridLayout, QSpinBox)
+                            QScrollArea, QSizePolicy, QGridLayout, QSpinBox,
+                            QInputDialog)
 from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QFont, QColor
 import datetime
@@ -18,6 +19,8 @@ from app.services.facturacion import FacturacionService
 from app.services.salidas_service import SalidasService
 from app.services.cierre_dia import CierreDiaService
 from app.services.exchange_rate import ExchangeRateService
+from app.utils.denominaciones import resolver_denominaciones
+from app.utils.perfilado import perfilar_accion
 
 class CierreDiaTab(QWidget):
     """Pestaña para visualizar y realizar cierres de día"""
@@ -36,6 +39,9 @@ class CierreDiaTab(QWidget):
         self.denominaciones_eur = [5, 10, 20, 50, 100, 200, 500]
         self.denominaciones_cup = [1, 3, 5, 10, 20, 50, 100, 200, 500, 1000]
         
+        # Marca de la última vista previa (ver CierreDiaService.obtener_resumen_cierre)
+        self.marca_cierre = None
+        
         # Contadores de billetes
         self.contadores_usd = {}
         self.contadores_eur = {}
@@ -85,6 +91,11 @@ class CierreDiaTab(QWidget):
         actualizar_btn.clicked.connect(self.actualizar_resumen)
         fecha_layout.addWidget(actualizar_btn)
         
+        pendientes_btn = QPushButton("Cerrar Días Pendientes")
+        pendientes_btn.setToolTip("Crea un cierre por cada día anterior que quedó sin cerrar")
+        pendientes_btn.clicked.connect(self.cerrar_dias_pendientes)
+        fecha_layout.addWidget(pendientes_btn)
+        
         container_layout.addLayout(fecha_layout)
         
         # Sección: Resumen de movimientos
@@ -337,6 +348,24 @@ class CierreDiaTab(QWidget):
         sugerir_btn.clicked.connect(self.sugerir_conteo)
         cierre_layout.addWidget(sugerir_btn)
         
+        # Botón para registrar un arqueo (conteo al cambiar de turno)
+        arqueo_btn = QPushButton("Registrar Arqueo")
+        arqueo_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #7E57C2;
+                color: white;
+                font-weight: bold;
+                padding: 10px;
+                font-size: 14px;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #673AB7;
+            }
+        """)
+        arqueo_btn.clicked.connect(self.registrar_arqueo)
+        cierre_layout.addWidget(arqueo_btn)
+        
         cierre_layout.addStretch()
         
         realizar_cierre_btn = QPushButton("REALIZAR CIERRE DE DÍA")
@@ -364,61 +393,26 @@ class CierreDiaTab(QWidget):
     
     def actualizar_resumen(self):
         """Actualiza el resumen de entradas y salidas del día"""
-        # Ya no filtramos por fecha, simplemente obtenemos todas las facturas sin cerrar
-        print("\nActualizando resumen de facturas abiertas")
-        
-        # Obtener TODAS las facturas sin cerrar
-        self.db_facturas = self.cierre_service.obtener_facturas_sin_cerrar()
-        print(f"Total facturas sin cerrar: {len(self.db_facturas)}")
-        
-        # Obtener todas las salidas sin cerrar
-        salidas = self.cierre_service.obtener_salidas_sin_cerrar()
-        print(f"Total salidas sin cerrar: {len(salidas)}")
-        
-        # Calcular totales de entradas
-        total_entradas_usd = 0
-        total_entradas_eur = 0
-        total_entradas_cup = 0
-        total_entradas_transfer = 0
-        
-        for factura in self.db_facturas:
-            # Obtener valores con manejo para None
-            pago_usd = factura.get('pago_usd', 0) or 0
-            pago_eur = factura.get('pago_eur', 0) or 0
-            pago_cup = factura.get('pago_cup', 0) or 0
-            pago_transferencia = factura.get('pago_transferencia', 0) or 0
-            
-            total_entradas_usd += pago_usd
-            total_entradas_eur += pago_eur
-            total_entradas_cup += pago_cup
-            total_entradas_transfer += pago_transferencia
-        
-        # Calcular totales de salidas
-        total_salidas_usd = 0
-        total_salidas_eur = 0
-        total_salidas_cup = 0
-        total_salidas_transfer = 0
-        
-        for salida in salidas:
-            monto_usd = salida.get('monto_usd', 0) or 0
-            monto_eur = salida.get('monto_eur', 0) or 0
-            monto_cup = salida.get('monto_cup', 0) or 0
-            monto_transferencia = salida.get('monto_transferencia', 0) or 0
-            
-            total_salidas_usd += monto_usd
-            total_salidas_eur += monto_eur
-            total_salidas_cup += monto_cup
-            total_salidas_transfer += monto_transferencia
-        
-        # Calcular balances
-        balance_usd = total_entradas_usd - total_salidas_usd
-        balance_eur = total_entradas_eur - total_salidas_eur
-        balance_cup = total_entradas_cup - total_salidas_cup
-        balance_transfer = total_entradas_transfer - total_salidas_transfer
-            # Imprimir valores para depuración
-        print(f"Entradas - USD: {total_entradas_usd}, EUR: {total_entradas_eur}, CUP: {total_entradas_cup}, Transfer: {total_entradas_transfer}")
-        print(f"Salidas - USD: {total_salidas_usd}, EUR: {total_salidas_eur}, CUP: {total_salidas_cup}, Transfer: {total_salidas_transfer}")
-        print(f"Balance - USD: {balance_usd}, EUR: {balance_eur}, CUP: {balance_cup}, Transfer: {balance_transfer}")
+        # Saldo de todas las facturas y salidas sin cerrar (mantenido por la base de datos).
+        # La marca fija qué filas entrarán en el cierre: lo que llegue después
+        # de esta vista previa queda para el día siguiente.
+        saldo = self.cierre_service.obtener_resumen_cierre()
+        self.marca_cierre = saldo['marca']
+        
+        total_entradas_usd = saldo['usd']['entradas']
+        total_entradas_eur = saldo['eur']['entradas']
+        total_entradas_cup = saldo['cup']['entradas']
+        total_entradas_transfer = saldo['transferencia']['entradas']
+        
+        total_salidas_usd = saldo['usd']['salidas']
+        total_salidas_eur = saldo['eur']['salidas']
+        total_salidas_cup = saldo['cup']['salidas']
+        total_salidas_transfer = saldo['transferencia']['salidas']
+        
+        balance_usd = saldo['usd']['balance']
+        balance_eur = saldo['eur']['balance']
+        balance_cup = saldo['cup']['balance']
+        balance_transfer = saldo['transferencia']['balance']
         
         # Actualizar etiquetas de entradas
         self.entradas_usd_label.setText(f"{total_entradas_usd:.2f}")
@@ -588,6 +582,7 @@ class CierreDiaTab(QWidget):
         for spinner in list(self.contadores_usd.values()) + list(self.contadores_eur.values()) + list(self.contadores_cup.values()):
             spinner.setValue(0)
     
+    @perfilar_accion("realizar_cierre")
     def realizar_cierre(self):
         """Realiza el cierre del día con los montos contados"""
         # Primero verificar que todas las diferencias sean cero
@@ -633,6 +628,23 @@ class CierreDiaTab(QWidget):
             if respuesta == QMessageBox.StandardButton.No:
                 return
         
+        # Si quedaron días anteriores sin cerrar, ofrecer cerrarlos por separado
+        # antes de incluir sus movimientos en el cierre de hoy
+        if self.cierre_service.obtener_dias_pendientes():
+            respuesta = QMessageBox.question(
+                self,
+                "Días sin cerrar",
+                "Hay días anteriores con movimientos sin cerrar.\n\n"
+                "¿Desea cerrarlos primero, un cierre por día? El resumen se actualizará "
+                "y deberá revisar el conteo antes de cerrar el día actual.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            
+            if respuesta == QMessageBox.StandardButton.Yes:
+                self.cerrar_dias_pendientes(confirmar=False)
+                return
+        
         # Obtener montos contados
         efectivo_usd = float(self.total_usd_label.text())
         efectivo_eur = float(self.total_eur_label.text())
@@ -650,9 +662,20 @@ class CierreDiaTab(QWidget):
             f"CUP en caja según movimientos: {self.balance_cup_label.text()}\n"
             f"CUP contado: {efectivo_cup:.2f}\n"
             f"Diferencia CUP: {self.diferencia_cup_label.text()}\n\n"
-            f"¿Está seguro de realizar el cierre?"
         )
         
+        # Lo registrado después de la última actualización del resumen queda abierto
+        if self.marca_cierre is not None:
+            posteriores = self.cierre_service.contar_posteriores_a_marca(self.marca_cierre)
+            if posteriores['facturas'] or posteriores['salidas']:
+                mensaje += (
+                    f"ATENCIÓN: desde la última actualización del resumen se registraron "
+                    f"{posteriores['facturas']} factura(s) y {posteriores['salidas']} salida(s) "
+                    f"que NO se incluyen en este cierre y quedarán abiertas para el siguiente. "
+                    f"Responda No y actualice el resumen para incluirlas.\n\n"
+                )
+        mensaje += "¿Está seguro de realizar el cierre?"
+        
         respuesta = QMessageBox.question(
             self,
             "Confirmar cierre de día",
@@ -668,7 +691,8 @@ class CierreDiaTab(QWidget):
         resultado = self.cierre_service.realizar_cierre_dia(
             efectivo_contado_usd=efectivo_usd,
             efectivo_contado_eur=efectivo_eur,
-            efectivo_contado_cup=efectivo_cup
+            efectivo_contado_cup=efectivo_cup,
+            marca=self.marca_cierre
         )
         
         if resultado['success']:
@@ -697,50 +721,127 @@ class CierreDiaTab(QWidget):
                 f"No se pudo realizar el cierre: {resultado.get('message', 'Error desconocido')}"
             )
     
+    def registrar_arqueo(self):
+        """Registra un arqueo de la caja con el conteo actual (cambio de turno)"""
+        responsable, ok = QInputDialog.getText(self, "Registrar arqueo", "Responsable del turno:")
+        if not ok:
+            return
+        
+        responsable = responsable.strip()
+        if not responsable:
+            QMessageBox.warning(self, "Registrar arqueo", "Debe indicar el responsable del turno.")
+            return
+        
+        billetes = {
+            'usd': {denominacion: spinner.value() for denominacion, spinner in self.contadores_usd.items()},
+            'eur': {denominacion: spinner.value() for denominacion, spinner in self.contadores_eur.items()},
+            'cup': {denominacion: spinner.value() for denominacion, spinner in self.contadores_cup.items()}
+        }
+        
+        resultado = self.cierre_service.registrar_arqueo(billetes, responsable)
+        
+        if not resultado['success']:
+            QMessageBox.warning(
+                self,
+                "Error al registrar arqueo",
+                f"No se pudo registrar el arqueo: {resultado.get('message', 'Error desconocido')}"
+            )
+            return
+        
+        lineas = [
+            f"{moneda.upper()}: esperado {resultado['esperado'][moneda]:.2f}, "
+            f"contado {resultado['contado'][moneda]:.2f}, "
+            f"diferencia del turno {resultado['diferencias'][moneda]:.2f}"
+            for moneda in ('usd', 'eur', 'cup')
+        ]
+        QMessageBox.information(
+            self,
+            "Arqueo registrado",
+            f"Arqueo registrado para {responsable}.\n\n" + "\n".join(lineas)
+        )
+        
+        self.limpiar_conteo()
+        self.actualizar_resumen()
+    
+    def cerrar_dias_pendientes(self, confirmar=True):
+        """Realiza los cierres de recuperación de los días anteriores sin cerrar"""
+        dias = self.cierre_service.obtener_dias_pendientes()
+        if not dias:
+            QMessageBox.information(self, "Días pendientes", "No hay días anteriores pendientes de cierre.")
+            return
+        
+        if confirmar:
+            detalle = "\n".join(
+                f"{dia['fecha']}: {dia['num_facturas']} factura(s), {dia['num_salidas']} salida(s)"
+                for dia in dias
+            )
+            respuesta = QMessageBox.question(
+                self,
+                "Cerrar días pendientes",
+                f"Se creará un cierre (sin conteo de efectivo) para cada día:\n\n{detalle}\n\n¿Desea continuar?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No
+            )
+            if respuesta == QMessageBox.StandardButton.No:
+                return
+        
+        resultado = self.cierre_service.realizar_cierres_pendientes()
+        if resultado['success']:
+            QMessageBox.information(
+                self, "Días pendientes",
+                f"{resultado['message']}:\n" + "\n".join(resultado['cierres'])
+            )
+        else:
+            QMessageBox.warning(self, "Días pendientes", resultado['message'])
+        
+        self.actualizar_resumen()
+    
     def sugerir_conteo(self):
-        """Sugiere el conteo de billetes basado en el balance esperado"""
+        """
+        Sugiere el conteo de billetes basado en el balance esperado
+        
+        Si ya se contaron billetes, la sugerencia solo usa los billetes contados
+        (indica cuáles separar para cubrir el balance); si no, no hay límite.
+        """
         try:
             # Obtener balances
-            balance_usd = float(self.balance_usd_label.text())
-            balance_eur = float(self.balance_eur_label.text())
-            balance_cup = float(self.balance_cup_label.text())
-            
-            # Limpiar conteo actual
-            self.limpiar_conteo()
-            
-            # Algoritmo para sugerir conteo de USD
-            restante_usd = balance_usd
-            for denom in sorted(self.denominaciones_usd, reverse=True):
-                if restante_usd >= denom:
-                    cantidad = int(restante_usd / denom)
-                    self.contadores_usd[denom].setValue(cantidad)
-                    restante_usd -= cantidad * denom
+            balances = {
+                'usd': float(self.balance_usd_label.text()),
+                'eur': float(self.balance_eur_label.text()),
+                'cup': float(self.balance_cup_label.text())
+            }
             
-            # Algoritmo para sugerir conteo de EUR
-            restante_eur = balance_eur
-            for denom in sorted(self.denominaciones_eur, reverse=True):
-                if restante_eur >= denom:
-                    cantidad = int(restante_eur / denom)
-                    self.contadores_eur[denom].setValue(cantidad)
-                    restante_eur -= cantidad * denom
+            contadores = {
+                'usd': (self.denominaciones_usd, self.contadores_usd),
+                'eur': (self.denominaciones_eur, self.contadores_eur),
+                'cup': (self.denominaciones_cup, self.contadores_cup)
+            }
             
-            # Algoritmo para sugerir conteo de CUP
-            restante_cup = balance_cup
-            for denom in sorted(self.denominaciones_cup, reverse=True):
-                if restante_cup >= denom:
-                    cantidad = int(restante_cup / denom)
-                    self.contadores_cup[denom].setValue(cantidad)
-                    restante_cup -= cantidad * denom
+            # Resolver cada moneda en centavos exactos, sin pasar de los billetes contados
+            residuos = {}
+            for moneda, (denominaciones, spinners) in contadores.items():
+                contados = {denom: spinner.value() for denom, spinner in spinners.items()}
+                disponibles = contados if any(contados.values()) else None
+                
+                conteo, residuo = resolver_denominaciones(balances[moneda], denominaciones, disponibles)
+                for denom, cantidad in conteo.items():
+                    spinners[denom].setValue(cantidad)
+                if residuo > 0:
+                    residuos[moneda] = residuo
             
             # Actualizar totales
             self.calcular_totales()
             
-            QMessageBox.information(
-                self,
-                "Sugerencia de conteo",
+            mensaje = (
                 "Se ha sugerido un conteo de billetes basado en el balance esperado.\n"
                 "Por favor verifique y ajuste según sea necesario."
             )
+            if residuos:
+                mensaje += "\n\nNo se pudo cubrir exactamente con los billetes disponibles:\n" + "\n".join(
+                    f"{moneda.upper()}: faltan {residuo:.2f}" for moneda, residuo in residuos.items()
+                )
+            
+            QMessageBox.information(self, "Sugerencia de conteo", mensaje)
         
         except ValueError:
             QMessageBox.warning(
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""
+Componente para lectores de códigos tipo teclado (HID / "keyboard wedge").
+Distingue las ráfagas de teclas del lector de la escritura normal por el
+tiempo entre pulsaciones.
+"""
+
+import time
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QObject, QEvent, QTimer, Qt, pyqtSignal
+from PyQt6.QtGui import QKeyEvent
+
+from app.utils.config import config
+
+class LectorTeclado(QObject):
+    """Filtro de eventos que captura códigos enviados por un lector USB"""
+    
+    codigo_detectado = pyqtSignal(str)
+    
+    def __init__(self, widget_destino, parent=None):
+        """
+        Inicializa el filtro
+        
+        Args:
+            widget_destino: Widget que debe estar visible en la ventana activa
+                para que se capturen las ráfagas (por ejemplo, la pestaña de facturación)
+            parent: Objeto padre
+        """
+        super().__init__(parent)
+        self.widget_destino = widget_destino
+        
+        # Parámetros de detección
+        self.intervalo_maximo = config.get("scanner", "wedge_max_intervalo_ms", 35) / 1000.0
+        self.longitud_minima = config.get("scanner", "wedge_min_longitud", 4)
+        
+        # Teclas retenidas de la ráfaga actual: (receptor, tecla, modificadores, texto)
+        self.buffer = []
+        self.ultima_pulsacion = 0.0
+        self.reenviando = False
+        
+        # Si la ráfaga se detiene sin Enter, las teclas se devuelven a su destino
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.liberar_buffer)
+    
+    def activo(self):
+        """Indica si el filtro debe interceptar teclas en este momento"""
+        if not self.widget_destino.isVisible():
+            return False
+        return QApplication.activeWindow() is self.widget_destino.window()
+    
+    def eventFilter(self, receptor, evento):
+        """Intercepta las pulsaciones y detecta ráfagas terminadas en Enter"""
+        if self.reenviando or evento.type() != QEvent.Type.KeyPress:
+            return False
+        
+        if not self.activo():
+            return False
+        
+        ahora = time.monotonic()
+        tecla = evento.key()
+        texto = evento.text()
+        rafaga = bool(self.buffer) and (ahora - self.ultima_pulsacion) <= self.intervalo_maximo
+        
+        # Fin de código: Enter dentro de la ráfaga
+        if tecla in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            if rafaga and len(self.buffer) >= self.longitud_minima:
+                codigo = "".join(item[3] for item in self.buffer).strip()
+                self.buffer = []
+                self.timer.stop()
+                if codigo:
+                    self.codigo_detectado.emit(codigo)
+                return True
+            
+            self.liberar_buffer()
+            return False
+        
+        # Solo se retienen caracteres imprimibles sin Ctrl/Alt
+        modificadores = evento.modifiers()
+        if (len(texto) != 1 or not texto.isprintable() or
+                modificadores & (Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.AltModifier)):
+            self.liberar_buffer()
+            return False
+        
+        # Una pausa larga significa que la tecla anterior era escritura manual
+        if self.buffer and not rafaga:
+            self.liberar_buffer()
+        
+        self.buffer.append((receptor, tecla, modificadores, texto))
+        self.ultima_pulsacion = ahora
+        self.timer.start(max(1, int(self.intervalo_maximo * 1000)))
+        return True
+    
+    def liberar_buffer(self):
+        """Devuelve las teclas retenidas a sus receptores originales"""
+        self.timer.stop()
+        pendientes, self.buffer = self.buffer, []
+        
+        self.reenviando = True
+        try:
+            for receptor, tecla, modificadores, texto in pendientes:
+                try:
+                    evento = QKeyEvent(QEvent.Type.KeyPress, tecla, modificadores, texto)
+                    QApplication.sendEvent(receptor, evento)
+                except RuntimeError:
+                    # El receptor pudo haberse destruido mientras se esperaba
+                    pass
+        finally:
+            self.reenviando = False
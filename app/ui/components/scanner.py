@@ -10,16 +10,33 @@ from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QImage, QPixmap
 import cv2
 
+from app.utils.config import config
+from app.utils.decodificador import decodificar_frame
+
 class ScannerWidget(QDialog):
     """Widget para escanear códigos de barras utilizando la cámara"""
     
     codigo_escaneado = pyqtSignal(str)
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, continuo=False):
+        """
+        Inicializa el diálogo de escaneo
+        
+        Args:
+            parent: Widget padre
+            continuo: Si es True, la cámara permanece abierta y se emite cada
+                código nuevo en lugar de cerrar el diálogo tras el primero
+        """
         super().__init__(parent)
-        self.setWindowTitle("Escáner de Códigos")
+        self.setWindowTitle("Escaneo Continuo" if continuo else "Escáner de Códigos")
         self.setMinimumSize(640, 480)
         
+        self.continuo = continuo
+        self.codigo = ""
+        
+        # Códigos ya emitidos en esta sesión (para no repetirlos)
+        self.codigos_sesion = set()
+        
         # Inicializar cámara
         self.camara = None
         self.timer = QTimer()
@@ -42,8 +59,14 @@ class ScannerWidget(QDialog):
         instrucciones.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(instrucciones)
         
-        # Botón para cancelar
-        cancelar_btn = QPushButton("Cancelar")
+        # Contador de códigos leídos en modo continuo
+        self.estado_label = QLabel("")
+        self.estado_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.estado_label.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.estado_label)
+        
+        # Botón para cancelar (o terminar la sesión en modo continuo)
+        cancelar_btn = QPushButton("Terminar" if self.continuo else "Cancelar")
         cancelar_btn.clicked.connect(self.reject)
         layout.addWidget(cancelar_btn)
     
@@ -57,9 +80,20 @@ class ScannerWidget(QDialog):
         self.detener_camara()
         super().closeEvent(event)
     
+    def done(self, resultado):
+        """Libera la cámara al aceptar o rechazar el diálogo"""
+        self.detener_camara()
+        super().done(resultado)
+    
     def iniciar_camara(self):
         """Inicia la captura de video desde la cámara"""
-        self.camara = cv2.VideoCapture(0)
+        # Si la cámara sigue abierta (sesión continua) no se vuelve a abrir
+        if self.camara is not None and self.camara.isOpened():
+            if not self.timer.isActive():
+                self.timer.start(30)
+            return
+        
+        self.camara = cv2.VideoCapture(config.get("scanner", "camera_index", 0))
         
         if not self.camara.isOpened():
             QMessageBox.critical(self, "Error", "No se pudo acceder a la cámara.")
@@ -77,4 +111,37 @@ class ScannerWidget(QDialog):
             self.camara.release()
             self.camara = None
     
-    
\ No newline at end of file
+    def actualizar_frame(self):
+        """Lee un frame de la cámara, lo muestra e intenta decodificarlo"""
+        if self.camara is None:
+            return
+        
+        ok, frame = self.camara.read()
+        if not ok:
+            return
+        
+        # Mostrar el frame en la interfaz
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        alto, ancho, canales = rgb.shape
+        imagen = QImage(rgb.data, ancho, alto, canales * ancho, QImage.Format.Format_RGB888)
+        self.imagen_label.setPixmap(QPixmap.fromImage(imagen).scaled(
+            self.imagen_label.size(),
+            Qt.AspectRatioMode.KeepAspectRatio
+        ))
+        
+        # Intentar decodificar
+        for codigo in decodificar_frame(frame):
+            if codigo in self.codigos_sesion:
+                continue
+            
+            self.codigos_sesion.add(codigo)
+            self.codigo = codigo
+            self.codigo_escaneado.emit(codigo)
+            
+            if not self.continuo:
+                self.accept()
+                return
+            
+            self.estado_label.setText(
+                f"Último código: {codigo}  |  Leídos en la sesión: {len(self.codigos_sesion)}"
+            )
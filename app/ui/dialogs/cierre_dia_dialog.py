@@ -12,6 +12,7 @@ from datetime import datetime, date, timedelta
 
 from app.services.cierre_dia import CierreDiaService
 from app.services.exchange_rate import ExchangeRateService  # Añadir esta importación
+from app.utils.conversion import convertir_monto
 
 class CierreDiaDialog(QDialog):
     """Diálogo para confirmar el cierre del día y verificar los montos"""
@@ -202,8 +203,8 @@ class CierreDiaDialog(QDialog):
             diferencia_cup = cup_contado - self.total_cup_valor
             diferencia_usd = usd_contado - self.total_usd_valor
             
-            # Obtener tasa de cambio actual
-            tasa = self.exchange_service.obtener_tasa_actual()
+            # Obtener tasas de cambio actuales
+            tasas = self.exchange_service.obtener_tasas_actuales()
             
             # Verificar si es un posible cambio de divisas
             es_cambio_divisas = False
@@ -212,7 +213,7 @@ class CierreDiaDialog(QDialog):
             # Caso 1: Falta USD pero sobra el equivalente en CUP (alguien cambió USD por CUP)
             if diferencia_usd < -0.01 and diferencia_cup > 0:
                 # Convertir la diferencia de USD a CUP para ver si coincide
-                equivalente_cup = abs(diferencia_usd) * tasa
+                equivalente_cup = convertir_monto(abs(diferencia_usd), "USD", "CUP", tasas)
                 if abs(equivalente_cup - diferencia_cup) / equivalente_cup < 0.05:  # 5% de tolerancia
                     es_cambio_divisas = True
                     mensaje_cambio = (f"✓ Posible cambio de {abs(diferencia_usd):.2f} USD a "
@@ -221,7 +222,7 @@ class CierreDiaDialog(QDialog):
             # Caso 2: Falta CUP pero sobra el equivalente en USD (alguien cambió CUP por USD)
             elif diferencia_cup < -0.01 and diferencia_usd > 0:
                 # Convertir la diferencia de CUP a USD para ver si coincide
-                equivalente_usd = abs(diferencia_cup) / tasa
+                equivalente_usd = convertir_monto(abs(diferencia_cup), "CUP", "USD", tasas)
                 if abs(equivalente_usd - diferencia_usd) / equivalente_usd < 0.05:  # 5% de tolerancia
                     es_cambio_divisas = True
                     mensaje_cambio = (f"✓ Posible cambio de {abs(diferencia_cup):.2f} CUP a "
@@ -277,8 +278,8 @@ class CierreDiaDialog(QDialog):
             diferencia_cup = cup_contado - self.total_cup_valor
             diferencia_usd = usd_contado - self.total_usd_valor
             
-            # Obtener tasa de cambio actual
-            tasa = self.exchange_service.obtener_tasa_actual()
+            # Obtener tasas de cambio actuales
+            tasas = self.exchange_service.obtener_tasas_actuales()
             
             # Verificar si es un posible cambio de divisas
             es_cambio_divisas = False
@@ -286,14 +287,14 @@ class CierreDiaDialog(QDialog):
             
             # Caso 1: Falta USD pero sobra el equivalente en CUP
             if diferencia_usd < -0.01 and diferencia_cup > 0:
-                equivalente_cup = abs(diferencia_usd) * tasa
+                equivalente_cup = convertir_monto(abs(diferencia_usd), "USD", "CUP", tasas)
                 if abs(equivalente_cup - diferencia_cup) / equivalente_cup < 0.05:  # 5% de tolerancia
                     es_cambio_divisas = True
                     mensaje_cambio = f"\n\n✓ Posible cambio de {abs(diferencia_usd):.2f} USD a {diferencia_cup:.2f} CUP"
             
             # Caso 2: Falta CUP pero sobra el equivalente en USD
             elif diferencia_cup < -0.01 and diferencia_usd > 0:
-                equivalente_usd = abs(diferencia_cup) / tasa
+                equivalente_usd = convertir_monto(abs(diferencia_cup), "CUP", "USD", tasas)
                 if abs(equivalente_usd - diferencia_usd) / equivalente_usd < 0.05:  # 5% de tolerancia
                     es_cambio_divisas = True
                     mensaje_cambio = f"\n\n✓ Posible cambio de {abs(diferencia_cup):.2f} CUP a {diferencia_usd:.2f} USD"
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""
+Diálogo para consultar el registro de diagnóstico.
+"""
+
+import logging
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                            QComboBox, QPlainTextEdit, QPushButton)
+from PyQt6.QtGui import QFont
+
+from app.utils.registro import NIVELES, configurar_registro, nivel_actual, obtener_buffer
+
+class RegistroDialog(QDialog):
+    """Diálogo que muestra los mensajes recientes del registro y permite cambiar su nivel"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.setWindowTitle("Registro de Diagnóstico")
+        self.setMinimumSize(800, 500)
+        
+        # Configurar la interfaz
+        self.init_ui()
+        
+        # Cargar mensajes iniciales
+        self.actualizar()
+    
+    def init_ui(self):
+        """Inicializa la interfaz de usuario"""
+        main_layout = QVBoxLayout(self)
+        
+        # Nivel del registro
+        nivel_layout = QHBoxLayout()
+        nivel_layout.addWidget(QLabel("Nivel:"))
+        
+        self.nivel_combo = QComboBox()
+        self.nivel_combo.addItems(NIVELES)
+        if nivel_actual() in NIVELES:
+            self.nivel_combo.setCurrentText(nivel_actual())
+        self.nivel_combo.currentTextChanged.connect(self.cambiar_nivel)
+        nivel_layout.addWidget(self.nivel_combo)
+        
+        nivel_layout.addWidget(QLabel("Los mensajes DEBUG solo se guardan mientras ese nivel está activo"))
+        nivel_layout.addStretch()
+        main_layout.addLayout(nivel_layout)
+        
+        # Mensajes
+        self.mensajes_text = QPlainTextEdit()
+        self.mensajes_text.setReadOnly(True)
+        self.mensajes_text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.mensajes_text.setFont(QFont("Monospace"))
+        main_layout.addWidget(self.mensajes_text)
+        
+        # Botones
+        botones_layout = QHBoxLayout()
+        
+        self.actualizar_btn = QPushButton("Actualizar")
+        self.actualizar_btn.clicked.connect(self.actualizar)
+        botones_layout.addWidget(self.actualizar_btn)
+        
+        self.limpiar_btn = QPushButton("Limpiar")
+        self.limpiar_btn.clicked.connect(self.limpiar)
+        botones_layout.addWidget(self.limpiar_btn)
+        
+        botones_layout.addStretch()
+        
+        self.cerrar_btn = QPushButton("Cerrar")
+        self.cerrar_btn.clicked.connect(self.accept)
+        botones_layout.addWidget(self.cerrar_btn)
+        
+        main_layout.addLayout(botones_layout)
+    
+    def cambiar_nivel(self, nivel):
+        """Cambia el nivel del registro y vuelve a mostrar los mensajes"""
+        configurar_registro(nivel)
+        self.actualizar()
+    
+    def actualizar(self):
+        """Muestra los mensajes del búfer con el nivel seleccionado o superior"""
+        nivel = getattr(logging, self.nivel_combo.currentText(), logging.DEBUG)
+        self.mensajes_text.setPlainText("\n".join(obtener_buffer().mensajes(nivel)))
+        
+        # Desplazar al mensaje más reciente
+        barra = self.mensajes_text.verticalScrollBar()
+        barra.setValue(barra.maximum())
+    
+    def limpiar(self):
+        """Descarta los mensajes guardados"""
+        obtener_buffer().limpiar()
+        self.mensajes_text.clear()
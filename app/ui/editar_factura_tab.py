@@ -8,14 +8,19 @@ Permite modificar los medios de pago de facturas existentes que no estén cerrad
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, 
                             QLabel, QLineEdit, QPushButton, QGroupBox,
                             QMessageBox, QTableWidget, QTableWidgetItem, QHeaderView,
-                            QSplitter,QScrollArea,QFrame)
-from PyQt6.QtCore import Qt
+                            QSplitter,QScrollArea,QFrame, QDateTimeEdit, QDoubleSpinBox,
+                            QCheckBox)
+from PyQt6.QtCore import Qt, QDateTime, QTime
 from PyQt6.QtGui import QDoubleValidator, QRegularExpressionValidator, QColor
 from datetime import datetime, date, timedelta
 
 from app.database.models import Factura
 from app.services.facturacion import FacturacionService
 from app.services.exchange_rate import ExchangeRateService
+from app.utils.conversion import total_pagado
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class EditarFacturaTab(QWidget):
     """Pestaña para editar medios de pago de facturas existentes"""
@@ -216,6 +221,55 @@ class EditarFacturaTab(QWidget):
         scroll_layout.addWidget(splitter)
         scroll_layout.addLayout(botones_layout)
         
+        # Corrección retroactiva de tasas
+        correccion_group = QGroupBox("Corrección de Tasa (facturas abiertas)")
+        correccion_layout = QFormLayout()
+        
+        inicio_dia = QDateTime(QDateTime.currentDateTime().date(), QTime(0, 0))
+        self.correccion_desde_input = QDateTimeEdit(inicio_dia)
+        self.correccion_desde_input.setCalendarPopup(True)
+        self.correccion_desde_input.setDisplayFormat("yyyy-MM-dd HH:mm")
+        correccion_layout.addRow("Desde:", self.correccion_desde_input)
+        
+        self.correccion_hasta_input = QDateTimeEdit(QDateTime.currentDateTime())
+        self.correccion_hasta_input.setCalendarPopup(True)
+        self.correccion_hasta_input.setDisplayFormat("yyyy-MM-dd HH:mm")
+        correccion_layout.addRow("Hasta:", self.correccion_hasta_input)
+        
+        tasas = self.exchange_service.obtener_tasas_actuales()
+        self.correccion_usd_input = QDoubleSpinBox()
+        self.correccion_usd_input.setRange(0.01, 999999.99)
+        self.correccion_usd_input.setDecimals(2)
+        self.correccion_usd_input.setValue(tasas['usd'])
+        correccion_layout.addRow("Tasa USD correcta:", self.correccion_usd_input)
+        
+        self.correccion_eur_input = QDoubleSpinBox()
+        self.correccion_eur_input.setRange(0.01, 999999.99)
+        self.correccion_eur_input.setDecimals(2)
+        self.correccion_eur_input.setValue(tasas['eur'])
+        correccion_layout.addRow("Tasa EUR correcta:", self.correccion_eur_input)
+        
+        # Reemplazar el historial también cambia los totales de las facturas cerradas
+        self.correccion_historial_check = QCheckBox("Reemplazar también las tasas registradas en el intervalo")
+        correccion_layout.addRow("", self.correccion_historial_check)
+        
+        correccion_botones = QHBoxLayout()
+        self.vista_previa_btn = QPushButton("Vista Previa")
+        self.vista_previa_btn.clicked.connect(lambda: self.corregir_tasa(aplicar=False))
+        correccion_botones.addWidget(self.vista_previa_btn)
+        
+        self.aplicar_correccion_btn = QPushButton("Aplicar Corrección")
+        self.aplicar_correccion_btn.clicked.connect(lambda: self.corregir_tasa(aplicar=True))
+        correccion_botones.addWidget(self.aplicar_correccion_btn)
+        correccion_layout.addRow("", correccion_botones)
+        
+        self.correccion_resultado_label = QLabel("")
+        self.correccion_resultado_label.setWordWrap(True)
+        correccion_layout.addRow("", self.correccion_resultado_label)
+        
+        correccion_group.setLayout(correccion_layout)
+        scroll_layout.addWidget(correccion_group)
+        
         # Configurar el widget de scroll
         scroll_area.setWidget(scroll_content)
         main_layout.addWidget(scroll_area, 1)
@@ -322,7 +376,7 @@ class EditarFacturaTab(QWidget):
         if facturas:
             # Se encontró por orden_id
             factura = facturas[0]
-            print(f"Factura encontrada por ID de Orden: {id_busqueda}")
+            registro.debug("Factura encontrada por ID de Orden: %s", id_busqueda)
         else:
             try:
                 # Intentar buscar como ID numérico de factura
@@ -334,8 +388,8 @@ class EditarFacturaTab(QWidget):
                                     "No se encontró ninguna factura con ese ID interno")
                     return
                 
-                print(f"Factura encontrada por ID interno: {id_busqueda}, " +
-                    f"ID de Orden: {factura.orden_id}")
+                registro.debug("Factura encontrada por ID interno: %s, ID de Orden: %s",
+                               id_busqueda, factura.orden_id)
                     
             except ValueError:
                 # No es un número y tampoco se encontró como orden_id
@@ -361,8 +415,8 @@ class EditarFacturaTab(QWidget):
         
         # Habilitar campos de edición
         self.habilitar_campos_edicion(True)
-
-
+    
+    
     def mostrar_detalles_factura(self, factura, editable=True):
         """Muestra los detalles de la factura seleccionada"""
         try:
@@ -421,9 +475,9 @@ class EditarFacturaTab(QWidget):
                 self.factura_actual = None
                     
         except Exception as e:
-            print(f"Error al mostrar detalles de la factura: {e}")
+            registro.error("Error al mostrar detalles de la factura: %s", e)
             QMessageBox.warning(self, "Error", f"Error al cargar detalles: {str(e)}")
-
+    
     def habilitar_campos_edicion(self, habilitado):
         """Habilita o deshabilita los campos de edición"""
         self.pago_usd_input.setEnabled(habilitado)
@@ -497,38 +551,11 @@ class EditarFacturaTab(QWidget):
             
             # Obtener tasas de cambio
             tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
             
             # Calcular total en la moneda de la factura
-            if moneda == "USD":
-                # Convertir todas las monedas a USD
-                pago_eur_en_usd = pago_eur * (tasa_eur / tasa_usd)
-                pago_cup_en_usd = pago_cup / tasa_usd
-                pago_transferencia_en_usd = pago_transferencia / tasa_usd
-                
-                total_recibido = pago_usd + pago_eur_en_usd + pago_cup_en_usd + pago_transferencia_en_usd
-                balance = total_recibido - monto
-                moneda_balance = "USD"
-                
-            elif moneda == "EUR":
-                # Convertir todas las monedas a EUR
-                pago_usd_en_eur = pago_usd * (tasa_usd / tasa_eur)
-                pago_cup_en_eur = pago_cup / tasa_eur
-                pago_transferencia_en_eur = pago_transferencia / tasa_eur
-                
-                total_recibido = pago_eur + pago_usd_en_eur + pago_cup_en_eur + pago_transferencia_en_eur
-                balance = total_recibido - monto
-                moneda_balance = "EUR"
-                
-            else:  # CUP
-                # Convertir todas las monedas a CUP
-                pago_usd_en_cup = pago_usd * tasa_usd
-                pago_eur_en_cup = pago_eur * tasa_eur
-                
-                total_recibido = pago_cup + pago_usd_en_cup + pago_eur_en_cup + pago_transferencia
-                balance = total_recibido - monto
-                moneda_balance = "CUP"
+            total_recibido = total_pagado(pago_usd, pago_eur, pago_cup, pago_transferencia, moneda, tasas)
+            balance = total_recibido - monto
+            moneda_balance = moneda
             
             # Mostrar balance
             epsilon = 0.01  # Margen de error para redondeo
@@ -551,7 +578,7 @@ class EditarFacturaTab(QWidget):
             self.balance_label.setStyleSheet("color: red; font-weight: bold;")
             self.actualizar_btn.setEnabled(False)
         except Exception as e:
-            print(f"Error al verificar balance: {e}")
+            registro.error("Error al verificar balance: %s", e)
             self.balance_label.setText(f"Balance: Error - {str(e)}")
             self.balance_label.setStyleSheet("color: red; font-weight: bold;")
             self.actualizar_btn.setEnabled(False)
@@ -566,6 +593,65 @@ class EditarFacturaTab(QWidget):
         self.balance_label.setText("Balance: --")
         self.balance_label.setStyleSheet("")
     
+    def corregir_tasa(self, aplicar=False):
+        """
+        Muestra o aplica la corrección de tasas sobre las facturas abiertas del intervalo
+        
+        Args:
+            aplicar: Si es False solo se muestra la vista previa
+        """
+        desde = self.correccion_desde_input.dateTime().toPyDateTime()
+        hasta = self.correccion_hasta_input.dateTime().toPyDateTime()
+        tasa_usd = self.correccion_usd_input.value()
+        tasa_eur = self.correccion_eur_input.value()
+        corregir_historial = self.correccion_historial_check.isChecked()
+        
+        # Antes de aplicar siempre se muestra (y se confirma) la vista previa
+        resultado = self.facturacion_service.corregir_tasa_facturas(
+            desde, hasta, tasa_usd, tasa_eur, corregir_historial=corregir_historial
+        )
+        if not resultado['success']:
+            QMessageBox.warning(self, "Error", resultado['message'])
+            return
+        
+        lineas = [resultado['message']]
+        for moneda, datos in sorted(resultado['por_moneda'].items()):
+            lineas.append(f"{moneda}: {datos['cantidad']} factura(s), equivalente "
+                          f"{datos['equivalente_actual']:.2f} → {datos['equivalente_nuevo']:.2f} USD")
+        if resultado['cantidad']:
+            lineas.append(f"Diferencia total: {resultado['diferencia_usd']:+.2f} USD")
+        if resultado['insuficientes']:
+            lineas.append(f"{resultado['insuficientes']} factura(s) quedarían con pagos insuficientes")
+        if corregir_historial:
+            for tasa in resultado['tasas_historial']:
+                lineas.append(f"Tasa desde {tasa['vigente_desde']} UTC: USD {tasa['usd']:.2f}, "
+                              f"EUR {tasa['eur']:.2f} (también cambian los totales de facturas cerradas)")
+        resumen = "\n".join(lineas)
+        self.correccion_resultado_label.setText(resumen)
+        
+        if not aplicar or (resultado['cantidad'] == 0 and not (corregir_historial and resultado['tasas_historial'])):
+            return
+        
+        respuesta = QMessageBox.question(
+            self, "Confirmar Corrección",
+            f"{resumen}\n\n¿Aplicar USD = {tasa_usd:.2f} y EUR = {tasa_eur:.2f} a estas facturas?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if respuesta != QMessageBox.StandardButton.Yes:
+            return
+        
+        resultado = self.facturacion_service.corregir_tasa_facturas(
+            desde, hasta, tasa_usd, tasa_eur, aplicar=True, corregir_historial=corregir_historial
+        )
+        if resultado['success']:
+            self.correccion_resultado_label.setText(resultado['message'])
+            QMessageBox.information(self, "Éxito", resultado['message'])
+            self.cargar_facturas_recientes()
+            if self.factura_actual:
+                self.verificar_balance()
+        else:
+            QMessageBox.warning(self, "Error", resultado['message'])
+    
     def actualizar_factura(self):
         """Actualiza la factura con los nuevos datos de pago"""
         if not self.factura_actual:
@@ -9,18 +9,35 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QLabel, QLineEdit, QPushButton, QComboBox, 
                              QTableWidget, QTableWidgetItem, QGroupBox,
                              QMessageBox, QInputDialog, QHeaderView, QCheckBox,
-                             QScrollArea, QSizePolicy)
-from PyQt6.QtCore import Qt, pyqtSlot, Qt
+                             QScrollArea, QSizePolicy, QApplication)
+from PyQt6.QtCore import Qt, pyqtSlot, Qt, pyqtSignal
+from collections import deque
 from datetime import datetime, date, timedelta
+import threading
 
-from app.ui.components.scanner import ScannerWidget
 from app.ui.components.invoice_table import InvoiceTableWidget
-from app.services.facturacion import FacturacionService
+from app.ui.components.lector_teclado import LectorTeclado
+from app.utils.config import config
+from app.utils.conversion import convertir_monto, total_pagado
+from app.utils.perfilado import perfilar_accion
+from app.services.facturacion import FacturacionService, FacturaDuplicadaError
 from app.services.scanner_service import ScannerService
+from app.services.cola_facturas import iniciar_cola_facturas
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class FacturacionTab(QWidget):
     """Pestaña para la facturación y escaneo de códigos"""
     
+    # Confirmación del hilo escritor: (ticket, orden_id, factura_id o None, error)
+    factura_guardada = pyqtSignal(int, str, object, str)
+    
+    # Emitidas desde el hilo que decodifica fotos
+    fotos_avance = pyqtSignal(int, int)
+    fotos_decodificadas = pyqtSignal(object, object, bool)
+    fotos_fallidas = pyqtSignal(str)
+    
     def __init__(self, exchange_service):
         super().__init__()
         
@@ -29,10 +46,42 @@ class FacturacionTab(QWidget):
         self.facturacion_service = FacturacionService()
         self.scanner_service = ScannerService()
         
+        # Orden de la sesión de escaneo cargada en el formulario
+        self.codigo_cargado = None
+        
+        # Escritura diferida opcional: las facturas se confirman en lotes en segundo plano
+        self.cola_facturas = None
+        if config.get("facturacion", "write_behind", False):
+            self.cola_facturas = iniciar_cola_facturas(
+                intervalo_ms=config.get("facturacion", "group_commit_ms", 5)
+            )
+            self.factura_guardada.connect(self.confirmar_factura_guardada)
+        
+        # Datos del formulario de cada factura encolada (por ticket) y de las
+        # que el hilo escritor no pudo guardar, a la espera de volver al formulario
+        self.facturas_en_cola = {}
+        self.facturas_fallidas = deque()
+        
+        # Decodificación de fotos en segundo plano
+        self.cancelar_fotos = None
+        self.progreso_fotos = None
+        self.fotos_avance.connect(self.mostrar_avance_fotos)
+        self.fotos_decodificadas.connect(self.encolar_ordenes_de_fotos)
+        self.fotos_fallidas.connect(self.mostrar_error_fotos)
+        
         # Configurar la interfaz
         self.init_ui()
         
+        # Lector de códigos tipo teclado (USB/HID): captura la ráfaga sin
+        # necesidad de que el campo de orden tenga el foco
+        self.lector_teclado = None
+        if config.get("scanner", "wedge_enabled", True):
+            self.lector_teclado = LectorTeclado(self, self)
+            self.lector_teclado.codigo_detectado.connect(self.procesar_codigo_lector)
+            QApplication.instance().installEventFilter(self.lector_teclado)
+        
         # Cargar datos iniciales
+        self.facturacion_service.cargar_indice_ordenes()
         self.cargar_tasa_actual()
         self.cargar_facturas_recientes()
     def init_ui(self):
@@ -105,15 +154,43 @@ class FacturacionTab(QWidget):
         self.orden_id_input = QLineEdit()
         self.orden_id_input.setPlaceholderText("Escanee o ingrese ID de orden")
         self.orden_id_input.setMinimumWidth(200)
+        self.orden_id_input.editingFinished.connect(self.verificar_orden_id)
         
         escanear_btn = QPushButton("Escanear")
         escanear_btn.clicked.connect(self.iniciar_escaneo)
         
+        # Escaneo continuo: la cámara queda abierta y los códigos se encolan
+        escaneo_continuo_btn = QPushButton("Escaneo Continuo")
+        escaneo_continuo_btn.setToolTip("Mantiene la cámara abierta y encola las órdenes leídas")
+        escaneo_continuo_btn.clicked.connect(self.iniciar_escaneo_continuo)
+        
         orden_layout.addWidget(self.orden_id_input)
         orden_layout.addWidget(escanear_btn)
+        orden_layout.addWidget(escaneo_continuo_btn)
+        
+        # Órdenes a partir de fotos de comprobantes
+        self.importar_fotos_btn = QPushButton("Desde Fotos")
+        self.importar_fotos_btn.setToolTip("Decodifica las órdenes de un directorio de fotos y las encola")
+        self.importar_fotos_btn.clicked.connect(self.importar_ordenes_desde_fotos)
+        orden_layout.addWidget(self.importar_fotos_btn)
         
         factura_layout.addRow("ID de Orden:", orden_layout)
         
+        # Aviso de orden duplicada
+        self.orden_estado_label = QLabel("")
+        self.orden_estado_label.setStyleSheet("color: red; font-weight: bold;")
+        factura_layout.addRow("", self.orden_estado_label)
+        
+        # Órdenes pendientes de la sesión de escaneo continuo
+        self.cola_escaneo_label = QLabel("")
+        self.cola_escaneo_label.setStyleSheet("font-style: italic; color: #1565C0;")
+        factura_layout.addRow("", self.cola_escaneo_label)
+        
+        # Facturas pendientes de escritura (modo diferido)
+        self.guardado_label = QLabel("")
+        self.guardado_label.setStyleSheet("font-style: italic; color: #6A1B9A;")
+        factura_layout.addRow("", self.guardado_label)
+        
         # Añadir campo para Mensajero (obligatorio)
         mensajero_layout = QHBoxLayout()
         self.mensajero_input = QLineEdit()
@@ -331,8 +408,6 @@ class FacturacionTab(QWidget):
             
             # Obtener tasas de cambio
             tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
             
             # Obtener pagos - Usar try/except para cada conversión por seguridad
             try:
@@ -362,34 +437,9 @@ class FacturacionTab(QWidget):
                 self.pago_transferencia_input.setText("0")
             
             # Calcular total en la moneda de la factura
-            if moneda == "USD":
-                # Convertir todas las monedas a USD
-                pago_eur_en_usd = pago_eur * (tasa_eur / tasa_usd)
-                pago_cup_en_usd = pago_cup / tasa_usd
-                pago_transferencia_en_usd = pago_transferencia / tasa_usd
-                
-                total_recibido = pago_usd + pago_eur_en_usd + pago_cup_en_usd + pago_transferencia_en_usd
-                balance = total_recibido - monto
-                moneda_balance = "USD"
-                
-            elif moneda == "EUR":
-                # Convertir todas las monedas a EUR
-                pago_usd_en_eur = pago_usd * (tasa_usd / tasa_eur)
-                pago_cup_en_eur = pago_cup / tasa_eur
-                pago_transferencia_en_eur = pago_transferencia / tasa_eur
-                
-                total_recibido = pago_eur + pago_usd_en_eur + pago_cup_en_eur + pago_transferencia_en_eur
-                balance = total_recibido - monto
-                moneda_balance = "EUR"
-                
-            else:  # CUP
-                # Convertir todas las monedas a CUP
-                pago_usd_en_cup = pago_usd * tasa_usd
-                pago_eur_en_cup = pago_eur * tasa_eur
-                
-                total_recibido = pago_cup + pago_usd_en_cup + pago_eur_en_cup + pago_transferencia
-                balance = total_recibido - monto
-                moneda_balance = "CUP"
+            total_recibido = total_pagado(pago_usd, pago_eur, pago_cup, pago_transferencia, moneda, tasas)
+            balance = total_recibido - monto
+            moneda_balance = moneda
             
             # Mostrar balance
             if abs(balance) < 0.01:  # Si está cerca de cero (por redondeo)
@@ -413,11 +463,11 @@ class FacturacionTab(QWidget):
                 self.balance_label.setStyleSheet("color: red; font-weight: bold;")
                     
         except ValueError as e:
-            print(f"Error al calcular balance: {e}")
+            registro.error("Error al calcular balance: %s", e)
             self.balance_label.setText("Balance: Error en valores")
             self.balance_label.setStyleSheet("color: red;")
         except Exception as e:
-            print(f"Error inesperado: {e}")
+            registro.error("Error inesperado: %s", e)
             self.balance_label.setText("Balance: Error")
             self.balance_label.setStyleSheet("color: red;")
 
@@ -453,8 +503,159 @@ class FacturacionTab(QWidget):
         codigo = self.scanner_service.escanear()
         if codigo:
             self.orden_id_input.setText(codigo)
+            self.verificar_orden_id()
             QMessageBox.information(self, "Escaneo Exitoso", 
                                 f"Código escaneado: {codigo}")
+    
+    def procesar_codigo_lector(self, codigo):
+        """Recibe un código leído por el lector tipo teclado"""
+        # Si hay una factura en curso, el código espera en la cola de la sesión
+        if self.orden_id_input.text().strip():
+            if self.scanner_service.sesion.agregar(codigo):
+                self.actualizar_cola_escaneo()
+            return
+        
+        self.orden_id_input.setText(codigo)
+        if self.verificar_orden_id() and self.mensajero_input.text().strip():
+            self.monto_input.setFocus()
+        else:
+            self.mensajero_input.setFocus()
+    
+    def verificar_orden_id(self):
+        """
+        Comprueba si la orden del formulario ya fue facturada
+        
+        Returns:
+            True si la orden está libre, False si ya existe una factura
+        """
+        orden_id = self.orden_id_input.text().strip()
+        
+        # Si la orden escaneada se quitó del formulario, puede volver a escanearse
+        if self.codigo_cargado is not None and orden_id != self.codigo_cargado:
+            self.scanner_service.descartar_codigo(self.codigo_cargado)
+            self.codigo_cargado = None
+        
+        if orden_id and self.facturacion_service.verificar_orden_id_existente(orden_id):
+            self.orden_estado_label.setText(f"Ya existe una factura con el ID de orden '{orden_id}'")
+            self.orden_id_input.setStyleSheet("QLineEdit { border: 2px solid red; }")
+            return False
+        
+        self.orden_estado_label.setText("")
+        self.orden_id_input.setStyleSheet("")
+        return True
+    
+    def iniciar_escaneo_continuo(self):
+        """Abre una sesión de escaneo continuo que alimenta la cola de órdenes"""
+        self.scanner_service.iniciar_sesion(self, al_encolar=self.codigo_encolado)
+    
+    def importar_ordenes_desde_fotos(self):
+        """Decodifica en segundo plano un directorio de fotos y encola las órdenes pendientes"""
+        from PyQt6.QtWidgets import QFileDialog, QProgressDialog
+        
+        directorio = QFileDialog.getExistingDirectory(self, "Seleccionar directorio de fotos")
+        if not directorio:
+            return
+        
+        self.importar_fotos_btn.setEnabled(False)
+        self.cancelar_fotos = threading.Event()
+        
+        self.progreso_fotos = QProgressDialog("Buscando fotos...", "Cancelar", 0, 0, self)
+        self.progreso_fotos.setWindowTitle("Órdenes desde Fotos")
+        self.progreso_fotos.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progreso_fotos.setMinimumDuration(0)
+        self.progreso_fotos.canceled.connect(self.cancelar_fotos.set)
+        self.progreso_fotos.show()
+        
+        # El hilo solo se comunica con la interfaz mediante señales
+        def decodificar(cancelar):
+            try:
+                ordenes, errores = self.scanner_service.decodificar_fotos(
+                    directorio, al_avanzar=self.fotos_avance.emit, cancelado=cancelar.is_set
+                )
+            except Exception as e:
+                registro.exception("Error al decodificar las fotos de %s", directorio)
+                self.fotos_fallidas.emit(str(e))
+                return
+            self.fotos_decodificadas.emit(ordenes, errores, cancelar.is_set())
+        
+        threading.Thread(target=decodificar, args=(self.cancelar_fotos,),
+                         name="decodificar-fotos", daemon=True).start()
+    
+    def mostrar_avance_fotos(self, procesadas, total):
+        """Actualiza el progreso de la decodificación de fotos"""
+        if self.progreso_fotos is not None and not self.progreso_fotos.wasCanceled():
+            self.progreso_fotos.setMaximum(total)
+            self.progreso_fotos.setValue(procesadas)
+            self.progreso_fotos.setLabelText(f"Decodificando fotos: {procesadas} de {total}")
+    
+    def terminar_importacion_fotos(self):
+        """Cierra el progreso y permite iniciar otra importación"""
+        if self.progreso_fotos is not None:
+            self.progreso_fotos.canceled.disconnect()
+            self.progreso_fotos.close()
+            self.progreso_fotos = None
+        self.cancelar_fotos = None
+        self.importar_fotos_btn.setEnabled(True)
+    
+    def mostrar_error_fotos(self, error):
+        """Informa de un error en la decodificación de fotos"""
+        self.terminar_importacion_fotos()
+        QMessageBox.warning(self, "Órdenes desde Fotos", f"No se pudieron decodificar las fotos:\n{error}")
+    
+    def encolar_ordenes_de_fotos(self, ordenes, errores, cancelado):
+        """Encola las órdenes decodificadas que aún no tienen factura"""
+        self.terminar_importacion_fotos()
+        
+        encoladas = 0
+        ya_facturadas = []
+        for orden in ordenes:
+            if orden['ya_facturada']:
+                ya_facturadas.append(orden['orden_id'])
+            elif self.scanner_service.sesion.agregar(orden['orden_id']):
+                encoladas += 1
+        
+        if not self.orden_id_input.text().strip():
+            self.cargar_siguiente_codigo()
+        else:
+            self.actualizar_cola_escaneo()
+        
+        mensaje = f"Órdenes encontradas: {len(ordenes)}\nEncoladas para facturar: {encoladas}"
+        if cancelado:
+            mensaje = "Importación cancelada: solo se procesó una parte de las fotos.\n\n" + mensaje
+        if ya_facturadas:
+            mensaje += f"\n\nYa facturadas ({len(ya_facturadas)}):\n" + "\n".join(ya_facturadas[:20])
+            if len(ya_facturadas) > 20:
+                mensaje += "\n..."
+        if errores:
+            mensaje += f"\n\nFotos sin código legible: {len(errores)}"
+        
+        QMessageBox.information(self, "Órdenes desde Fotos", mensaje)
+    
+    def codigo_encolado(self, codigo):
+        """Recibe un código nuevo de la sesión de escaneo continuo"""
+        # Si el formulario está libre se carga de inmediato
+        if not self.orden_id_input.text().strip():
+            self.cargar_siguiente_codigo()
+        else:
+            self.actualizar_cola_escaneo()
+    
+    def cargar_siguiente_codigo(self):
+        """Carga en el formulario la siguiente orden pendiente de la sesión"""
+        codigo = self.scanner_service.sesion.siguiente()
+        if codigo:
+            self.orden_id_input.setText(codigo)
+            self.codigo_cargado = codigo
+            self.verificar_orden_id()
+            self.mensajero_input.setFocus()
+        self.actualizar_cola_escaneo()
+    
+    def actualizar_cola_escaneo(self):
+        """Muestra cuántas órdenes escaneadas esperan ser facturadas"""
+        pendientes = self.scanner_service.sesion.cantidad_pendiente()
+        if pendientes:
+            self.cola_escaneo_label.setText(f"Órdenes escaneadas en espera: {pendientes}")
+        else:
+            self.cola_escaneo_label.setText("")
 
     def actualizar_monto_equivalente(self):
         """Actualiza el monto equivalente basado en la moneda seleccionada y la tasa de cambio"""
@@ -468,23 +669,19 @@ class FacturacionTab(QWidget):
             
             # Obtener tasas actuales
             tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
             
-            if moneda == "USD":
-                equivalente_cup = monto * tasa_usd
-                self.equivalente_label.setText(f"Equivalente: {equivalente_cup:.2f} CUP")
-            elif moneda == "EUR":
-                equivalente_cup = monto * tasa_eur
+            if moneda in ("USD", "EUR"):
+                equivalente_cup = convertir_monto(monto, moneda, "CUP", tasas)
                 self.equivalente_label.setText(f"Equivalente: {equivalente_cup:.2f} CUP")
             else:  # CUP
-                equivalente_usd = monto / tasa_usd
-                equivalente_eur = monto / tasa_eur
+                equivalente_usd = convertir_monto(monto, "CUP", "USD", tasas)
+                equivalente_eur = convertir_monto(monto, "CUP", "EUR", tasas)
                 self.equivalente_label.setText(f"Equivalente: {equivalente_usd:.2f} USD | {equivalente_eur:.2f} EUR")
                     
         except ValueError:
             self.equivalente_label.setText("Equivalente: (valor inválido)")
     
+    @perfilar_accion("registrar_factura")
     def registrar_factura(self):
         """Registra una nueva factura en el sistema"""
         # Validar campos
@@ -528,74 +725,173 @@ class FacturacionTab(QWidget):
             
             # Obtener tasas de cambio
             tasas = self.exchange_service.obtener_tasas_actuales()
-            tasa_usd = tasas['usd']
-            tasa_eur = tasas['eur']
             
             # Verificar que los pagos sean suficientes (mismo cálculo que en verificar_balance)
-            if moneda == "USD":
-                pago_eur_en_usd = pago_eur * (tasa_eur / tasa_usd)
-                pago_cup_en_usd = pago_cup / tasa_usd
-                pago_transferencia_en_usd = pago_transferencia / tasa_usd
-                
-                total_recibido = pago_usd + pago_eur_en_usd + pago_cup_en_usd + pago_transferencia_en_usd
-            elif moneda == "EUR":
-                pago_usd_en_eur = pago_usd * (tasa_usd / tasa_eur)
-                pago_cup_en_eur = pago_cup / tasa_eur
-                pago_transferencia_en_eur = pago_transferencia / tasa_eur
-                
-                total_recibido = pago_eur + pago_usd_en_eur + pago_cup_en_eur + pago_transferencia_en_eur
-            else:  # CUP
-                pago_usd_en_cup = pago_usd * tasa_usd
-                pago_eur_en_cup = pago_eur * tasa_eur
-                
-                total_recibido = pago_cup + pago_usd_en_cup + pago_eur_en_cup + pago_transferencia
+            total_recibido = total_pagado(pago_usd, pago_eur, pago_cup, pago_transferencia, moneda, tasas)
             
             if total_recibido < monto - 0.01:  # Margen para redondeo
                 QMessageBox.warning(self, "Error", "El pago recibido es insuficiente")
                 return
             
-            # Usar el servicio de facturación para registrar la factura
-            resultado = self.facturacion_service.registrar_factura(
-                orden_id, monto, moneda, pago_usd, pago_eur, pago_cup, 
-                pago_transferencia, transferencia_id, mensajero  # Añadido mensajero como argumento
-            )
+            # Registrar con las tasas ya consultadas (una sola sentencia INSERT),
+            # o entregarla al hilo escritor si la escritura diferida está activa
+            try:
+                if self.cola_facturas is not None:
+                    resultado = self.cola_facturas.encolar(
+                        orden_id, monto, moneda, pago_usd, pago_eur, pago_cup,
+                        pago_transferencia, transferencia_id, mensajero, tasas=tasas,
+                        al_confirmar=self.factura_guardada.emit
+                    )
+                else:
+                    resultado = self.facturacion_service.registrar_factura_rapida(
+                        orden_id, monto, moneda, pago_usd, pago_eur, pago_cup, 
+                        pago_transferencia, transferencia_id, mensajero, tasas=tasas
+                    )
+            except FacturaDuplicadaError:
+                self.verificar_orden_id()
+                QMessageBox.warning(self, "Error", f"Ya existe una factura con el ID de orden '{orden_id}'")
+                return
             
-            if resultado:
-                # Limpiar campos
-                self.orden_id_input.clear()
-                self.monto_input.clear()
-                self.mensajero_input.clear()  # Limpiar el campo mensajero
-                self.pago_usd_input.clear()
-                self.pago_eur_input.clear()
-                self.pago_cup_input.clear()
-                self.pago_transferencia_input.clear()
-                self.transferencia_id_input.clear()
-                # Ya no hay checkbox: self.pago_transferencia_check.setChecked(False)
-                self.equivalente_label.setText("Equivalente: --")
-                self.balance_label.setText("Balance: --")
-                self.balance_label.setStyleSheet("")
+            if resultado is not None:
+                if self.cola_facturas is not None:
+                    # Hasta la confirmación del hilo escritor se conservan los
+                    # datos para devolverlos al formulario si la escritura falla
+                    self.facturas_en_cola[resultado] = self.datos_formulario()
+                    titulo = "Factura en Cola"
+                    mensaje = "Factura enviada a guardar (pendiente de confirmación)"
+                else:
+                    titulo = "Éxito"
+                    mensaje = "Factura registrada correctamente"
                 
-                self.cargar_facturas_recientes()
+                self.limpiar_formulario()
                 
-                # Mensaje de éxito con información sobre cambio si corresponde
-                mensaje = "Factura registrada correctamente"
+                if self.cola_facturas is not None:
+                    self.actualizar_guardado_pendiente()
+                else:
+                    self.cargar_facturas_recientes()
+                
+                # Continuar con una factura que no se pudo guardar o con la
+                # siguiente orden de la sesión de escaneo
+                if self.facturas_fallidas:
+                    self.restaurar_formulario(self.facturas_fallidas.popleft())
+                    self.actualizar_guardado_pendiente()
+                else:
+                    self.cargar_siguiente_codigo()
                 
                 # Calcular cambio a devolver si hay sobrepago
                 if total_recibido > monto + 0.01:  # Hay cambio a devolver
                     cambio = total_recibido - monto
                     mensaje += f"\n\nDar cambio: {cambio:.2f} {moneda}"
                     
-                QMessageBox.information(self, "Éxito", mensaje)
+                QMessageBox.information(self, titulo, mensaje)
             else:
-                # Verificar si el error es por factura duplicada
-                if self.facturacion_service.verificar_orden_id_existente(orden_id):
-                    QMessageBox.warning(self, "Error", f"Ya existe una factura con el ID de orden '{orden_id}'")
-                else:
-                    QMessageBox.warning(self, "Error", "No se pudo registrar la factura")
+                QMessageBox.warning(self, "Error", "No se pudo registrar la factura")
                     
         except ValueError as e:
             QMessageBox.warning(self, "Error", f"Los valores ingresados no son válidos: {e}")
     
+    def confirmar_factura_guardada(self, ticket, orden_id, factura_id, error):
+        """Recibe la confirmación del hilo escritor para una factura encolada"""
+        datos = self.facturas_en_cola.pop(ticket, None)
+        
+        if factura_id is None:
+            # La orden no quedó facturada: puede volver a escanearse
+            self.scanner_service.descartar_codigo(orden_id)
+            
+            # Los datos vuelven al formulario (o esperan a que quede libre)
+            if datos is None:
+                detalle = "Regístrela nuevamente."
+            elif self.formulario_vacio():
+                self.restaurar_formulario(datos)
+                detalle = "Los datos se cargaron de nuevo en el formulario para registrarla otra vez."
+            else:
+                self.facturas_fallidas.append(datos)
+                detalle = "Los datos se cargarán en el formulario al terminar la factura en curso."
+            
+            self.actualizar_guardado_pendiente()
+            QMessageBox.critical(
+                self, "Factura no guardada",
+                f"La factura de la orden '{orden_id}' no se pudo guardar:\n{error}\n\n{detalle}"
+            )
+            return
+        
+        self.actualizar_guardado_pendiente()
+        
+        # Refrescar la tabla una sola vez cuando se vacía la cola
+        if self.cola_facturas.cantidad_pendiente() == 0:
+            self.cargar_facturas_recientes()
+    
+    def actualizar_guardado_pendiente(self):
+        """Muestra cuántas facturas esperan su confirmación en disco y cuántas fallaron"""
+        partes = []
+        pendientes = self.cola_facturas.cantidad_pendiente()
+        if pendientes:
+            partes.append(f"Guardando facturas (pendientes de confirmación): {pendientes}")
+        if self.facturas_fallidas:
+            partes.append(f"Facturas sin guardar en espera: {len(self.facturas_fallidas)}")
+        self.guardado_label.setText("  |  ".join(partes))
+    
+    def datos_formulario(self):
+        """
+        Copia los campos de la factura en curso
+        
+        Returns:
+            Diccionario con el texto de cada campo del formulario
+        """
+        return {
+            'orden_id': self.orden_id_input.text(),
+            'monto': self.monto_input.text(),
+            'moneda': self.moneda_combo.currentText(),
+            'mensajero': self.mensajero_input.text(),
+            'pago_usd': self.pago_usd_input.text(),
+            'pago_eur': self.pago_eur_input.text(),
+            'pago_cup': self.pago_cup_input.text(),
+            'pago_transferencia': self.pago_transferencia_input.text(),
+            'transferencia_id': self.transferencia_id_input.text()
+        }
+    
+    def formulario_vacio(self):
+        """Indica si no hay una factura en curso en el formulario"""
+        return not self.orden_id_input.text().strip() and not self.monto_input.text().strip()
+    
+    def limpiar_formulario(self):
+        """Limpia los campos de la factura"""
+        self.codigo_cargado = None
+        self.orden_id_input.clear()
+        self.orden_estado_label.setText("")
+        self.orden_id_input.setStyleSheet("")
+        self.monto_input.clear()
+        self.mensajero_input.clear()  # Limpiar el campo mensajero
+        self.pago_usd_input.clear()
+        self.pago_eur_input.clear()
+        self.pago_cup_input.clear()
+        self.pago_transferencia_input.clear()
+        self.transferencia_id_input.clear()
+        # Ya no hay checkbox: self.pago_transferencia_check.setChecked(False)
+        self.equivalente_label.setText("Equivalente: --")
+        self.balance_label.setText("Balance: --")
+        self.balance_label.setStyleSheet("")
+    
+    def restaurar_formulario(self, datos):
+        """
+        Vuelve a cargar en el formulario una factura que no se pudo guardar
+        
+        Args:
+            datos: Diccionario devuelto por datos_formulario
+        """
+        self.orden_id_input.setText(datos['orden_id'])
+        self.moneda_combo.setCurrentText(datos['moneda'])
+        self.monto_input.setText(datos['monto'])
+        self.mensajero_input.setText(datos['mensajero'])
+        self.pago_usd_input.setText(datos['pago_usd'])
+        self.pago_eur_input.setText(datos['pago_eur'])
+        self.pago_cup_input.setText(datos['pago_cup'])
+        self.pago_transferencia_input.setText(datos['pago_transferencia'])
+        self.actualizar_campo_id_transferencia()
+        self.transferencia_id_input.setText(datos['transferencia_id'])
+        self.verificar_orden_id()
+        self.verificar_balance()
+    
     def cargar_facturas_recientes(self):
         """Carga las facturas recientes en la tabla"""
         # Usar el servicio de facturación para obtener los datos
@@ -671,6 +967,6 @@ class FacturacionTab(QWidget):
                     self.transferencia_id_input.setFocus()
                     
         except ValueError as e:
-            print(f"Error al convertir monto de transferencia: {e}")
+            registro.error("Error al convertir monto de transferencia: %s", e)
             self.transferencia_id_input.setEnabled(False)
             self.transferencia_id_input.clear()
\ No newline at end of file
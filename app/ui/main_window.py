@@ -8,29 +8,58 @@ Define la estructura general de la interfaz gráfica.
 from datetime import datetime, date, timedelta
 from PyQt6.QtWidgets import (QMainWindow, QTabWidget, QWidget, QVBoxLayout,
                              QMenuBar, QMenu, QToolBar, QStatusBar, QMessageBox,
-                             QLabel)
+                             QLabel, QFileDialog)
 from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtCore import Qt, QSize, QTimer, QTime, QDate  # QDate se importa desde PyQt6.QtCore
+from PyQt6.QtCore import Qt, QSize, QTimer, QTime, QDate, pyqtSignal  # QDate se importa desde PyQt6.QtCore
 
 from app.ui.editar_factura_tab import EditarFacturaTab
 from app.ui.facturacion_tab import FacturacionTab
 from app.ui.reportes_tab import ReportesTab
 from app.ui.salidas_tab import SalidasTab
 from app.ui.cierre_dia_tab import CierreDiaTab  # Importar la nueva pestaña
+from app.services.arranque import InicializadorArranque
 from app.services.exchange_rate import ExchangeRateService
 from app.services.cierre_dia import CierreDiaService
 from app.services.salidas_service import SalidasService
+from app.services.cola_facturas import detener_cola_facturas
+from app.services.proveedores_tasas import (crear_proveedor, iniciar_actualizador_tasas,
+                                            detener_actualizador_tasas)
+from app.utils.config import config
+from app.utils.perfilado import guardar_linea_tiempo, marcar, medir
+
+def _pestana_diferida(atributo):
+    """Propiedad que construye la pestaña diferida la primera vez que se usa"""
+    return property(lambda self: self.obtener_pestana(atributo))
 
 class MainWindow(QMainWindow):
     """Ventana principal de la aplicación de facturación"""
     
+    # Emitida desde el hilo del actualizador cuando registra tasas nuevas
+    tasas_actualizadas = pyqtSignal()
+    
+    # Emitidas desde el hilo de arranque
+    etapa_iniciada = pyqtSignal(str, str)
+    etapa_completada = pyqtSignal(str, object)
+    arranque_fallido = pyqtSignal(str, str)
+    
+    # Pestañas que se construyen (y cargan sus datos) al activarlas por primera vez
+    facturacion_tab = _pestana_diferida("facturacion_tab")
+    salidas_tab = _pestana_diferida("salidas_tab")
+    editar_factura_tab = _pestana_diferida("editar_factura_tab")
+    cierre_tab = _pestana_diferida("cierre_tab")
+    reportes_tab = _pestana_diferida("reportes_tab")
+    
     def __init__(self):
         super().__init__()
         
-        # Inicializar servicios
-        self.exchange_service = ExchangeRateService()
-        self.cierre_service = CierreDiaService()
-        self.salidas_service = SalidasService()  # Inicializar servicio de Salidas
+        # Los servicios se crean cuando el hilo de arranque termina de preparar la base de datos
+        self.exchange_service = None
+        self.cierre_service = None
+        self.salidas_service = None
+        self.etapas_completadas = set()
+        
+        # Acciones del menú y la barra que usan una pestaña, por etapa de arranque pendiente
+        self.acciones_por_etapa = {}
         
         # Configurar la ventana
         self.setWindowTitle("Sistema de Facturación")
@@ -39,19 +68,20 @@ class MainWindow(QMainWindow):
         # Crear el widget central con pestañas
         self.tabs = QTabWidget()
         
-        # Crear las pestañas principales
-        self.facturacion_tab = FacturacionTab(self.exchange_service)
-        self.salidas_tab = SalidasTab(self.exchange_service)  # Crear pestaña de Salidas
-        self.editar_factura_tab = EditarFacturaTab(self.exchange_service)  # Crear pestaña de Edición de Facturas
-        self.cierre_tab = CierreDiaTab(self.exchange_service)  # Crear pestaña de Cierre de Día
-        self.reportes_tab = ReportesTab()
-        
-        # Añadir pestañas al widget de pestañas
-        self.tabs.addTab(self.facturacion_tab, "Facturación")
-        self.tabs.addTab(self.salidas_tab, "Salidas de Caja")  # Añadir pestaña de Salidas
-        self.tabs.addTab(self.editar_factura_tab, "Editar Factura")  # Añadir pestaña de Edición
-        self.tabs.addTab(self.cierre_tab, "Cierre de Día")  # Añadir pestaña de Cierre
-        self.tabs.addTab(self.reportes_tab, "Reportes")
+        # Las pestañas muestran un marcador (deshabilitado hasta que termina la
+        # etapa de arranque de la que dependen) y se construyen al activarlas
+        self.pestanas = {}
+        self.pestanas_diferidas = {}
+        self.agregar_pestana_diferida("facturacion_tab", "Facturación", "ordenes",
+                                      lambda: FacturacionTab(self.exchange_service))
+        self.agregar_pestana_diferida("salidas_tab", "Salidas de Caja", "base_datos",
+                                      lambda: SalidasTab(self.exchange_service))
+        self.agregar_pestana_diferida("editar_factura_tab", "Editar Factura", "tasas",
+                                      lambda: EditarFacturaTab(self.exchange_service))
+        self.agregar_pestana_diferida("cierre_tab", "Cierre de Día", "cierres",
+                                      lambda: CierreDiaTab(self.exchange_service))
+        self.agregar_pestana_diferida("reportes_tab", "Reportes", "tasas", ReportesTab)
+        self.tabs.currentChanged.connect(self.al_cambiar_pestana)
         
         # Establecer el widget central
         self.setCentralWidget(self.tabs)
@@ -65,15 +95,27 @@ class MainWindow(QMainWindow):
         # Configurar la barra de estado con fecha actual
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
-
+        
         # Agregar fecha actual a la barra de estado
         fecha_actual = date.today().strftime("%d/%m/%Y")
         self.fecha_label = QLabel(f"Fecha: {fecha_actual}")
         self.statusBar.addPermanentWidget(self.fecha_label)
-        self.statusBar.showMessage("Listo")
         
-        # Verificar si es un nuevo día
-        self.verificar_nuevo_dia()
+        # Menú y barra de herramientas usan los servicios: se habilitan con la base de datos lista
+        # (las acciones que abren una pestaña, además, cuando termina la etapa de esa pestaña)
+        self.menuBar().setEnabled(False)
+        self.toolbar.setEnabled(False)
+        
+        # Base de datos, cachés y verificación de cierres en segundo plano
+        self.etapa_iniciada.connect(self.al_iniciar_etapa)
+        self.etapa_completada.connect(self.al_completar_etapa)
+        self.arranque_fallido.connect(self.al_fallar_arranque)
+        self.arranque = InicializadorArranque(
+            al_iniciar_etapa=self.etapa_iniciada.emit,
+            al_completar_etapa=self.etapa_completada.emit,
+            al_fallar=self.arranque_fallido.emit
+        )
+        self.arranque.iniciar()
         
         # Configurar temporizador para actualizar la fecha
         self.fecha_timer = QTimer(self)
@@ -83,6 +125,163 @@ class MainWindow(QMainWindow):
         tiempo_hasta_medianoche = QTime(23, 59, 59).msecsSinceStartOfDay() - tiempo_actual.msecsSinceStartOfDay() + 1000
         self.fecha_timer.start(tiempo_hasta_medianoche)
     
+    def closeEvent(self, event):
+        """Guarda las facturas pendientes de escritura y detiene los hilos en segundo plano antes de salir"""
+        detener_cola_facturas()
+        detener_actualizador_tasas()
+        super().closeEvent(event)
+    
+    def agregar_pestana_diferida(self, atributo, titulo, etapa, fabrica):
+        """
+        Añade una pestaña que se construye al activarla por primera vez
+        
+        Args:
+            atributo: Nombre del atributo con el que se accede a la pestaña
+            titulo: Título de la pestaña
+            etapa: Etapa de arranque que debe terminar antes de habilitar la pestaña
+            fabrica: Función sin argumentos que crea la pestaña
+        """
+        marcador = QLabel("Cargando...")
+        marcador.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        marcador.setStyleSheet("color: #777777; font-style: italic;")
+        indice = self.tabs.addTab(marcador, titulo)
+        self.tabs.setTabEnabled(indice, etapa in self.etapas_completadas)
+        self.pestanas_diferidas[atributo] = (marcador, titulo, etapa, fabrica)
+    
+    def obtener_pestana(self, atributo):
+        """
+        Devuelve una pestaña diferida, construyéndola si todavía no existe
+        
+        Args:
+            atributo: Nombre del atributo de la pestaña
+        
+        Returns:
+            Widget de la pestaña
+        """
+        pestana = self.pestanas.get(atributo)
+        if pestana is not None:
+            return pestana
+        
+        marcador, titulo, _, fabrica = self.pestanas_diferidas[atributo]
+        with medir(f"construir pestaña {titulo}"):
+            pestana = fabrica()
+        self.pestanas[atributo] = pestana
+        del self.pestanas_diferidas[atributo]
+        
+        # Reemplazar el marcador en la misma posición sin cambiar la pestaña activa
+        indice = self.tabs.indexOf(marcador)
+        activa = self.tabs.currentIndex()
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(indice)
+        self.tabs.insertTab(indice, pestana, titulo)
+        self.tabs.setCurrentIndex(activa)
+        self.tabs.blockSignals(False)
+        marcador.deleteLater()
+        
+        return pestana
+    
+    def accion_de_pestana(self, accion, atributo):
+        """
+        Deshabilita una acción hasta que termine la etapa de arranque de la pestaña que usa
+        
+        Args:
+            accion: QAction del menú o de la barra de herramientas
+            atributo: Nombre del atributo de la pestaña diferida
+        """
+        etapa = self.pestanas_diferidas[atributo][2]
+        if etapa not in self.etapas_completadas:
+            accion.setEnabled(False)
+            self.acciones_por_etapa.setdefault(etapa, []).append(accion)
+    
+    def pestana_construida(self, atributo):
+        """Devuelve la pestaña si ya fue construida, o None"""
+        return self.pestanas.get(atributo)
+    
+    def al_cambiar_pestana(self, indice):
+        """Construye la pestaña activada si todavía muestra su marcador"""
+        if not self.tabs.isTabEnabled(indice):
+            return
+        
+        widget = self.tabs.widget(indice)
+        for atributo, (marcador, _, _, _) in self.pestanas_diferidas.items():
+            if marcador is widget:
+                # Tras devolver el control, para que el marcador llegue a mostrarse
+                QTimer.singleShot(0, lambda atributo=atributo: self.obtener_pestana(atributo)
+                                  if atributo in self.pestanas_diferidas else None)
+                break
+    
+    def al_iniciar_etapa(self, etapa, texto):
+        """Muestra en la barra de estado la etapa de arranque en curso"""
+        self.statusBar.showMessage(texto)
+    
+    def al_completar_etapa(self, etapa, resultado):
+        """Habilita lo que dependía de la etapa de arranque que terminó"""
+        self.etapas_completadas.add(etapa)
+        
+        if etapa == "base_datos":
+            self.iniciar_servicios()
+        
+        for accion in self.acciones_por_etapa.pop(etapa, []):
+            accion.setEnabled(True)
+        
+        # Habilitar las pestañas de la etapa (y construir la activa)
+        for atributo, (marcador, _, etapa_pestana, _) in list(self.pestanas_diferidas.items()):
+            if etapa_pestana == etapa:
+                indice = self.tabs.indexOf(marcador)
+                self.tabs.setTabEnabled(indice, True)
+                if self.tabs.currentIndex() == indice:
+                    self.al_cambiar_pestana(indice)
+        
+        if etapa == "cierres":
+            self.statusBar.showMessage("Listo")
+            marcar("arranque completo")
+            guardar_linea_tiempo()
+            self.mostrar_estado_dia(resultado['ultimo_cierre'], resultado['dias_pendientes'])
+    
+    def al_fallar_arranque(self, etapa, mensaje):
+        """Informa del error de arranque y deja la inicialización a cargo de cada pestaña"""
+        self.statusBar.showMessage(f"Error al iniciar: {mensaje}")
+        marcar(f"arranque fallido en {etapa}")
+        guardar_linea_tiempo()
+        QMessageBox.critical(
+            self,
+            "Error al iniciar",
+            f"No se pudo completar la inicialización ({etapa}):\n{mensaje}"
+        )
+        
+        # Cada pestaña y servicio vuelve a intentar su propia inicialización al usarse
+        if self.exchange_service is None:
+            self.iniciar_servicios()
+        for marcador, _, _, _ in self.pestanas_diferidas.values():
+            self.tabs.setTabEnabled(self.tabs.indexOf(marcador), True)
+        for acciones in self.acciones_por_etapa.values():
+            for accion in acciones:
+                accion.setEnabled(True)
+        self.acciones_por_etapa.clear()
+        self.al_cambiar_pestana(self.tabs.currentIndex())
+    
+    def iniciar_servicios(self):
+        """Crea los servicios de la ventana y habilita menú y barra de herramientas"""
+        self.exchange_service = ExchangeRateService()
+        self.cierre_service = CierreDiaService()
+        self.salidas_service = SalidasService()  # Inicializar servicio de Salidas
+        
+        self.menuBar().setEnabled(True)
+        self.toolbar.setEnabled(True)
+        
+        # Tasas desde un proveedor externo (archivo o HTTP), consultado en segundo plano
+        proveedor = crear_proveedor(config.get("exchange_rate", "proveedor", "manual"),
+                                    config.get("exchange_rate", "origen", ""))
+        if proveedor is not None:
+            self.tasas_actualizadas.connect(self.al_actualizar_tasas)
+            iniciar_actualizador_tasas(
+                ExchangeRateService(),
+                proveedor,
+                intervalo_s=config.get("exchange_rate", "intervalo_s", 300),
+                timeout_s=config.get("exchange_rate", "timeout_s", 3),
+                al_actualizar=self.tasas_actualizadas.emit
+            )
+    
     def crear_menu(self):
         """Crea la barra de menú y sus acciones"""
         menubar = self.menuBar()
@@ -94,20 +293,29 @@ class MainWindow(QMainWindow):
         accion_tasa = QAction('&Actualizar Tasa de Cambio', self)
         accion_tasa.setStatusTip('Actualizar la tasa de cambio USD a CUP')
         accion_tasa.triggered.connect(self.actualizar_tasa_cambio)
+        self.accion_de_pestana(accion_tasa, "facturacion_tab")
         menu_archivo.addAction(accion_tasa)
         
+        # Acción: Importar serie de tasas
+        accion_importar_tasas = QAction('&Importar Tasas desde CSV...', self)
+        accion_importar_tasas.setStatusTip('Importar una serie de tasas de cambio desde un archivo CSV')
+        accion_importar_tasas.triggered.connect(self.importar_tasas_csv)
+        menu_archivo.addAction(accion_importar_tasas)
+        
         menu_archivo.addSeparator()
-
+        
         # Acción: Editar factura
         accion_editar = QAction('&Editar Factura', self)
         accion_editar.setStatusTip('Modificar medios de pago de una factura existente')
         accion_editar.triggered.connect(self.abrir_editar_factura)
+        self.accion_de_pestana(accion_editar, "editar_factura_tab")
         menu_archivo.addAction(accion_editar)
         
         # Acción: Registrar Salida
         accion_salida = QAction('&Registrar Salida de Caja', self)
         accion_salida.setStatusTip('Registrar una nueva salida de dinero')
         accion_salida.triggered.connect(self.registrar_salida)
+        self.accion_de_pestana(accion_salida, "salidas_tab")
         menu_archivo.addAction(accion_salida)
         
         menu_archivo.addSeparator()
@@ -116,6 +324,7 @@ class MainWindow(QMainWindow):
         accion_cierre = QAction('&Realizar Cierre de Día', self)
         accion_cierre.setStatusTip('Cerrar la facturación del día actual')
         accion_cierre.triggered.connect(self.realizar_cierre_dia)
+        self.accion_de_pestana(accion_cierre, "cierre_tab")
         menu_archivo.addAction(accion_cierre)
         
         menu_archivo.addSeparator()
@@ -134,18 +343,21 @@ class MainWindow(QMainWindow):
         accion_exportar = QAction('&Exportar a CSV', self)
         accion_exportar.setStatusTip('Exportar reporte a archivo CSV')
         accion_exportar.triggered.connect(self.exportar_a_csv)
+        self.accion_de_pestana(accion_exportar, "reportes_tab")
         menu_reportes.addAction(accion_exportar)
         
         # Acción: Exportar Salidas
         accion_exportar_salidas = QAction('&Exportar Salidas', self)
         accion_exportar_salidas.setStatusTip('Exportar reporte de salidas de caja')
         accion_exportar_salidas.triggered.connect(self.exportar_salidas)
+        self.accion_de_pestana(accion_exportar_salidas, "salidas_tab")
         menu_reportes.addAction(accion_exportar_salidas)
         
         # Acción: Ver historial de cierres
         accion_historial = QAction('&Historial de Cierres', self)
         accion_historial.setStatusTip('Ver historial de cierres diarios')
         accion_historial.triggered.connect(self.ver_historial_cierres)
+        self.accion_de_pestana(accion_historial, "reportes_tab")
         menu_reportes.addAction(accion_historial)
         
         # Menú Ayuda
@@ -156,37 +368,48 @@ class MainWindow(QMainWindow):
         accion_acerca.setStatusTip('Mostrar información sobre la aplicación')
         accion_acerca.triggered.connect(self.mostrar_acerca_de)
         menu_ayuda.addAction(accion_acerca)
+        
+        # Acción: Registro de diagnóstico
+        accion_registro = QAction('&Registro de Diagnóstico', self)
+        accion_registro.setStatusTip('Ver los mensajes recientes del registro de diagnóstico')
+        accion_registro.triggered.connect(self.mostrar_registro)
+        menu_ayuda.addAction(accion_registro)
     
     def crear_toolbar(self):
         """Crea la barra de herramientas con acciones comunes"""
         toolbar = QToolBar("Barra de herramientas principal")
         toolbar.setIconSize(QSize(16, 16))
         self.addToolBar(toolbar)
+        self.toolbar = toolbar
         
         # Acción: Escanear
         accion_escanear = QAction('Escanear', self)
         accion_escanear.setStatusTip('Escanear código de una orden')
         accion_escanear.triggered.connect(self.escanear_codigo)
+        self.accion_de_pestana(accion_escanear, "facturacion_tab")
         toolbar.addAction(accion_escanear)
         
         # Acción: Registrar Salida
         accion_salida = QAction('Registrar Salida', self)
         accion_salida.setStatusTip('Registrar una salida de caja')
         accion_salida.triggered.connect(self.registrar_salida)
+        self.accion_de_pestana(accion_salida, "salidas_tab")
         toolbar.addAction(accion_salida)
         
         # Acción: Actualizar tasa
         accion_tasa = QAction('Actualizar Tasa', self)
         accion_tasa.setStatusTip('Actualizar tasa de cambio')
         accion_tasa.triggered.connect(self.actualizar_tasa_cambio)
+        self.accion_de_pestana(accion_tasa, "facturacion_tab")
         toolbar.addAction(accion_tasa)
         
         # Acción: Cierre de día
         accion_cierre = QAction('Cierre de Día', self)
         accion_cierre.setStatusTip('Realizar cierre del día actual')
         accion_cierre.triggered.connect(self.realizar_cierre_dia)
+        self.accion_de_pestana(accion_cierre, "cierre_tab")
         toolbar.addAction(accion_cierre)
-
+    
     def abrir_editar_factura(self):
         """Cambia a la pestaña de edición de facturas"""
         # Obtener el índice de la pestaña de edición de facturas
@@ -194,15 +417,25 @@ class MainWindow(QMainWindow):
         if indice_editar >= 0:
             self.tabs.setCurrentIndex(indice_editar)
     
-
+    
     
             
-
+    
     def verificar_nuevo_dia(self):
         """Verifica si es un nuevo día y muestra el último cierre registrado"""
         # Obtener si hay cierre para hoy y el último cierre registrado
         hay_cierre, ultimo_cierre = self.cierre_service.verificar_dia_actual()
-        
+        dias_pendientes = self.cierre_service.obtener_dias_pendientes() if ultimo_cierre else []
+        self.mostrar_estado_dia(ultimo_cierre, dias_pendientes)
+    
+    def mostrar_estado_dia(self, ultimo_cierre, dias_pendientes):
+        """
+        Muestra el último cierre registrado y ofrece cerrar los días pendientes
+        
+        Args:
+            ultimo_cierre: Fecha ('YYYY-MM-DD') del último cierre, o None
+            dias_pendientes: Días anteriores sin cerrar (ver obtener_dias_pendientes)
+        """
         # Validar si no hay un último cierre registrado
         if not ultimo_cierre:
             QMessageBox.warning(
@@ -230,6 +463,28 @@ class MainWindow(QMainWindow):
             f"El último cierre registrado fue el día: {fecha_ultimo.strftime('%d/%m/%Y')}.\n\n"
             "Puede continuar con las operaciones del día actual."
         )
+        
+        # Días anteriores que quedaron sin cerrar (por ejemplo, tras un feriado)
+        if dias_pendientes:
+            respuesta = QMessageBox.question(
+                self,
+                "Días sin cerrar",
+                f"Hay {len(dias_pendientes)} día(s) anteriores con movimientos sin cerrar "
+                f"(desde el {dias_pendientes[0]['fecha']}).\n\n"
+                "¿Desea crear ahora un cierre por cada uno de esos días?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            
+            if respuesta == QMessageBox.StandardButton.Yes:
+                resultado = self.cierre_service.realizar_cierres_pendientes()
+                if resultado['success']:
+                    QMessageBox.information(self, "Días pendientes", resultado['message'])
+                    # Si la pestaña de cierre aún no se abrió, cargará los datos al abrirla
+                    if self.pestana_construida("cierre_tab") is not None:
+                        self.cierre_tab.actualizar_resumen()
+                else:
+                    QMessageBox.warning(self, "Días pendientes", resultado['message'])
     
     def actualizar_fecha(self):
         """Actualiza la etiqueta de fecha cuando cambia el día"""
@@ -248,21 +503,55 @@ class MainWindow(QMainWindow):
         """Muestra diálogo para actualizar la tasa de cambio"""
         self.facturacion_tab.mostrar_dialogo_tasa()
     
+    def al_actualizar_tasas(self):
+        """Muestra las tasas recibidas del proveedor"""
+        if self.pestana_construida("facturacion_tab") is not None:
+            self.facturacion_tab.cargar_tasa_actual()
+            self.facturacion_tab.actualizar_monto_equivalente()
+        tasas = self.exchange_service.obtener_tasas_actuales()
+        self.statusBar.showMessage(
+            f"Tasas actualizadas: USD 1 = CUP {tasas['usd']:.2f} | EUR 1 = CUP {tasas['eur']:.2f}", 10000
+        )
+    
+    def importar_tasas_csv(self):
+        """Importa una serie de tasas de cambio desde un archivo CSV"""
+        ruta, _ = QFileDialog.getOpenFileName(
+            self, "Importar Tasas de Cambio", "", "Archivos CSV (*.csv);;Todos los archivos (*)"
+        )
+        if not ruta:
+            return
+        
+        importadas, errores = self.exchange_service.importar_tasas_csv(ruta)
+        
+        mensaje = f"Se importaron {importadas} tasa(s) de cambio."
+        if errores:
+            detalle = "\n".join(errores[:10])
+            if len(errores) > 10:
+                detalle += f"\n... y {len(errores) - 10} error(es) más"
+            mensaje += f"\n\nLíneas con errores:\n{detalle}"
+            QMessageBox.warning(self, "Importar Tasas", mensaje)
+        else:
+            QMessageBox.information(self, "Importar Tasas", mensaje)
+        
+        # Las pestañas muestran la tasa vigente
+        if self.pestana_construida("facturacion_tab") is not None:
+            self.facturacion_tab.cargar_tasa_actual()
+    
     def escanear_codigo(self):
         """Inicia el proceso de escaneo de código de barras"""
-        self.tabs.setCurrentIndex(0)  # Cambiar a la pestaña de facturación
+        self.tabs.setCurrentWidget(self.facturacion_tab)  # Cambiar a la pestaña de facturación
         self.facturacion_tab.iniciar_escaneo()
     
     def registrar_salida(self):
         """Abre la pestaña de salidas para registrar una nueva salida"""
-        self.tabs.setCurrentIndex(1)  # Cambiar a la pestaña de salidas
+        self.tabs.setCurrentWidget(self.salidas_tab)  # Cambiar a la pestaña de salidas
         # Dar foco al primer campo de la pestaña de salidas
         if hasattr(self.salidas_tab, 'destinatario_input'):
             self.salidas_tab.destinatario_input.setFocus()
     
     def exportar_a_csv(self):
         """Exporta el reporte actual a un archivo CSV"""
-        self.tabs.setCurrentIndex(2)  # Cambiar a la pestaña de reportes
+        self.tabs.setCurrentWidget(self.reportes_tab)  # Cambiar a la pestaña de reportes
         self.reportes_tab.exportar_csv()
     
     def exportar_salidas(self):
@@ -285,7 +574,7 @@ class MainWindow(QMainWindow):
         fechas_layout.addWidget(QLabel("Hasta:"))
         hasta_date = QDateEdit()
         hasta_date.setDate(date.today())
-
+        
         hasta_date.setCalendarPopup(True)
         fechas_layout.addWidget(hasta_date)
         
@@ -348,12 +637,17 @@ class MainWindow(QMainWindow):
         
     def ver_historial_cierres(self):
             """Muestra el historial de cierres de día"""
-            self.tabs.setCurrentIndex(2)  # Cambiar a la pestaña de reportes
+            self.tabs.setCurrentWidget(self.reportes_tab)  # Cambiar a la pestaña de reportes
             
             # Si la pestaña de reportes tiene pestañas internas, seleccionar la de cierres
             if hasattr(self.reportes_tab, 'tabs') and self.reportes_tab.tabs.count() > 1:
                 self.reportes_tab.tabs.setCurrentIndex(1)  # Seleccionar pestaña de cierres
         
+    def mostrar_registro(self):
+        """Muestra el registro de diagnóstico"""
+        from app.ui.dialogs.registro_dialog import RegistroDialog
+        RegistroDialog(self).exec()
+    
     def mostrar_acerca_de(self):
             """Muestra información sobre la aplicación"""
             QMessageBox.about(self, "Acerca de", 
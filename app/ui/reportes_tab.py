@@ -17,7 +17,12 @@ import os
 
 from app.services.facturacion import FacturacionService
 from app.services.cierre_dia import CierreDiaService
+from app.services.libro_caja import LibroCajaService
 from app.services.salidas_service import SalidasService
+from app.utils.perfilado import perfilar_accion
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class ReportesTab(QWidget):
     """Pestaña para la visualización y exportación de reportes"""
@@ -29,6 +34,7 @@ class ReportesTab(QWidget):
         self.facturacion_service = FacturacionService()
         self.cierre_service = CierreDiaService()
         self.salidas_service = SalidasService()
+        self.libro_service = LibroCajaService()
         
         # Configurar la interfaz
         self.init_ui()
@@ -314,7 +320,7 @@ class ReportesTab(QWidget):
         
         # Regenerar el reporte con los filtros limpios
         self.generar_reporte_salidas()
-
+    
     def cargar_cierres_recientes(self):
         """Carga los cierres más recientes (último mes)"""
         self.cierre_periodo_combo.setCurrentIndex(0)  # Selecciona "Último mes"
@@ -331,12 +337,12 @@ class ReportesTab(QWidget):
                 QMessageBox.warning(self, "Error", "La fecha de inicio debe ser anterior a la fecha final")
                 return
             
-            print(f"Consultando cierres desde {fecha_inicio} hasta {fecha_fin}")
+            registro.debug("Consultando cierres desde %s hasta %s", fecha_inicio, fecha_fin)
             
             # Llamar al servicio de cierres con el rango de fechas
             cierres = self.cierre_service.obtener_cierres_por_fecha(fecha_inicio, fecha_fin)
             
-            print(f"Se encontraron {len(cierres)} cierres en el período seleccionado")
+            registro.debug("Se encontraron %s cierres en el período seleccionado", len(cierres))
             
             # Limpiar tabla y mostrar los resultados
             self.cierres_table.setRowCount(0)
@@ -352,9 +358,7 @@ class ReportesTab(QWidget):
                                         "No se encontraron cierres para el período seleccionado.")
                 
         except Exception as e:
-            print(f"ERROR al cargar cierres por fechas: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR al cargar cierres por fechas: %s", e)
             QMessageBox.critical(self, "Error", f"Ocurrió un error al cargar los cierres:\n{str(e)}")
     
     def setup_salidas_tab(self):
@@ -548,6 +552,11 @@ class ReportesTab(QWidget):
         balance_layout.addWidget(self.consolidado_balance_eur)
         balance_layout.addWidget(self.consolidado_balance_cup)
         balance_layout.addWidget(self.consolidado_balance_transf)
+        
+        # Saldo del libro de caja al final del período (después de los cierres de ese día)
+        self.consolidado_saldo_caja = QLabel("Saldo en caja al final del período: --")
+        self.consolidado_saldo_caja.setWordWrap(True)
+        balance_layout.addWidget(self.consolidado_saldo_caja)
         balance_layout.addStretch()
         
         balance_group.setLayout(balance_layout)
@@ -586,16 +595,17 @@ class ReportesTab(QWidget):
         # Generar consolidado inicial
         self.generar_consolidado()
     
+    @perfilar_accion("reporte_facturas")
     def generar_reporte_facturas(self):
        
         """Genera un reporte de facturas según los filtros seleccionados"""
         try:
-            print("\n--- INICIANDO GENERACIÓN DE REPORTE DE FACTURAS ---")
+            registro.debug("--- INICIANDO GENERACIÓN DE REPORTE DE FACTURAS ---")
             
             # Obtener fechas
             fecha_inicio = self.factura_fecha_inicio.date().toString("yyyy-MM-dd")
             fecha_fin = self.factura_fecha_fin.date().toString("yyyy-MM-dd")
-            print(f"Periodo seleccionado: {fecha_inicio} a {fecha_fin}")
+            registro.debug("Periodo seleccionado: %s a %s", fecha_inicio, fecha_fin)
             
             # Validar fechas
             if self.factura_fecha_inicio.date() > self.factura_fecha_fin.date():
@@ -603,30 +613,30 @@ class ReportesTab(QWidget):
                 return
             
             # Obtener facturas filtradas
-            print("Consultando facturas en la base de datos...")
+            registro.debug("Consultando facturas en la base de datos...")
             facturas = self.facturacion_service.obtener_facturas_por_fecha(fecha_inicio, fecha_fin)
-            print(f"Se encontraron {len(facturas)} facturas en la base de datos")
+            registro.debug("Se encontraron %s facturas en la base de datos", len(facturas))
             
             # Aplicar filtros adicionales
             moneda_filtro = self.filtro_moneda.currentText()
             if moneda_filtro != "Todas":
-                print(f"Aplicando filtro de moneda: {moneda_filtro}")
+                registro.debug("Aplicando filtro de moneda: %s", moneda_filtro)
                 facturas = [f for f in facturas if f.moneda == moneda_filtro]
-                print(f"Quedan {len(facturas)} facturas después del filtro de moneda")
+                registro.debug("Quedan %s facturas después del filtro de moneda", len(facturas))
             
             min_monto_texto = self.filtro_min_monto.text()
             if min_monto_texto:
                 try:
                     min_monto = float(min_monto_texto)
-                    print(f"Aplicando filtro de monto mínimo: {min_monto}")
+                    registro.debug("Aplicando filtro de monto mínimo: %s", min_monto)
                     facturas = [f for f in facturas if f.monto >= min_monto]
-                    print(f"Quedan {len(facturas)} facturas después del filtro de monto")
+                    registro.debug("Quedan %s facturas después del filtro de monto", len(facturas))
                 except ValueError:
-                    print(f"Error: el monto '{min_monto_texto}' no es un número válido")
+                    registro.warning("Error: el monto '%s' no es un número válido", min_monto_texto)
                     pass  # Ignorar si no es un número válido
             
             # Limpiar tabla
-            print("Limpiando tabla de resultados...")
+            registro.debug("Limpiando tabla de resultados...")
             self.facturas_table.setRowCount(0)
             
             # Variables para totales
@@ -636,7 +646,7 @@ class ReportesTab(QWidget):
             total_transferencia = 0.0
             
             # Llenar tabla con datos
-            print(f"Llenando tabla con {len(facturas)} facturas...")
+            registro.debug("Llenando tabla con %s facturas...", len(facturas))
             for i, factura in enumerate(facturas):
                 try:
                     self.facturas_table.insertRow(i)
@@ -682,11 +692,11 @@ class ReportesTab(QWidget):
                     total_transferencia += pago_transferencia
                     
                 except Exception as e:
-                    print(f"Error procesando factura #{i+1}: {e}")
+                    registro.error("Error procesando factura #%s: %s", i+1, e)
             
             # IMPORTANTE: Este código debe estar FUERA del bucle for y del bloque except
             # Actualizar etiquetas de totales - FUERA DEL BUCLE
-            print("Actualizando etiquetas de totales...")
+            registro.debug("Actualizando etiquetas de totales...")
             self.total_facturas.setText(f"Facturas: {len(facturas)}")
             self.total_usd.setText(f"Total USD: ${total_usd:.2f}")
             self.total_eur.setText(f"Total EUR: €{total_eur:.2f}")
@@ -696,7 +706,7 @@ class ReportesTab(QWidget):
             # Forzar actualización de la interfaz - FUERA DEL BUCLE
             self.facturas_table.update()
             
-            print(f"Reporte generado exitosamente: {len(facturas)} facturas mostradas.")
+            registro.debug("Reporte generado exitosamente: %s facturas mostradas.", len(facturas))
             
             # Si no hay resultados, mostrar mensaje - FUERA DEL BUCLE
             if len(facturas) == 0:
@@ -704,9 +714,7 @@ class ReportesTab(QWidget):
                                         "No se encontraron facturas que coincidan con los filtros seleccionados.")
                                             
         except Exception as e:
-            print(f"ERROR GENERAL al generar reporte: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR GENERAL al generar reporte: %s", e)
             QMessageBox.critical(self, "Error", f"Ocurrió un error al generar el reporte:\n{str(e)}")
     def exportar_facturas_csv(self):
         """Exporta el reporte de facturas actual a un archivo CSV"""
@@ -770,7 +778,7 @@ class ReportesTab(QWidget):
     def cargar_cierres_dia(self):
         """Carga la lista de cierres de día"""
         try:
-            print("\n--- INICIANDO CARGA DE CIERRES DE DÍA ---")
+            registro.debug("--- INICIANDO CARGA DE CIERRES DE DÍA ---")
             
             # Determinar el límite según el periodo seleccionado
             limite = 30  # Por defecto: último mes
@@ -782,29 +790,29 @@ class ReportesTab(QWidget):
             elif periodo_idx == 3:  # Todo
                 limite = None
             
-            print(f"Consultando cierres con límite: {limite} días")
+            registro.debug("Consultando cierres con límite: %s días", limite)
             
             # Obtener cierres de día
             cierres = self.cierre_service.obtener_historial_cierres(limite)
-            print(f"Se encontraron {len(cierres)} cierres de día")
+            registro.debug("Se encontraron %s cierres de día", len(cierres))
             
             if not cierres:
-                print("No se encontraron cierres en este periodo")
+                registro.debug("No se encontraron cierres en este periodo")
                 # Podríamos añadir aquí código para diagnosticar si hay cierres en la base de datos
             
             # Limpiar tabla
-            print("Limpiando tabla de resultados...")
+            registro.debug("Limpiando tabla de resultados...")
             self.cierres_table.setRowCount(0)
             
             # Llenar tabla con datos
-            print(f"Llenando tabla con {len(cierres)} cierres...")
+            registro.debug("Llenando tabla con %s cierres...", len(cierres))
             for i, cierre in enumerate(cierres):
                 try:
                     self.cierres_table.insertRow(i)
                     
                     # Verificar que el cierre tenga los campos esperados
                     if 'id' not in cierre or 'fecha' not in cierre:
-                        print(f"Cierre #{i+1} incompleto. Campos disponibles: {cierre.keys()}")
+                        registro.debug("Cierre #%s incompleto. Campos disponibles: %s", i+1, cierre.keys())
                     
                     # Crear items para cada columna
                     id_item = QTableWidgetItem(str(cierre.get('id', 'N/A')))
@@ -817,14 +825,14 @@ class ReportesTab(QWidget):
                         total_cup = cierre.get('total_cup', 0) or 0
                         total_transf = cierre.get('total_transferencia', 0) or 0
                         
-                        print(f"Cierre #{i+1}: USD={total_usd}, EUR={total_eur}, CUP={total_cup}, Transf={total_transf}")
+                        registro.debug("Cierre #%s: USD=%s, EUR=%s, CUP=%s, Transf=%s", i+1, total_usd, total_eur, total_cup, total_transf)
                         
                         total_usd_item = QTableWidgetItem(f"{total_usd:.2f}")
                         total_eur_item = QTableWidgetItem(f"{total_eur:.2f}")
                         total_cup_item = QTableWidgetItem(f"{total_cup:.2f}")
                         total_transferencia_item = QTableWidgetItem(f"{total_transf:.2f}")
                     except Exception as e:
-                        print(f"Error al procesar montos del cierre #{i+1}: {e}")
+                        registro.error("Error al procesar montos del cierre #%s: %s", i+1, e)
                         total_usd_item = QTableWidgetItem("0.00")
                         total_eur_item = QTableWidgetItem("0.00")
                         total_cup_item = QTableWidgetItem("0.00")
@@ -844,7 +852,7 @@ class ReportesTab(QWidget):
                         diferencia_eur_item = QTableWidgetItem(f"{dif_eur:.2f}")
                         diferencia_cup_item = QTableWidgetItem(f"{dif_cup:.2f}")
                     except Exception as e:
-                        print(f"Error al procesar diferencias del cierre #{i+1}: {e}")
+                        registro.error("Error al procesar diferencias del cierre #%s: %s", i+1, e)
                         diferencia_usd_item = QTableWidgetItem("0.00")
                         diferencia_eur_item = QTableWidgetItem("0.00")
                         diferencia_cup_item = QTableWidgetItem("0.00")
@@ -886,28 +894,24 @@ class ReportesTab(QWidget):
                     self.cierres_table.setItem(i, 9, diferencia_cup_item)
             
                 except Exception as e:
-                    print(f"Error al procesar cierre #{i+1}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    registro.exception("Error al procesar cierre #%s: %s", i+1, e)
         
             # Forzar actualización de la tabla después de cargar todos los datos
             self.cierres_table.update()
             
             # Mostrar mensajes informativos
             if len(cierres) > 0:
-                print(f"Se cargaron {len(cierres)} cierres en la tabla")
+                registro.debug("Se cargaron %s cierres en la tabla", len(cierres))
                 # Opcional: Mostrar mensaje en la barra de estado
                 # self.parent().statusBar().showMessage(f"Se cargaron {len(cierres)} cierres", 3000)
             else:
-                print("No se encontraron cierres de día para mostrar")
+                registro.debug("No se encontraron cierres de día para mostrar")
                 # Mostrar mensaje informativo al usuario
                 QMessageBox.information(self, "Sin resultados", 
                                     "No se encontraron cierres de día para el período seleccionado.")
         
         except Exception as e:
-            print(f"ERROR GENERAL al cargar cierres de día: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR GENERAL al cargar cierres de día: %s", e)
             QMessageBox.critical(self, "Error", f"Ocurrió un error al cargar los cierres de día:\n{str(e)}")
         
     def filtrar_cierres(self):
@@ -920,26 +924,26 @@ class ReportesTab(QWidget):
             # Obtener fila seleccionada
             filas_seleccionadas = self.cierres_table.selectedItems()
             if not filas_seleccionadas:
-                print("No hay filas seleccionadas en la tabla de cierres")
+                registro.warning("No hay filas seleccionadas en la tabla de cierres")
                 return
             
             # Obtener ID del cierre seleccionado
             fila = filas_seleccionadas[0].row()
             cierre_id_item = self.cierres_table.item(fila, 0)
             if not cierre_id_item:
-                print("No se pudo obtener el ítem de ID")
+                registro.warning("No se pudo obtener el ítem de ID")
                 return
                 
             cierre_id_text = cierre_id_item.text().strip()
             if not cierre_id_text:
-                print("El texto del ID está vacío")
+                registro.warning("El texto del ID está vacío")
                 return
                 
             try:
                 cierre_id = int(cierre_id_text)
-                print(f"Mostrando detalles del cierre #{cierre_id}")
+                registro.debug("Mostrando detalles del cierre #%s", cierre_id)
             except ValueError:
-                print(f"No se pudo convertir '{cierre_id_text}' a entero")
+                registro.warning("No se pudo convertir '%s' a entero", cierre_id_text)
                 return
             
             # Actualizar la información del cierre seleccionado
@@ -963,16 +967,16 @@ class ReportesTab(QWidget):
                     parent = parent.parent()
             
             # Obtener detalles del cierre desde el servicio
-            print(f"Solicitando detalles del cierre #{cierre_id} al servicio...")
+            registro.debug("Solicitando detalles del cierre #%s al servicio...", cierre_id)
             detalles = self.cierre_service.obtener_detalles_cierre(cierre_id)
             
             if not detalles or not detalles.get('success', False):
                 error_msg = detalles.get('message', 'Error desconocido') if detalles else 'No se obtuvo respuesta del servicio'
-                print(f"Error al obtener detalles: {error_msg}")
+                registro.error("Error al obtener detalles: %s", error_msg)
                 QMessageBox.warning(self, "Error", f"No se pudieron obtener los detalles del cierre: {error_msg}")
                 
                 # Intentar consulta directa a la base de datos como alternativa
-                print("Intentando consulta directa a la base de datos...")
+                registro.debug("Intentando consulta directa a la base de datos...")
                 from app.database.db_manager import DBManager
                 db = DBManager()
                 try:
@@ -983,7 +987,7 @@ class ReportesTab(QWidget):
                     cursor.execute("SELECT id, fecha FROM cierres_dia WHERE id = ?", (cierre_id,))
                     cierre = cursor.fetchone()
                     if not cierre:
-                        print(f"No se encontró el cierre #{cierre_id} en la base de datos")
+                        registro.debug("No se encontró el cierre #%s en la base de datos", cierre_id)
                         db.disconnect()
                         return
                     
@@ -1036,12 +1040,10 @@ class ReportesTab(QWidget):
                             'motivo': s[7] if len(s) > 7 else ''
                         })
                     
-                    print(f"Consulta directa - Facturas: {len(facturas)}, Salidas: {len(salidas)}")
+                    registro.debug("Consulta directa - Facturas: %s, Salidas: %s", len(facturas), len(salidas))
                     
                 except Exception as e:
-                    print(f"Error en consulta directa: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    registro.exception("Error en consulta directa: %s", e)
                     if db.connection:
                         db.disconnect()
                     return
@@ -1049,7 +1051,7 @@ class ReportesTab(QWidget):
                 # Obtener facturas y salidas de la respuesta del servicio
                 facturas = detalles.get('facturas', [])
                 salidas = detalles.get('salidas', [])
-                print(f"Detalles obtenidos del servicio - Facturas: {len(facturas)}, Salidas: {len(salidas)}")
+                registro.debug("Detalles obtenidos del servicio - Facturas: %s, Salidas: %s", len(facturas), len(salidas))
             
             # Limpiar tablas de detalles
             self.cierre_facturas_table.setRowCount(0)
@@ -1091,7 +1093,7 @@ class ReportesTab(QWidget):
                     self.cierre_facturas_table.setItem(i, 5, fecha_item)
                     self.cierre_facturas_table.setItem(i, 6, estado_item)
                 except Exception as e:
-                    print(f"Error al procesar factura: {e}")
+                    registro.error("Error al procesar factura: %s", e)
             
             # Llenar tabla de salidas
             for i, salida in enumerate(salidas):
@@ -1116,18 +1118,16 @@ class ReportesTab(QWidget):
                     self.cierre_salidas_table.setItem(i, 5, destinatario_item)
                     self.cierre_salidas_table.setItem(i, 6, motivo_item)
                 except Exception as e:
-                    print(f"Error al procesar salida: {e}")
+                    registro.error("Error al procesar salida: %s", e)
             
             # Mostrar mensaje si no hay datos
             if len(facturas) == 0 and len(salidas) == 0:
-                print("No se encontraron facturas ni salidas para este cierre")
+                registro.debug("No se encontraron facturas ni salidas para este cierre")
                 QMessageBox.information(self, "Sin datos", 
                                     "Este cierre no tiene facturas ni salidas asociadas.")
         
         except Exception as e:
-            print(f"ERROR GENERAL al mostrar detalles: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR GENERAL al mostrar detalles: %s", e)
             QMessageBox.critical(self, "Error", f"Error al mostrar detalles del cierre: {str(e)}")
         
     def exportar_cierres_csv(self):
@@ -1178,15 +1178,16 @@ class ReportesTab(QWidget):
             QMessageBox.critical(self, "Error de Exportación", 
                                f"No se pudo exportar el reporte:\n{str(e)}")
     
+    @perfilar_accion("reporte_salidas")
     def generar_reporte_salidas(self):
         """Genera un reporte de salidas según los filtros seleccionados"""
         try:
-            print("\n--- INICIANDO GENERACIÓN DE REPORTE DE SALIDAS ---")
+            registro.debug("--- INICIANDO GENERACIÓN DE REPORTE DE SALIDAS ---")
             
             # Obtener fechas
             fecha_inicio = self.salida_fecha_inicio.date().toString("yyyy-MM-dd")
             fecha_fin = self.salida_fecha_fin.date().toString("yyyy-MM-dd")
-            print(f"Periodo seleccionado: {fecha_inicio} a {fecha_fin}")
+            registro.debug("Periodo seleccionado: %s a %s", fecha_inicio, fecha_fin)
             
             # Validar fechas
             if self.salida_fecha_inicio.date() > self.salida_fecha_fin.date():
@@ -1199,30 +1200,30 @@ class ReportesTab(QWidget):
             motivo = self.filtro_motivo.text().strip() if self.filtro_motivo.text().strip() else None
             
             # Obtener salidas filtradas
-            print("Consultando salidas en la base de datos...")
+            registro.debug("Consultando salidas en la base de datos...")
             salidas = self.salidas_service.obtener_salidas_por_fecha(fecha_inicio, fecha_fin)
-            print(f"Se encontraron {len(salidas)} salidas en la base de datos")
+            registro.debug("Se encontraron %s salidas en la base de datos", len(salidas))
             
             # Aplicar filtro de destinatario
             if destinatario:
-                print(f"Filtrando por destinatario: '{destinatario}'")
+                registro.debug("Filtrando por destinatario: '%s'", destinatario)
                 salidas = [s for s in salidas if destinatario.lower() in s['destinatario'].lower()]
-                print(f"Quedan {len(salidas)} salidas después del filtro de destinatario")
+                registro.debug("Quedan %s salidas después del filtro de destinatario", len(salidas))
             
             # Aplicar filtro de autorizado por
             if autorizado_por:
-                print(f"Filtrando por autorizado por: '{autorizado_por}'")
+                registro.debug("Filtrando por autorizado por: '%s'", autorizado_por)
                 salidas = [s for s in salidas if autorizado_por.lower() in s['autorizado_por'].lower()]
-                print(f"Quedan {len(salidas)} salidas después del filtro de autorizado por")
+                registro.debug("Quedan %s salidas después del filtro de autorizado por", len(salidas))
             
             # Aplicar filtro de motivo
             if motivo:
-                print(f"Filtrando por motivo: '{motivo}'")
+                registro.debug("Filtrando por motivo: '%s'", motivo)
                 salidas = [s for s in salidas if motivo.lower() in (s.get('motivo', '').lower() or '')]
-                print(f"Quedan {len(salidas)} salidas después del filtro de motivo")
+                registro.debug("Quedan %s salidas después del filtro de motivo", len(salidas))
             
             # Limpiar tabla
-            print("Limpiando tabla de resultados...")
+            registro.debug("Limpiando tabla de resultados...")
             self.salidas_table.setRowCount(0)
             
             # Variables para totales
@@ -1232,7 +1233,7 @@ class ReportesTab(QWidget):
             total_transferencia = 0.0
             
             # Llenar tabla con datos
-            print(f"Llenando tabla con {len(salidas)} salidas...")
+            registro.debug("Llenando tabla con %s salidas...", len(salidas))
             for i, salida in enumerate(salidas):
                 try:
                     self.salidas_table.insertRow(i)
@@ -1246,7 +1247,7 @@ class ReportesTab(QWidget):
                     monto_cup = salida.get('monto_cup', 0) or 0
                     monto_transferencia = salida.get('monto_transferencia', 0) or 0
                     
-                    print(f"Salida #{i+1}: USD={monto_usd}, EUR={monto_eur}, CUP={monto_cup}, Transf={monto_transferencia}")
+                    registro.debug("Salida #%s: USD=%s, EUR=%s, CUP=%s, Transf=%s", i+1, monto_usd, monto_eur, monto_cup, monto_transferencia)
                     
                     usd_item = QTableWidgetItem(f"{monto_usd:.2f}")
                     eur_item = QTableWidgetItem(f"{monto_eur:.2f}")
@@ -1279,10 +1280,10 @@ class ReportesTab(QWidget):
                     total_transferencia += monto_transferencia
                     
                 except Exception as e:
-                    print(f"Error al procesar salida #{i+1}: {e}")
+                    registro.error("Error al procesar salida #%s: %s", i+1, e)
         
             # Actualizar etiquetas de totales
-            print("Actualizando etiquetas de totales...")
+            registro.debug("Actualizando etiquetas de totales...")
             self.total_salidas.setText(f"Salidas: {len(salidas)}")
             self.salidas_total_usd.setText(f"Total USD: ${total_usd:.2f}")
             self.salidas_total_eur.setText(f"Total EUR: €{total_eur:.2f}")
@@ -1292,7 +1293,7 @@ class ReportesTab(QWidget):
             # Forzar actualización de la interfaz
             self.salidas_table.update()
             
-            print(f"Reporte de salidas generado exitosamente: {len(salidas)} salidas mostradas.")
+            registro.debug("Reporte de salidas generado exitosamente: %s salidas mostradas.", len(salidas))
             
             # Si no hay resultados, mostrar mensaje
             if len(salidas) == 0:
@@ -1300,9 +1301,7 @@ class ReportesTab(QWidget):
                                     "No se encontraron salidas que coincidan con los filtros seleccionados.")
         
         except Exception as e:
-            print(f"ERROR GENERAL al generar reporte de salidas: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR GENERAL al generar reporte de salidas: %s", e)
             QMessageBox.critical(self, "Error", f"Ocurrió un error al generar el reporte de salidas:\n{str(e)}")
             
     def exportar_salidas_csv(self):
@@ -1364,15 +1363,16 @@ class ReportesTab(QWidget):
             QMessageBox.critical(self, "Error de Exportación", 
                                f"No se pudo exportar el reporte:\n{str(e)}")
     
+    @perfilar_accion("reporte_consolidado")
     def generar_consolidado(self):
         """Genera un reporte consolidado para el período seleccionado"""
         try:
-            print("\n--- INICIANDO GENERACIÓN DE REPORTE CONSOLIDADO ---")
+            registro.debug("--- INICIANDO GENERACIÓN DE REPORTE CONSOLIDADO ---")
             
             # Obtener fechas
             fecha_inicio = self.consolidado_fecha_inicio.date().toString("yyyy-MM-dd")
             fecha_fin = self.consolidado_fecha_fin.date().toString("yyyy-MM-dd")
-            print(f"Periodo seleccionado: {fecha_inicio} a {fecha_fin}")
+            registro.debug("Periodo seleccionado: %s a %s", fecha_inicio, fecha_fin)
             
             # Validar fechas
             if self.consolidado_fecha_inicio.date() > self.consolidado_fecha_fin.date():
@@ -1383,13 +1383,13 @@ class ReportesTab(QWidget):
             estadisticas = self.facturacion_service.obtener_estadisticas_facturas_por_fecha(fecha_inicio, fecha_fin)
             
             # Obtener facturas y salidas para el período
-            print("Consultando facturas...")
+            registro.debug("Consultando facturas...")
             facturas = self.facturacion_service.obtener_facturas_por_fecha(fecha_inicio, fecha_fin)
-            print(f"Se encontraron {len(facturas)} facturas")
+            registro.debug("Se encontraron %s facturas", len(facturas))
             
-            print("Consultando salidas...")
+            registro.debug("Consultando salidas...")
             salidas = self.salidas_service.obtener_salidas_por_fecha(fecha_inicio, fecha_fin)
-            print(f"Se encontraron {len(salidas)} salidas")
+            registro.debug("Se encontraron %s salidas", len(salidas))
             
             # Variables para totales generales
             total_facturas = estadisticas["cantidad_total"]
@@ -1401,8 +1401,8 @@ class ReportesTab(QWidget):
             pagos_recibidos_cup = sum(getattr(f, 'pago_cup', 0) or 0 for f in facturas)
             pagos_recibidos_transf = sum(getattr(f, 'pago_transferencia', 0) or 0 for f in facturas)
             
-            print(f"Pagos recibidos - USD: {pagos_recibidos_usd}, EUR: {pagos_recibidos_eur}, " +
-                f"CUP: {pagos_recibidos_cup}, Transf: {pagos_recibidos_transf}")
+            registro.debug("Pagos recibidos - USD: %s, EUR: %s, CUP: %s, Transf: %s",
+                           pagos_recibidos_usd, pagos_recibidos_eur, pagos_recibidos_cup, pagos_recibidos_transf)
             
             # Calcular totales de salidas
             try:
@@ -1411,10 +1411,10 @@ class ReportesTab(QWidget):
                 total_salidas_cup = sum(s.get('monto_cup', 0) or 0 for s in salidas)
                 total_salidas_transf = sum(s.get('monto_transferencia', 0) or 0 for s in salidas)
                 
-                print(f"Total salidas - USD: {total_salidas_usd}, EUR: {total_salidas_eur}, " +
-                    f"CUP: {total_salidas_cup}, Transf: {total_salidas_transf}")
+                registro.debug("Total salidas - USD: %s, EUR: %s, CUP: %s, Transf: %s",
+                               total_salidas_usd, total_salidas_eur, total_salidas_cup, total_salidas_transf)
             except Exception as e:
-                print(f"Error al calcular totales de salidas: {e}")
+                registro.error("Error al calcular totales de salidas: %s", e)
                 total_salidas_usd = 0
                 total_salidas_eur = 0
                 total_salidas_cup = 0
@@ -1427,17 +1427,17 @@ class ReportesTab(QWidget):
                 balance_cup = pagos_recibidos_cup - total_salidas_cup
                 balance_transf = pagos_recibidos_transf - total_salidas_transf
                 
-                print(f"Balance - USD: {balance_usd}, EUR: {balance_eur}, " +
-                    f"CUP: {balance_cup}, Transf: {balance_transf}")
+                registro.debug("Balance - USD: %s, EUR: %s, CUP: %s, Transf: %s",
+                               balance_usd, balance_eur, balance_cup, balance_transf)
             except Exception as e:
-                print(f"Error al calcular balances: {e}")
+                registro.error("Error al calcular balances: %s", e)
                 balance_usd = 0
                 balance_eur = 0
                 balance_cup = 0
                 balance_transf = 0
             
             # Actualizar etiquetas del panel de facturas con estadísticas
-            print("Actualizando etiquetas de facturas...")
+            registro.debug("Actualizando etiquetas de facturas...")
             self.consolidado_num_facturas.setText(f"Facturas: {total_facturas}")
             
             # Usar el total equivalente en USD de las estadísticas
@@ -1458,18 +1458,18 @@ class ReportesTab(QWidget):
             self.consolidado_facturas_detalle.setText(desglose)
             
             # Actualizar etiquetas del panel de salidas
-            print("Actualizando etiquetas de salidas...")
+            registro.debug("Actualizando etiquetas de salidas...")
             self.consolidado_num_salidas.setText(f"Salidas: {total_salidas}")
             
             # Convertir salidas a USD (aproximación)
             try:
                 tasa_actual = self.facturacion_service.obtener_tasa_cambio()
-                print(f"Tasa de cambio actual: {tasa_actual}")
+                registro.debug("Tasa de cambio actual: %s", tasa_actual)
                 
                 if tasa_actual > 0:
                     total_salidas_usd_equiv = total_salidas_usd + (total_salidas_eur * 1.1) + (total_salidas_cup / tasa_actual)
                 else:
-                    print("Advertencia: Tasa de cambio es cero o negativa. Usando solo USD para el total.")
+                    registro.warning("Advertencia: Tasa de cambio es cero o negativa. Usando solo USD para el total.")
                     total_salidas_usd_equiv = total_salidas_usd
                     
                 self.consolidado_total_salidas.setText(f"Total Salidas (USD): ${total_salidas_usd_equiv:.2f}")
@@ -1478,13 +1478,13 @@ class ReportesTab(QWidget):
                 self.consolidado_promedio_salida.setText(f"Promedio por Salida: ${promedio_salida:.2f}")
                 
             except Exception as e:
-                print(f"Error al convertir salidas a USD: {e}")
+                registro.error("Error al convertir salidas a USD: %s", e)
                 self.consolidado_total_salidas.setText(f"Total Salidas (USD): ${total_salidas_usd:.2f}")
                 promedio_salida = total_salidas_usd / total_salidas if total_salidas > 0 else 0
                 self.consolidado_promedio_salida.setText(f"Promedio por Salida: ${promedio_salida:.2f}")
             
             # Actualizar etiquetas de balance según los pagos recibidos vs. salidas
-            print("Actualizando etiquetas de balance...")
+            registro.debug("Actualizando etiquetas de balance...")
             self.consolidado_balance_usd.setText(f"Balance USD: ${balance_usd:.2f}")
             self.consolidado_balance_eur.setText(f"Balance EUR: €{balance_eur:.2f}")
             self.consolidado_balance_cup.setText(f"Balance CUP: ${balance_cup:.2f}")
@@ -1504,19 +1504,26 @@ class ReportesTab(QWidget):
                 else:
                     label.setStyleSheet("color: black;")
             
+            saldo_caja = self.libro_service.saldo_en(fecha_fin)
+            self.consolidado_saldo_caja.setText(
+                "Saldo en caja al final del período: "
+                f"USD ${saldo_caja['usd']:.2f}, EUR €{saldo_caja['eur']:.2f}, "
+                f"CUP ${saldo_caja['cup']:.2f}, Transferencia ${saldo_caja['transferencia']:.2f}"
+            )
+            
             # Generar resumen por día
-            print("Generando resumen por día...")
+            registro.debug("Generando resumen por día...")
             self.generar_resumen_por_dia(fecha_inicio, fecha_fin, facturas, salidas)
             
             # Forzar actualización de la interfaz
             self.consolidado_dias_table.update()
             
             # Mostrar resumen
-            print(f"Reporte consolidado generado exitosamente para el período {fecha_inicio} a {fecha_fin}")
-            print(f"- Facturas: {total_facturas}, Total facturado: {estadisticas['total_equivalente_usd']:.2f} USD, Promedio: {estadisticas['promedio_general_usd']:.2f} USD")
-            print(f"- Pagos recibidos: USD ${pagos_recibidos_usd:.2f}, EUR €{pagos_recibidos_eur:.2f}, CUP ${pagos_recibidos_cup:.2f}, Transf ${pagos_recibidos_transf:.2f}")
-            print(f"- Salidas: {total_salidas}, Total salidas: USD ${total_salidas_usd:.2f}, EUR €{total_salidas_eur:.2f}, CUP ${total_salidas_cup:.2f}, Transf ${total_salidas_transf:.2f}")
-            print(f"- Balance: USD ${balance_usd:.2f}, EUR €{balance_eur:.2f}, CUP ${balance_cup:.2f}, Transf ${balance_transf:.2f}")
+            registro.debug("Reporte consolidado generado exitosamente para el período %s a %s", fecha_inicio, fecha_fin)
+            registro.debug("- Facturas: %s, Total facturado: %.2f USD, Promedio: %.2f USD", total_facturas, estadisticas['total_equivalente_usd'], estadisticas['promedio_general_usd'])
+            registro.debug("- Pagos recibidos: USD $%.2f, EUR €%.2f, CUP $%.2f, Transf $%.2f", pagos_recibidos_usd, pagos_recibidos_eur, pagos_recibidos_cup, pagos_recibidos_transf)
+            registro.debug("- Salidas: %s, Total salidas: USD $%.2f, EUR €%.2f, CUP $%.2f, Transf $%.2f", total_salidas, total_salidas_usd, total_salidas_eur, total_salidas_cup, total_salidas_transf)
+            registro.debug("- Balance: USD $%.2f, EUR €%.2f, CUP $%.2f, Transf $%.2f", balance_usd, balance_eur, balance_cup, balance_transf)
             
             # Si no hay datos, mostrar un mensaje al usuario
             if total_facturas == 0 and total_salidas == 0:
@@ -1524,9 +1531,7 @@ class ReportesTab(QWidget):
                                     "No se encontraron facturas ni salidas para el período seleccionado.")
                     
         except Exception as e:
-            print(f"ERROR GENERAL al generar reporte consolidado: {e}")
-            import traceback
-            traceback.print_exc()
+            registro.exception("ERROR GENERAL al generar reporte consolidado: %s", e)
             QMessageBox.critical(self, "Error", f"Ocurrió un error al generar el reporte consolidado:\n{str(e)}")   
         
     def generar_resumen_por_dia(self, fecha_inicio, fecha_fin, facturas, salidas):
@@ -17,6 +17,9 @@ import os
 from pathlib import Path
 import datetime
 from app.services.salidas_service import SalidasService
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
 
 class SalidasTab(QWidget):
     """Pestaña para registrar y visualizar salidas de caja"""
@@ -400,7 +403,7 @@ class SalidasTab(QWidget):
             return None
             
         except Exception as e:
-            print(f"Error al exportar salidas: {e}")
+            registro.error("Error al exportar salidas: %s", e)
             return None
     
     def mostrar_dialogo_salida_rapida(self):
@@ -8,6 +8,11 @@ import os
 import json
 from pathlib import Path
 
+from app.utils.perfilado import medir
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
 class Config:
     """Clase para gestionar la configuración de la aplicación"""
     
@@ -17,25 +22,42 @@ class Config:
     # Configuración predeterminada
     DEFAULT_CONFIG = {
         "database": {
-            "path": str(Path(__file__).parent.parent.parent / "data" / "facturacion.db")
+            "path": str(Path(__file__).parent.parent.parent / "data" / "facturacion.db"),
+            "instrumentacion": False,
+            "umbral_lento_ms": 50,
+            "registro_consultas_lentas": ""
         },
         "app": {
             "theme": "system",
-            "language": "es"
+            "language": "es",
+            "nivel_registro": "INFO",
+            "registro_capacidad": 2000
         },
         "scanner": {
             "camera_index": 0,
-            "timeout": 30
+            "timeout": 30,
+            "wedge_enabled": True,
+            "wedge_max_intervalo_ms": 35,
+            "wedge_min_longitud": 4
         },
         "exchange_rate": {
-            "default_rate": 24.0
+            "default_rate": 24.0,
+            "proveedor": "manual",
+            "origen": "",
+            "intervalo_s": 300,
+            "timeout_s": 3
+        },
+        "facturacion": {
+            "write_behind": False,
+            "group_commit_ms": 5
         }
     }
     
     def __init__(self):
         """Inicializa la configuración"""
         self._config = None
-        self.load()
+        with medir("cargar configuración"):
+            self.load()
     
     def load(self):
         """Carga la configuración desde el archivo"""
@@ -53,7 +75,7 @@ class Config:
                 self.save()
                 
         except Exception as e:
-            print(f"Error al cargar configuración: {e}")
+            registro.error("Error al cargar configuración: %s", e)
             self._config = self.DEFAULT_CONFIG
     
     def save(self):
@@ -66,7 +88,7 @@ class Config:
                 json.dump(self._config, f, indent=4)
                 
         except Exception as e:
-            print(f"Error al guardar configuración: {e}")
+            registro.error("Error al guardar configuración: %s", e)
     
     def get(self, section, key, default=None):
         """
@@ -118,7 +140,7 @@ class Config:
             return True
             
         except Exception as e:
-            print(f"Error al establecer configuración: {e}")
+            registro.error("Error al establecer configuración: %s", e)
             return False
 
 # Crear instancia global
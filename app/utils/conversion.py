@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+"""
+Conversión de montos entre monedas.
+Todas las tasas se expresan en CUP por unidad ({'usd': ..., 'eur': ...});
+las transferencias se liquidan en CUP.
+"""
+
+from typing import Dict
+
+def tasa_a_cup(moneda: str, tasas: Dict[str, float]) -> float:
+    """
+    Obtiene cuántos CUP vale una unidad de la moneda
+    
+    Args:
+        moneda: 'USD', 'EUR', 'CUP' o 'TRANSFERENCIA' (sin distinguir mayúsculas)
+        tasas: Diccionario {'usd': ..., 'eur': ...}
+    
+    Returns:
+        Tasa a CUP (1 para CUP y transferencias)
+    """
+    moneda = moneda.upper()
+    if moneda == "USD":
+        return tasas['usd']
+    if moneda == "EUR":
+        return tasas['eur']
+    return 1.0
+
+def convertir_monto(monto: float, origen: str, destino: str, tasas: Dict[str, float]) -> float:
+    """
+    Convierte un monto de una moneda a otra pasando por CUP
+    
+    Args:
+        monto: Monto en la moneda de origen
+        origen: Moneda del monto
+        destino: Moneda a la que se convierte
+        tasas: Diccionario {'usd': ..., 'eur': ...}
+    
+    Returns:
+        Monto en la moneda de destino
+    """
+    if origen.upper() == destino.upper():
+        return monto
+    return monto * tasa_a_cup(origen, tasas) / tasa_a_cup(destino, tasas)
+
+def total_pagado(pago_usd: float, pago_eur: float, pago_cup: float, pago_transferencia: float,
+                 moneda: str, tasas: Dict[str, float]) -> float:
+    """
+    Suma los pagos de una factura expresados en su moneda
+    
+    Args:
+        pago_usd: Monto pagado en USD
+        pago_eur: Monto pagado en EUR
+        pago_cup: Monto pagado en CUP
+        pago_transferencia: Monto pagado por transferencia (en CUP)
+        moneda: Moneda de la factura
+        tasas: Diccionario {'usd': ..., 'eur': ...}
+    
+    Returns:
+        Total recibido en la moneda de la factura
+    """
+    return (convertir_monto(pago_usd, "USD", moneda, tasas) +
+            convertir_monto(pago_eur, "EUR", moneda, tasas) +
+            convertir_monto(pago_cup, "CUP", moneda, tasas) +
+            convertir_monto(pago_transferencia, "TRANSFERENCIA", moneda, tasas))
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+Decodificación de códigos de barras y QR sobre imágenes de OpenCV.
+No depende de PyQt para poder usarse también desde scripts y procesos auxiliares.
+"""
+
+import os
+from multiprocessing import Pool
+from typing import Callable, List, Tuple
+
+import cv2
+
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+# Extensiones de imagen reconocidas al recorrer directorios
+EXTENSIONES_IMAGEN = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+# Ancho máximo con el que se intenta primero decodificar una foto
+ANCHO_MAXIMO_FOTO = 1600
+
+# Detectores compartidos (se crean una sola vez por proceso)
+_detector_qr = None
+_detector_barras = None
+
+
+def _obtener_detectores():
+    """Crea perezosamente los detectores de OpenCV"""
+    global _detector_qr, _detector_barras
+    
+    if _detector_qr is None:
+        _detector_qr = cv2.QRCodeDetector()
+        
+        # El detector de códigos de barras solo existe en OpenCV >= 4.8
+        if hasattr(cv2, "barcode"):
+            try:
+                _detector_barras = cv2.barcode.BarcodeDetector()
+            except Exception as e:
+                registro.warning("Detector de códigos de barras no disponible: %s", e)
+                _detector_barras = None
+    
+    return _detector_qr, _detector_barras
+
+
+def decodificar_frame(frame) -> List[str]:
+    """
+    Decodifica todos los códigos visibles en un frame
+    
+    Args:
+        frame: Imagen BGR o en escala de grises (numpy array)
+    
+    Returns:
+        Lista de códigos decodificados (sin vacíos ni repetidos, en orden de aparición)
+    """
+    if frame is None:
+        return []
+    
+    # Trabajar en escala de grises reduce el costo de ambos detectores
+    if len(frame.shape) == 3:
+        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    else:
+        gris = frame
+    
+    detector_qr, detector_barras = _obtener_detectores()
+    codigos = []
+    
+    # Códigos de barras lineales (los más comunes en las órdenes)
+    if detector_barras is not None:
+        try:
+            resultado = detector_barras.detectAndDecodeMulti(gris)
+            if resultado[0]:
+                codigos.extend(resultado[1])
+        except cv2.error:
+            pass
+    
+    # Códigos QR
+    try:
+        resultado = detector_qr.detectAndDecodeMulti(gris)
+        if resultado[0]:
+            codigos.extend(resultado[1])
+    except cv2.error:
+        pass
+    
+    # Limpiar resultados conservando el orden
+    vistos = set()
+    limpios = []
+    for codigo in codigos:
+        codigo = codigo.strip() if codigo else ""
+        if codigo and codigo not in vistos:
+            vistos.add(codigo)
+            limpios.append(codigo)
+    
+    return limpios
+
+
+def decodificar_imagen(ruta: str) -> Tuple[str, List[str], str]:
+    """
+    Decodifica los códigos de una foto en disco
+    
+    Las fotos de teléfono se prueban primero reducidas (mucho más rápido) y,
+    si no se encuentra nada, a resolución completa.
+    
+    Args:
+        ruta: Ruta de la imagen
+    
+    Returns:
+        Tupla (ruta, códigos, mensaje de error o cadena vacía)
+    """
+    try:
+        imagen = cv2.imread(ruta)
+        if imagen is None:
+            return ruta, [], "No se pudo leer la imagen"
+        
+        alto, ancho = imagen.shape[:2]
+        if ancho > ANCHO_MAXIMO_FOTO:
+            escala = ANCHO_MAXIMO_FOTO / ancho
+            reducida = cv2.resize(imagen, (ANCHO_MAXIMO_FOTO, int(alto * escala)),
+                                  interpolation=cv2.INTER_AREA)
+            codigos = decodificar_frame(reducida)
+            if codigos:
+                return ruta, codigos, ""
+        
+        return ruta, decodificar_frame(imagen), ""
+    except Exception as e:
+        return ruta, [], str(e)
+
+
+def listar_imagenes(directorio: str, recursivo: bool = True) -> List[str]:
+    """
+    Lista las imágenes de un directorio
+    
+    Args:
+        directorio: Directorio a recorrer
+        recursivo: Si es True, incluye subdirectorios
+    
+    Returns:
+        Lista ordenada de rutas de imagen
+    """
+    rutas = []
+    for raiz, dirs, archivos in os.walk(directorio):
+        for archivo in archivos:
+            if archivo.lower().endswith(EXTENSIONES_IMAGEN):
+                rutas.append(os.path.join(raiz, archivo))
+        if not recursivo:
+            break
+    return sorted(rutas)
+
+
+def decodificar_directorio(directorio: str, procesos: int = None, recursivo: bool = True,
+                           al_avanzar: Callable[[int, int], None] = None,
+                           cancelado: Callable[[], bool] = None) -> List[Tuple[str, List[str], str]]:
+    """
+    Decodifica en paralelo todas las imágenes de un directorio
+    
+    Args:
+        directorio: Directorio con las fotos
+        procesos: Número de procesos (por defecto, uno por núcleo)
+        recursivo: Si es True, incluye subdirectorios
+        al_avanzar: Función opcional que recibe (fotos procesadas, total)
+        cancelado: Función opcional que devuelve True para detener la decodificación;
+            las fotos pendientes se descartan
+    
+    Returns:
+        Lista de tuplas (ruta, códigos, error) en el orden de los archivos
+        (solo las procesadas si se canceló)
+    """
+    rutas = listar_imagenes(directorio, recursivo)
+    if not rutas:
+        return []
+    
+    resultados = []
+    
+    def recoger(iterador):
+        for resultado in iterador:
+            resultados.append(resultado)
+            if al_avanzar is not None:
+                al_avanzar(len(resultados), len(rutas))
+            if cancelado is not None and cancelado():
+                break
+    
+    # Con pocas fotos no compensa arrancar procesos
+    if len(rutas) == 1 or procesos == 1:
+        recoger(decodificar_imagen(ruta) for ruta in rutas)
+        return resultados
+    
+    # Al salir del bloque se terminan los procesos (también si se canceló)
+    procesos = min(procesos or os.cpu_count() or 1, len(rutas))
+    with Pool(processes=procesos) as pool:
+        recoger(pool.imap(decodificar_imagen, rutas, chunksize=max(1, len(rutas) // (procesos * 4))))
+    return resultados
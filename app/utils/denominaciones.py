@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Descomposición exacta de un monto en billetes.
+Trabaja con enteros (centavos divididos por el máximo común divisor de las
+denominaciones) para no arrastrar residuos de punto flotante, respeta la
+cantidad disponible de cada billete y minimiza el número de billetes.
+"""
+
+import math
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Por encima de este número de unidades el problema se reduce antes de la
+# programación dinámica (ver _resolver)
+LIMITE_DIRECTO = 20000
+
+_INFINITO = float("inf")
+
+
+def _a_centavos(valor: float) -> int:
+    """Convierte un monto a centavos enteros"""
+    return int(round(float(valor) * 100))
+
+
+def _capas(objetivo: int, billetes: Tuple[Tuple[int, Optional[int]], ...]) -> List[list]:
+    """
+    Programación dinámica de mínimo número de billetes con cantidades acotadas
+    
+    Cada capa i contiene, para cada valor de 0 a objetivo, el mínimo de billetes
+    necesarios usando solo los i primeros tipos de billete (inf si no se alcanza).
+    Para cada billete se recorre cada clase de residuo con una ventana deslizante
+    de mínimos, así el costo es O(objetivo) por denominación.
+    
+    Args:
+        objetivo: Valor máximo (en unidades)
+        billetes: Tuplas (valor en unidades, disponibles o None si no hay límite)
+    
+    Returns:
+        Lista de capas (la capa 0 solo alcanza el valor 0)
+    """
+    anterior = [_INFINITO] * (objetivo + 1)
+    anterior[0] = 0
+    capas = [anterior]
+    
+    for valor, disponibles in billetes:
+        limite = objetivo // valor if disponibles is None else min(disponibles, objetivo // valor)
+        actual = anterior[:]
+        
+        if limite > 0:
+            for residuo in range(min(valor, objetivo + 1)):
+                # En la clase de residuo, actual[j] = min(anterior[i] - i) + j con j - limite <= i <= j
+                ventana = deque()
+                for j, v in enumerate(range(residuo, objetivo + 1, valor)):
+                    candidato = anterior[v] - j
+                    while ventana and ventana[-1][1] >= candidato:
+                        ventana.pop()
+                    ventana.append((j, candidato))
+                    if ventana[0][0] < j - limite:
+                        ventana.popleft()
+                    mejor = ventana[0][1] + j
+                    if mejor < actual[v]:
+                        actual[v] = mejor
+        
+        capas.append(actual)
+        anterior = actual
+    
+    return capas
+
+
+def _reconstruir(capas: List[list], billetes, valor_final: int) -> List[int]:
+    """
+    Recupera las cantidades de cada billete para un valor alcanzado
+    
+    Args:
+        capas: Resultado de _capas
+        billetes: Las mismas tuplas (valor, disponibles) usadas en _capas
+        valor_final: Valor a reconstruir
+    
+    Returns:
+        Cantidades por billete, en el orden de billetes
+    """
+    cantidades = [0] * len(billetes)
+    v = valor_final
+    for i in range(len(billetes), 0, -1):
+        valor, disponibles = billetes[i - 1]
+        objetivo = capas[i][v]
+        previa = capas[i - 1]
+        k = 0
+        while previa[v - k * valor] + k != objetivo:
+            k += 1
+        cantidades[i - 1] = k
+        v -= k * valor
+    return cantidades
+
+
+def _cota_intercambio(mayor: int, resto) -> int:
+    """
+    Valor máximo que los billetes menores necesitan aportar si sobran billetes del mayor
+    
+    Si un billete d se usa mayor/mcd(d, mayor) veces o más, ese grupo puede
+    cambiarse por d/mcd(d, mayor) billetes del mayor sin perder valor y con
+    menos billetes (si quedan tantos del mayor sin usar, ver _sobrante_intercambio).
+    """
+    return sum((mayor // math.gcd(valor, mayor) - 1) * valor for valor, _ in resto)
+
+
+def _sobrante_intercambio(mayor: int, resto) -> int:
+    """
+    Billetes del mayor que deben quedar sin usar para que valga _cota_intercambio
+    
+    Es el máximo de d/mcd(d, mayor) entre los billetes menores: los billetes
+    del mayor que entran en el intercambio de cualquiera de ellos.
+    """
+    return max((valor // math.gcd(valor, mayor) for valor, _ in resto), default=1)
+
+
+def _mejor(a: Tuple[int, float, list], b: Tuple[int, float, list]) -> Tuple[int, float, list]:
+    """Elige la solución de mayor valor y, a igual valor, la de menos billetes"""
+    if b is None:
+        return a
+    if a is None:
+        return b
+    return b if (b[0], -b[1]) > (a[0], -a[1]) else a
+
+
+@lru_cache(maxsize=256)
+def _resolver(objetivo: int, billetes: Tuple[Tuple[int, Optional[int]], ...]) -> Tuple[int, float, tuple]:
+    """
+    Busca el mayor valor alcanzable sin pasar del objetivo con el mínimo de billetes
+    
+    Con objetivos grandes (saldos altos en CUP) no se recorre todo el rango:
+    o quedan sin usar menos de _sobrante_intercambio billetes de la mayor
+    denominación (se prueba cada una de esas cantidades y el resto se resuelve
+    por separado), o los menores aportan como mucho _cota_intercambio, así que
+    basta una programación dinámica hasta esa cota y se completa con el billete
+    mayor. Si el objetivo cubre todos los billetes disponibles, se usan todos.
+    
+    Args:
+        objetivo: Valor objetivo en unidades
+        billetes: Tuplas (valor, disponibles) ordenadas de mayor a menor valor
+    
+    Returns:
+        Tupla (valor alcanzado, número de billetes, cantidades por billete)
+    """
+    if not billetes or objetivo <= 0:
+        return 0, 0, tuple(0 for _ in billetes)
+    
+    if all(disponibles is not None for _, disponibles in billetes):
+        capacidad = sum(valor * disponibles for valor, disponibles in billetes)
+        if capacidad <= objetivo:
+            return capacidad, sum(disponibles for _, disponibles in billetes), \
+                tuple(disponibles for _, disponibles in billetes)
+    
+    mayor, disponibles_mayor = billetes[0]
+    resto = billetes[1:]
+    
+    if objetivo <= LIMITE_DIRECTO:
+        # Se ordena de menor a mayor para que la reconstrucción recorra primero el billete mayor
+        ascendente = tuple(reversed(billetes))
+        capas = _capas(objetivo, ascendente)
+        final = capas[-1]
+        for v in range(objetivo, -1, -1):
+            if final[v] != _INFINITO:
+                cantidades = _reconstruir(capas, ascendente, v)
+                return v, final[v], tuple(reversed(cantidades))
+    
+    mejor = None
+    
+    # Caso 1: quedan sin usar menos billetes del mayor de los que requiere el
+    # intercambio; se prueba cada cantidad y el resto resuelve lo que falta
+    if disponibles_mayor is not None:
+        maximo = min(disponibles_mayor, objetivo // mayor)
+        minimo = max(0, disponibles_mayor - _sobrante_intercambio(mayor, resto) + 1)
+        for n in range(maximo, minimo - 1, -1):
+            valor, cantidad, cantidades = _resolver(objetivo - n * mayor, resto)
+            mejor = _mejor(mejor, (valor + n * mayor, cantidad + n, (n,) + cantidades))
+    
+    # Caso 2: sobran billetes del mayor; los menores aportan a lo sumo la cota
+    cota = min(objetivo, _cota_intercambio(mayor, resto) + mayor)
+    if resto:
+        ascendente = tuple(reversed(resto))
+        capas = _capas(cota, ascendente)
+        final = capas[-1]
+    else:
+        ascendente = ()
+        capas = None
+        final = [0]
+    
+    mejor_v = None
+    for v in range(len(final)):
+        if final[v] == _INFINITO:
+            continue
+        n = (objetivo - v) // mayor
+        if disponibles_mayor is not None:
+            n = min(n, disponibles_mayor)
+        candidato = (n * mayor + v, n + final[v], v, n)
+        if mejor_v is None or (candidato[0], -candidato[1]) > (mejor_v[0], -mejor_v[1]):
+            mejor_v = candidato
+    
+    if mejor_v is not None:
+        valor, cantidad, v, n = mejor_v
+        cantidades = tuple(reversed(_reconstruir(capas, ascendente, v))) if capas else ()
+        mejor = _mejor(mejor, (valor, cantidad, (n,) + cantidades))
+    
+    return mejor
+
+
+def resolver_denominaciones(monto: float, denominaciones: Iterable[float],
+                            disponibles: Optional[Dict[float, int]] = None) -> Tuple[Dict[float, int], float]:
+    """
+    Descompone un monto en billetes con el mínimo número de billetes
+    
+    Si el monto no puede formarse exactamente (centavos sin moneda, o pocos
+    billetes disponibles), se devuelve la combinación de mayor valor que no lo
+    supera y el residuo que queda sin cubrir.
+    
+    Args:
+        monto: Monto a descomponer
+        denominaciones: Valores de los billetes
+        disponibles: Cantidad disponible de cada billete (None o ausente = sin límite)
+    
+    Returns:
+        Tupla (cantidades por denominación, residuo)
+    """
+    denominaciones = sorted({d for d in denominaciones if d > 0}, reverse=True)
+    conteo = {d: 0 for d in denominaciones}
+    
+    centavos = _a_centavos(monto)
+    if centavos <= 0 or not denominaciones:
+        return conteo, round(max(monto, 0), 2)
+    
+    # Trabajar en unidades del mcd de las denominaciones (1 unidad = 1 CUP con billetes enteros)
+    en_centavos = [_a_centavos(d) for d in denominaciones]
+    unidad = 0
+    for valor in en_centavos:
+        unidad = math.gcd(unidad, valor)
+    
+    billetes = tuple(
+        (valor // unidad, None if disponibles is None or disponibles.get(d) is None else max(0, int(disponibles[d])))
+        for d, valor in zip(denominaciones, en_centavos)
+    )
+    
+    valor, _, cantidades = _resolver(centavos // unidad, billetes)
+    
+    for d, cantidad in zip(denominaciones, cantidades):
+        conteo[d] = cantidad
+    
+    residuo = (centavos - valor * unidad) / 100
+    return conteo, round(residuo, 2)
@@ -10,6 +10,10 @@ from datetime import datetime, date, timedelta
 import json
 from typing import List, Dict, Any
 
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
 class CSVExporter:
     """Clase para exportar datos a formato CSV"""
     
@@ -51,7 +55,7 @@ class CSVExporter:
             return True
             
         except Exception as e:
-            print(f"Error al exportar a CSV: {e}")
+            registro.error("Error al exportar a CSV: %s", e)
             return False
 
 class JSONExporter:
@@ -87,7 +91,7 @@ class JSONExporter:
             return True
             
         except Exception as e:
-            print(f"Error al exportar a JSON: {e}")
+            registro.error("Error al exportar a JSON: %s", e)
             return False
 
 class ReportExporter:
@@ -161,11 +165,11 @@ class ReportExporter:
                 return JSONExporter.export(data, filepath)
                 
             else:
-                print(f"Formato de exportación no soportado: {formato}")
+                registro.warning("Formato de exportación no soportado: %s", formato)
                 return False
                 
         except Exception as e:
-            print(f"Error al exportar reporte de facturas: {e}")
+            registro.error("Error al exportar reporte de facturas: %s", e)
             return False
     
     @staticmethod
@@ -212,9 +216,9 @@ class ReportExporter:
                 return JSONExporter.export(data, filepath)
                 
             else:
-                print(f"Formato de exportación no soportado: {formato}")
+                registro.warning("Formato de exportación no soportado: %s", formato)
                 return False
                 
         except Exception as e:
-            print(f"Error al exportar historial de tasas de cambio: {e}")
+            registro.error("Error al exportar historial de tasas de cambio: %s", e)
             return False
\ No newline at end of file
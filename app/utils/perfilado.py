@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""
+Modo de perfilado de la aplicación.
+Se activa con la opción --perfil [directorio] o con la variable de entorno
+FACTURACION_PERFIL (un directorio, o 1 para el predeterminado). Guarda la
+línea de tiempo del arranque (importaciones, configuración, base de datos,
+construcción de cada pestaña) y ejecuta bajo cProfile las acciones marcadas
+con @perfilar_accion, dejando un archivo .prof por ejecución y una tabla
+resumen en el directorio de perfiles. Sin activar, solo se anotan en memoria
+las pocas marcas del arranque.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.utils.registro import obtener_registro
+
+registro = obtener_registro(__name__)
+
+VARIABLE_ENTORNO = "FACTURACION_PERFIL"
+DIRECTORIO_PREDETERMINADO = Path(os.path.expanduser("~")) / ".facturacion-app" / "perfiles"
+
+# Funciones que se muestran en el resumen de cada acción perfilada
+FUNCIONES_RESUMEN = 30
+
+_inicio = time.perf_counter()
+_linea_tiempo = []  # (inicio_s, duracion_s o None, evento, hilo)
+_acciones = {}  # nombre -> [ejecuciones, total_s, maximo_s]
+_lock = threading.Lock()
+_directorio = None
+_perfil_en_curso = False
+
+def activar_perfilado(directorio: str = None) -> Path:
+    """
+    Activa el modo de perfilado
+    
+    Args:
+        directorio: Directorio donde se guardan los perfiles (por defecto
+            ~/.facturacion-app/perfiles)
+    
+    Returns:
+        Directorio de perfiles
+    """
+    global _directorio
+    _directorio = Path(directorio) if directorio else DIRECTORIO_PREDETERMINADO
+    os.makedirs(_directorio, exist_ok=True)
+    return _directorio
+
+def leer_opcion_perfil(argumentos):
+    """
+    Extrae la opción --perfil [directorio] de los argumentos de la línea de comandos
+    
+    Args:
+        argumentos: Lista de argumentos (sys.argv)
+    
+    Returns:
+        Tupla (activar, directorio, argumentos restantes); directorio es None
+        para el directorio de perfiles predeterminado
+    """
+    if "--perfil" not in argumentos:
+        return False, None, argumentos
+    
+    posicion = argumentos.index("--perfil")
+    restantes = argumentos[:posicion] + argumentos[posicion + 1:]
+    directorio = None
+    if posicion + 1 < len(argumentos) and not argumentos[posicion + 1].startswith("-"):
+        directorio = argumentos[posicion + 1]
+        restantes = argumentos[:posicion] + argumentos[posicion + 2:]
+    return True, directorio, restantes
+
+def perfilado_activo() -> bool:
+    """Indica si el modo de perfilado está activo"""
+    return _directorio is not None
+
+def marcar(evento: str):
+    """
+    Anota un instante en la línea de tiempo del arranque
+    
+    Args:
+        evento: Descripción del instante
+    """
+    with _lock:
+        _linea_tiempo.append((time.perf_counter() - _inicio, None, evento, threading.current_thread().name))
+
+@contextmanager
+def medir(evento: str):
+    """
+    Anota en la línea de tiempo la duración del bloque
+    
+    Args:
+        evento: Descripción del bloque
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fin = time.perf_counter()
+        with _lock:
+            _linea_tiempo.append((inicio - _inicio, fin - inicio, evento, threading.current_thread().name))
+
+def _nombre_archivo(prefijo: str, extension: str) -> Path:
+    """Ruta única en el directorio de perfiles para un prefijo y una extensión"""
+    marca = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return _directorio / f"{prefijo}-{marca}.{extension}"
+
+def guardar_linea_tiempo(nombre: str = "arranque") -> Optional[Path]:
+    """
+    Guarda la línea de tiempo como tabla de texto (solo con el perfilado activo)
+    
+    Args:
+        nombre: Prefijo del archivo
+    
+    Returns:
+        Ruta del archivo guardado, o None si el perfilado no está activo
+    """
+    if not perfilado_activo():
+        return None
+    
+    with _lock:
+        eventos = sorted(_linea_tiempo)
+    
+    lineas = [f"{'Inicio ms':>10} {'Duración ms':>12}  {'Hilo':<16} Evento", "-" * 72]
+    for inicio, duracion, evento, hilo in eventos:
+        texto_duracion = f"{duracion * 1000:>12.1f}" if duracion is not None else f"{'':>12}"
+        lineas.append(f"{inicio * 1000:>10.1f} {texto_duracion}  {hilo:<16} {evento}")
+    
+    ruta = _nombre_archivo(nombre, "txt")
+    try:
+        ruta.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+    except OSError as e:
+        registro.error("Error al guardar la línea de tiempo: %s", e)
+        return None
+    return ruta
+
+def _guardar_resumen_acciones():
+    """Reescribe la tabla con las métricas acumuladas de cada acción perfilada"""
+    with _lock:
+        acciones = sorted(_acciones.items(), key=lambda item: item[1][1], reverse=True)
+    
+    lineas = [f"{'Acción':<32} {'Veces':>6} {'Total ms':>10} {'Media ms':>10} {'Máximo ms':>10}", "-" * 72]
+    for nombre, (veces, total, maximo) in acciones:
+        lineas.append(f"{nombre:<32} {veces:>6} {total * 1000:>10.1f} "
+                      f"{total / veces * 1000:>10.1f} {maximo * 1000:>10.1f}")
+    
+    try:
+        (_directorio / "acciones.txt").write_text("\n".join(lineas) + "\n", encoding="utf-8")
+    except OSError as e:
+        registro.error("Error al guardar el resumen de acciones: %s", e)
+
+def _guardar_perfil(nombre: str, perfil: cProfile.Profile, duracion: float):
+    """Guarda el .prof de una ejecución, su resumen por tiempo acumulado y la tabla de acciones"""
+    with _lock:
+        metricas = _acciones.setdefault(nombre, [0, 0.0, 0.0])
+        metricas[0] += 1
+        metricas[1] += duracion
+        metricas[2] = max(metricas[2], duracion)
+    
+    ruta = _nombre_archivo(nombre, "prof")
+    try:
+        perfil.dump_stats(str(ruta))
+        
+        salida = io.StringIO()
+        salida.write(f"{nombre}: {duracion * 1000:.1f} ms\n\n")
+        pstats.Stats(perfil, stream=salida).sort_stats("cumulative").print_stats(FUNCIONES_RESUMEN)
+        ruta.with_suffix(".txt").write_text(salida.getvalue(), encoding="utf-8")
+    except OSError as e:
+        registro.error("Error al guardar el perfil de %s: %s", nombre, e)
+    
+    _guardar_resumen_acciones()
+
+def perfilar_accion(nombre: str):
+    """
+    Decorador que ejecuta una acción bajo cProfile cuando el perfilado está activo
+    
+    Los argumentos posicionales sobrantes (como el 'checked' de clicked) se
+    descartan, igual que hace PyQt al conectar una señal a un método sin ellos.
+    Las acciones anidadas se ejecutan dentro del perfil de la exterior.
+    
+    Args:
+        nombre: Nombre de la acción en los archivos de perfil
+    """
+    def decorador(funcion):
+        parametros = inspect.signature(funcion).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in parametros):
+            maximo_posicionales = None
+        else:
+            maximo_posicionales = sum(1 for p in parametros
+                                      if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+        
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if maximo_posicionales is not None:
+                args = args[:maximo_posicionales]
+            
+            global _perfil_en_curso
+            if _directorio is None or _perfil_en_curso:
+                return funcion(*args, **kwargs)
+            
+            _perfil_en_curso = True
+            perfil = cProfile.Profile()
+            inicio = time.perf_counter()
+            try:
+                return perfil.runcall(funcion, *args, **kwargs)
+            finally:
+                duracion = time.perf_counter() - inicio
+                _perfil_en_curso = False
+                _guardar_perfil(nombre, perfil, duracion)
+        
+        return envoltura
+    return decorador
+
+# Activación por variable de entorno (también para procesos sin interfaz)
+if os.environ.get(VARIABLE_ENTORNO):
+    _valor = os.environ[VARIABLE_ENTORNO]
+    activar_perfilado(None if _valor.lower() in ("1", "true", "si", "sí") else _valor)
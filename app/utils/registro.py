@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Registro de diagnóstico de la aplicación.
+Sustituye a print(): cada módulo obtiene su registro con obtener_registro y
+escribe mensajes con argumentos separados (registro.debug("... %s", valor)),
+de modo que un mensaje por debajo del nivel activo no se llega a formatear.
+Los mensajes que pasan el nivel se guardan en un búfer circular en memoria,
+visible desde la interfaz (Ayuda > Registro de Diagnóstico), y se escriben
+en la consola solo si existe (no en el ejecutable sin ventana de consola).
+"""
+
+import logging
+import sys
+import threading
+from collections import deque
+from typing import List
+
+RAIZ = "facturacion"
+
+NIVELES = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+CAPACIDAD_PREDETERMINADA = 2000
+
+FORMATO = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+class BufferCircular(logging.Handler):
+    """Manejador que conserva en memoria los últimos mensajes ya formateados"""
+    
+    def __init__(self, capacidad: int = CAPACIDAD_PREDETERMINADA):
+        """
+        Inicializa el búfer
+        
+        Args:
+            capacidad: Máximo de mensajes conservados (los más antiguos se descartan)
+        """
+        super().__init__()
+        self.registros = deque(maxlen=capacidad)
+        self.setFormatter(logging.Formatter(FORMATO, "%Y-%m-%d %H:%M:%S"))
+    
+    def emit(self, record):
+        """Guarda el mensaje formateado junto con su nivel"""
+        try:
+            self.registros.append((record.levelno, self.format(record)))
+        except Exception:
+            self.handleError(record)
+    
+    def redimensionar(self, capacidad: int):
+        """Cambia la capacidad conservando los mensajes más recientes"""
+        with self.lock:
+            self.registros = deque(self.registros, maxlen=capacidad)
+    
+    def mensajes(self, nivel_minimo: int = logging.DEBUG) -> List[str]:
+        """
+        Devuelve los mensajes guardados, del más antiguo al más reciente
+        
+        Args:
+            nivel_minimo: Nivel mínimo de los mensajes devueltos
+        
+        Returns:
+            Lista de mensajes formateados
+        """
+        with self.lock:
+            registros = list(self.registros)
+        return [texto for nivel, texto in registros if nivel >= nivel_minimo]
+    
+    def limpiar(self):
+        """Descarta los mensajes guardados"""
+        with self.lock:
+            self.registros.clear()
+
+_raiz = logging.getLogger(RAIZ)
+_buffer = BufferCircular()
+_lock = threading.Lock()
+_configurado = False
+
+def _configurar_inicial():
+    """Conecta el búfer (y la consola, si existe) al registro raíz de la aplicación"""
+    global _configurado
+    with _lock:
+        if _configurado:
+            return
+        _raiz.setLevel(logging.INFO)
+        _raiz.propagate = False
+        _raiz.addHandler(_buffer)
+        
+        # En el ejecutable sin consola sys.stderr es None: no se escribe nada
+        if sys.stderr is not None:
+            consola = logging.StreamHandler(sys.stderr)
+            consola.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+            _raiz.addHandler(consola)
+        _configurado = True
+
+def obtener_registro(nombre: str) -> logging.Logger:
+    """
+    Obtiene el registro de un módulo
+    
+    Args:
+        nombre: Nombre del módulo (normalmente __name__)
+    
+    Returns:
+        Logger hijo del registro de la aplicación
+    """
+    _configurar_inicial()
+    if nombre.startswith("app."):
+        nombre = nombre[len("app."):]
+    return _raiz.getChild(nombre)
+
+def configurar_registro(nivel: str = None, capacidad: int = None):
+    """
+    Ajusta el nivel del registro y la capacidad del búfer
+    
+    Args:
+        nivel: 'DEBUG', 'INFO', 'WARNING' o 'ERROR' (None para no cambiarlo)
+        capacidad: Máximo de mensajes del búfer (None para no cambiarlo)
+    """
+    _configurar_inicial()
+    if nivel:
+        _raiz.setLevel(getattr(logging, str(nivel).upper(), logging.INFO))
+    if capacidad:
+        _buffer.redimensionar(int(capacidad))
+
+def nivel_actual() -> str:
+    """Devuelve el nombre del nivel activo"""
+    return logging.getLevelName(_raiz.level)
+
+def obtener_buffer() -> BufferCircular:
+    """Devuelve el búfer circular con los mensajes recientes"""
+    _configurar_inicial()
+    return _buffer
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script para medir la sugerencia de conteo de billetes.
+Compara el algoritmo voraz anterior de sugerir_conteo con el resolvedor exacto
+de app.utils.denominaciones sobre saldos grandes en CUP, con y sin límite de
+billetes disponibles, y verifica que el resultado cuadre al centavo.
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+# Asegurar que los módulos de la aplicación se puedan importar
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils.denominaciones import resolver_denominaciones, _resolver
+
+DENOMINACIONES_CUP = [1, 3, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+def sugerir_voraz(monto, denominaciones, disponibles=None):
+    """
+    Reproduce el algoritmo voraz anterior (con límite opcional de billetes)
+    
+    Returns:
+        Tupla (conteo, residuo)
+    """
+    conteo = {}
+    restante = monto
+    for denom in sorted(denominaciones, reverse=True):
+        if restante >= denom:
+            cantidad = int(restante / denom)
+            if disponibles is not None:
+                cantidad = min(cantidad, disponibles.get(denom, 0))
+            conteo[denom] = cantidad
+            restante -= cantidad * denom
+    return conteo, restante
+
+def medir(nombre, funcion, casos, repeticiones):
+    """
+    Mide una función de sugerencia sobre una lista de casos
+    
+    Args:
+        nombre: Nombre a mostrar
+        funcion: Función (monto, denominaciones, disponibles) -> (conteo, residuo)
+        casos: Lista de tuplas (monto, disponibles)
+        repeticiones: Veces que se resuelve cada caso
+    
+    Returns:
+        Diccionario con las métricas
+    """
+    tiempos = []
+    billetes = 0
+    exactos = 0
+    for monto, disponibles in casos:
+        for _ in range(repeticiones):
+            # Sin caché: cada sugerencia debe costar lo mismo que la primera
+            _resolver.cache_clear()
+            inicio = time.perf_counter()
+            conteo, residuo = funcion(monto, DENOMINACIONES_CUP, disponibles)
+            tiempos.append(time.perf_counter() - inicio)
+        
+        total = sum(denom * cantidad for denom, cantidad in conteo.items())
+        if disponibles is not None:
+            assert all(cantidad <= disponibles.get(denom, 0) for denom, cantidad in conteo.items())
+        billetes += sum(conteo.values())
+        if abs(total - monto) < 0.005:
+            exactos += 1
+    
+    tiempos.sort()
+    return {
+        "nombre": nombre,
+        "mediana_ms": tiempos[len(tiempos) // 2] * 1000,
+        "maximo_ms": tiempos[-1] * 1000,
+        "billetes": billetes,
+        "exactos": exactos,
+        "casos": len(casos)
+    }
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description='Benchmark de la sugerencia de conteo de billetes')
+    parser.add_argument('--casos', type=int, default=50, help='Número de saldos a resolver')
+    parser.add_argument('--maximo', type=float, default=2000000, help='Saldo máximo en CUP')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Repeticiones por caso')
+    parser.add_argument('--semilla', type=int, default=1, help='Semilla aleatoria')
+    
+    args = parser.parse_args()
+    
+    print("=== Benchmark de Denominaciones ===")
+    
+    generador = random.Random(args.semilla)
+    saldos = [round(generador.uniform(1000, args.maximo)) for _ in range(args.casos)]
+    
+    # Con límite: falta un billete de 1000, no hay billetes de 1 y el resto se
+    # cubre con lo que haya de cada denominación (el voraz suele quedarse con residuo)
+    casos_libres = [(saldo, None) for saldo in saldos]
+    casos_limitados = []
+    for saldo in saldos:
+        disponibles = {denom: generador.randint(0, 40) for denom in DENOMINACIONES_CUP}
+        disponibles[1] = 0
+        disponibles[1000] = int(saldo // 1000) - 1
+        casos_limitados.append((saldo, disponibles))
+    
+    resultados = [
+        medir("voraz sin límite", sugerir_voraz, casos_libres, args.repeticiones),
+        medir("exacto sin límite", resolver_denominaciones, casos_libres, args.repeticiones),
+        medir("voraz con límite", sugerir_voraz, casos_limitados, args.repeticiones),
+        medir("exacto con límite", resolver_denominaciones, casos_limitados, args.repeticiones),
+    ]
+    
+    encabezado = f"{'Algoritmo':<20} {'Mediana ms':>11} {'Máximo ms':>10} {'Billetes':>9} {'Exactos':>9}"
+    print(encabezado)
+    print("-" * len(encabezado))
+    for r in resultados:
+        print(f"{r['nombre']:<20} {r['mediana_ms']:>11.2f} {r['maximo_ms']:>10.2f} "
+              f"{r['billetes']:>9} {r['exactos']:>4}/{r['casos']:<4}")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script para medir el rendimiento del escáner sin cámara.
+Pasa videos grabados y conjuntos de imágenes por la misma decodificación que
+usa ScannerWidget y reporta tasa de lectura, tiempo hasta la primera lectura,
+CPU por frame y tasa de fallos para cada resolución.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Asegurar que los módulos de la aplicación se puedan importar
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import cv2
+
+from app.utils.decodificador import decodificar_frame
+from app.utils.exporters import JSONExporter
+
+EXTENSIONES_IMAGEN = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+
+def leer_frames(ruta, max_frames=None):
+    """
+    Genera los frames de un video, una imagen o un directorio de imágenes
+    
+    Args:
+        ruta: Ruta al archivo de video, imagen o directorio
+        max_frames: Número máximo de frames a leer (opcional)
+    
+    Yields:
+        Frames BGR (numpy array)
+    """
+    ruta = Path(ruta)
+    leidos = 0
+    
+    if ruta.is_dir():
+        archivos = sorted(p for p in ruta.iterdir() if p.suffix.lower() in EXTENSIONES_IMAGEN)
+        for archivo in archivos:
+            if max_frames is not None and leidos >= max_frames:
+                return
+            frame = cv2.imread(str(archivo))
+            if frame is not None:
+                leidos += 1
+                yield frame
+        return
+    
+    if ruta.suffix.lower() in EXTENSIONES_IMAGEN:
+        frame = cv2.imread(str(ruta))
+        if frame is not None:
+            yield frame
+        return
+    
+    # Video: mismo mecanismo de captura que la cámara
+    captura = cv2.VideoCapture(str(ruta))
+    try:
+        while captura.isOpened():
+            if max_frames is not None and leidos >= max_frames:
+                return
+            ok, frame = captura.read()
+            if not ok:
+                return
+            leidos += 1
+            yield frame
+    finally:
+        captura.release()
+
+def parsear_resolucion(texto):
+    """
+    Convierte 'ANCHOxALTO' en una tupla; 'original' devuelve None
+    
+    Args:
+        texto: Resolución en formato '640x480' u 'original'
+    
+    Returns:
+        Tupla (ancho, alto) o None
+    """
+    if texto.lower() == "original":
+        return None
+    ancho, alto = texto.lower().split("x")
+    return int(ancho), int(alto)
+
+def medir(ruta, resolucion, esperado=None, max_frames=None):
+    """
+    Mide la decodificación de una fuente a una resolución
+    
+    Args:
+        ruta: Fuente de frames (video, imagen o directorio)
+        resolucion: Tupla (ancho, alto) o None para la resolución original
+        esperado: Código que debería leerse en cada frame (opcional)
+        max_frames: Número máximo de frames a procesar (opcional)
+    
+    Returns:
+        Diccionario con las métricas
+    """
+    frames = 0
+    frames_leidos = 0
+    fallos = 0
+    codigos = set()
+    primera_lectura_ms = None
+    primera_lectura_frame = None
+    cpu_total = 0.0
+    
+    inicio = time.perf_counter()
+    for frame in leer_frames(ruta, max_frames):
+        frames += 1
+        
+        cpu_inicio = time.process_time()
+        if resolucion is not None:
+            frame = cv2.resize(frame, resolucion, interpolation=cv2.INTER_AREA)
+        resultado = decodificar_frame(frame)
+        cpu_total += time.process_time() - cpu_inicio
+        
+        if resultado:
+            frames_leidos += 1
+            codigos.update(resultado)
+            if primera_lectura_ms is None:
+                primera_lectura_ms = (time.perf_counter() - inicio) * 1000
+                primera_lectura_frame = frames
+        
+        # Sin código esperado, un fallo es un frame sin lectura
+        if (esperado is not None and esperado not in resultado) or (esperado is None and not resultado):
+            fallos += 1
+    
+    duracion = time.perf_counter() - inicio
+    
+    return {
+        "fuente": str(ruta),
+        "resolucion": "original" if resolucion is None else f"{resolucion[0]}x{resolucion[1]}",
+        "frames": frames,
+        "frames_leidos": frames_leidos,
+        "tasa_lectura": frames_leidos / frames if frames else 0.0,
+        "primera_lectura_ms": primera_lectura_ms,
+        "primera_lectura_frame": primera_lectura_frame,
+        "cpu_por_frame_ms": cpu_total * 1000 / frames if frames else 0.0,
+        "tiempo_por_frame_ms": duracion * 1000 / frames if frames else 0.0,
+        "tasa_fallos": fallos / frames if frames else 0.0,
+        "codigos": sorted(codigos)
+    }
+
+def imprimir_tabla(resultados):
+    """Imprime los resultados en forma de tabla"""
+    encabezado = (f"{'Fuente':<30} {'Resolución':>11} {'Frames':>7} {'Lectura':>8} "
+                  f"{'1ª (ms)':>9} {'CPU/fr ms':>10} {'Fallos':>7}")
+    print(encabezado)
+    print("-" * len(encabezado))
+    
+    for r in resultados:
+        primera = f"{r['primera_lectura_ms']:.1f}" if r["primera_lectura_ms"] is not None else "-"
+        print(f"{os.path.basename(r['fuente'])[:30]:<30} {r['resolucion']:>11} {r['frames']:>7} "
+              f"{r['tasa_lectura'] * 100:>7.1f}% {primera:>9} {r['cpu_por_frame_ms']:>10.2f} "
+              f"{r['tasa_fallos'] * 100:>6.1f}%")
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description='Benchmark de decodificación del escáner sobre archivos grabados')
+    parser.add_argument('fuentes', nargs='+', help='Videos, imágenes o directorios de imágenes')
+    parser.add_argument('--resoluciones', default='original,1280x720,640x480',
+                        help="Lista separada por comas (por ejemplo 'original,640x480')")
+    parser.add_argument('--esperado', help='Código que debería leerse en cada frame (para la tasa de fallos)')
+    parser.add_argument('--max-frames', type=int, help='Máximo de frames por fuente')
+    parser.add_argument('--json', help='Guardar los resultados en un archivo JSON')
+    
+    args = parser.parse_args()
+    
+    print("=== Benchmark del Escáner ===")
+    
+    resoluciones = [parsear_resolucion(r.strip()) for r in args.resoluciones.split(",") if r.strip()]
+    
+    resultados = []
+    for fuente in args.fuentes:
+        if not os.path.exists(fuente):
+            print(f"Error: No existe la fuente {fuente}")
+            return 1
+        for resolucion in resoluciones:
+            resultados.append(medir(fuente, resolucion, args.esperado, args.max_frames))
+    
+    print()
+    imprimir_tabla(resultados)
+    
+    if args.json:
+        if JSONExporter.export(resultados, os.path.abspath(args.json)):
+            print(f"\nResultados guardados en: {args.json}")
+        else:
+            return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script para medir el registro de facturas.
+Compara la secuencia anterior de registrar_factura (conteo de duplicados,
+consulta de tasas, sondeo del esquema, INSERT y relectura de la fila) con
+registrar_factura_rapida (un solo INSERT con índice único y RETURNING).
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+# Asegurar que los módulos de la aplicación se puedan importar
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.facturacion import FacturacionService, SQL_INSERTAR_FACTURA
+
+def registrar_legado(servicio, orden_id, monto, mensajero):
+    """
+    Reproduce la secuencia de sentencias del registro anterior
+    
+    Args:
+        servicio: FacturacionService sobre la base de datos de prueba
+        orden_id: Identificador de la orden
+        monto: Monto en USD (pagado completo en USD)
+        mensajero: Nombre del mensajero
+    
+    Returns:
+        True si la factura se registró
+    """
+    db = servicio.db
+    db.connect()
+    existente = db.fetch_one("SELECT COUNT(*) FROM facturas WHERE orden_id = ?", (orden_id,))
+    if existente and existente[0] > 0:
+        db.disconnect()
+        return False
+    
+    # La consulta de tasas abre su propia conexión
+    tasas = servicio.exchange_service.obtener_tasas_actuales()
+    
+    # Las impresiones de depuración del registro anterior
+    for nombre, valor in (("orden_id", orden_id), ("monto", monto), ("moneda", "USD"),
+                          ("monto_equivalente", monto), ("pago_usd", monto), ("pago_eur", 0.0),
+                          ("pago_cup", 0.0), ("pago_transferencia", 0.0), ("transferencia_id", None),
+                          ("tasa_usada", tasas['usd']), ("mensajero", mensajero)):
+        print(f"{nombre}: {valor}")
+    
+    params = (orden_id, monto, "USD", monto, monto, 0.0, 0.0, 0.0, None, tasas['usd'], mensajero)
+    db.execute("SELECT mensajero FROM facturas LIMIT 1")
+    cursor = db.execute(SQL_INSERTAR_FACTURA, params)
+    verificacion = db.fetch_one(
+        "SELECT pago_eur, pago_transferencia, mensajero FROM facturas WHERE id = ?",
+        (cursor.lastrowid,)
+    )
+    print(f"Verificación - pago_eur: {verificacion[0]}, pago_transferencia: {verificacion[1]}, mensajero: {verificacion[2]}")
+    db.commit()
+    db.disconnect()
+    return True
+
+def medir(directorio, nombre, cantidad, rapido):
+    """
+    Registra 'cantidad' facturas en una base nueva y mide el tiempo
+    
+    Args:
+        directorio: Directorio temporal para la base de datos
+        nombre: Nombre del archivo de la base de datos
+        cantidad: Número de facturas a registrar
+        rapido: True para registrar_factura_rapida, False para la secuencia anterior
+    
+    Returns:
+        Registros por segundo
+    """
+    servicio = FacturacionService(os.path.join(directorio, nombre))
+    tasas = servicio.exchange_service.obtener_tasas_actuales()
+    
+    inicio = time.perf_counter()
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for i in range(cantidad):
+            orden_id = f"BENCH-{i:07d}"
+            if rapido:
+                servicio.registrar_factura_rapida(orden_id, 10.0, "USD", pago_usd=10.0,
+                                                  mensajero="benchmark", tasas=tasas)
+            else:
+                registrar_legado(servicio, orden_id, 10.0, "benchmark")
+    duracion = time.perf_counter() - inicio
+    
+    return cantidad / duracion if duracion > 0 else 0.0
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description='Benchmark del registro de facturas')
+    parser.add_argument('-n', '--cantidad', type=int, default=1000, help='Facturas a registrar por variante')
+    parser.add_argument('--directorio', help='Directorio para las bases de prueba (por defecto, uno temporal)')
+    
+    args = parser.parse_args()
+    
+    print("=== Benchmark de Registro de Facturas ===")
+    
+    with tempfile.TemporaryDirectory(dir=args.directorio) as directorio:
+        legado = medir(directorio, "legado.db", args.cantidad, rapido=False)
+        rapido = medir(directorio, "rapido.db", args.cantidad, rapido=True)
+    
+    print(f"Facturas por variante: {args.cantidad}")
+    print(f"Registro anterior:     {legado:10.1f} registros/s")
+    print(f"Registro rápido:       {rapido:10.1f} registros/s")
+    if legado > 0:
+        print(f"Mejora:                {rapido / legado:10.2f}x")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script para decodificar en lote las órdenes de un directorio de fotos.
+Las fotos de comprobantes enviadas por los mensajeros se decodifican en
+paralelo y se genera la lista de órdenes, marcando las que ya tienen factura.
+"""
+
+import os
+import sys
+import csv
+import argparse
+from pathlib import Path
+
+# Asegurar que los módulos de la aplicación se puedan importar
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.scanner_service import ScannerService
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description='Decodificar órdenes desde un directorio de fotos')
+    parser.add_argument('directorio', help='Directorio con las fotos de los comprobantes')
+    parser.add_argument('--procesos', type=int, help='Número de procesos (por defecto, uno por núcleo)')
+    parser.add_argument('--no-recursivo', action='store_true', help='No incluir subdirectorios')
+    parser.add_argument('--csv', help='Guardar la lista de órdenes en un archivo CSV')
+    
+    args = parser.parse_args()
+    
+    print("=== Decodificación de Fotos ===")
+    
+    if not os.path.isdir(args.directorio):
+        print(f"Error: No existe el directorio {args.directorio}")
+        return 1
+    
+    ordenes, errores = ScannerService().decodificar_fotos(args.directorio, args.procesos, not args.no_recursivo)
+    
+    for orden in ordenes:
+        marca = "YA FACTURADA" if orden['ya_facturada'] else "pendiente"
+        print(f"{orden['orden_id']:<30} {marca:<13} {os.path.basename(orden['archivo'])}")
+    
+    for archivo, mensaje in errores:
+        print(f"Aviso: {os.path.basename(archivo)}: {mensaje}")
+    
+    pendientes = sum(1 for orden in ordenes if not orden['ya_facturada'])
+    print(f"\nÓrdenes encontradas: {len(ordenes)} | Pendientes de facturar: {pendientes}")
+    
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as archivo:
+            writer = csv.DictWriter(archivo, fieldnames=['orden_id', 'ya_facturada', 'archivo'])
+            writer.writeheader()
+            writer.writerows(ordenes)
+        print(f"Lista guardada en: {args.csv}")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Servidor local de tasas de cambio para pruebas.
+Sustituye al origen real de tasas: responde en /tasas con un JSON
+{"usd": ..., "eur": ...} que puede variar con el tiempo, tardar en responder
+o fallar a propósito, para probar el proveedor HTTP y el actualizador.
+Con --archivo escribe además las tasas en un archivo (proveedor 'archivo').
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class EstadoTasas:
+    """Tasas actuales del servidor, con variación aleatoria opcional"""
+    
+    def __init__(self, usd, eur, variacion, cada_s):
+        """
+        Inicializa el estado
+        
+        Args:
+            usd: Tasa USD inicial
+            eur: Tasa EUR inicial
+            variacion: Variación máxima por paso (fracción, por ejemplo 0.01)
+            cada_s: Segundos entre variaciones
+        """
+        self.usd = usd
+        self.eur = eur
+        self.variacion = variacion
+        self.cada_s = cada_s
+        self.actualizado = datetime.now()
+        self.lock = threading.Lock()
+        self.ultimo_paso = time.monotonic()
+    
+    def tasas(self):
+        """Devuelve las tasas actuales, aplicando las variaciones pendientes"""
+        with self.lock:
+            if self.variacion and self.cada_s > 0:
+                while time.monotonic() - self.ultimo_paso >= self.cada_s:
+                    self.usd = round(self.usd * (1 + random.uniform(-self.variacion, self.variacion)), 2)
+                    self.eur = round(self.eur * (1 + random.uniform(-self.variacion, self.variacion)), 2)
+                    self.ultimo_paso += self.cada_s
+                    self.actualizado = datetime.now()
+            return {
+                "usd": self.usd,
+                "eur": self.eur,
+                "actualizado": self.actualizado.isoformat(timespec="seconds")
+            }
+
+def crear_manejador(estado, retraso_ms, tasa_fallos):
+    """
+    Crea la clase que atiende las peticiones HTTP
+    
+    Args:
+        estado: EstadoTasas compartido
+        retraso_ms: Retraso artificial de cada respuesta
+        tasa_fallos: Probabilidad de responder 503
+    
+    Returns:
+        Subclase de BaseHTTPRequestHandler
+    """
+    class ManejadorTasas(BaseHTTPRequestHandler):
+        """Atiende GET /tasas"""
+        
+        def do_GET(self):
+            """Responde con las tasas actuales (o con un fallo simulado)"""
+            if self.path.rstrip("/") != "/tasas":
+                self.send_error(404)
+                return
+            
+            if retraso_ms:
+                time.sleep(retraso_ms / 1000.0)
+            
+            if random.random() < tasa_fallos:
+                self.send_error(503, "Fallo simulado")
+                return
+            
+            cuerpo = json.dumps(estado.tasas()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+        
+        def log_message(self, formato, *args):
+            """Registro breve de cada petición"""
+            print(f"{self.address_string()} {formato % args}")
+    
+    return ManejadorTasas
+
+def escribir_archivo(estado, ruta, cada_s, detener):
+    """Escribe periódicamente las tasas en un archivo JSON (reemplazándolo de una vez)"""
+    while not detener.is_set():
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(estado.tasas(), archivo)
+        os.replace(temporal, ruta)
+        detener.wait(cada_s)
+
+def main():
+    """Función principal del script"""
+    parser = argparse.ArgumentParser(description='Servidor local de tasas de cambio para pruebas')
+    parser.add_argument('--puerto', type=int, default=8765, help='Puerto HTTP (por defecto 8765)')
+    parser.add_argument('--usd', type=float, default=350.0, help='Tasa USD inicial')
+    parser.add_argument('--eur', type=float, default=370.0, help='Tasa EUR inicial')
+    parser.add_argument('--variacion', type=float, default=0.0,
+                        help='Variación máxima por paso, como fracción (por ejemplo 0.01)')
+    parser.add_argument('--cada', type=float, default=60.0, help='Segundos entre variaciones')
+    parser.add_argument('--retraso-ms', type=int, default=0, help='Retraso de cada respuesta (para probar timeouts)')
+    parser.add_argument('--fallos', type=float, default=0.0, help='Probabilidad de responder 503')
+    parser.add_argument('--archivo', help='Escribir también las tasas en este archivo JSON')
+    
+    args = parser.parse_args()
+    
+    estado = EstadoTasas(args.usd, args.eur, args.variacion, args.cada)
+    detener = threading.Event()
+    
+    if args.archivo:
+        hilo = threading.Thread(target=escribir_archivo, args=(estado, args.archivo, min(args.cada, 5), detener),
+                                daemon=True)
+        hilo.start()
+        print(f"Escribiendo tasas en: {args.archivo}")
+    
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto),
+                                   crear_manejador(estado, args.retraso_ms, args.fallos))
+    print(f"=== Servidor de Tasas en http://127.0.0.1:{args.puerto}/tasas ===")
+    print("Configure exchange_rate.proveedor = 'http' y exchange_rate.origen con esta dirección")
+    
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo servidor")
+    finally:
+        detener.set()
+        servidor.server_close()
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
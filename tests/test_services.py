@@ -0,0 +1,852 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de los servicios.
+"""
+
+import datetime
+import logging
+import random
+import sqlite3
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from app.database import db_manager, instrumentacion
+from app.database.db_manager import DatabaseManager
+from app.services.arranque import ETAPAS, InicializadorArranque
+from app.services.cierre_dia import CierreDiaService
+from app.services.cola_facturas import ColaFacturas
+from app.services.exchange_rate import ExchangeRateService
+from app.services.facturacion import FacturacionService, FacturaDuplicadaError
+from app.services import historial_tasas, libro_caja
+from app.services.historial_tasas import formatear_instante
+from app.services.indice_ordenes import IndiceOrdenes, obtener_indice_ordenes
+from app.services.libro_caja import LibroCajaService
+from app.services.proveedores_tasas import (ActualizadorTasas, ProveedorArchivo, ProveedorHTTP, ProveedorTasas,
+                                             crear_proveedor)
+from app.services.salidas_service import SalidasService
+from app.utils import denominaciones, perfilado, registro
+from scripts.servidor_tasas import EstadoTasas, crear_manejador
+
+TASAS = {'usd': 400.0, 'eur': 440.0}
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """Base de datos temporal como ruta predeterminada de todos los servicios"""
+    ruta = str(tmp_path / "facturacion.db")
+    inicializar = DatabaseManager.__init__
+    monkeypatch.setattr(DatabaseManager, "__init__",
+                        lambda self, db_path=None: inicializar(self, db_path or ruta))
+    return ruta
+
+def facturar(servicio, orden_id, monto, moneda="USD"):
+    """Registra una factura pagada en su propia moneda"""
+    pago = {f"pago_{moneda.lower()}": monto}
+    return servicio.registrar_factura_rapida(orden_id, monto, moneda, mensajero="m", tasas=TASAS, **pago)
+
+def test_cierre_con_marca_no_incluye_arqueo_posterior(db_path):
+    """Un arqueo registrado entre la vista previa y el cierre queda fuera del cierre"""
+    facturacion = FacturacionService()
+    cierres = CierreDiaService()
+    
+    facturar(facturacion, "F1", 5)
+    facturar(facturacion, "F2", 2)
+    vista_previa = cierres.obtener_resumen_cierre()
+    
+    facturar(facturacion, "F3", 10)
+    facturar(facturacion, "F4", 25, "EUR")
+    arqueo = cierres.registrar_arqueo({'usd': {1: 17}, 'eur': {5: 5}}, "turno 2")
+    assert arqueo['success']
+    assert cierres.contar_posteriores_a_marca(vista_previa['marca']) == {'facturas': 2, 'salidas': 0}
+    
+    resultado = cierres.realizar_cierre_dia(7, 0, 0, marca=vista_previa['marca'])
+    assert resultado['success']
+    assert resultado['total_usd'] == 7
+    assert resultado['num_arqueos'] == 0
+    assert resultado['diferencias_turno'] == {'usd': 0, 'eur': 0, 'cup': 0}
+    
+    # El arqueo sigue abierto y su saldo esperado ya no incluye lo cerrado
+    assert [a['id'] for a in cierres.obtener_arqueos_abiertos()] == [arqueo['id']]
+    saldo = cierres.obtener_resumen_cierre()
+    assert saldo['usd']['balance'] == 10
+    assert saldo['eur']['balance'] == 25
+    assert saldo['num_facturas'] == 2
+
+def test_cierres_pendientes_asignan_arqueos_por_dia(db_path):
+    """Los arqueos de días anteriores van a su cierre de recuperación; los de hoy siguen abiertos"""
+    facturacion = FacturacionService()
+    cierres = CierreDiaService()
+    
+    facturar(facturacion, "F1", 5)
+    arqueo_ayer = cierres.registrar_arqueo({'usd': {1: 5}}, "ayer")
+    
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("UPDATE facturas SET fecha = datetime('now', '-1 day')")
+    conexion.execute("UPDATE arqueos SET fecha = datetime('now', '-1 day')")
+    conexion.commit()
+    
+    facturar(facturacion, "F2", 10)
+    arqueo_hoy = cierres.registrar_arqueo({'usd': {1: 15}}, "hoy")
+    
+    resultado = cierres.realizar_cierres_pendientes()
+    assert resultado['success'] and len(resultado['cierres']) == 1
+    
+    asignados = dict(conexion.execute("SELECT id, cierre_id FROM arqueos").fetchall())
+    conexion.close()
+    assert asignados[arqueo_ayer['id']] is not None
+    assert asignados[arqueo_hoy['id']] is None
+    
+    saldo = cierres.obtener_resumen_cierre()
+    assert saldo['usd']['balance'] == 10
+    assert saldo['num_facturas'] == 1
+    
+    cierre = cierres.realizar_cierre_dia(10, 0, 0)
+    assert cierre['num_arqueos'] == 1
+    assert cierre['diferencias_turno'] == {'usd': 0, 'eur': 0, 'cup': 0}
+
+def resolver_directo(objetivo, billetes):
+    """Programación dinámica sobre todo el rango, sin reducir el objetivo"""
+    final = denominaciones._capas(objetivo, tuple(reversed(billetes)))[-1]
+    valor = max(v for v in range(objetivo + 1) if final[v] != denominaciones._INFINITO)
+    return valor, final[valor]
+
+@pytest.mark.parametrize("objetivo, billetes", [
+    (32507, ((100, 2), (50, 0), (10, 37), (5, 8), (2, None), (1, 0))),
+    (22756, ((1000, 3), (500, 14), (200, 49), (100, 42), (50, 1), (20, 49), (10, 1), (5, 3), (3, 1), (1, 3))),
+    (45000, ((1000, None), (500, 2), (200, 1), (100, 5), (50, None), (20, 3), (10, 0), (5, 4), (3, 2), (1, 1))),
+])
+def test_resolver_denominaciones_escasas_es_exacto(objetivo, billetes):
+    """Por encima de LIMITE_DIRECTO con billetes escasos coincide con la programación dinámica completa"""
+    assert objetivo > denominaciones.LIMITE_DIRECTO
+    valor, cantidad, cantidades = denominaciones._resolver(objetivo, billetes)
+    assert (valor, cantidad) == resolver_directo(objetivo, billetes)
+    assert valor == sum(v * n for (v, _), n in zip(billetes, cantidades))
+    assert all(limite is None or n <= limite for (_, limite), n in zip(billetes, cantidades))
+
+def test_resolver_denominaciones_aleatorio_es_exacto():
+    """Objetivos y disponibilidades aleatorios coinciden con la programación dinámica completa"""
+    aleatorio = random.Random(39)
+    valores = (1000, 500, 200, 100, 50, 20, 10, 5, 3, 1)
+    for _ in range(8):
+        billetes = tuple((v, aleatorio.choice([None, 0, 1, 2, 5, 20, 50])) for v in valores)
+        objetivo = aleatorio.randint(denominaciones.LIMITE_DIRECTO + 1, 2 * denominaciones.LIMITE_DIRECTO)
+        assert denominaciones._resolver(objetivo, billetes)[:2] == resolver_directo(objetivo, billetes)
+
+def test_tasas_actuales_registradas_por_otra_terminal(db_path):
+    """Las tasas que escribe otra conexión se ven sin reiniciar y también en las funciones SQL"""
+    servicio = ExchangeRateService()
+    assert servicio.actualizar_tasas(400, 440, datetime.datetime(2026, 1, 1, 8))
+    assert servicio.obtener_tasas_actuales() == {'usd': 400, 'eur': 440}
+    
+    conexion = sqlite3.connect(db_path)
+    conexion.execute(
+        "INSERT INTO tasas_historial (vigente_desde, usd_valor, eur_valor) VALUES (CURRENT_TIMESTAMP, 410, 450)"
+    )
+    conexion.commit()
+    conexion.close()
+    
+    assert servicio.obtener_tasas_actuales() == {'usd': 410, 'eur': 450}
+    servicio.db.connect()
+    assert servicio.db.fetch_one("SELECT tasa_cup('USD', NULL)")[0] == 410
+    servicio.db.disconnect()
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("2026-03-01 10:20:30", "2026-03-01 10:20:30"),
+    ("2026-03-01T10:20:30.250", "2026-03-01 10:20:30"),
+    ("2026-03-01 10:20:30+02:00", "2026-03-01 08:20:30"),
+    ("2026-03-01T10:20Z", "2026-03-01 10:20:00"),
+])
+def test_formatear_instante_texto_con_hora(texto, esperado):
+    """El texto con hora se interpreta como ISO 8601 (sin zona horaria, en UTC)"""
+    assert formatear_instante(texto) == esperado
+
+def test_indice_ordenes_se_carga_una_vez_entre_hilos(db_path, monkeypatch):
+    """Varios hilos que piden el índice sin cargar provocan una sola carga completa"""
+    facturar(FacturacionService(), "F1", 5)
+    
+    cargas = []
+    cargar = IndiceOrdenes.cargar
+    def cargar_lento(self, db):
+        cargas.append(threading.current_thread().name)
+        time.sleep(0.05)
+        cargar(self, db)
+    monkeypatch.setattr(IndiceOrdenes, "cargar", cargar_lento)
+    
+    db = DatabaseManager()
+    obtener_indice_ordenes(db).cargado = False
+    cargas.clear()
+    hilos = [threading.Thread(target=obtener_indice_ordenes, args=(db,)) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    assert len(cargas) == 1
+    assert db.connection is None
+    assert obtener_indice_ordenes(db).existe("F1", lambda orden_id: False)
+
+def test_corregir_tasa_facturas_solo_facturas_abiertas(db_path):
+    """La corrección previsualiza sin cambios, omite las cerradas y no toca el historial salvo que se pida"""
+    ahora = datetime.datetime.now()
+    tasas = ExchangeRateService()
+    assert tasas.actualizar_tasas(400, 440, ahora - datetime.timedelta(minutes=30))
+    assert tasas.actualizar_tasas(405, 445, ahora - datetime.timedelta(minutes=10))
+    
+    facturacion = FacturacionService()
+    facturar(facturacion, "F1", 4000, "CUP")
+    facturar(facturacion, "F2", 4000, "CUP")
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("UPDATE facturas SET cerrada = 1 WHERE orden_id = 'F1'")
+    conexion.commit()
+    
+    def equivalentes():
+        return dict(conexion.execute("SELECT orden_id, monto_equivalente FROM facturas").fetchall())
+    
+    def historial():
+        return conexion.execute("SELECT * FROM tasas_historial ORDER BY vigente_desde").fetchall()
+    
+    historial_antes = historial()
+    desde, hasta = ahora - datetime.timedelta(hours=1), ahora + datetime.timedelta(minutes=1)
+    
+    vista = facturacion.corregir_tasa_facturas(desde, hasta, 500, 550)
+    assert vista['success'] and not vista['aplicada']
+    assert vista['cantidad'] == 1
+    assert vista['por_moneda']['CUP'] == {'cantidad': 1, 'equivalente_actual': 10.0, 'equivalente_nuevo': 8.0}
+    assert [(t['usd'], t['eur']) for t in vista['tasas_historial']] == [(400, 440), (405, 445)]
+    assert equivalentes() == {'F1': 10.0, 'F2': 10.0}
+    
+    aplicada = facturacion.corregir_tasa_facturas(desde, hasta, 500, 550, aplicar=True)
+    assert aplicada['aplicada'] and aplicada['cantidad'] == 1
+    assert equivalentes() == {'F1': 10.0, 'F2': 8.0}
+    assert historial() == historial_antes
+    
+    con_historial = facturacion.corregir_tasa_facturas(desde, hasta, 500, 550, aplicar=True,
+                                                       corregir_historial=True)
+    assert con_historial['aplicada']
+    assert [fila[1:] for fila in historial()] == [(500, 550), (500, 550)]
+    assert tasas.obtener_tasas_actuales() == {'usd': 500, 'eur': 550}
+    conexion.close()
+
+def test_importar_tasas_csv_con_sufijo_z(db_path, tmp_path):
+    """Las fechas del CSV con sufijo 'Z' se importan como UTC"""
+    ruta = tmp_path / "tasas.csv"
+    ruta.write_text("vigente_desde,usd,eur\n2026-02-01T08:00:00Z,420,460\n2026-02-02 09:30,425,465\n",
+                    encoding="utf-8")
+    
+    servicio = ExchangeRateService()
+    assert servicio.importar_tasas_csv(str(ruta)) == (2, [])
+    assert servicio.obtener_tasas_en("2026-02-01 08:00:00") == {'usd': 420, 'eur': 460}
+
+def test_estadisticas_convierten_con_la_tasa_de_cada_fecha(db_path):
+    """Cada factura se convierte con la tasa vigente al emitirla (antes de la primera, con la primera)"""
+    tasas = ExchangeRateService()
+    assert tasas.actualizar_tasas(400, 440, "2026-01-01 08:00:00")
+    assert tasas.actualizar_tasas(500, 550, "2026-02-01 08:00:00")
+    
+    historial = historial_tasas.obtener_historial_tasas(tasas.db)
+    assert historial.tasas_en("2025-12-31 10:00:00") == {'usd': 400, 'eur': 440}
+    assert historial.tasas_en("2026-02-01 07:59:59") == {'usd': 400, 'eur': 440}
+    assert historial.tasas_en("2026-02-01 08:00:00") == {'usd': 500, 'eur': 550}
+    
+    facturacion = FacturacionService()
+    facturar(facturacion, "F1", 4000, "CUP")
+    facturar(facturacion, "F2", 4000, "CUP")
+    facturar(facturacion, "F3", 5000, "CUP")
+    facturar(facturacion, "F4", 22, "EUR")
+    fechas = {"F1": "2025-12-31 10:00:00", "F2": "2026-01-15 10:00:00",
+              "F3": "2026-02-15 10:00:00", "F4": "2026-02-15 11:00:00"}
+    conexion = sqlite3.connect(db_path)
+    conexion.executemany("UPDATE facturas SET fecha = ? WHERE orden_id = ?",
+                         [(fecha, orden) for orden, fecha in fechas.items()])
+    conexion.commit()
+    conexion.close()
+    
+    estadisticas = facturacion.obtener_estadisticas_facturas_por_fecha("2025-12-01", "2026-02-28")
+    assert estadisticas['cantidad_total'] == 4
+    assert estadisticas['total_cup'] == 13000
+    # 4000/400 + 4000/400 + 5000/500 + 22 EUR * 550/500
+    assert estadisticas['total_equivalente_usd'] == pytest.approx(30 + 24.2)
+    
+    # Una tasa nueva no cambia los totales de días anteriores
+    assert tasas.actualizar_tasas(800, 880)
+    repetidas = facturacion.obtener_estadisticas_facturas_por_fecha("2025-12-01", "2026-02-28")
+    assert repetidas['total_equivalente_usd'] == pytest.approx(estadisticas['total_equivalente_usd'])
+
+def test_funciones_conversion_sin_consulta_por_fila(db_path, monkeypatch):
+    """Sin historial cargado, to_usd carga las tasas una vez en lugar de abrir una conexión por fila"""
+    facturacion = FacturacionService()
+    for numero in range(20):
+        facturar(facturacion, f"F{numero}", 4000, "CUP")
+    
+    historial_tasas._historiales.clear()
+    conexiones = []
+    conectar = sqlite3.connect
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: conexiones.append(args) or conectar(*args, **kwargs))
+    
+    db = DatabaseManager()
+    db.connect()
+    total = db.fetch_one("SELECT SUM(to_usd(monto, moneda, fecha)) FROM facturas")[0]
+    db.disconnect()
+    
+    assert total == pytest.approx(20 * 4000 / 350)
+    assert len(conexiones) <= 3
+
+def fechar_movimientos(db_path, fechas):
+    """Asigna fechas (UTC) a los movimientos del libro de caja en orden de id"""
+    conexion = sqlite3.connect(db_path)
+    ids = [fila[0] for fila in conexion.execute("SELECT id FROM movimientos_caja ORDER BY id")]
+    conexion.executemany("UPDATE movimientos_caja SET fecha = ? WHERE id = ?", zip(fechas, ids[-len(fechas):]))
+    conexion.commit()
+    conexion.close()
+
+def test_libro_caja_saldo_en_instante_y_checkpoint(db_path):
+    """saldo_en responde a mitad del día y parte del checkpoint anterior al instante"""
+    facturacion = FacturacionService()
+    libro = LibroCajaService()
+    facturar(facturacion, "F1", 5)
+    facturar(facturacion, "F2", 10)
+    fechar_movimientos(db_path, ["2026-05-01 10:00:00", "2026-05-01 15:00:00"])
+    assert libro.crear_checkpoint() is not None
+    
+    facturar(facturacion, "F3", 20)
+    fechar_movimientos(db_path, ["2026-05-01 18:00:00"])
+    
+    assert libro.saldo_en("2026-05-01 12:00:00")['usd'] == 5
+    assert libro.saldo_en("2026-05-01 16:00:00")['usd'] == 15
+    assert libro.saldo_en()['usd'] == 35
+    assert libro.saldo_en(cuenta=libro_caja.CUENTA_VENTAS)['usd'] == -35
+    
+    # Después del checkpoint se usan sus saldos guardados, no los movimientos anteriores
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("UPDATE movimientos_caja SET monto = 1000 WHERE fecha = '2026-05-01 10:00:00'")
+    conexion.commit()
+    conexion.close()
+    assert libro.saldo_en("2026-05-01 16:00:00")['usd'] == 15
+    assert libro.saldo_en("2026-05-01 12:00:00")['usd'] == 1000
+
+def test_libro_caja_historial_ordenado_con_saldo_acumulado(db_path):
+    """historial devuelve los movimientos posteriores al inicio en orden, con el saldo de cada uno"""
+    facturacion = FacturacionService()
+    libro = LibroCajaService()
+    for orden_id, monto in (("F1", 5), ("F2", 10), ("F3", 20)):
+        facturar(facturacion, orden_id, monto)
+    fechar_movimientos(db_path, ["2026-05-01 10:00:00", "2026-05-01 15:00:00", "2026-05-01 18:00:00"])
+    
+    historial = libro.historial(libro_caja.CUENTA_CAJA, "usd", "2026-05-01 12:00:00")
+    assert historial['saldo_inicial'] == 5
+    assert historial['saldo_final'] == 35
+    assert [(m['fecha'], m['importe'], m['saldo']) for m in historial['movimientos']] == [
+        ("2026-05-01 15:00:00", 10, 15),
+        ("2026-05-01 18:00:00", 20, 35),
+    ]
+    assert {m['contrapartida'] for m in historial['movimientos']} == {libro_caja.CUENTA_VENTAS}
+    
+    hasta = libro.historial(libro_caja.CUENTA_CAJA, "usd", "2026-05-01 00:00:00", "2026-05-01 15:00:00")
+    assert [m['saldo'] for m in hasta['movimientos']] == [5, 15]
+
+def encolar(cola, orden_id, monto, notificaciones=None):
+    """Encola una factura pagada en USD y guarda su notificación"""
+    al_confirmar = None if notificaciones is None else (lambda *args: notificaciones.append(args))
+    return cola.encolar(orden_id, monto, "USD", pago_usd=monto, mensajero="m", tasas=TASAS,
+                        al_confirmar=al_confirmar)
+
+def facturas_guardadas(db_path):
+    """orden_id de las facturas en la base de datos, en orden de id"""
+    conexion = sqlite3.connect(db_path)
+    ordenes = [fila[0] for fila in conexion.execute("SELECT orden_id FROM facturas ORDER BY id")]
+    conexion.close()
+    return ordenes
+
+def test_cola_facturas_agrupa_en_un_lote(db_path, monkeypatch):
+    """Las facturas encoladas dentro del intervalo se confirman en un mismo commit"""
+    lotes = []
+    guardar_lote = ColaFacturas._guardar_lote
+    monkeypatch.setattr(ColaFacturas, "_guardar_lote",
+                        lambda self, conexion, lote: lotes.append(len(lote)) or guardar_lote(self, conexion, lote))
+    
+    cola = ColaFacturas(intervalo_ms=300)
+    notificaciones = []
+    tickets = [encolar(cola, f"F{numero}", 5, notificaciones) for numero in range(3)]
+    cola.vaciar()
+    
+    assert lotes == [3]
+    assert [(ticket, orden_id, error) for ticket, orden_id, _, error in notificaciones] == \
+        [(tickets[0], "F0", ""), (tickets[1], "F1", ""), (tickets[2], "F2", "")]
+    assert all(factura_id for _, _, factura_id, _ in notificaciones)
+    assert cola.cantidad_pendiente() == 0
+    cola.detener()
+
+def test_cola_facturas_rechaza_orden_pendiente(db_path, monkeypatch):
+    """Una orden encolada y aún no escrita se rechaza como duplicada"""
+    liberar = threading.Event()
+    guardar_lote = ColaFacturas._guardar_lote
+    monkeypatch.setattr(ColaFacturas, "_guardar_lote",
+                        lambda self, conexion, lote: liberar.wait(5) and guardar_lote(self, conexion, lote))
+    
+    cola = ColaFacturas(intervalo_ms=1)
+    encolar(cola, "F1", 5)
+    assert cola.cantidad_pendiente() == 1
+    with pytest.raises(FacturaDuplicadaError):
+        encolar(cola, "F1", 5)
+    
+    liberar.set()
+    cola.detener()
+    assert facturas_guardadas(db_path) == ["F1"]
+    
+    # Ya escrita, también la rechaza una cola nueva
+    otra = ColaFacturas()
+    with pytest.raises(FacturaDuplicadaError):
+        encolar(otra, "F1", 5)
+    otra.detener()
+
+def test_cola_facturas_detener_escribe_lo_pendiente(db_path):
+    """vaciar y detener no terminan hasta que las facturas encoladas están en disco"""
+    cola = ColaFacturas(intervalo_ms=50)
+    encolar(cola, "F1", 5)
+    cola.vaciar()
+    assert facturas_guardadas(db_path) == ["F1"]
+    
+    encolar(cola, "F2", 5)
+    encolar(cola, "F3", 5)
+    cola.detener()
+    assert facturas_guardadas(db_path) == ["F1", "F2", "F3"]
+    assert not cola.hilo.is_alive()
+
+def test_cola_facturas_error_descarta_la_orden(db_path):
+    """Una factura que falla por otro motivo se notifica y deja de figurar en el índice"""
+    cola = ColaFacturas(intervalo_ms=100)
+    conexion = sqlite3.connect(db_path)
+    conexion.execute(
+        "CREATE TRIGGER rechazar_mala BEFORE INSERT ON facturas WHEN NEW.orden_id = 'MALA' "
+        "BEGIN SELECT RAISE(ABORT, 'factura rechazada'); END"
+    )
+    conexion.commit()
+    conexion.close()
+    
+    notificaciones = []
+    encolar(cola, "BUENA", 5, notificaciones)
+    encolar(cola, "MALA", 5, notificaciones)
+    cola.vaciar()
+    
+    errores = {orden_id: error for _, orden_id, _, error in notificaciones}
+    assert errores["BUENA"] == ""
+    assert "factura rechazada" in errores["MALA"]
+    assert facturas_guardadas(db_path) == ["BUENA"]
+    assert "MALA" not in cola.indice.recientes and "MALA" not in cola.indice.pendientes
+    assert not cola.servicio.verificar_orden_id_existente("MALA", exacto=True)
+    cola.detener()
+
+def test_salida_sin_saldo_suficiente_se_rechaza(db_path):
+    """Una salida mayor que el saldo de la caja no se registra"""
+    facturar(FacturacionService(), "F1", 5)
+    salidas = SalidasService()
+    
+    rechazada = salidas.registrar_salida(monto_usd=10, destinatario="d", autorizado_por="a")
+    assert not rechazada['success']
+    assert "USD" in rechazada['message']
+    assert salidas.obtener_saldo_caja()['num_salidas'] == 0
+    
+    aceptada = salidas.registrar_salida(monto_usd=3, destinatario="d", autorizado_por="a")
+    assert aceptada['success']
+    assert salidas.obtener_saldo_caja()['usd']['balance'] == 2
+    assert not salidas.registrar_salida(monto_usd=3, destinatario="d", autorizado_por="a")['success']
+
+def saldo_recalculado(db_path):
+    """Entradas y salidas de la caja abierta sumando las tablas (sin saldo_caja)"""
+    conexion = sqlite3.connect(db_path)
+    entradas = conexion.execute(
+        "SELECT TOTAL(pago_usd), TOTAL(pago_eur), TOTAL(pago_cup), COUNT(*) FROM facturas WHERE cerrada = 0"
+    ).fetchone()
+    salidas = conexion.execute(
+        "SELECT TOTAL(monto_usd), TOTAL(monto_eur), TOTAL(monto_cup), COUNT(*) FROM salidas_caja WHERE cerrada = 0"
+    ).fetchone()
+    conexion.close()
+    return entradas, salidas
+
+def saldo_mantenido(salidas):
+    """Los mismos valores leídos de la fila que mantienen los triggers"""
+    saldo = salidas.obtener_saldo_caja()
+    return (
+        (saldo['usd']['entradas'], saldo['eur']['entradas'], saldo['cup']['entradas'], saldo['num_facturas']),
+        (saldo['usd']['salidas'], saldo['eur']['salidas'], saldo['cup']['salidas'], saldo['num_salidas']),
+    )
+
+def test_saldo_caja_sigue_ediciones_y_borrados(db_path):
+    """saldo_caja coincide con las tablas tras editar pagos, borrar filas y cerrar"""
+    facturacion = FacturacionService()
+    salidas = SalidasService()
+    facturar(facturacion, "F1", 5)
+    facturar(facturacion, "F2", 20, "EUR")
+    facturar(facturacion, "F3", 4000, "CUP")
+    assert salidas.registrar_salida(monto_usd=2, monto_cup=1000, destinatario="d", autorizado_por="a")['success']
+    assert saldo_mantenido(salidas) == saldo_recalculado(db_path)
+    
+    conexion = sqlite3.connect(db_path)
+    (f1,) = conexion.execute("SELECT id FROM facturas WHERE orden_id = 'F1'").fetchone()
+    assert facturacion.actualizar_pagos_factura(f1, 3, 0, 800, 0)
+    assert saldo_mantenido(salidas) == saldo_recalculado(db_path)
+    assert salidas.obtener_saldo_caja()['usd']['balance'] == 1
+    
+    conexion.execute("DELETE FROM facturas WHERE orden_id = 'F2'")
+    conexion.execute("UPDATE salidas_caja SET monto_cup = 500")
+    conexion.commit()
+    assert saldo_mantenido(salidas) == saldo_recalculado(db_path)
+    
+    conexion.execute("UPDATE facturas SET cerrada = 1 WHERE orden_id = 'F3'")
+    conexion.execute("DELETE FROM salidas_caja")
+    conexion.commit()
+    conexion.close()
+    assert saldo_mantenido(salidas) == saldo_recalculado(db_path)
+    assert saldo_mantenido(salidas) == ((3, 0, 800, 1), (0, 0, 0, 0))
+
+def test_migracion_calcula_saldo_y_libro_de_una_base_existente(db_path):
+    """Una base sin saldo_caja ni libro los obtiene de las facturas y salidas existentes"""
+    facturacion = FacturacionService()
+    facturar(facturacion, "F1", 5)
+    facturar(facturacion, "F2", 4000, "CUP")
+    assert SalidasService().registrar_salida(monto_usd=2, destinatario="d", autorizado_por="a")['success']
+    
+    # Dejar la base como antes de la migración
+    conexion = sqlite3.connect(db_path)
+    disparadores = [fila[0] for fila in conexion.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND (name LIKE 'trg_saldo%' OR name LIKE 'trg_libro%')"
+    )]
+    assert disparadores
+    for nombre in disparadores:
+        conexion.execute(f"DROP TRIGGER {nombre}")
+    for tabla in ("saldo_caja", "movimientos_caja", "saldos_checkpoint", "checkpoints_caja"):
+        conexion.execute(f"DROP TABLE {tabla}")
+    conexion.commit()
+    
+    db_manager._bases_inicializadas.discard(db_path)
+    salidas = SalidasService()
+    assert saldo_mantenido(salidas) == saldo_recalculado(db_path)
+    
+    movimientos = conexion.execute(
+        "SELECT moneda, cuenta_debe, cuenta_haber, monto, origen FROM movimientos_caja ORDER BY id"
+    ).fetchall()
+    conexion.close()
+    assert sorted(movimientos) == sorted([
+        ("usd", "caja", "ventas", 5, "factura"),
+        ("cup", "caja", "ventas", 4000, "factura"),
+        ("usd", "salidas", "caja", 2, "salida"),
+    ])
+    assert LibroCajaService().saldo_en() == {'usd': 3, 'eur': 0, 'cup': 4000, 'transferencia': 0}
+
+def test_cierres_pendientes_un_cierre_por_dia(db_path):
+    """Cada día anterior recibe exactamente un cierre con sus totales; lo de hoy sigue abierto"""
+    facturacion = FacturacionService()
+    cierres = CierreDiaService()
+    facturar(facturacion, "A1", 5)
+    facturar(facturacion, "A2", 4000, "CUP")
+    facturar(facturacion, "B1", 10)
+    facturar(facturacion, "B2", 20, "EUR")
+    assert SalidasService().registrar_salida(monto_usd=4, destinatario="d", autorizado_por="a")['success']
+    facturar(facturacion, "H1", 7)
+    
+    conexion = sqlite3.connect(db_path)
+    conexion.execute("UPDATE facturas SET fecha = datetime('now', '-3 days') WHERE orden_id LIKE 'A%'")
+    conexion.execute("UPDATE facturas SET fecha = datetime('now', '-1 day') WHERE orden_id LIKE 'B%'")
+    conexion.execute("UPDATE salidas_caja SET fecha = datetime('now', '-1 day')")
+    conexion.commit()
+    hace_tres, ayer = [
+        conexion.execute(f"SELECT date('now', '{dias}', 'localtime')").fetchone()[0] for dias in ("-3 days", "-1 day")
+    ]
+    
+    assert cierres.obtener_dias_pendientes() == [
+        {'fecha': hace_tres, 'num_facturas': 2, 'num_salidas': 0},
+        {'fecha': ayer, 'num_facturas': 2, 'num_salidas': 1},
+    ]
+    
+    resultado = cierres.realizar_cierres_pendientes()
+    assert resultado['success'] and resultado['cierres'] == [hace_tres, ayer]
+    
+    filas = conexion.execute(
+        "SELECT fecha, total_usd, total_eur, total_cup, total_transferencia, num_facturas, tipo "
+        "FROM cierres_dia ORDER BY fecha"
+    ).fetchall()
+    assert filas == [
+        (hace_tres, 5, 0, 4000, 0, 2, 'recuperacion'),
+        (ayer, 6, 20, 0, 0, 2, 'recuperacion'),
+    ]
+    
+    abiertas = conexion.execute("SELECT orden_id, dia_id FROM facturas WHERE cerrada = 0").fetchall()
+    asignadas = dict(conexion.execute(
+        "SELECT f.orden_id, c.fecha FROM facturas f JOIN cierres_dia c ON c.id = f.dia_id"
+    ).fetchall())
+    conexion.close()
+    assert abiertas == [("H1", None)]
+    assert asignadas == {"A1": hace_tres, "A2": hace_tres, "B1": ayer, "B2": ayer}
+    
+    assert cierres.obtener_dias_pendientes() == []
+    assert not cierres.realizar_cierres_pendientes()['success']
+    assert cierres.obtener_resumen_cierre()['usd']['balance'] == 7
+
+@pytest.fixture
+def servidor_tasas():
+    """Servidor de tasas de scripts/servidor_tasas.py en un puerto libre; devuelve (url, estado)"""
+    estado = EstadoTasas(410.0, 450.0, 0.0, 60.0)
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), crear_manejador(estado, 0, 0.0))
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}/tasas", estado
+    servidor.shutdown()
+    servidor.server_close()
+    hilo.join()
+
+def test_proveedor_tasas_es_abstracto():
+    """Un proveedor sin obtener() no se puede instanciar; crear_proveedor elige la subclase"""
+    with pytest.raises(TypeError):
+        ProveedorTasas()
+    
+    assert isinstance(crear_proveedor("archivo", "tasas.json"), ProveedorArchivo)
+    assert isinstance(crear_proveedor("HTTP", "http://127.0.0.1/tasas"), ProveedorHTTP)
+    assert crear_proveedor("http", "") is None
+    assert crear_proveedor(None, "tasas.json") is None
+
+def test_proveedor_archivo_json_y_csv(tmp_path):
+    """El JSON se relee solo si cambia; del CSV se toma la última fila; las tasas no positivas se rechazan"""
+    ruta = tmp_path / "tasas.json"
+    ruta.write_text('{"usd": 410, "eur": 450}', encoding="utf-8")
+    proveedor = ProveedorArchivo(str(ruta))
+    assert proveedor.obtener(1) == {'usd': 410, 'eur': 450}
+    
+    ruta.write_text('{"usd": 420, "eur": 460, "actualizado": "2026-01-01T08:00:00"}', encoding="utf-8")
+    assert proveedor.obtener(1) == {'usd': 420, 'eur': 460}
+    
+    ruta_csv = tmp_path / "tasas.csv"
+    ruta_csv.write_text("usd_valor,eur_valor\n400,440\n430,470\n", encoding="utf-8")
+    assert ProveedorArchivo(str(ruta_csv)).obtener(1) == {'usd': 430, 'eur': 470}
+    
+    ruta.write_text('{"usd": 0, "eur": 460}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        proveedor.obtener(1)
+
+def test_proveedor_http_con_servidor_de_tasas(db_path, servidor_tasas):
+    """El actualizador registra las tasas del servidor local y avisa solo cuando cambian"""
+    url, estado = servidor_tasas
+    proveedor = ProveedorHTTP(url)
+    assert proveedor.obtener(2) == {'usd': 410, 'eur': 450}
+    with pytest.raises(Exception):
+        ProveedorHTTP(url.replace("/tasas", "/otra")).obtener(2)
+    
+    servicio = ExchangeRateService()
+    actualizadas = threading.Event()
+    actualizador = ActualizadorTasas(servicio, proveedor, intervalo_s=60, timeout_s=2,
+                                     al_actualizar=actualizadas.set)
+    try:
+        assert actualizadas.wait(5)
+        assert servicio.obtener_tasas_actuales() == {'usd': 410, 'eur': 450}
+        
+        # Las mismas tasas no se vuelven a registrar
+        actualizadas.clear()
+        actualizador._consultar()
+        assert actualizador.ultimo_error is None and not actualizador.vencidas()
+        assert not actualizadas.is_set()
+        
+        estado.usd = 415.0
+        actualizador._consultar()
+        assert actualizadas.is_set()
+        assert servicio.obtener_tasas_actuales() == {'usd': 415, 'eur': 450}
+    finally:
+        actualizador.detener()
+
+def test_pestanas_diferidas_se_construyen_al_usarlas(monkeypatch):
+    """Las pestañas secundarias se construyen una sola vez, al usarlas, en la posición de su marcador"""
+    QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from app.ui.main_window import MainWindow
+    aplicacion = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    
+    class Ventana:
+        """Solo la gestión de pestañas diferidas de MainWindow"""
+        agregar_pestana_diferida = MainWindow.agregar_pestana_diferida
+        obtener_pestana = MainWindow.obtener_pestana
+        pestana_construida = MainWindow.pestana_construida
+        al_cambiar_pestana = MainWindow.al_cambiar_pestana
+        salidas_tab = MainWindow.salidas_tab
+        reportes_tab = MainWindow.reportes_tab
+        
+        def __init__(self):
+            self.tabs = QtWidgets.QTabWidget()
+            self.pestanas = {}
+            self.pestanas_diferidas = {}
+    
+    construidas = []
+    def fabrica(atributo):
+        def crear():
+            construidas.append(atributo)
+            return QtWidgets.QWidget()
+        return crear
+    
+    ventana = Ventana()
+    ventana.tabs.addTab(QtWidgets.QWidget(), "Facturación")
+    ventana.agregar_pestana_diferida("salidas_tab", "Salidas de Caja", fabrica("salidas_tab"))
+    ventana.agregar_pestana_diferida("reportes_tab", "Reportes", fabrica("reportes_tab"))
+    ventana.tabs.currentChanged.connect(ventana.al_cambiar_pestana)
+    assert ventana.tabs.count() == 3 and construidas == []
+    assert ventana.pestana_construida("reportes_tab") is None
+    
+    # Desde un menú: se construye sin cambiar la pestaña activa
+    reportes = ventana.reportes_tab
+    assert ventana.reportes_tab is reportes and construidas == ["reportes_tab"]
+    assert ventana.tabs.indexOf(reportes) == 2 and ventana.tabs.tabText(2) == "Reportes"
+    assert ventana.tabs.currentIndex() == 0
+    
+    # Al activarla: se construye tras devolver el control al bucle de eventos
+    ventana.tabs.setCurrentIndex(1)
+    assert construidas == ["reportes_tab"]
+    aplicacion.processEvents()
+    assert construidas == ["reportes_tab", "salidas_tab"]
+    assert ventana.tabs.currentWidget() is ventana.pestana_construida("salidas_tab")
+    assert ventana.tabs.count() == 3
+
+def test_arranque_ejecuta_las_etapas_en_orden(db_path):
+    """Cada etapa avisa al empezar y al terminar, en orden; la de cierres devuelve su estado"""
+    eventos = []
+    resultados = {}
+    def completar(nombre, resultado):
+        eventos.append(("fin", nombre))
+        resultados[nombre] = resultado
+    
+    arranque = InicializadorArranque(lambda nombre, texto: eventos.append(("inicio", nombre)), completar,
+                                     lambda nombre, mensaje: eventos.append(("error", nombre)))
+    arranque.iniciar()
+    arranque.hilo.join(10)
+    
+    nombres = [nombre for nombre, _ in ETAPAS]
+    assert nombres == ["base_datos", "tasas", "ordenes", "cierres"]
+    assert eventos == [(evento, nombre) for nombre in nombres for evento in ("inicio", "fin")]
+    assert set(arranque.duraciones) == set(nombres)
+    assert arranque.db.db_path == db_path
+    assert resultados["cierres"] == {'hay_cierre': False, 'ultimo_cierre': None, 'dias_pendientes': []}
+
+def test_arranque_se_detiene_en_la_etapa_que_falla(db_path, monkeypatch):
+    """Si una etapa falla se avisa con su nombre y las siguientes no se ejecutan"""
+    def fallar(self):
+        raise RuntimeError("índice dañado")
+    monkeypatch.setattr(InicializadorArranque, "_etapa_ordenes", fallar)
+    
+    eventos = []
+    arranque = InicializadorArranque(lambda nombre, texto: eventos.append(("inicio", nombre)),
+                                     lambda nombre, resultado: eventos.append(("fin", nombre)),
+                                     lambda nombre, mensaje: eventos.append(("error", nombre, mensaje)))
+    arranque.iniciar()
+    arranque.hilo.join(10)
+    
+    assert eventos == [
+        ("inicio", "base_datos"), ("fin", "base_datos"),
+        ("inicio", "tasas"), ("fin", "tasas"),
+        ("inicio", "ordenes"), ("error", "ordenes", "índice dañado"),
+    ]
+    assert "ordenes" not in arranque.duraciones
+
+@pytest.mark.parametrize("argumentos, esperado", [
+    (["main.py"], (False, None, ["main.py"])),
+    (["main.py", "--perfil"], (True, None, ["main.py"])),
+    (["main.py", "--perfil", "/tmp/perfiles", "-style", "fusion"],
+     (True, "/tmp/perfiles", ["main.py", "-style", "fusion"])),
+    (["main.py", "--perfil", "-style", "fusion"], (True, None, ["main.py", "-style", "fusion"])),
+])
+def test_leer_opcion_perfil(argumentos, esperado):
+    """--perfil admite un directorio opcional y se quita de los argumentos que recibe Qt"""
+    assert perfilado.leer_opcion_perfil(argumentos) == esperado
+
+def test_perfilar_accion_guarda_perfil_y_resumen(tmp_path, monkeypatch):
+    """Sin activar solo ejecuta la acción; activado guarda su .prof y acumula la tabla de acciones"""
+    monkeypatch.setattr(perfilado, "_directorio", None)
+    monkeypatch.setattr(perfilado, "_acciones", {})
+    
+    @perfilado.perfilar_accion("sumar")
+    def sumar(a, b=1):
+        return a + b
+    
+    # El argumento sobrante (como el 'checked' de clicked) se descarta
+    assert sumar(2, 3, True) == 5
+    assert list(tmp_path.iterdir()) == []
+    
+    assert perfilado.activar_perfilado(str(tmp_path)) == tmp_path
+    assert sumar(2) == 3
+    assert sumar(2, b=5) == 7
+    
+    assert len(list(tmp_path.glob("sumar-*.prof"))) == 2
+    resumen = (tmp_path / "acciones.txt").read_text(encoding="utf-8").splitlines()
+    assert resumen[2].split()[:2] == ["sumar", "2"]
+
+@pytest.mark.parametrize("sql, esperado", [
+    ("SELECT * FROM facturas  -- comentario\n WHERE orden_id = 'F''1' AND monto > 10.5",
+     "SELECT * FROM facturas WHERE orden_id = ? AND monto > ?"),
+    ("SELECT t1.col2 FROM t1 WHERE id IN (1, 2,3)", "SELECT t1.col2 FROM t1 WHERE id IN (...)"),
+    ("select x from y where id in (?,?,?)", "select x from y where id IN (...)"),
+    ("UPDATE facturas\n\tSET cerrada = 1 WHERE dia_id IS NULL", "UPDATE facturas SET cerrada = ? WHERE dia_id IS NULL"),
+])
+def test_normalizar_sql(sql, esperado):
+    """Comentarios, espacios, literales y listas IN no separan ejecuciones de una misma sentencia"""
+    assert instrumentacion.normalizar_sql(sql) == esperado
+
+def test_registrar_medicion_histograma_y_consultas_lentas(tmp_path, monkeypatch):
+    """Cada medición cae en la cubeta de su límite superior; las lentas se anotan con su plan"""
+    ruta = tmp_path / "consultas_lentas.log"
+    monkeypatch.setattr(instrumentacion, "_estadisticas", {})
+    monkeypatch.setattr(instrumentacion, "_umbral_lento_s", 0.05)
+    monkeypatch.setattr(instrumentacion, "_ruta_registro", ruta)
+    conexion = sqlite3.connect(":memory:")
+    conexion.execute("CREATE TABLE facturas (orden_id TEXT PRIMARY KEY, monto REAL)")
+    
+    sql = "SELECT monto FROM facturas WHERE orden_id = ?"
+    for segundos in (0.00005, 0.001, 0.001, 0.003, 0.003, 0.003, 0.003, 0.003, 0.003, 2.0):
+        instrumentacion.registrar_medicion(conexion, sql, ("F1",), 1, 1, segundos)
+    instrumentacion.registrar_medicion(conexion, "SELECT monto FROM facturas WHERE orden_id = 'F2'", (), 0, 0, 0.0002)
+    conexion.close()
+    
+    [estadisticas] = instrumentacion.obtener_estadisticas()
+    assert estadisticas['sql'] == sql
+    assert estadisticas['ejecuciones'] == 11 and estadisticas['filas'] == 10
+    histograma = {limite: cantidad for limite, cantidad in estadisticas['histograma'].items() if cantidad}
+    assert histograma == {0.1: 1, 0.25: 1, 1: 2, 5: 6, None: 1}
+    assert estadisticas['p50_ms'] == 5 and estadisticas['p95_ms'] == float("inf")
+    assert estadisticas['maximo_ms'] == 2000 and estadisticas['lentas'] == 1
+    
+    anotadas = ruta.read_text(encoding="utf-8")
+    assert "2000.0 ms" in anotadas and anotadas.count(" ms |") == 1
+    assert "plan: SEARCH facturas USING INDEX" in anotadas
+
+def test_configurar_registro_nivel_y_capacidad_del_buffer():
+    """El búfer conserva los últimos mensajes que pasan el nivel; los demás no se llegan a formatear"""
+    buffer = registro.obtener_buffer()
+    nivel, capacidad = registro.nivel_actual(), buffer.registros.maxlen
+    
+    class Contador:
+        formateado = 0
+        def __str__(self):
+            Contador.formateado += 1
+            return "valor"
+    
+    prueba = registro.obtener_registro("app.pruebas")
+    try:
+        registro.configurar_registro("INFO", 3)
+        buffer.limpiar()
+        prueba.debug("oculto %s", Contador())
+        for numero in range(5):
+            prueba.info("mensaje %d", numero)
+        prueba.warning("aviso")
+        assert Contador.formateado == 0
+        assert [texto.split(": ", 1)[1] for texto in buffer.mensajes()] == ["mensaje 3", "mensaje 4", "aviso"]
+        assert all("facturacion.pruebas" in texto for texto in buffer.mensajes())
+        assert len(buffer.mensajes(logging.WARNING)) == 1
+        
+        # Sin capacidad no se cambia; al reducirla se conservan los más recientes
+        registro.configurar_registro("debug")
+        assert registro.nivel_actual() == "DEBUG" and buffer.registros.maxlen == 3
+        registro.configurar_registro(capacidad=2)
+        assert [texto.split(": ", 1)[1] for texto in buffer.mensajes()] == ["mensaje 4", "aviso"]
+        prueba.debug("visible %s", Contador())
+        assert Contador.formateado > 0 and buffer.mensajes()[-1].endswith("visible valor")
+        
+        registro.configurar_registro("desconocido")
+        assert registro.nivel_actual() == "INFO"
+    finally:
+        registro.configurar_registro(nivel, capacidad)
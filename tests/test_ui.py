@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de la interfaz gráfica.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).parent.parent
+
+# Módulos pesados que solo deben cargarse al usar el escáner
+MODULOS_PESADOS = ("cv2", "numpy")
+
+# Tiempo máximo de importación de la ventana principal (microsegundos, sin PyQt6).
+# Los servicios que importa tardan unos 120 ms; el resto es el código de las pestañas.
+PRESUPUESTO_IMPORTACION_US = 400000
+
+def medir_importacion(modulo, previos=()):
+    """
+    Importa un módulo en un proceso nuevo con -X importtime
+    
+    Args:
+        modulo: Módulo a importar
+        previos: Módulos importados antes (no cuentan en el tiempo de modulo)
+    
+    Returns:
+        Diccionario {módulo importado: tiempo acumulado en microsegundos}
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in (*previos, modulo))],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    
+    tiempos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        tiempos[nombre.strip()] = int(acumulado)
+    return tiempos
+
+def test_servicio_escaner_no_importa_modulos_pesados():
+    """El servicio de escaneo se importa sin cargar OpenCV ni NumPy (ni PyQt6)"""
+    tiempos = medir_importacion("app.services.scanner_service")
+    
+    cargados = [nombre for nombre in tiempos if nombre.split(".")[0] in (*MODULOS_PESADOS, "PyQt6")]
+    assert not cargados, f"Módulos pesados en el servicio de escaneo: {', '.join(sorted(cargados))}"
+
+def test_inicio_no_importa_modulos_pesados():
+    """La ventana principal se importa sin cargar OpenCV ni NumPy"""
+    pytest.importorskip("PyQt6.QtWidgets")
+    tiempos = medir_importacion("app.ui.main_window")
+    
+    cargados = [nombre for nombre in tiempos if nombre.split(".")[0] in MODULOS_PESADOS]
+    assert not cargados, f"Módulos pesados en el arranque: {', '.join(sorted(cargados))}"
+
+def test_presupuesto_importacion_ventana_principal():
+    """Importar la aplicación (sin contar PyQt6) cabe en el presupuesto de tiempo"""
+    pytest.importorskip("PyQt6.QtWidgets")
+    tiempos = medir_importacion("app.ui.main_window",
+                                previos=("PyQt6.QtCore", "PyQt6.QtGui", "PyQt6.QtWidgets"))
+    
+    propio = tiempos["app.ui.main_window"]
+    assert propio < PRESUPUESTO_IMPORTACION_US, f"Importar la ventana principal tardó {propio / 1000:.0f} ms"